@@ -0,0 +1,6 @@
+# Pacote api - serviço HTTP de processamento (FastAPI em api.main)
+from .service import DatasetService, DatasetExists, DatasetNotFound, ServiceDataset, get_dataset_service
+from .client import ExcelServiceClient, ServiceError
+
+__all__ = ['DatasetService', 'DatasetExists', 'DatasetNotFound', 'ServiceDataset', 'get_dataset_service',
+           'ExcelServiceClient', 'ServiceError']
@@ -0,0 +1,125 @@
+# Cliente do serviço HTTP (scripts de lote e front-ends)
+import os
+import time
+from typing import Dict, List, Any, Optional, BinaryIO, Union
+
+import pandas as pd
+import requests
+
+# Estados finais de uma tarefa (ver core.jobs)
+FINISHED = ('done', 'failed', 'cancelled')
+
+
+class ServiceError(Exception):
+    """Erro devolvido pelo serviço (ou tarefa que terminou sem sucesso)"""
+    pass
+
+
+class ExcelServiceClient:
+    """
+    Acesso ao serviço de processamento (api.main)
+
+    Exemplo de execução noturna:
+
+        client = ExcelServiceClient('http://localhost:8000')
+        client.upload('vendas', 'vendas.csv')
+        client.upload('clientes', 'clientes.xlsx')
+        client.run('join', left='vendas', right='clientes', left_on=['id'], right_on=['id'], result='relatorio')
+        client.download('relatorio', 'relatorio.xlsx')
+    """
+
+    def __init__(self, base_url: str = 'http://localhost:8000', timeout: float = 60.0,
+                 session: Optional[requests.Session] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    # Datasets --------------------------------------------------------------
+
+    def datasets(self) -> List[Dict[str, Any]]:
+        return self._request('GET', '/datasets')
+
+    def dataset(self, name: str) -> Dict[str, Any]:
+        return self._request('GET', f'/datasets/{name}')
+
+    def upload(self, name: str, source: Union[str, BinaryIO], filename: Optional[str] = None,
+               replace: bool = False, sheet: Optional[str] = None, wait: bool = True) -> Dict[str, Any]:
+        """Envia um arquivo (caminho ou arquivo aberto) em streaming; espera a leitura com `wait`"""
+        if isinstance(source, str):
+            filename = filename or os.path.basename(source)
+            with open(source, 'rb') as handle:
+                return self.upload(name, handle, filename, replace, sheet, wait)
+        if not filename:
+            raise ValueError("Informe o nome do arquivo (a extensão define o formato)")
+
+        params = {'filename': filename, 'replace': replace}
+        if sheet is not None:
+            params['sheet'] = sheet
+        job = self._request('PUT', f'/datasets/{name}', params=params, data=source)
+        return self.wait(job['id']) if wait else job
+
+    def rows(self, name: str, start: int = 0, limit: int = 100) -> pd.DataFrame:
+        return pd.DataFrame(self._request('GET', f'/datasets/{name}/rows', params={'start': start, 'limit': limit}))
+
+    def download(self, name: str, path: Optional[str] = None, file_format: str = 'xlsx',
+                 **options: Any) -> bytes:
+        """Baixa o dataset no formato pedido (e grava em `path`, se informado)"""
+        data = self._send('GET', f'/datasets/{name}/download', params={'format': file_format, **options}).content
+        if path:
+            with open(path, 'wb') as target:
+                target.write(data)
+        return data
+
+    def undo(self, name: str) -> Dict[str, Any]:
+        return self._request('POST', f'/datasets/{name}/undo')
+
+    def delete(self, name: str) -> None:
+        self._send('DELETE', f'/datasets/{name}')
+
+    # Operações -------------------------------------------------------------
+
+    def submit(self, operation: str, /, **body: Any) -> Dict[str, Any]:
+        """Submete uma operação (join, procv, depara, formulas, arithmetic, group) e devolve a tarefa"""
+        return self._request('POST', f'/operations/{operation}', json=body)
+
+    def run(self, operation: str, /, **body: Any) -> Dict[str, Any]:
+        """Submete a operação e espera terminar; devolve o resultado da tarefa"""
+        return self.wait(self.submit(operation, **body)['id'])['result']
+
+    # Tarefas ---------------------------------------------------------------
+
+    def job(self, job_id: str) -> Dict[str, Any]:
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        return self._request('DELETE', f'/jobs/{job_id}')
+
+    def wait(self, job_id: str, poll: float = 0.5, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Acompanha a tarefa até o fim; levanta ServiceError se ela falhar ou for cancelada"""
+        started = time.monotonic()
+        while True:
+            job = self.job(job_id)
+            if job['status'] in FINISHED:
+                break
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise ServiceError(f"Tarefa '{job['name']}' não terminou em {timeout:.0f}s")
+            time.sleep(poll)
+
+        if job['status'] != 'done':
+            raise ServiceError(job['error'] or f"Tarefa '{job['name']}' cancelada")
+        return job
+
+    # Internos --------------------------------------------------------------
+
+    def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        return self._send(method, path, **kwargs).json()
+
+    def _send(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get('detail')
+            except ValueError:
+                detail = response.text
+            raise ServiceError(f"{response.status_code}: {detail}")
+        return response
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Serviço HTTP do editor de Excel: upload em streaming, operações em segundo
+plano e download dos resultados
+
+    uvicorn api.main:app --host 0.0.0.0 --port 8000
+
+(executado a partir da pasta streamlit/)
+"""
+import os
+import tempfile
+from typing import Dict, List, Any, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+try:
+    import aiofiles
+except ImportError:  # pragma: no cover - aiofiles é opcional
+    aiofiles = None
+
+from core.export import EXPORT_FORMATS, ExportOptions
+from core.ingest import IngestOptions
+from core.jobs import Job
+from core.mapping import NormalizeOptions
+from core.memory import MB, MemoryBudgetExceeded
+from api.service import DatasetExists, DatasetNotFound, DatasetService, get_dataset_service
+
+# Tamanho máximo de um upload
+MAX_UPLOAD_BYTES = int(os.environ.get('EXCEL_API_MAX_UPLOAD_MB', 1024)) * MB
+
+
+# Corpos das operações ------------------------------------------------------
+
+class JoinRequest(BaseModel):
+    left: str
+    right: str
+    left_on: List[str]
+    right_on: List[str]
+    how: str = 'left'
+    result: Optional[str] = None
+    max_rows: Optional[int] = None
+
+
+class ProcvRequest(BaseModel):
+    source: str
+    reference: str
+    lookup_columns: List[str]
+    reference_columns: List[str]
+    value_columns: List[str]
+    new_column: str
+    mode: str = 'exact'
+    duplicates: str = 'first'
+
+
+class DeparaRequest(BaseModel):
+    dataset: str
+    columns: List[str]
+    de: List[Any]
+    para: List[Any]
+    case: bool = False
+    whitespace: bool = False
+    accents: bool = False
+    regex: bool = False
+
+
+class FormulasRequest(BaseModel):
+    dataset: str
+    formulas: str
+
+
+class ArithmeticRequest(BaseModel):
+    dataset: str
+    operation: str = Field(description="add, sub, mul ou div")
+    column1: str
+    column2: str
+    new_column: str
+
+
+class GroupRequest(BaseModel):
+    dataset: str
+    keys: List[str]
+    aggregations: List[Tuple[str, str]] = Field(description="Pares (coluna, função)")
+    pivot: Optional[str] = None
+    result: Optional[str] = None
+
+
+def job_summary(job: Job) -> Dict[str, Any]:
+    """Estado de uma tarefa em JSON"""
+    return {
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'progress': job.progress,
+        'elapsed': job.elapsed,
+        'result': job.result if isinstance(job.result, dict) else None,
+        'error': job.error
+    }
+
+
+def create_app(service: Optional[DatasetService] = None) -> FastAPI:
+    """Aplicação FastAPI sobre o serviço de datasets (o do processo, por padrão)"""
+    app = FastAPI(title="Editor de Excel - Serviço de Processamento")
+
+    def get_service() -> DatasetService:
+        return service or get_dataset_service()
+
+    def accepted(job: Job) -> JSONResponse:
+        return JSONResponse(job_summary(job), status_code=202)
+
+    @app.exception_handler(DatasetNotFound)
+    async def not_found(request: Request, exc: DatasetNotFound) -> JSONResponse:
+        return JSONResponse({'detail': str(exc)}, status_code=404)
+
+    @app.exception_handler(DatasetExists)
+    async def conflict(request: Request, exc: DatasetExists) -> JSONResponse:
+        return JSONResponse({'detail': str(exc)}, status_code=409)
+
+    @app.exception_handler(MemoryBudgetExceeded)
+    async def no_memory(request: Request, exc: MemoryBudgetExceeded) -> JSONResponse:
+        return JSONResponse({'detail': str(exc)}, status_code=507)
+
+    @app.exception_handler(ValueError)
+    async def bad_request(request: Request, exc: ValueError) -> JSONResponse:
+        return JSONResponse({'detail': str(exc)}, status_code=400)
+
+    @app.get('/health')
+    async def health() -> Dict[str, Any]:
+        return {'status': 'ok', 'datasets': len(get_service().datasets())}
+
+    # Datasets --------------------------------------------------------------
+
+    @app.get('/datasets')
+    async def list_datasets() -> List[Dict[str, Any]]:
+        return get_service().datasets()
+
+    @app.put('/datasets/{name}', status_code=202)
+    async def upload_dataset(name: str, request: Request, filename: str, replace: bool = False,
+                             sheet: Optional[str] = None, engine: str = 'pandas') -> JSONResponse:
+        """
+        Recebe o arquivo como corpo da requisição (sem multipart), gravado em
+        disco bloco a bloco; a leitura acontece em segundo plano
+        """
+        path = await _receive_file(request, os.path.splitext(filename)[1])
+        try:
+            job = get_service().ingest(name, path, filename, replace=replace, sheet=sheet,
+                                       options=IngestOptions(engine=engine))
+        except Exception:
+            os.remove(path)
+            raise
+        return accepted(job)
+
+    @app.get('/datasets/{name}')
+    async def get_dataset(name: str) -> Dict[str, Any]:
+        return get_service().dataset(name).summary()
+
+    @app.get('/datasets/{name}/rows')
+    async def get_rows(name: str, start: int = Query(0, ge=0),
+                       limit: int = Query(100, ge=0, le=10_000)) -> Response:
+        rows = await run_in_threadpool(get_service().rows, name, start, limit)
+        return Response(rows.to_json(orient='records', date_format='iso'), media_type='application/json')
+
+    @app.get('/datasets/{name}/download')
+    async def download(name: str, format: str = 'xlsx', decimal_separator: str = '.',
+                       date_format: str = 'AAAA-MM-DD', include_index: bool = False) -> Response:
+        options = ExportOptions.from_config({
+            'decimal_separator': decimal_separator, 'date_format': date_format, 'include_index': include_index
+        })
+        data = await run_in_threadpool(get_service().export, name, format, options)
+        _, extension, mime = EXPORT_FORMATS[format]
+        return Response(data, media_type=mime, headers={
+            'Content-Disposition': f'attachment; filename="{name}.{extension}"'
+        })
+
+    @app.post('/datasets/{name}/undo')
+    async def undo(name: str) -> Dict[str, Any]:
+        return await run_in_threadpool(get_service().undo, name)
+
+    @app.delete('/datasets/{name}', status_code=204)
+    async def delete_dataset(name: str) -> Response:
+        await run_in_threadpool(get_service().delete, name)
+        return Response(status_code=204)
+
+    # Operações -------------------------------------------------------------
+
+    @app.post('/operations/join', status_code=202)
+    async def join(body: JoinRequest) -> JSONResponse:
+        return accepted(get_service().join(
+            body.left, body.right, body.left_on, body.right_on, body.how, body.result, body.max_rows
+        ))
+
+    @app.post('/operations/procv', status_code=202)
+    async def procv(body: ProcvRequest) -> JSONResponse:
+        return accepted(get_service().procv(
+            body.source, body.reference, body.lookup_columns, body.reference_columns,
+            body.value_columns, body.new_column, body.mode, body.duplicates
+        ))
+
+    @app.post('/operations/depara', status_code=202)
+    async def depara(body: DeparaRequest) -> JSONResponse:
+        normalize = NormalizeOptions(case=body.case, whitespace=body.whitespace, accents=body.accents)
+        return accepted(get_service().depara(body.dataset, body.columns, body.de, body.para, normalize, body.regex))
+
+    @app.post('/operations/formulas', status_code=202)
+    async def formulas(body: FormulasRequest) -> JSONResponse:
+        return accepted(get_service().formulas(body.dataset, body.formulas))
+
+    @app.post('/operations/arithmetic', status_code=202)
+    async def arithmetic(body: ArithmeticRequest) -> JSONResponse:
+        return accepted(get_service().arithmetic(
+            body.dataset, body.operation, body.column1, body.column2, body.new_column
+        ))
+
+    @app.post('/operations/group', status_code=202)
+    async def group(body: GroupRequest) -> JSONResponse:
+        return accepted(get_service().group(
+            body.dataset, body.keys, [tuple(item) for item in body.aggregations], body.pivot, body.result
+        ))
+
+    # Tarefas ---------------------------------------------------------------
+
+    @app.get('/jobs')
+    async def list_jobs() -> List[Dict[str, Any]]:
+        return [job_summary(job) for job in get_service().jobs()]
+
+    @app.get('/jobs/{job_id}')
+    async def get_job(job_id: str) -> Dict[str, Any]:
+        job = get_service().job(job_id)
+        if job is None:
+            raise HTTPException(404, f"Tarefa '{job_id}' não encontrada")
+        return job_summary(job)
+
+    @app.delete('/jobs/{job_id}')
+    async def cancel_job(job_id: str) -> Dict[str, Any]:
+        job = get_service().cancel(job_id)
+        if job is None:
+            raise HTTPException(404, f"Tarefa '{job_id}' não encontrada")
+        return job_summary(job)
+
+    return app
+
+
+async def _receive_file(request: Request, suffix: str) -> str:
+    """Grava o corpo da requisição em um arquivo temporário sem mantê-lo inteiro em memória"""
+    declared = int(request.headers.get('content-length') or 0)
+    if declared > MAX_UPLOAD_BYTES:
+        raise HTTPException(413, f"Arquivo maior que {MAX_UPLOAD_BYTES // MB} MB")
+
+    descriptor, path = tempfile.mkstemp(suffix=suffix, prefix='upload_')
+    os.close(descriptor)
+    received = 0
+    try:
+        if aiofiles is not None:
+            async with aiofiles.open(path, 'wb') as target:
+                async for chunk in request.stream():
+                    received += len(chunk)
+                    if received > MAX_UPLOAD_BYTES:
+                        raise HTTPException(413, f"Arquivo maior que {MAX_UPLOAD_BYTES // MB} MB")
+                    await target.write(chunk)
+        else:
+            with open(path, 'wb') as target:
+                async for chunk in request.stream():
+                    received += len(chunk)
+                    if received > MAX_UPLOAD_BYTES:
+                        raise HTTPException(413, f"Arquivo maior que {MAX_UPLOAD_BYTES // MB} MB")
+                    await run_in_threadpool(target.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+app = create_app()
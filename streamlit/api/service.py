@@ -0,0 +1,350 @@
+# Serviço de datasets e operações (sem interface)
+import os
+import time
+import contextlib
+import threading
+import dataclasses
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+
+import pandas as pd
+
+from core.engine import OperationEngine
+from core.export import EXPORT_FORMATS, ExportCache, ExportOptions, csv_date_formats, export_file
+from core.ingest import IngestOptions, IngestReport, file_format, read_columnar, read_csv_chunked, read_excel_sheet
+from core.jobs import DONE, Job, JobCancelled, JobRunner, get_job_runner
+from core.joins import KeyIndexCache
+from core.journal import EditJournal
+from core.mapping import NormalizeOptions
+from core.memory import get_memory_budget
+from core.storage import DatasetStore, create_dataset_store
+from core.workers import WorkerPool, get_worker_pool
+
+# Sessão que representa o serviço no orçamento global de memória
+SERVICE_BUDGET_ID = 'api-service'
+
+
+class DatasetNotFound(Exception):
+    """Dataset inexistente no serviço"""
+    pass
+
+
+class DatasetExists(Exception):
+    """Já existe um dataset com o nome pedido"""
+    pass
+
+
+@dataclass
+class ServiceDataset:
+    """Dataset carregado no serviço: journal de edições e origem"""
+    name: str
+    filename: str
+    journal: EditJournal
+    sheets: List[str] = field(default_factory=list)
+    report: Optional[IngestReport] = None
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False)
+
+    def summary(self) -> Dict[str, Any]:
+        handle = self.journal.handle
+        return {
+            'name': self.name,
+            'filename': self.filename,
+            'rows': handle.num_rows,
+            'columns': list(handle.columns),
+            'sheets': self.sheets,
+            'memory_bytes': handle.memory_bytes,
+            'history': [
+                {'description': description, 'applied': applied}
+                for description, applied in self.journal.history()
+            ],
+            'version': handle.key
+        }
+
+
+class DatasetService:
+    """
+    Datasets e operações do editor de Excel para uso fora do Streamlit
+
+    Mesmo motor (OperationEngine) e mesmo executor de tarefas (JobRunner) do
+    editor: leituras e operações rodam em segundo plano e devolvem um Job;
+    o parse de Excel e as operações pesadas em tabelas grandes rodam em
+    processos (e são canceladas junto com o Job). Operações sobre um mesmo
+    dataset são serializadas pelo lock do dataset.
+    """
+
+    def __init__(self, store: Optional[DatasetStore] = None, runner: Optional[JobRunner] = None,
+                 export_cache: Optional[ExportCache] = None, workers: Optional[WorkerPool] = None):
+        self.store = store or create_dataset_store()
+        self.runner = runner or get_job_runner()
+        self.engine = OperationEngine(self.store, KeyIndexCache(), self._ensure_memory,
+                                      workers=workers or get_worker_pool())
+        self.export_cache = export_cache or ExportCache()
+        self._datasets: Dict[str, ServiceDataset] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    # Datasets --------------------------------------------------------------
+
+    def datasets(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            datasets = list(self._datasets.values())
+        return [dataset.summary() for dataset in datasets]
+
+    def dataset(self, name: str) -> ServiceDataset:
+        with self._lock:
+            if name not in self._datasets:
+                raise DatasetNotFound(f"Dataset '{name}' não encontrado")
+            return self._datasets[name]
+
+    def ingest(self, name: str, path: str, filename: str, replace: bool = False,
+               sheet: Optional[str] = None, options: Optional[IngestOptions] = None) -> Job:
+        """
+        Lê o arquivo enviado (já gravado em `path`, que é apagado ao final) em
+        segundo plano e registra o resultado como `name`
+        """
+        upload_format = file_format(filename)
+        if upload_format is None:
+            raise ValueError(f"Formato de arquivo não suportado: {filename}")
+        if not replace:
+            self._check_name(name)
+        self._ensure_memory(os.path.getsize(path), f"o arquivo {filename}")
+
+        return self._submit(f"Upload {filename}", self._ingest_job, name, path, filename,
+                            upload_format, sheet, options or IngestOptions(), replace)
+
+    def rows(self, name: str, start: int = 0, limit: int = 100) -> pd.DataFrame:
+        """Linhas [start, start + limit) da versão atual (apenas elas são lidas)"""
+        handle = self.dataset(name).journal.handle
+        start = max(0, start)
+        return self.store.read_rows(handle, start, min(start + max(0, limit), handle.num_rows))
+
+    def export(self, name: str, export_format: str, options: Optional[ExportOptions] = None) -> bytes:
+        """Arquivo do dataset no formato pedido (repetido a partir do cache enquanto não houver edições)"""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportação desconhecido: {export_format}")
+        options = options or ExportOptions()
+        dataset = self.dataset(name)
+        with dataset.lock:
+            handle = dataset.journal.handle
+        data, _ = self.export_cache.get(
+            (handle.key, name, export_format, options),
+            lambda: export_file(
+                export_format, [(name, self.store.iter_batches(handle), handle.columns)], options,
+                total_rows=handle.num_rows,
+                date_formats=csv_date_formats(self.store, handle, options) if export_format == 'csv' else None
+            )
+        )
+        return data
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            dataset = self._datasets.pop(name, None)
+        if dataset is None:
+            raise DatasetNotFound(f"Dataset '{name}' não encontrado")
+        with dataset.lock:
+            dataset.journal.release()
+        self._report_memory()
+
+    # Operações -------------------------------------------------------------
+
+    def join(self, left: str, right: str, left_on: List[str], right_on: List[str], how: str = 'left',
+             result: Optional[str] = None, max_rows: Optional[int] = None) -> Job:
+        result = result or f"{left}_{right}_{how}"
+        self._check_name(result)
+        left_dataset, right_dataset = self.dataset(left), self.dataset(right)
+
+        def run(job: Job) -> Dict[str, Any]:
+            with self._locked(left_dataset, right_dataset):
+                handle, stats = self.engine.join(
+                    left_dataset.journal, right_dataset.journal, left_on, right_on, how, max_rows, job=job
+                )
+            self._register(result, f"JOIN {left} × {right}", handle)
+            return {'dataset': result, 'stats': dataclasses.asdict(stats)}
+
+        return self._submit(f"JOIN {left} × {right}", run)
+
+    def procv(self, source: str, reference: str, lookup_columns: List[str], reference_columns: List[str],
+              value_columns: List[str], new_column: str, mode: str = 'exact', duplicates: str = 'first') -> Job:
+        source_dataset, reference_dataset = self.dataset(source), self.dataset(reference)
+
+        def run(job: Job) -> Dict[str, Any]:
+            with self._locked(source_dataset, reference_dataset):
+                columns, stats = self.engine.procv(
+                    source_dataset.journal, reference_dataset.journal, lookup_columns, reference_columns,
+                    value_columns, new_column, mode, duplicates, reference_name=reference
+                )
+            return {'dataset': source, 'columns': columns, 'stats': dataclasses.asdict(stats)}
+
+        return self._submit(f"PROCV {source} ← {reference}", run)
+
+    def depara(self, name: str, columns: List[str], de: List[Any], para: List[Any],
+               normalize: Optional[NormalizeOptions] = None, regex: bool = False) -> Job:
+        return self._edit(name, "DE/PARA", lambda journal, job: self.engine.depara(
+            journal, columns, de, para, normalize, regex, job=job
+        ))
+
+    def formulas(self, name: str, text: str) -> Job:
+        return self._edit(name, "Fórmulas", lambda journal, job: self.engine.formulas(journal, text))
+
+    def arithmetic(self, name: str, operation: str, column1: str, column2: str, new_column: str) -> Job:
+        return self._edit(name, new_column, lambda journal, job: self.engine.arithmetic(
+            journal, operation, column1, column2, new_column
+        ))
+
+    def group(self, name: str, keys: List[str], aggregations: List[Tuple[str, str]],
+              pivot: Optional[str] = None, result: Optional[str] = None) -> Job:
+        result = result or f"{name}_agrupado"
+        self._check_name(result)
+        dataset = self.dataset(name)
+
+        def run(job: Job) -> Dict[str, Any]:
+            with dataset.lock:
+                journal = dataset.journal
+            # Progresso pela fração de linhas já agregadas
+            total = max(journal.handle.num_rows, 1)
+            handle, stats = self.engine.group(
+                journal, keys, aggregations, pivot, progress=lambda rows: job.report(rows / total), job=job
+            )
+            self._register(result, f"Agrupamento de {name}", handle)
+            return {'dataset': result, 'stats': dataclasses.asdict(stats)}
+
+        return self._submit(f"Agrupamento {name}", run)
+
+    def undo(self, name: str) -> Dict[str, Any]:
+        dataset = self.dataset(name)
+        with dataset.lock:
+            if dataset.journal.can_undo:
+                dataset.journal.undo()
+        return dataset.summary()
+
+    # Tarefas ---------------------------------------------------------------
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def job(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.job(job_id)
+        if job is not None and not job.done:
+            job.cancel()
+        return job
+
+    # Internos --------------------------------------------------------------
+
+    def _submit(self, name: str, fn: Any, *args) -> Job:
+        job = self.runner.submit(name, fn, *args)
+        with self._lock:
+            # Mantém apenas as tarefas recentes já concluídas
+            finished = [key for key, item in self._jobs.items() if item.done]
+            for key in finished[:max(0, len(finished) - 200)]:
+                del self._jobs[key]
+            self._jobs[job.id] = job
+        return job
+
+    def _edit(self, name: str, description: str, operation: Any) -> Job:
+        """Operação que altera o dataset (registrada no seu journal)"""
+        dataset = self.dataset(name)
+
+        def run(job: Job) -> Dict[str, Any]:
+            with dataset.lock:
+                stats = operation(dataset.journal, job)
+            self._report_memory()
+            return {'dataset': name, 'stats': dataclasses.asdict(stats) if stats is not None else None,
+                    'columns': list(dataset.journal.handle.columns)}
+
+        return self._submit(f"{description} em {name}", run)
+
+    def _ingest_job(self, job: Job, name: str, path: str, filename: str, upload_format: str,
+                    sheet: Optional[str], options: IngestOptions, replace: bool) -> Dict[str, Any]:
+        try:
+            sheets, report = [], None
+            if upload_format == 'csv':
+                with open(path, 'rb') as source:
+                    df, report = read_csv_chunked(source, options, progress=job.report,
+                                                  total_bytes=os.path.getsize(path))
+            else:
+                with open(path, 'rb') as source:
+                    data = source.read()
+                if upload_format == 'excel':
+                    # openpyxl prende o GIL: o parse roda no pool de processos
+                    parse = self.runner.submit(filename, read_excel_sheet, data, sheet, kind='process')
+                    self._wait(job, parse)
+                    sheets, df = parse.result
+                else:
+                    df, report = read_columnar(data, upload_format, options, progress=job.report)
+        finally:
+            os.remove(path)
+
+        self._register(name, filename, self.store.put(df), sheets=sheets, report=report, replace=replace)
+        return {'dataset': name, 'rows': len(df), 'columns': list(df.columns), 'sheets': sheets}
+
+    @contextlib.contextmanager
+    def _locked(self, *datasets: ServiceDataset):
+        # Sempre na mesma ordem (por nome) para que operações cruzadas não travem
+        with contextlib.ExitStack() as stack:
+            for dataset in sorted(datasets, key=lambda item: item.name):
+                stack.enter_context(dataset.lock)
+            yield
+
+    def _wait(self, job: Job, child: Job) -> None:
+        """Aguarda uma tarefa auxiliar (repassando o cancelamento de `job`)"""
+        try:
+            while not child.done:
+                job.report(job.progress)
+                time.sleep(0.05)
+        except JobCancelled:
+            child.cancel()
+            raise
+        if child.status != DONE:
+            raise ValueError(child.error or f"Tarefa '{child.name}' cancelada")
+
+    def _register(self, name: str, filename: str, handle: Any, sheets: Optional[List[str]] = None,
+                  report: Optional[IngestReport] = None, replace: bool = False) -> None:
+        dataset = ServiceDataset(name, filename, EditJournal(self.store, handle), sheets or [], report)
+        with self._lock:
+            previous = self._datasets.get(name)
+            if previous is not None and not replace:
+                self.store.delete(handle)
+                raise DatasetExists(f"Já existe um dataset chamado '{name}'")
+            self._datasets[name] = dataset
+        if previous is not None:
+            with previous.lock:
+                previous.journal.release()
+        self._report_memory()
+
+    def _check_name(self, name: str) -> None:
+        if not name:
+            raise ValueError("Informe o nome do dataset")
+        with self._lock:
+            if name in self._datasets:
+                raise DatasetExists(f"Já existe um dataset chamado '{name}'")
+
+    def _ensure_memory(self, nbytes: int, description: str) -> None:
+        """Despeja datasets para disco se preciso e recusa cargas acima do orçamento"""
+        budget = get_memory_budget()
+        self._report_memory()
+        shortfall = nbytes - budget.available(SERVICE_BUDGET_ID)
+        if shortfall > 0:
+            self.store.spill(shortfall)
+            self._report_memory()
+        budget.check(SERVICE_BUDGET_ID, nbytes, description)
+
+    def _report_memory(self) -> None:
+        get_memory_budget().report(SERVICE_BUDGET_ID, self.store.resident_bytes)
+
+
+_service: Optional[DatasetService] = None
+_service_lock = threading.Lock()
+
+
+def get_dataset_service() -> DatasetService:
+    """Serviço de datasets do processo"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = DatasetService()
+        return _service
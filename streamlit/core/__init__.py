@@ -1,4 +1,55 @@
 # Pacote core - componentes base da aplicação
 from .base import BaseModule, AppManager, AppConfig, DataProcessor, UIComponents
+from .cache import WorkbookCache
+from .storage import DatasetStore, DatasetHandle, MemoryDatasetStore, ParquetDatasetStore, StoreConfig, create_dataset_store
+from .journal import EditJournal, EditOperation
+from .ingest import IngestOptions, IngestReport, read_csv_chunked, read_excel_sheet, read_columnar, file_format
+from .memory import MemoryBudget, MemoryBudgetConfig, MemoryBudgetExceeded, get_memory_budget
+from .joins import JOIN_TYPES, KeyIndex, KeyIndexCache, JoinEstimate, JoinStats, JoinTooLarge, estimate_join, hash_join
+from .lookup import LookupStats, DuplicateKeys, lookup
+from .mapping import NormalizeOptions, ReplacementMap, ReplacementMapCache, ReplacementStats, get_replacement_cache
+from .expressions import Expression, ExpressionError, FormulaStats, compile_expression, parse_formulas, evaluate_formulas
+from .profiling import ColumnProfile, DatasetProfile, ProfileCache, profile_frame, update_profile
+from .aggregate import AGGREGATIONS, AggregateStats, GroupAggregator, group_aggregate
+from .export import (
+    EXPORT_FORMATS, ExportOptions, ExportCache, csv_date_formats, export_file, write_excel, write_csv, write_ndjson,
+    write_parquet, write_feather
+)
+from .workers import FrameRef, WorkerPool, WorkerError, WorkerTimeout, WorkerMemoryExceeded, get_worker_pool
+from .pipeline import (
+    FILTER_OPS, FilterStep, JoinStep, LookupStep, FormulaStep, SelectStep, GroupStep, Pipeline, QueryPlan,
+    PlanStats, StepTiming, optimize
+)
+from .engine import ARITHMETIC, OperationEngine
+from .shared import SharedDatasetCache, SharedEntry, get_shared_cache
+from .workspace import WorkspaceConfig, WorkspaceDataset, WorkspaceStore, get_workspace_store
+from .jobs import Job, JobRunner, JobCancelled, get_job_runner
+from .jsonstream import ColumnBuilder, JsonReadStats, decode_json, encode_json, read_json_document
+from .validation import (
+    ISSUE_COLUMNS, Rule, FrameRule, Schema, IncrementalValidator, ValidationStats, unique, matches,
+    valid_cpf, valid_cnpj, valid_cpf_cnpj, valid_cep
+)
 
-__all__ = ['BaseModule', 'AppManager', 'AppConfig', 'DataProcessor', 'UIComponents']
\ No newline at end of file
+__all__ = ['BaseModule', 'AppManager', 'AppConfig', 'DataProcessor', 'UIComponents', 'WorkbookCache',
+           'DatasetStore', 'DatasetHandle', 'MemoryDatasetStore', 'ParquetDatasetStore', 'StoreConfig',
+           'create_dataset_store', 'EditJournal', 'EditOperation',
+           'IngestOptions', 'IngestReport', 'read_csv_chunked', 'read_excel_sheet', 'read_columnar', 'file_format',
+           'MemoryBudget', 'MemoryBudgetConfig', 'MemoryBudgetExceeded', 'get_memory_budget',
+           'JOIN_TYPES', 'KeyIndex', 'KeyIndexCache', 'JoinEstimate', 'JoinStats', 'JoinTooLarge', 'estimate_join', 'hash_join',
+           'LookupStats', 'DuplicateKeys', 'lookup',
+           'NormalizeOptions', 'ReplacementMap', 'ReplacementMapCache', 'ReplacementStats', 'get_replacement_cache',
+           'Expression', 'ExpressionError', 'FormulaStats', 'compile_expression', 'parse_formulas', 'evaluate_formulas',
+           'ColumnProfile', 'DatasetProfile', 'ProfileCache', 'profile_frame', 'update_profile',
+           'AGGREGATIONS', 'AggregateStats', 'GroupAggregator', 'group_aggregate',
+           'EXPORT_FORMATS', 'ExportOptions', 'ExportCache', 'csv_date_formats', 'export_file', 'write_excel', 'write_csv',
+           'write_ndjson', 'write_parquet', 'write_feather',
+           'FrameRef', 'WorkerPool', 'WorkerError', 'WorkerTimeout', 'WorkerMemoryExceeded', 'get_worker_pool',
+           'FILTER_OPS', 'FilterStep', 'JoinStep', 'LookupStep', 'FormulaStep', 'SelectStep', 'GroupStep',
+           'Pipeline', 'QueryPlan', 'PlanStats', 'StepTiming', 'optimize',
+           'ARITHMETIC', 'OperationEngine',
+           'SharedDatasetCache', 'SharedEntry', 'get_shared_cache',
+           'WorkspaceConfig', 'WorkspaceDataset', 'WorkspaceStore', 'get_workspace_store',
+           'Job', 'JobRunner', 'JobCancelled', 'get_job_runner',
+           'ColumnBuilder', 'JsonReadStats', 'decode_json', 'encode_json', 'read_json_document',
+           'ISSUE_COLUMNS', 'Rule', 'FrameRule', 'Schema', 'IncrementalValidator', 'ValidationStats', 'unique', 'matches',
+           'valid_cpf', 'valid_cnpj', 'valid_cpf_cnpj', 'valid_cep']
\ No newline at end of file
@@ -0,0 +1,231 @@
+# Agrupamento / tabela dinâmica com agregação em blocos
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Iterable, Callable
+
+import numpy as np
+import pandas as pd
+
+# Agregações disponíveis (percentis no formato pNN, ex.: p90)
+AGGREGATIONS = {
+    'sum': 'Soma',
+    'mean': 'Média',
+    'count': 'Contagem',
+    'min': 'Mínimo',
+    'max': 'Máximo',
+    'nunique': 'Valores distintos',
+    'median': 'Mediana',
+    'p25': 'Percentil 25',
+    'p75': 'Percentil 75',
+    'p90': 'Percentil 90',
+}
+
+# Estado parcial mantido por grupo e como é combinado entre blocos
+_PARTIALS = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+_NEEDS = {'sum': ('sum',), 'mean': ('sum', 'count'), 'count': ('count',), 'min': ('min',), 'max': ('max',)}
+_NUMERIC_ONLY = ('sum', 'mean')
+_PERCENTILE = re.compile(r'^p(\d{1,2})$')
+
+
+@dataclass
+class AggregateStats:
+    """Linhas lidas, grupos gerados e tempo de um agrupamento"""
+    rows_scanned: int = 0
+    batches: int = 0
+    groups: int = 0
+    elapsed: float = 0.0
+
+
+def percentile_of(func: str) -> Optional[float]:
+    """Fração do percentil pedido (median = 0.5), ou None se não for percentil"""
+    if func == 'median':
+        return 0.5
+    match = _PERCENTILE.match(func)
+    return int(match.group(1)) / 100 if match else None
+
+
+def result_column(column: str, func: str) -> str:
+    """Nome da coluna de resultado de uma agregação"""
+    return f"{column}_{func}"
+
+
+class GroupAggregator:
+    """
+    Agregação incremental: cada bloco de linhas é reduzido a um estado por
+    grupo (somas, contagens, mínimos, máximos) e combinado ao estado acumulado,
+    então a memória depende do número de grupos, não do número de linhas.
+
+    Valores distintos e percentis precisam das frequências de cada par
+    (grupo, valor), que também são combinadas bloco a bloco; os percentis são
+    exatos (mesma interpolação linear do pandas).
+    """
+
+    def __init__(self, keys: List[str], aggregations: List[Tuple[str, str]], pivot: Optional[str] = None):
+        if not keys:
+            raise ValueError("Selecione ao menos uma coluna de agrupamento")
+        if not aggregations:
+            raise ValueError("Selecione ao menos uma agregação")
+        for _, func in aggregations:
+            if func not in _NEEDS and func != 'nunique' and percentile_of(func) is None:
+                raise ValueError(f"Agregação desconhecida: {func}")
+
+        if pivot and pivot in keys:
+            raise ValueError("A coluna do pivô não pode ser também uma coluna de agrupamento")
+
+        self.keys = list(keys)
+        self.pivot = pivot
+        self.group_keys = self.keys + ([pivot] if pivot else [])
+        self.aggregations = list(dict.fromkeys(aggregations))
+        self.stats = AggregateStats()
+
+        # Estados parciais: (coluna, parcial) e frequências por coluna
+        self._partial_specs = sorted({
+            (column, partial) for column, func in self.aggregations for partial in _NEEDS.get(func, ())
+        })
+        self._frequency_columns = sorted({
+            column for column, func in self.aggregations if func not in _NEEDS
+        })
+        self._state: Optional[pd.DataFrame] = None
+        self._frequencies: Dict[str, pd.Series] = {}
+
+    @property
+    def columns(self) -> List[str]:
+        """Colunas a ler do dataset"""
+        return list(dict.fromkeys(self.group_keys + [column for column, _ in self.aggregations]))
+
+    def update(self, batch: pd.DataFrame) -> None:
+        """Incorpora um bloco de linhas"""
+        self.stats.rows_scanned += len(batch)
+        self.stats.batches += 1
+        if batch.empty:
+            return
+
+        for column, func in self.aggregations:
+            if (func in _NUMERIC_ONLY or percentile_of(func) is not None) \
+                    and not pd.api.types.is_numeric_dtype(batch[column]):
+                raise ValueError(f"'{AGGREGATIONS.get(func, func)}' exige uma coluna numérica: '{column}'")
+
+        grouped = batch.groupby(self.group_keys, dropna=False, observed=True, sort=False)
+
+        if self._partial_specs:
+            partial = grouped.agg(**{
+                f"{column}\x00{name}": pd.NamedAgg(column=column, aggfunc=name)
+                for column, name in self._partial_specs
+            })
+            self._state = partial if self._state is None else self._combine(self._state, partial)
+
+        for column in self._frequency_columns:
+            counts = batch.groupby(self.group_keys + [column], dropna=False, observed=True, sort=False).size()
+            counts = counts[counts > 0]
+            previous = self._frequencies.get(column)
+            if previous is not None:
+                counts = pd.concat([previous, counts]).groupby(level=list(range(counts.index.nlevels)),
+                                                               dropna=False, sort=False).sum()
+            self._frequencies[column] = counts
+
+    def result(self) -> pd.DataFrame:
+        """Tabela final: uma linha por grupo (e uma coluna por valor do pivô)"""
+        if self._state is None and not self._frequencies:
+            # Nenhuma linha lida: tabela vazia com as colunas do resultado
+            # (com pivô não há valores, então só as chaves)
+            names = [] if self.pivot else [result_column(column, func) for column, func in self.aggregations]
+            self.stats.groups = 0
+            return pd.DataFrame(columns=self.keys + names)
+
+        results: Dict[str, pd.Series] = {}
+        for column, func in self.aggregations:
+            results[result_column(column, func)] = self._finalize(column, func)
+
+        if self._state is not None:
+            index = self._state.index
+        elif self._frequencies:
+            first = next(iter(self._frequencies.values()))
+            index = first.index.droplevel(-1).unique()
+        else:
+            index = pd.MultiIndex.from_tuples([], names=self.group_keys)
+        table = pd.DataFrame({name: values.reindex(index) for name, values in results.items()}, index=index)
+        table = table.sort_index()
+
+        if self.pivot:
+            # Uma coluna por (agregação, valor do pivô), como na tabela dinâmica do Excel
+            table = table.unstack(self.pivot)
+            table.columns = [f"{name}_{value}" for name, value in table.columns]
+
+        self.stats.groups = len(table)
+        return table.reset_index()
+
+    # Internos --------------------------------------------------------------
+
+    def _combine(self, state: pd.DataFrame, partial: pd.DataFrame) -> pd.DataFrame:
+        combined = pd.concat([state, partial])
+        levels = list(range(combined.index.nlevels))
+        return combined.groupby(level=levels, dropna=False, sort=False).agg({
+            name: _PARTIALS[name.split('\x00')[1]] for name in combined.columns
+        })
+
+    def _partial(self, column: str, name: str) -> pd.Series:
+        return self._state[f"{column}\x00{name}"]
+
+    def _finalize(self, column: str, func: str) -> pd.Series:
+        if func in ('sum', 'count', 'min', 'max'):
+            return self._partial(column, func)
+        if func == 'mean':
+            return self._partial(column, 'sum') / self._partial(column, 'count').replace(0, np.nan)
+
+        frequencies = self._frequencies[column]
+        groups = frequencies.index.droplevel(-1).unique()
+        # Valores nulos não contam como valor distinto nem entram nos percentis
+        frequencies = frequencies[frequencies.index.get_level_values(-1).notna()]
+        group_levels = list(range(frequencies.index.nlevels - 1))
+        if func == 'nunique':
+            # Grupo só com nulos tem 0 valores distintos (como no pandas), não NaN
+            counts = frequencies.groupby(level=group_levels, dropna=False, sort=False).size()
+            return counts.reindex(groups, fill_value=0)
+        return _weighted_quantile(frequencies, percentile_of(func))
+
+
+def _weighted_quantile(frequencies: pd.Series, q: float) -> pd.Series:
+    # Quantil com interpolação linear a partir de (grupo, valor) -> frequência
+    group_levels = list(range(frequencies.index.nlevels - 1))
+    grouped = frequencies.groupby(level=group_levels, dropna=False, sort=False)
+    groups = grouped.size().index
+    if not len(groups):
+        return pd.Series(dtype=float)
+
+    codes = grouped.ngroup().to_numpy()
+    values = frequencies.index.get_level_values(-1).to_numpy(dtype=float)
+    order = np.lexsort((values, codes))
+    codes, values, counts = codes[order], values[order], frequencies.to_numpy()[order]
+
+    # Posição (em linhas) onde cada grupo começa e seu tamanho
+    cumulative = np.cumsum(counts)
+    starts_at = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    group_first_row = np.r_[0, cumulative[:-1]][starts_at]
+    group_sizes = np.add.reduceat(counts, starts_at)
+
+    position = q * (group_sizes - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, group_sizes - 1)
+    lower_value = values[np.searchsorted(cumulative, group_first_row + lower, side='right')]
+    upper_value = values[np.searchsorted(cumulative, group_first_row + upper, side='right')]
+    result = lower_value + (position - lower) * (upper_value - lower_value)
+    return pd.Series(result, index=groups[codes[starts_at]])
+
+
+def group_aggregate(batches: Iterable[pd.DataFrame], keys: List[str], aggregations: List[Tuple[str, str]],
+                    pivot: Optional[str] = None,
+                    progress: Optional[Callable[[int], None]] = None) -> Tuple[pd.DataFrame, AggregateStats]:
+    """
+    Agrupa um dataset lido em blocos (ex.: DatasetStore.iter_batches)
+    `progress` recebe o total de linhas lidas após cada bloco
+    """
+    started = time.perf_counter()
+    aggregator = GroupAggregator(keys, aggregations, pivot)
+    for batch in batches:
+        aggregator.update(batch)
+        if progress:
+            progress(aggregator.stats.rows_scanned)
+    result = aggregator.result()
+    aggregator.stats.elapsed = time.perf_counter() - started
+    return result, aggregator.stats
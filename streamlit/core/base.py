@@ -92,6 +92,25 @@ class UIComponents:
         }
         default_config.update(kwargs)
         return st.data_editor(df, **default_config)
+
+    @staticmethod
+    def pagination(total_rows: int, page_size: int, key: str) -> Tuple[int, int]:
+        """Seletor de página; retorna o intervalo de linhas [início, fim) visível"""
+        total_pages = max(1, -(-total_rows // page_size))
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            page = st.number_input(
+                "Página:",
+                min_value=1,
+                max_value=total_pages,
+                value=1,
+                key=f"{key}_page"
+            )
+        start = (int(page) - 1) * page_size
+        stop = min(start + page_size, total_rows)
+        with col2:
+            st.caption(f"Linhas {start + 1:,}–{stop:,} de {total_rows:,} ({total_pages:,} páginas)")
+        return start, stop
     
     @staticmethod
     def action_buttons(buttons_config: List[Dict[str, Any]], columns: int = 3) -> Dict[str, bool]:
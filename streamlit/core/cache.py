@@ -0,0 +1,131 @@
+# Cache de planilhas
+import io
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple, Callable, Union
+
+import pandas as pd
+
+
+def content_hash(data: bytes) -> str:
+    """Retorna o hash SHA-256 do conteúdo de um arquivo"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """Memória real ocupada por um DataFrame (inclui objetos Python)"""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+class WorkbookCache:
+    """
+    Cache de planilhas por workbook, indexado pelo hash do conteúdo do upload.
+
+    Cada planilha é lida sob demanda (uma única vez) e mantida em uma LRU
+    limitada pelo tamanho em memória. Os bytes brutos do arquivo ficam fora
+    da LRU para que uma planilha despejada possa ser relida.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._workbooks: Dict[str, Union[bytes, str]] = {}
+        self._sheet_names: Dict[str, List[str]] = {}
+        self._frames: "OrderedDict[Tuple[str, str], Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._current_bytes = 0
+
+    def register(self, data: bytes, spill: Optional[Callable[[str, bytes], Any]] = None) -> str:
+        """
+        Registra o conteúdo de um workbook e retorna seu hash
+        `spill(hash, bytes)` pode devolver um caminho em disco para não manter os bytes em memória
+        """
+        digest = content_hash(data)
+        if digest not in self._workbooks:
+            self._workbooks[digest] = spill(digest, data) if spill else data
+        return digest
+
+    def has_workbook(self, digest: str) -> bool:
+        """Indica se o workbook está registrado no cache"""
+        return digest in self._workbooks
+
+    def sheet_names(self, digest: str) -> List[str]:
+        """Nomes das planilhas do workbook (lidos apenas uma vez)"""
+        if digest not in self._sheet_names:
+            with pd.ExcelFile(self._workbook_source(digest)) as excel_file:
+                self._sheet_names[digest] = list(excel_file.sheet_names)
+        return self._sheet_names[digest]
+
+    def get_sheet(self, digest: str, sheet_name: str) -> pd.DataFrame:
+        """Retorna uma cópia da planilha, lendo o arquivo apenas em caso de miss"""
+        key = (digest, sheet_name)
+        if key in self._frames:
+            self.hits += 1
+            self._frames.move_to_end(key)
+            return self._frames[key][0].copy()
+
+        self.misses += 1
+        df = pd.read_excel(self._workbook_source(digest), sheet_name=sheet_name)
+        self._store(key, df)
+        return df.copy()
+
+    def prime(self, digest: str, sheet_names: List[str], sheet_name: str, df: pd.DataFrame) -> None:
+        """Guarda uma planilha lida fora do cache (ex.: em segundo plano) para evitar um novo parse"""
+        self._sheet_names.setdefault(digest, list(sheet_names))
+        key = (digest, sheet_name)
+        if key not in self._frames:
+            self._store(key, df)
+
+    def release(self, digest: str) -> None:
+        """Remove o workbook e todas as suas planilhas do cache"""
+        for key in [key for key in self._frames if key[0] == digest]:
+            self._current_bytes -= self._frames.pop(key)[1]
+        self._workbooks.pop(digest, None)
+        self._sheet_names.pop(digest, None)
+
+    def workbook_bytes(self, digest: str) -> int:
+        """Memória ocupada pelas planilhas em cache de um workbook"""
+        return sum(size for (key_digest, _), (_, size) in self._frames.items() if key_digest == digest)
+
+    def trim(self, max_bytes: int) -> int:
+        """Despeja planilhas até o cache caber em `max_bytes`; retorna os bytes liberados"""
+        before = self._current_bytes
+        self._evict(limit=max_bytes)
+        return before - self._current_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso do cache"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'sheets': len(self._frames),
+            'workbooks': len(self._workbooks),
+            'bytes': self._current_bytes,
+            'max_bytes': self.max_bytes
+        }
+
+    def _workbook_source(self, digest: str) -> Any:
+        if digest not in self._workbooks:
+            raise KeyError(f"Workbook '{digest[:12]}' não está registrado no cache")
+        source = self._workbooks[digest]
+        return io.BytesIO(source) if isinstance(source, bytes) else source
+
+    def _store(self, key: Tuple[str, str], df: pd.DataFrame) -> None:
+        size = frame_nbytes(df)
+        self._frames[key] = (df, size)
+        self._current_bytes += size
+        self._evict(keep=key)
+
+    def _evict(self, keep: Optional[Tuple[str, str]] = None, limit: Optional[int] = None) -> None:
+        # Despeja as planilhas menos usadas até caber no limite (mantém a recém-lida)
+        limit = self.max_bytes if limit is None else limit
+        while self._current_bytes > limit and self._frames:
+            key = next(iter(self._frames))
+            if key == keep:
+                break
+            self._current_bytes -= self._frames.pop(key)[1]
+            self.evictions += 1
@@ -0,0 +1,305 @@
+# Motor de operações de dados (sem interface)
+import os
+import re
+import operator
+from typing import Dict, List, Any, Optional, Tuple, Callable, Iterator
+
+import pandas as pd
+
+from .aggregate import AggregateStats, group_aggregate
+from .cache import frame_nbytes
+from .expressions import ExpressionError, FormulaStats, parse_formulas, evaluate_formulas
+from .joins import JOIN_TYPES, KeyIndex, KeyIndexCache, JoinEstimate, JoinStats, estimate_join, hash_join
+from .jobs import Job
+from .journal import EditJournal
+from .lookup import LookupStats, lookup
+from .mapping import NormalizeOptions, ReplacementStats, get_replacement_cache
+from .pipeline import PIPELINE_BATCH_ROWS, Pipeline, PlanStats, QueryPlan, optimize, execute
+from .storage import DatasetStore, DatasetHandle, write_chunks
+from .workers import FrameRef, WorkerPool, as_frame, iter_frame
+
+# Operações entre duas colunas: rótulo (como na tela) e função
+ARITHMETIC = {
+    'add': ('Soma de colunas', operator.add),
+    'sub': ('Subtração', operator.sub),
+    'mul': ('Multiplicação', operator.mul),
+    'div': ('Divisão', operator.truediv),
+}
+
+# Linhas lidas por bloco nas agregações
+AGGREGATE_BATCH_ROWS = 200_000
+
+# A partir deste número de linhas as operações pesadas vão para o pool de
+# processos; abaixo dele, entregar os dados ao processo custa mais que a operação
+WORKER_MIN_ROWS = 100_000
+
+
+# Tarefas executadas nos processos de trabalho (funções de módulo) ------------
+
+def _join_task(left: Any, right: Any, left_on: List[str], right_on: List[str], how: str,
+               max_rows: Optional[int], path: str) -> Tuple[Tuple[str, int, List[str], int], JoinStats]:
+    # As partições vão direto para o arquivo em `path`: só os metadados voltam
+    return hash_join(as_frame(left), as_frame(right), left_on, right_on, how=how, max_rows=max_rows,
+                     sink=lambda chunks: write_chunks(path, chunks))
+
+
+def _depara_task(source: Any, columns: List[str], de: List[Any], para: List[Any],
+                 normalize: NormalizeOptions, regex: bool) -> Tuple[pd.DataFrame, ReplacementStats]:
+    # O cache de mapeamentos é do processo: mapas repetidos não são recompilados
+    try:
+        replacement_map = get_replacement_cache().get(de, para, normalize, regex)
+    except re.error as e:
+        raise ValueError(f"Expressão regular inválida: {e}")
+    return replacement_map.apply(as_frame(source), columns)
+
+
+def _describe_task(source: Any) -> pd.DataFrame:
+    return as_frame(source).describe()
+
+
+def _group_task(source: Any, read_columns: List[str], keys: List[str], aggregations: List[Tuple[str, str]],
+                pivot: Optional[str], batch_rows: int) -> Tuple[pd.DataFrame, AggregateStats]:
+    return group_aggregate(iter_frame(source, read_columns, batch_rows), keys, aggregations, pivot=pivot)
+
+
+class OperationEngine:
+    """
+    JOIN, PROCV, DE/PARA, fórmulas, agrupamento e pipelines sobre datasets versionados
+
+    Não depende do Streamlit: recebe os journals dos datasets, grava os
+    resultados no DatasetStore e devolve as estatísticas. É usado pelo editor
+    e pelo serviço HTTP (api/). `memory_check(nbytes, descrição)` é chamado
+    antes de materializar resultados grandes e pode recusar a operação.
+
+    Com `workers`, JOIN, DE/PARA, estatísticas e agrupamentos de tabelas com
+    `worker_rows` linhas ou mais rodam no pool de processos; `job` permite
+    cancelá-los (o processo é encerrado).
+    """
+
+    def __init__(self, store: DatasetStore, key_indexes: Optional[KeyIndexCache] = None,
+                 memory_check: Optional[Callable[[int, str], None]] = None,
+                 workers: Optional[WorkerPool] = None, worker_rows: int = WORKER_MIN_ROWS):
+        self.store = store
+        self.key_indexes = key_indexes if key_indexes is not None else KeyIndexCache()
+        self.memory_check = memory_check
+        self.workers = workers
+        self.worker_rows = worker_rows
+
+    def key_index(self, journal: EditJournal, columns: List[str]) -> Tuple[KeyIndex, bool]:
+        """Índice de chaves da versão atual (reconstruído só após edições)"""
+        return self.key_indexes.get(journal.handle, columns, lambda key_columns: journal.load(key_columns))
+
+    # JOIN ------------------------------------------------------------------
+
+    def estimate_join(self, left: EditJournal, right: EditJournal, left_on: List[str], right_on: List[str],
+                      how: str = 'left') -> JoinEstimate:
+        """Cardinalidade do JOIN calculada pelos índices, sem executá-lo"""
+        self._check_keys(left_on, right_on)
+        return estimate_join(self.key_index(left, left_on)[0], self.key_index(right, right_on)[0], how)
+
+    def join(self, left: EditJournal, right: EditJournal, left_on: List[str], right_on: List[str],
+             how: str = 'left', max_rows: Optional[int] = None,
+             job: Optional[Job] = None) -> Tuple[DatasetHandle, JoinStats]:
+        """Executa o JOIN em partições gravadas direto no armazenamento (ou num processo de trabalho)"""
+        if how not in JOIN_TYPES:
+            raise ValueError(f"Tipo de JOIN inválido: {how}")
+        self._check_keys(left_on, right_on)
+        left_index, _ = self.key_index(left, left_on)
+        right_index, _ = self.key_index(right, right_on)
+
+        # Memória do resultado estimada pelo tamanho médio das linhas de cada lado
+        estimate = estimate_join(left_index, right_index, how)
+        row_bytes = (left.handle.memory_bytes / max(left.handle.num_rows, 1)
+                     + right.handle.memory_bytes / max(right.handle.num_rows, 1))
+        self._check_memory(int(estimate.rows * row_bytes), f"o resultado do JOIN ({estimate.rows:,} linhas)")
+
+        if self._use_workers(left, right):
+            # O processo grava o resultado em disco e o armazenamento só registra
+            # o arquivo: o resultado não atravessa o pipe nem passa por esta memória
+            path = self.store.spool_path()
+            try:
+                (file_format, num_rows, columns, memory_bytes), stats = self.workers.run(
+                    _join_task, self._source(left), self._source(right), left_on, right_on, how, max_rows, path,
+                    job=job
+                )
+                return self.store.attach(path, file_format, num_rows, columns, memory_bytes), stats
+            finally:
+                for extension in ('parquet', 'pickle'):
+                    if os.path.exists(f"{path}.{extension}"):
+                        os.remove(f"{path}.{extension}")
+
+        return hash_join(
+            left.load(), right.load(), left_on, right_on,
+            how=how,
+            left_index=left_index,
+            right_index=right_index,
+            max_rows=max_rows,
+            sink=self.store.put_chunks
+        )
+
+    # PROCV -----------------------------------------------------------------
+
+    def procv(self, source: EditJournal, reference: EditJournal, lookup_columns: List[str],
+              reference_columns: List[str], value_columns: List[str], new_column: str,
+              mode: str = 'exact', duplicates: str = 'first',
+              reference_name: str = '') -> Tuple[List[str], LookupStats]:
+        """
+        Traz para a origem as colunas de valores da referência; com várias
+        colunas, cada uma vira '<new_column>_<coluna>'. Retorna as colunas criadas
+        """
+        if not (lookup_columns and reference_columns and value_columns and new_column):
+            raise ValueError("Informe as colunas de busca, as chaves da referência, os valores e o nome da nova coluna")
+        if len(lookup_columns) != len(reference_columns):
+            raise ValueError("Selecione o mesmo número de colunas chave na origem e na referência")
+
+        # Índices de chave em cache (reconstruídos apenas após edições)
+        source_index, _ = self.key_index(source, lookup_columns)
+        reference_index, _ = self.key_index(reference, reference_columns)
+        result, stats = lookup(
+            source_index, reference_index, reference.load(columns=value_columns),
+            mode=mode, duplicates=duplicates
+        )
+
+        # Apenas as novas colunas vão para o journal
+        if len(value_columns) == 1:
+            result.columns = [new_column]
+        else:
+            result.columns = [f"{new_column}_{column}" for column in value_columns]
+        source.set_columns(
+            result, f"PROCV {', '.join(lookup_columns)} → {', '.join(result.columns)}"
+                    + (f" ({reference_name})" if reference_name else "")
+        )
+        return list(result.columns), stats
+
+    # DE/PARA ---------------------------------------------------------------
+
+    def depara(self, journal: EditJournal, columns: List[str], de: List[Any], para: List[Any],
+               normalize: Optional[NormalizeOptions] = None, regex: bool = False,
+               description: str = "DE/PARA", job: Optional[Job] = None) -> ReplacementStats:
+        """Aplica um DE/PARA (compilado uma vez e reaproveitado) às colunas escolhidas"""
+        if not columns:
+            raise ValueError("Selecione ao menos uma coluna para aplicar o DE/PARA")
+        if len(de) != len(para):
+            raise ValueError("As listas DE e PARA precisam ter o mesmo tamanho")
+        arguments = (columns, list(de), list(para), normalize or NormalizeOptions(), regex)
+        if self._use_workers(journal):
+            updated, stats = self.workers.run(_depara_task, self._source(journal, columns), *arguments, job=job)
+        else:
+            updated, stats = _depara_task(journal.load(columns=columns), *arguments)
+
+        # Apenas as colunas alteradas vão para o journal
+        if len(updated.columns):
+            journal.set_columns(updated, f"{description} em {', '.join(updated.columns)}")
+        return stats
+
+    # Operações matemáticas -------------------------------------------------
+
+    def formulas(self, journal: EditJournal, text: str) -> FormulaStats:
+        """Calcula um lote de fórmulas `Nova_Coluna = expressão` (uma operação no journal)"""
+        formulas = parse_formulas(text)
+        if not formulas:
+            raise ExpressionError("Nenhuma fórmula informada")
+
+        # Lê apenas as colunas da tabela usadas pelas fórmulas
+        available = set(journal.handle.columns)
+        used = [
+            column for column in dict.fromkeys(
+                column for _, expression in formulas for column in expression.columns
+            ) if column in available
+        ]
+        results, stats = evaluate_formulas(journal.load(columns=used), formulas)
+        journal.set_columns(results, f"Fórmulas: {', '.join(results.columns)}")
+        return stats
+
+    def arithmetic(self, journal: EditJournal, operation: str, column1: str, column2: str,
+                   new_column: str) -> None:
+        """Cria `new_column` = `column1` (+ - * /) `column2`"""
+        if operation not in ARITHMETIC:
+            raise ValueError(f"Operação desconhecida: {operation}")
+        if not (column1 and column2 and new_column):
+            raise ValueError("Informe as duas colunas e o nome da nova coluna")
+
+        label, function = ARITHMETIC[operation]
+        df = journal.load(columns=list(dict.fromkeys([column1, column2])))
+        result = function(df[column1], df[column2])
+        journal.set_columns(result.to_frame(new_column), f"{label}: '{new_column}'")
+
+    def describe(self, journal: EditJournal, columns: List[str], job: Optional[Job] = None) -> pd.DataFrame:
+        """Estatísticas descritivas das colunas (apenas elas são lidas)"""
+        if self._use_workers(journal):
+            return self.workers.run(_describe_task, self._source(journal, columns), job=job)
+        return journal.load(columns=columns).describe()
+
+    # Agrupamento -----------------------------------------------------------
+
+    def group(self, journal: EditJournal, keys: List[str], aggregations: List[Tuple[str, str]],
+              pivot: Optional[str] = None, batch_rows: int = AGGREGATE_BATCH_ROWS,
+              progress: Optional[Callable[[int], None]] = None,
+              job: Optional[Job] = None) -> Tuple[DatasetHandle, AggregateStats]:
+        """
+        Agrupa lendo do armazenamento em blocos apenas as colunas usadas; o resultado é gravado como dataset
+        (no processo de trabalho, `progress` não é chamado)
+        """
+        handle = journal.handle
+        read_columns = list(dict.fromkeys(keys + ([pivot] if pivot else []) + [column for column, _ in aggregations]))
+        if self._use_workers(journal):
+            # Do arquivo Parquet, o processo lê um bloco por vez, como iter_batches
+            result, stats = self.workers.run(
+                _group_task, self._source(journal, read_columns), read_columns,
+                keys, aggregations, pivot, batch_rows, job=job
+            )
+        else:
+            result, stats = group_aggregate(
+                self.store.iter_batches(handle, read_columns, batch_rows),
+                keys, aggregations, pivot=pivot, progress=progress
+            )
+        self._check_memory(frame_nbytes(result), "o resultado do agrupamento")
+        return self.store.put(result), stats
+
+    # Pipelines -------------------------------------------------------------
+
+    def plan(self, pipeline: Pipeline, tables: Dict[str, EditJournal]) -> QueryPlan:
+        """Plano otimizado do pipeline (valida as colunas de cada etapa)"""
+        missing = [name for name in pipeline.tables() if name not in tables]
+        if missing:
+            raise ValueError(f"Tabela(s) não encontrada(s): {', '.join(missing)}")
+        return optimize(pipeline, {name: list(tables[name].handle.columns) for name in pipeline.tables()})
+
+    def run_pipeline(self, pipeline: Pipeline, tables: Dict[str, EditJournal],
+                     batch_rows: int = PIPELINE_BATCH_ROWS,
+                     job: Optional[Job] = None) -> Tuple[DatasetHandle, PlanStats]:
+        """
+        Executa o pipeline de uma vez, lendo a origem em blocos: só o resultado
+        final é gravado no armazenamento, sem tabelas intermediárias
+        """
+        plan = self.plan(pipeline, tables)
+        source = tables[pipeline.source].handle
+
+        def read(table: str, columns: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+            return self.store.iter_batches(tables[table].handle, columns, batch_rows)
+
+        def progress(rows: int) -> None:
+            if job is not None:
+                job.report(rows / max(source.num_rows, 1))
+
+        return execute(plan, read, self.store.put_chunks, progress=progress)
+
+    # Internos --------------------------------------------------------------
+
+    def _check_keys(self, left_on: List[str], right_on: List[str]) -> None:
+        if not left_on or len(left_on) != len(right_on):
+            raise ValueError("Selecione o mesmo número de colunas chave dos dois lados.")
+
+    def _use_workers(self, *journals: EditJournal) -> bool:
+        return self.workers is not None and max(journal.handle.num_rows for journal in journals) >= self.worker_rows
+
+    def _source(self, journal: EditJournal, columns: Optional[List[str]] = None) -> Any:
+        """Dados para o processo de trabalho: o arquivo Parquet, se houver, ou o DataFrame (via memória compartilhada)"""
+        path = self.store.file_path(journal.handle)
+        if path is not None:
+            return FrameRef(path, 'parquet', tuple(columns) if columns is not None else None)
+        return journal.load(columns=columns)
+
+    def _check_memory(self, nbytes: int, description: str) -> None:
+        if self.memory_check is not None:
+            self.memory_check(nbytes, description)
@@ -0,0 +1,491 @@
+# Exportação de datasets (Excel, CSV, Parquet, Feather e JSON Lines)
+import io
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Callable, Union
+
+import numpy as np
+import pandas as pd
+
+from .storage import DatasetStore, DatasetHandle
+
+try:
+    import xlsxwriter
+except ImportError:  # pragma: no cover - xlsxwriter é opcional
+    xlsxwriter = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow é opcional
+    pa = None
+    pq = None
+
+# Limite de linhas de uma planilha do Excel (incluindo o cabeçalho)
+EXCEL_MAX_ROWS = 1_048_576
+
+# Acima deste número de linhas o workbook é gravado em modo de memória constante
+CONSTANT_MEMORY_ROWS = 50_000
+
+# Formatos de data da tela de configurações -> (Excel, strftime)
+DATE_FORMATS = {
+    'DD/MM/AAAA': ('dd/mm/yyyy', '%d/%m/%Y'),
+    'MM/DD/AAAA': ('mm/dd/yyyy', '%m/%d/%Y'),
+    'AAAA-MM-DD': ('yyyy-mm-dd', '%Y-%m-%d'),
+}
+
+# Formatos de exportação: rótulo (como na tela de configurações), extensão e MIME
+EXPORT_FORMATS = {
+    'xlsx': ('Excel (.xlsx)', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('CSV (.csv)', 'csv', 'text/csv'),
+    'ndjson': ('JSON Lines (.jsonl)', 'jsonl', 'application/x-ndjson'),
+    'parquet': ('Parquet (.parquet)', 'parquet', 'application/vnd.apache.parquet'),
+    'feather': ('Feather/Arrow (.feather)', 'feather', 'application/vnd.apache.arrow.file'),
+}
+
+PARQUET_COMPRESSIONS = ['snappy', 'zstd', 'gzip', 'none']
+FEATHER_COMPRESSIONS = ['lz4', 'zstd', 'none']
+
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+@dataclass(frozen=True)
+class ExportOptions:
+    """Opções de exportação (vindas de `excel_config`)"""
+    include_index: bool = False
+    decimal_separator: str = '.'
+    date_format: str = 'AAAA-MM-DD'
+    compression: str = 'snappy'
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ExportOptions":
+        return cls(
+            include_index=bool(config.get('include_index', False)),
+            decimal_separator=config.get('decimal_separator', '.'),
+            date_format=config.get('date_format', 'AAAA-MM-DD') if config.get('date_format') in DATE_FORMATS
+            else 'AAAA-MM-DD',
+            compression=config.get('parquet_compression', 'snappy')
+        )
+
+    @property
+    def excel_date_format(self) -> str:
+        return DATE_FORMATS[self.date_format][0]
+
+    @property
+    def strftime_format(self) -> str:
+        return DATE_FORMATS[self.date_format][1]
+
+    @property
+    def csv_separator(self) -> str:
+        # Com vírgula decimal, o separador de campos do Excel em português é o ponto e vírgula
+        return ';' if self.decimal_separator == ',' else ','
+
+
+# Uma planilha a exportar: nome, blocos de linhas (ex.: DatasetStore.iter_batches)
+# e, opcionalmente, as colunas (o cabeçalho é gravado mesmo sem nenhum bloco)
+Sheet = Union[Tuple[str, Iterable[pd.DataFrame]], Tuple[str, Iterable[pd.DataFrame], List[str]]]
+
+
+def sheet_title(name: str, used: Optional[set] = None) -> str:
+    """Nome de planilha válido no Excel (até 31 caracteres, sem []:*?/\\, único)"""
+    title = _INVALID_SHEET_CHARS.sub('_', str(name)).strip("'") or 'Dados'
+    title = title[:31]
+    if used is None:
+        return title
+
+    candidate, counter = title, 2
+    while candidate.lower() in used:
+        suffix = f" ({counter})"
+        candidate = title[:31 - len(suffix)] + suffix
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def write_excel(sheets: List[Sheet], options: Optional[ExportOptions] = None,
+                constant_memory: Optional[bool] = None, total_rows: Optional[int] = None,
+                progress: Optional[Callable[[int], None]] = None) -> bytes:
+    """
+    Grava uma ou mais planilhas num único workbook e retorna os bytes do .xlsx
+
+    As linhas são escritas em ordem, bloco a bloco, com o tipo de cada coluna
+    resolvido uma vez por bloco. Em modo de memória constante (padrão acima de
+    CONSTANT_MEMORY_ROWS linhas) o xlsxwriter descarta cada linha depois de
+    gravada, então a memória usada não cresce com o tamanho da tabela.
+    Planilhas acima do limite do Excel continuam em "Nome (2)", "Nome (3)"...
+    """
+    if xlsxwriter is None:
+        raise ImportError("xlsxwriter é necessário para exportar em Excel")
+
+    options = options or ExportOptions()
+    if constant_memory is None:
+        constant_memory = total_rows is None or total_rows > CONSTANT_MEMORY_ROWS
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {
+            'constant_memory': constant_memory,
+            'nan_inf_to_errors': True,
+            'remove_timezone': True,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+        })
+        writer = _ExcelWriter(workbook, options)
+        written = 0
+        for name, chunks, *columns in sheets:
+            writer.start_sheet(name)
+            for chunk in chunks:
+                writer.write_frame(_with_index(chunk, options))
+                written += len(chunk)
+                if progress:
+                    progress(written)
+            if not writer.columns and columns:
+                # Tabela sem linhas: a planilha fica só com o cabeçalho
+                writer.write_frame(_with_index(pd.DataFrame(columns=columns[0]), options))
+        workbook.close()
+
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def write_csv(chunks: Iterable[pd.DataFrame], options: Optional[ExportOptions] = None,
+              date_formats: Optional[Dict[str, str]] = None, columns: Optional[List[str]] = None) -> bytes:
+    """
+    Grava os blocos como um único CSV (UTF-8) com as opções de separador decimal e data
+
+    `date_formats` (de `csv_date_formats`) fixa o formato de cada coluna de
+    datas para o arquivo inteiro; colunas fora dele usam o formato decidido
+    no primeiro bloco em que aparecem. Com `columns`, uma tabela sem blocos
+    gera só o cabeçalho
+    """
+    options = options or ExportOptions()
+    date_formats = dict(date_formats or {})
+    buffer = io.StringIO()
+    header = True
+    if columns is not None:
+        chunks = _or_empty(chunks, columns)
+    for chunk in chunks:
+        dates = chunk.select_dtypes(include=['datetime', 'datetimetz'])
+        if len(dates.columns):
+            chunk = chunk.copy(deep=False)
+            for column in dates.columns:
+                if column not in date_formats:
+                    date_formats[column] = _date_format(dates[column], options)
+                chunk[column] = dates[column].dt.strftime(date_formats[column])
+        chunk.to_csv(
+            buffer,
+            index=options.include_index,
+            header=header,
+            sep=options.csv_separator,
+            decimal=options.decimal_separator,
+            date_format=options.strftime_format
+        )
+        header = False
+    return buffer.getvalue().encode('utf-8')
+
+
+def csv_date_formats(store: DatasetStore, handle: DatasetHandle, options: ExportOptions) -> Dict[str, str]:
+    """
+    Formato de cada coluna de datas do dataset no CSV, decidido antes da
+    gravação: com hora se algum valor da coluna tiver hora. Só as colunas
+    de datas são lidas
+    """
+    sample = store.read_rows(handle, 0, 0)
+    columns = list(sample.select_dtypes(include=['datetime', 'datetimetz']).columns)
+    with_time = set()
+    if columns:
+        for batch in store.iter_batches(handle, columns):
+            with_time.update(column for column in columns if column not in with_time and _has_time(batch[column]))
+            if len(with_time) == len(columns):
+                break
+    return {column: f"{options.strftime_format} %H:%M:%S" if column in with_time else options.strftime_format
+            for column in columns}
+
+
+def write_ndjson(chunks: Iterable[pd.DataFrame], options: Optional[ExportOptions] = None) -> bytes:
+    """Grava os blocos como JSON Lines (um objeto por linha, datas em ISO 8601)"""
+    options = options or ExportOptions()
+    buffer = io.StringIO()
+    for chunk in chunks:
+        chunk = _with_index(chunk, options)
+        if chunk.empty:
+            continue
+        text = chunk.to_json(orient='records', lines=True, date_format='iso', force_ascii=False)
+        buffer.write(text if text.endswith('\n') else text + '\n')
+    return buffer.getvalue().encode('utf-8')
+
+
+def write_parquet(chunks: Iterable[pd.DataFrame], options: Optional[ExportOptions] = None,
+                  columns: Optional[List[str]] = None) -> bytes:
+    """
+    Grava os blocos como um Parquet (um row group por bloco), preservando os
+    tipos do pandas (categorias, inteiros anuláveis, datas com fuso...)
+    Com `columns`, uma tabela sem blocos gera um arquivo só com o esquema
+    """
+    options = options or ExportOptions()
+    compression = options.compression if options.compression in PARQUET_COMPRESSIONS else 'snappy'
+    return _write_arrow(chunks, options, lambda sink, schema: pq.ParquetWriter(
+        sink, schema, compression=None if compression == 'none' else compression
+    ), columns)
+
+
+def write_feather(chunks: Iterable[pd.DataFrame], options: Optional[ExportOptions] = None,
+                  columns: Optional[List[str]] = None) -> bytes:
+    """Grava os blocos como Feather v2 (arquivo Arrow IPC), lido sem conversão pelo pyarrow/pandas"""
+    options = options or ExportOptions()
+    compression = options.compression if options.compression in FEATHER_COMPRESSIONS else 'lz4'
+    write_options = pa.ipc.IpcWriteOptions(compression=None if compression == 'none' else compression)
+    return _write_arrow(chunks, options, lambda sink, schema: pa.ipc.new_file(sink, schema, options=write_options),
+                        columns)
+
+
+def export_file(file_format: str, sheets: List[Sheet], options: Optional[ExportOptions] = None,
+                total_rows: Optional[int] = None, date_formats: Optional[Dict[str, str]] = None) -> bytes:
+    """
+    Gera o arquivo no formato pedido (apenas o Excel aceita mais de uma planilha)
+    `date_formats` vale para o CSV (veja `csv_date_formats`)
+    """
+    if file_format == 'xlsx':
+        return write_excel(sheets, options, total_rows=total_rows)
+    if len(sheets) != 1:
+        raise ValueError(f"O formato {EXPORT_FORMATS[file_format][0]} guarda uma única tabela")
+    _, chunks, *columns = sheets[0]
+    columns = columns[0] if columns else None
+    if file_format == 'csv':
+        return write_csv(chunks, options, date_formats, columns)
+    if file_format == 'ndjson':
+        return write_ndjson(chunks, options)
+
+    writers = {'parquet': write_parquet, 'feather': write_feather}
+    if file_format not in writers:
+        raise ValueError(f"Formato de exportação desconhecido: {file_format}")
+    return writers[file_format](chunks, options, columns)
+
+
+def _write_arrow(chunks: Iterable[pd.DataFrame], options: ExportOptions,
+                 open_writer: Callable[[Any, Any], Any], columns: Optional[List[str]] = None) -> bytes:
+    # Escrita em streaming: cada bloco vira um row group / record batch
+    if pa is None:
+        raise ImportError("pyarrow é necessário para exportar em Parquet ou Feather")
+
+    sink = pa.BufferOutputStream()
+    writer = schema = None
+    if columns is not None:
+        chunks = _or_empty(chunks, columns)
+    try:
+        for chunk in chunks:
+            table = _arrow_table(chunk, options.include_index)
+            if writer is None:
+                schema = table.schema
+                writer = open_writer(sink, schema)
+            elif not table.schema.equals(schema, check_metadata=False):
+                # Blocos seguintes seguem o esquema do primeiro (ex.: coluna toda nula no bloco)
+                table = table.cast(schema)
+            writer.write_table(table)
+        if writer is None:
+            raise ValueError("Nenhuma linha para exportar")
+    finally:
+        if writer is not None:
+            writer.close()
+    return sink.getvalue().to_pybytes()
+
+
+def _or_empty(chunks: Iterable[pd.DataFrame], columns: List[str]) -> Iterable[pd.DataFrame]:
+    # Tabela sem linhas (o armazenamento não produz blocos): um bloco vazio com
+    # as colunas, para gravar o cabeçalho / esquema
+    produced = False
+    for chunk in chunks:
+        produced = True
+        yield chunk
+    if not produced:
+        yield pd.DataFrame(columns=columns)
+
+
+def _arrow_table(df: pd.DataFrame, include_index: bool) -> "pa.Table":
+    if not all(isinstance(column, str) for column in df.columns):
+        df = df.rename(columns=str)
+    try:
+        return pa.Table.from_pandas(df, preserve_index=include_index)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Colunas com tipos mistos (comum em planilhas) são gravadas como texto
+        df = df.copy()
+        for column in df.select_dtypes(include=['object']).columns:
+            try:
+                pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[column] = df[column].map(str, na_action='ignore')
+        return pa.Table.from_pandas(df, preserve_index=include_index)
+
+
+def _with_index(df: pd.DataFrame, options: ExportOptions) -> pd.DataFrame:
+    if not options.include_index:
+        return df
+    # Índices sem nome viram a coluna "index", como no to_excel do pandas
+    return df.reset_index()
+
+
+def _has_time(series: pd.Series) -> bool:
+    values = series.dropna()
+    return bool(len(values)) and bool((values != values.dt.normalize()).any())
+
+
+def _date_format(series: pd.Series, options: ExportOptions) -> str:
+    return f"{options.strftime_format} %H:%M:%S" if _has_time(series) else options.strftime_format
+
+
+class _ExcelWriter:
+    """Escreve blocos de linhas em planilhas do xlsxwriter, uma linha por vez"""
+
+    def __init__(self, workbook: Any, options: ExportOptions):
+        self.workbook = workbook
+        self.header_format = workbook.add_format({'bold': True, 'border': 1})
+        self.date_format = workbook.add_format({'num_format': options.excel_date_format})
+        self.datetime_format = workbook.add_format({'num_format': f"{options.excel_date_format} hh:mm:ss"})
+        self.used_titles: set = set()
+        self.worksheet = None
+        self.name = ''
+        self.part = 0
+        self.row = 0
+        self.columns: List[str] = []
+
+    def start_sheet(self, name: str) -> None:
+        self.name, self.part, self.columns = name, 1, []
+        self._new_worksheet(sheet_title(name, self.used_titles))
+
+    def write_frame(self, df: pd.DataFrame) -> None:
+        if not self.columns:
+            self.columns = [str(column) for column in df.columns]
+            self._write_header()
+
+        start = 0
+        while start < len(df):
+            room = EXCEL_MAX_ROWS - self.row
+            if room <= 0:
+                # Planilha cheia: continua numa nova, com o mesmo cabeçalho
+                self.part += 1
+                self._new_worksheet(sheet_title(f"{self.name} ({self.part})", self.used_titles))
+                self._write_header()
+                continue
+            block = df.iloc[start:start + room]
+            self._write_rows(block)
+            start += len(block)
+
+    def _new_worksheet(self, title: str) -> None:
+        self.worksheet = self.workbook.add_worksheet(title)
+        self.row = 0
+
+    def _write_header(self) -> None:
+        for col, name in enumerate(self.columns):
+            self.worksheet.write_string(0, col, name, self.header_format)
+        self.row = 1
+
+    def _write_rows(self, df: pd.DataFrame) -> None:
+        # Tipo de cada coluna resolvido uma vez: o laço por célula só chama o escritor certo
+        writers = []
+        columns = []
+        for _, series in df.items():
+            writer, values = self._column_writer(series)
+            writers.append(writer)
+            columns.append(values)
+
+        row = self.row
+        for values in zip(*columns):
+            for col, value in enumerate(values):
+                if value is not None:
+                    writers[col](row, col, value)
+            row += 1
+        self.row = row
+
+    def _column_writer(self, series: pd.Series) -> Tuple[Callable, List[Any]]:
+        worksheet = self.worksheet
+        mask = series.isna().to_numpy()
+        dtype = series.dtype
+
+        if pd.api.types.is_bool_dtype(dtype):
+            return worksheet.write_boolean, _with_none(series.astype(object).to_numpy(), mask)
+
+        if pd.api.types.is_numeric_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype):
+            return worksheet.write_number, _with_none(series.to_numpy(dtype=float, na_value=np.nan).tolist(), mask)
+
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            cell_format = self.datetime_format if _has_time(series) else self.date_format
+            if getattr(dtype, 'tz', None) is not None:
+                series = series.dt.tz_localize(None)
+            values = _with_none(series.astype(object).tolist(), mask)
+            return lambda row, col, value: worksheet.write_datetime(row, col, value, cell_format), values
+
+        if pd.api.types.is_string_dtype(dtype) and not pd.api.types.is_object_dtype(dtype):
+            return worksheet.write_string, _with_none(series.astype(object).tolist(), mask)
+
+        # Colunas mistas (object/categorias): tipo decidido célula a célula
+        return self._write_any, _with_none(series.astype(object).tolist(), mask)
+
+    def _write_any(self, row: int, col: int, value: Any) -> None:
+        worksheet = self.worksheet
+        if isinstance(value, str):
+            worksheet.write_string(row, col, value)
+        elif isinstance(value, (bool, np.bool_)):
+            worksheet.write_boolean(row, col, bool(value))
+        elif isinstance(value, (int, float, np.integer, np.floating)):
+            worksheet.write_number(row, col, float(value))
+        elif isinstance(value, (datetime, date)):
+            has_time = isinstance(value, datetime) and value.time() != datetime.min.time()
+            worksheet.write_datetime(row, col, value, self.datetime_format if has_time else self.date_format)
+        elif isinstance(value, timedelta):
+            worksheet.write_string(row, col, str(value))
+        else:
+            worksheet.write_string(row, col, str(value))
+
+
+def _with_none(values: Any, mask: np.ndarray) -> List[Any]:
+    # Nulos viram None (célula não é gravada)
+    values = list(values)
+    for position in np.flatnonzero(mask):
+        values[position] = None
+    return values
+
+
+class ExportCache:
+    """
+    Arquivos exportados, indexados pelas versões dos datasets, formato e
+    opções; repetir um download não gera o arquivo de novo
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._files: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(data) for data in self._files.values())
+
+    def get(self, key: tuple, build: Callable[[], bytes]) -> Tuple[bytes, bool]:
+        """Bytes do arquivo (do cache ou gerados por `build`) e se vieram do cache"""
+        with self._lock:
+            if key in self._files:
+                self.hits += 1
+                self._files.move_to_end(key)
+                return self._files[key], True
+
+        data = build()
+        with self._lock:
+            self.misses += 1
+            self._files[key] = data
+            while self.nbytes > self.max_bytes and len(self._files) > 1:
+                self._files.popitem(last=False)
+        return data, False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._files.clear()
@@ -0,0 +1,291 @@
+# Motor de fórmulas para colunas derivadas
+import re
+import ast
+import time
+import operator
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class ExpressionError(Exception):
+    """Fórmula inválida ou que usa algo fora da lista permitida"""
+    pass
+
+
+def _stack(n: int, args: Tuple[Any, ...]) -> np.ndarray:
+    # Argumentos (colunas ou constantes) empilhados como linhas de floats
+    return np.vstack([np.broadcast_to(np.asarray(arg, dtype=float), (n,)) for arg in args])
+
+
+def _round(value: Any, digits: Any = 0) -> Any:
+    return np.round(np.asarray(value, dtype=float), int(digits))
+
+
+def _power(base: Any, exponent: Any) -> Any:
+    # Sempre em float64: com inteiros do Python, 9^9^9 calcularia um número
+    # de milhões de dígitos segurando o GIL; em float o excesso vira inf
+    return np.power(np.asarray(base, dtype=float), np.asarray(exponent, dtype=float))
+
+
+def _if(condition: Any, when_true: Any, when_false: Any) -> Any:
+    return np.where(np.asarray(condition, dtype=bool), when_true, when_false)
+
+
+# Funções permitidas: nome -> (função, recebe o número de linhas?)
+FUNCTIONS: Dict[str, Tuple[Callable, bool]] = {
+    'IF': (_if, False),
+    'ROUND': (_round, False),
+    'ABS': (np.abs, False),
+    'SQRT': (np.sqrt, False),
+    'LOG': (np.log, False),
+    'EXP': (np.exp, False),
+    'SUM': (lambda n, *args: np.nansum(_stack(n, args), axis=0), True),
+    'AVERAGE': (lambda n, *args: np.nanmean(_stack(n, args), axis=0), True),
+    'MIN': (lambda n, *args: np.nanmin(_stack(n, args), axis=0), True),
+    'MAX': (lambda n, *args: np.nanmax(_stack(n, args), axis=0), True),
+    'AND': (lambda *args: np.logical_and.reduce([np.asarray(arg, dtype=bool) for arg in args]), False),
+    'OR': (lambda *args: np.logical_or.reduce([np.asarray(arg, dtype=bool) for arg in args]), False),
+    'NOT': (np.logical_not, False),
+    'ISBLANK': (pd.isna, False),
+}
+
+# Nomes das funções no Excel em português
+FUNCTION_ALIASES = {
+    'SE': 'IF', 'ARRED': 'ROUND', 'RAIZ': 'SQRT', 'LN': 'LOG', 'SOMA': 'SUM',
+    'MEDIA': 'AVERAGE', 'MÉDIA': 'AVERAGE', 'MÍNIMO': 'MIN', 'MÁXIMO': 'MAX',
+    'E': 'AND', 'OU': 'OR', 'NÃO': 'NOT', 'ÉVAZIO': 'ISBLANK'
+}
+
+_BINARY = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: _power,
+    ast.BitXor: _power  # ^ é potência, como no Excel
+}
+_COMPARE = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge
+}
+_CONSTANTS = {'TRUE': True, 'FALSE': False, 'VERDADEIRO': True, 'FALSO': False}
+
+_QUOTED_COLUMN = re.compile(r'\[([^\]]+)\]|`([^`]+)`')
+_EXCEL_EQUALS = re.compile(r'(?<![<>=!])=(?!=)')
+_STRING = re.compile(r'"[^"]*"|\'[^\']*\'')
+
+
+class Expression:
+    """
+    Fórmula compilada uma única vez e avaliada de forma vetorizada.
+
+    Aceita a sintaxe do Excel (`=`, `<>`, `^`, SE/IF, ARRED/ROUND, SOMA/SUM...);
+    colunas com espaços vão entre colchetes ou crases: `[Valor Total] * 1.1`.
+    """
+
+    def __init__(self, text: str):
+        self.text = text.strip().lstrip('=').strip()
+        if not self.text:
+            raise ExpressionError("Fórmula vazia")
+
+        source, self._quoted = self._preprocess(self.text)
+        try:
+            self._tree = ast.parse(source, mode='eval')
+        except SyntaxError as e:
+            raise ExpressionError(f"Sintaxe inválida: {e.msg}")
+
+        self.columns: List[str] = []
+        self._validate(self._tree.body)
+
+    def evaluate(self, df: pd.DataFrame) -> pd.Series:
+        """Avalia a fórmula sobre as colunas de `df` (só as colunas usadas são lidas)"""
+        missing = [column for column in self.columns if column not in df.columns]
+        if missing:
+            raise ExpressionError(f"Coluna(s) não encontrada(s): {', '.join(missing)}")
+
+        env = {column: df[column].to_numpy() for column in self.columns}
+        try:
+            with np.errstate(all='ignore'):
+                value = self._eval(self._tree.body, env, len(df))
+        except ExpressionError:
+            raise
+        except Exception as e:
+            # Ex.: MAX sobre uma coluna de texto, texto dividido por número
+            raise ExpressionError(f"Erro ao avaliar '{self.text}': {e}")
+        return pd.Series(np.broadcast_to(value, (len(df),)) if np.ndim(value) == 0 else value, index=df.index)
+
+    # Internos --------------------------------------------------------------
+
+    @staticmethod
+    def _preprocess(text: str) -> Tuple[str, Dict[str, str]]:
+        # Colunas entre [ ] ou ` ` viram identificadores; =, <> e ; do Excel viram ==, != e ,
+        quoted: Dict[str, str] = {}
+
+        def quote(match: re.Match) -> str:
+            name = f"__col{len(quoted)}__"
+            quoted[name] = match.group(1) or match.group(2)
+            return name
+
+        parts, last = [], 0
+        for match in _STRING.finditer(text):
+            parts.append(text[last:match.start()])
+            parts.append(match.group(0))
+            last = match.end()
+        parts.append(text[last:])
+
+        # Só trechos fora de strings são reescritos
+        for i in range(0, len(parts), 2):
+            chunk = _QUOTED_COLUMN.sub(quote, parts[i])
+            chunk = chunk.replace('<>', '!=').replace(';', ',')
+            parts[i] = _EXCEL_EQUALS.sub('==', chunk)
+        return ''.join(parts), quoted
+
+    def _column(self, name: str) -> str:
+        return self._quoted.get(name, name)
+
+    def _function(self, name: str) -> str:
+        name = name.upper()
+        return FUNCTION_ALIASES.get(name, name)
+
+    def _validate(self, node: ast.AST) -> None:
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or self._function(node.func.id) not in FUNCTIONS:
+                name = node.func.id if isinstance(node.func, ast.Name) else ast.unparse(node.func)
+                raise ExpressionError(f"Função não permitida: {name}")
+            if node.keywords:
+                raise ExpressionError("Argumentos nomeados não são permitidos")
+            for arg in node.args:
+                self._validate(arg)
+            return
+
+        if isinstance(node, ast.Name):
+            if node.id.upper() in _CONSTANTS:
+                return
+            column = self._column(node.id)
+            if column not in self.columns:
+                self.columns.append(column)
+            return
+
+        if isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float, str, bool)):
+                raise ExpressionError(f"Valor não permitido: {node.value!r}")
+            return
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            self._validate(node.left)
+            self._validate(node.right)
+            return
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd, ast.Not)):
+            self._validate(node.operand)
+            return
+
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+            self._validate(node.left)
+            for comparator in node.comparators:
+                self._validate(comparator)
+            return
+
+        if isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._validate(value)
+            return
+
+        raise ExpressionError(f"Sintaxe não permitida: {ast.unparse(node)}")
+
+    def _eval(self, node: ast.AST, env: Dict[str, Any], n: int) -> Any:
+        if isinstance(node, ast.Constant):
+            return node.value
+
+        if isinstance(node, ast.Name):
+            if node.id.upper() in _CONSTANTS:
+                return _CONSTANTS[node.id.upper()]
+            return env[self._column(node.id)]
+
+        if isinstance(node, ast.BinOp):
+            return _BINARY[type(node.op)](self._eval(node.left, env, n), self._eval(node.right, env, n))
+
+        if isinstance(node, ast.UnaryOp):
+            operand = self._eval(node.operand, env, n)
+            if isinstance(node.op, ast.Not):
+                return np.logical_not(operand)
+            return -operand if isinstance(node.op, ast.USub) else operand
+
+        if isinstance(node, ast.Compare):
+            # a < b < c vira (a < b) & (b < c)
+            result, left = True, self._eval(node.left, env, n)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._eval(comparator, env, n)
+                result = np.logical_and(result, _COMPARE[type(op)](left, right))
+                left = right
+            return result
+
+        if isinstance(node, ast.BoolOp):
+            values = [np.asarray(self._eval(value, env, n), dtype=bool) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return combine.reduce(values)
+
+        function, needs_rows = FUNCTIONS[self._function(node.func.id)]
+        args = [self._eval(arg, env, n) for arg in node.args]
+        try:
+            return function(n, *args) if needs_rows else function(*args)
+        except TypeError as e:
+            raise ExpressionError(f"Argumentos inválidos para {node.func.id.upper()}: {e}")
+
+
+@lru_cache(maxsize=256)
+def compile_expression(text: str) -> Expression:
+    """Compila (e guarda em cache) uma fórmula"""
+    return Expression(text)
+
+
+@dataclass
+class FormulaStats:
+    """Tempo de cada fórmula de um lote"""
+    rows: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def elapsed(self) -> float:
+        return sum(self.timings.values())
+
+
+def parse_formulas(text: str) -> List[Tuple[str, Expression]]:
+    """
+    Lê um lote de fórmulas, uma por linha, no formato `Nova_Coluna = expressão`
+    Linhas vazias e começadas por # são ignoradas
+    """
+    formulas = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        match = re.match(r'^(\[[^\]]+\]|`[^`]+`|[^=<>!]+?)\s*=(?!=)\s*(.+)$', line)
+        if not match:
+            raise ExpressionError(f"Linha {number}: use o formato 'Nova_Coluna = expressão'")
+        name = match.group(1).strip().strip('[]`').strip()
+        try:
+            formulas.append((name, compile_expression(match.group(2))))
+        except ExpressionError as e:
+            raise ExpressionError(f"Linha {number}: {e}")
+    return formulas
+
+
+def evaluate_formulas(df: pd.DataFrame, formulas: List[Tuple[str, Expression]]) -> Tuple[pd.DataFrame, FormulaStats]:
+    """
+    Avalia as fórmulas em ordem; cada uma pode usar as colunas criadas pelas anteriores
+    Retorna apenas as novas colunas (o DataFrame de entrada não é copiado nem alterado)
+    """
+    stats = FormulaStats(rows=len(df))
+    results: Dict[str, pd.Series] = {}
+
+    for name, expression in formulas:
+        started = time.perf_counter()
+        # Colunas já calculadas no lote têm precedência sobre as da tabela
+        sources = {column: results[column] if column in results else df[column]
+                   for column in expression.columns if column in results or column in df.columns}
+        results[name] = expression.evaluate(pd.DataFrame(sources, index=df.index))
+        stats.timings[name] = time.perf_counter() - started
+
+    return pd.DataFrame(results, index=df.index), stats
@@ -0,0 +1,274 @@
+# Ingestão de arquivos CSV, Excel e formatos colunares
+import io
+import os
+import re
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow é opcional
+    pa = None
+    pa_csv = None
+    pq = None
+
+# Extensões aceitas no upload -> formato
+FILE_FORMATS = {
+    '.xlsx': 'excel', '.xls': 'excel', '.csv': 'csv',
+    '.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather',
+    '.jsonl': 'ndjson', '.ndjson': 'ndjson'
+}
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$')
+
+FORMAT_LABELS = {'csv': 'CSV', 'parquet': 'Parquet', 'feather': 'Feather', 'ndjson': 'JSON Lines'}
+
+
+@dataclass
+class IngestOptions:
+    """Opções de leitura e otimização de tipos"""
+    chunksize: int = 100_000
+    sample_rows: int = 10_000
+    engine: str = 'pandas'
+    downcast_integers: bool = True
+    downcast_floats: bool = False
+    use_categories: bool = True
+    category_ratio: float = 0.5
+    max_categories: int = 10_000
+
+
+@dataclass
+class IngestReport:
+    """Resumo da ingestão: linhas, tipos convertidos e memória economizada"""
+    rows: int = 0
+    columns: int = 0
+    engine: str = 'pandas'
+    memory_before: int = 0
+    memory_after: int = 0
+    elapsed: float = 0.0
+    conversions: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def memory_saved(self) -> int:
+        return self.memory_before - self.memory_after
+
+    @property
+    def saved_ratio(self) -> float:
+        return self.memory_saved / self.memory_before if self.memory_before else 0.0
+
+
+def infer_schema(sample: pd.DataFrame, options: IngestOptions) -> List[str]:
+    """Escolhe, a partir de uma amostra, as colunas de texto que viram `category`"""
+    if not options.use_categories or sample.empty:
+        return []
+
+    category_columns = []
+    for column in sample.select_dtypes(include=['object', 'string']).columns:
+        unique_count = sample[column].nunique(dropna=True)
+        if unique_count <= options.max_categories and unique_count / len(sample) <= options.category_ratio:
+            category_columns.append(column)
+    return category_columns
+
+
+def optimize_dtypes(df: pd.DataFrame, category_columns: List[str], options: IngestOptions) -> pd.DataFrame:
+    """Reduz inteiros (e opcionalmente decimais) e converte texto repetitivo em `category`"""
+    for column in df.columns:
+        series = df[column]
+        if column in category_columns:
+            df[column] = series.astype('category')
+        elif options.downcast_integers and pd.api.types.is_integer_dtype(series.dtype):
+            df[column] = pd.to_numeric(series, downcast='integer')
+        elif options.downcast_floats and pd.api.types.is_float_dtype(series.dtype):
+            df[column] = pd.to_numeric(series, downcast='float')
+    return df
+
+
+def read_csv_chunked(source: Any, options: Optional[IngestOptions] = None,
+                     progress: Optional[Callable[[float], None]] = None,
+                     total_bytes: Optional[int] = None, **read_kwargs) -> Tuple[pd.DataFrame, IngestReport]:
+    """
+    Lê um CSV em blocos, otimizando os tipos de cada bloco antes de juntá-los
+
+    `progress` recebe a fração (0 a 1) já lida quando `total_bytes` é conhecido.
+    """
+    options = options or IngestOptions()
+    report = IngestReport(engine=options.engine)
+    started = time.perf_counter()
+
+    # Esquema inferido de uma amostra do início do arquivo
+    position = source.tell() if hasattr(source, 'tell') else None
+    sample = pd.read_csv(source, nrows=options.sample_rows, **read_kwargs)
+    category_columns = infer_schema(sample, options)
+    if position is not None:
+        source.seek(position)
+    del sample
+
+    def read_chunks(options: IngestOptions) -> List[pd.DataFrame]:
+        chunks = []
+        for chunk in _iter_chunks(source, options, **read_kwargs):
+            report.memory_before += int(chunk.memory_usage(deep=True).sum())
+            chunks.append(optimize_dtypes(chunk, category_columns, options))
+            if progress and total_bytes and hasattr(source, 'tell'):
+                progress(min(source.tell() / total_bytes, 1.0))
+        return chunks
+
+    try:
+        chunks = read_chunks(options)
+    except Exception as e:
+        # O pyarrow fixa os tipos pelo primeiro bloco: se um bloco seguinte muda
+        # o tipo de uma coluna (inteiros e depois 1.5), relê com o pandas
+        if pa is None or not isinstance(e, pa.ArrowInvalid) or options.engine != 'pyarrow' or position is None:
+            raise
+        source.seek(position)
+        report.engine, report.memory_before = 'pandas', 0
+        chunks = read_chunks(replace(options, engine='pandas'))
+
+    df = _concat_chunks(chunks, category_columns)
+    report.rows = len(df)
+    report.columns = len(df.columns)
+    report.memory_after = int(df.memory_usage(deep=True).sum())
+    report.elapsed = time.perf_counter() - started
+    report.conversions = {
+        str(column): str(dtype) for column, dtype in df.dtypes.items()
+        if column in category_columns or str(dtype) in ('int8', 'int16', 'int32', 'float32', 'uint8', 'uint16', 'uint32')
+    }
+
+    if progress:
+        progress(1.0)
+    return df, report
+
+
+def read_excel_sheet(data: bytes, sheet_name: Optional[str] = None) -> Tuple[List[str], pd.DataFrame]:
+    """
+    Lê os nomes das planilhas e uma planilha (a primeira por padrão) de um workbook
+    Função de módulo para poder rodar em um processo separado (openpyxl prende o GIL)
+    """
+    with pd.ExcelFile(io.BytesIO(data)) as excel_file:
+        sheet_names = list(excel_file.sheet_names)
+        df = excel_file.parse(sheet_name if sheet_name is not None else sheet_names[0])
+    return sheet_names, df
+
+
+def file_format(filename: str) -> Optional[str]:
+    """Formato de um arquivo pela extensão (None se não suportado)"""
+    return FILE_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def read_columnar(data: bytes, file_format: str, options: Optional[IngestOptions] = None,
+                  progress: Optional[Callable[[float], None]] = None) -> Tuple[pd.DataFrame, IngestReport]:
+    """
+    Lê Parquet, Feather/Arrow IPC ou JSON Lines
+
+    Parquet e Feather são lidos por row group / record batch e convertidos
+    uma única vez, com os tipos (e o índice) gravados no arquivo. JSON Lines
+    é lido em blocos e passa pela mesma otimização de tipos do CSV.
+    """
+    options = options or IngestOptions()
+    started = time.perf_counter()
+
+    if file_format == 'ndjson':
+        df, report = _read_ndjson(data, options, progress)
+    else:
+        if pa is None:
+            raise ImportError("pyarrow é necessário para ler Parquet e Feather")
+        report = IngestReport(engine='pyarrow')
+        df = _read_arrow_table(data, file_format, progress).to_pandas()
+        report.memory_after = int(df.memory_usage(deep=True).sum())
+
+    report.rows = len(df)
+    report.columns = len(df.columns)
+    report.elapsed = time.perf_counter() - started
+    if progress:
+        progress(1.0)
+    return df, report
+
+
+def _read_arrow_table(data: bytes, file_format: str, progress: Optional[Callable[[float], None]]) -> "pa.Table":
+    if file_format == 'parquet':
+        parquet_file = pq.ParquetFile(pa.BufferReader(data))
+        tables = []
+        for i in range(parquet_file.num_row_groups):
+            tables.append(parquet_file.read_row_group(i))
+            if progress:
+                progress((i + 1) / parquet_file.num_row_groups)
+        return pa.concat_tables(tables) if tables else parquet_file.schema_arrow.empty_table()
+
+    try:
+        reader = pa.ipc.open_file(pa.BufferReader(data))
+    except pa.ArrowInvalid:
+        # Arrow IPC em formato de stream (sem rodapé)
+        return pa.ipc.open_stream(pa.BufferReader(data)).read_all()
+    batches = []
+    for i in range(reader.num_record_batches):
+        batches.append(reader.get_batch(i))
+        if progress:
+            progress((i + 1) / reader.num_record_batches)
+    return pa.Table.from_batches(batches, schema=reader.schema)
+
+
+def _read_ndjson(data: bytes, options: IngestOptions,
+                 progress: Optional[Callable[[float], None]]) -> Tuple[pd.DataFrame, IngestReport]:
+    report = IngestReport(engine='pandas')
+    source = io.BytesIO(data)
+    chunks, category_columns = [], None
+    with pd.read_json(source, lines=True, chunksize=options.chunksize) as reader:
+        for chunk in reader:
+            if category_columns is None:
+                category_columns = infer_schema(chunk.head(options.sample_rows), options)
+            report.memory_before += int(chunk.memory_usage(deep=True).sum())
+            chunks.append(optimize_dtypes(chunk, category_columns, options))
+            if progress and data:
+                progress(min(source.tell() / len(data), 1.0))
+
+    df = _concat_chunks(chunks, category_columns or [])
+    _parse_iso_dates(df)
+    report.memory_after = int(df.memory_usage(deep=True).sum())
+    report.conversions = {
+        str(column): str(df[column].dtype) for column in category_columns or []
+    }
+    return df, report
+
+
+def _parse_iso_dates(df: pd.DataFrame) -> None:
+    # JSON não tem tipo de data: colunas de texto em ISO 8601 voltam a ser datas
+    for column in df.select_dtypes(include=['object', 'string']).columns:
+        values = df[column].dropna()
+        if values.empty or not values.head(100).map(lambda value: isinstance(value, str) and bool(
+                _ISO_DATE.match(value))).all():
+            continue
+        try:
+            df[column] = pd.to_datetime(df[column], format='ISO8601')
+        except (ValueError, TypeError):
+            pass
+
+
+def _iter_chunks(source: Any, options: IngestOptions, **read_kwargs):
+    if options.engine == 'pyarrow' and pa_csv is not None and not read_kwargs:
+        # Leitor em streaming do pyarrow: blocos decodificados em paralelo
+        reader = pa_csv.open_csv(source, read_options=pa_csv.ReadOptions(block_size=16 * 1024 * 1024))
+        for batch in reader:
+            yield batch.to_pandas()
+        return
+
+    yield from pd.read_csv(source, chunksize=options.chunksize, **read_kwargs)
+
+
+def _concat_chunks(chunks: List[pd.DataFrame], category_columns: List[str]) -> pd.DataFrame:
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+
+    # Alinhar as categorias de todos os blocos para que o concat preserve o tipo
+    for column in category_columns:
+        categories = chunks[0][column].cat.categories
+        for chunk in chunks[1:]:
+            categories = categories.union(chunk[column].cat.categories)
+        for chunk in chunks:
+            chunk[column] = chunk[column].cat.set_categories(categories)
+
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,174 @@
+# Execução de tarefas em segundo plano
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+STATUS_LABELS = {
+    PENDING: '⏳ Na fila',
+    RUNNING: '⚙️ Processando',
+    DONE: '✅ Concluído',
+    FAILED: '❌ Erro',
+    CANCELLED: '🚫 Cancelado'
+}
+
+
+class JobCancelled(Exception):
+    """Levantada dentro da tarefa quando o cancelamento foi solicitado"""
+    pass
+
+
+@dataclass
+class Job:
+    """Tarefa submetida ao JobRunner"""
+    name: str
+    kind: str = 'thread'
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = PENDING
+    progress: float = 0.0
+    result: Any = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    _future: Optional[Future] = field(default=None, repr=False)
+    _cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def report(self, fraction: float) -> None:
+        """Atualiza o progresso; interrompe a tarefa se o cancelamento foi pedido"""
+        self.progress = max(0.0, min(float(fraction), 1.0))
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def cancel(self) -> None:
+        """
+        Pede o cancelamento. Tarefas na fila são descartadas; tarefas em thread
+        param no próximo `report`; em processo, o resultado é ignorado
+        """
+        self._cancel_event.set()
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED)
+
+    def _finish(self, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        if status == DONE:
+            self.progress = 1.0
+        self.status = status
+
+
+class JobRunner:
+    """
+    Executor compartilhado pelas sessões: um pool de threads para tarefas que
+    liberam o GIL ou reportam progresso (CSV, pyarrow) e um pool de processos
+    para parsing preso ao GIL (openpyxl)
+    """
+
+    def __init__(self, max_threads: int = 4, max_processes: int = 2):
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, fn: Callable[..., Any], *args, kind: str = 'thread', **kwargs) -> Job:
+        """
+        Submete uma tarefa
+        Em `thread`, `fn` recebe o Job como primeiro argumento (para progresso e
+        cancelamento); em `process`, `fn` precisa ser uma função de módulo serializável
+        """
+        job = Job(name=name, kind=kind)
+
+        if kind == 'process':
+            job._future = self._process_pool().submit(fn, *args, **kwargs)
+            job.status = RUNNING
+            job.started = time.time()
+        else:
+            job._future = self._thread_pool().submit(self._run_in_thread, job, fn, *args, **kwargs)
+
+        job._future.add_done_callback(lambda future: self._on_done(job, future))
+        return job
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for executor in (self._threads, self._processes):
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+            self._threads = self._processes = None
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix='job')
+            return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                # spawn: fork de um servidor com várias threads não é seguro
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.max_processes,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._processes
+
+    @staticmethod
+    def _run_in_thread(job: Job, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if job.cancel_requested:
+            raise JobCancelled()
+        job.status = RUNNING
+        job.started = time.time()
+        return fn(job, *args, **kwargs)
+
+    @staticmethod
+    def _on_done(job: Job, future: Future) -> None:
+        if job.done:
+            return
+        if future.cancelled() or job.cancel_requested:
+            job._finish(CANCELLED)
+            return
+
+        error = future.exception()
+        if isinstance(error, JobCancelled):
+            job._finish(CANCELLED)
+        elif error is not None:
+            job._finish(FAILED, error=str(error) or type(error).__name__)
+        else:
+            job._finish(DONE, result=future.result())
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Executor de tarefas do processo (único para todas as sessões)"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
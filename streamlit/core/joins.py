@@ -0,0 +1,336 @@
+# Motor de JOIN com índices de chave
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .storage import DatasetHandle
+
+JOIN_TYPES = ('inner', 'left', 'right', 'outer')
+
+
+class JoinTooLarge(Exception):
+    """JOIN recusado porque o resultado estimado ultrapassa o limite de linhas"""
+    pass
+
+
+def key_frame(df: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+    """Colunas-chave prontas para indexação (categorias viram seus valores)"""
+    keys = df[list(columns)]
+    for column in keys.columns:
+        if isinstance(keys[column].dtype, pd.CategoricalDtype):
+            keys = keys.assign(**{column: keys[column].astype(keys[column].cat.categories.dtype)})
+    return keys
+
+
+class KeyIndex:
+    """
+    Índice hash das chaves de um dataset (uma ou várias colunas).
+
+    Cada linha recebe o código da sua chave distinta; `order`/`offsets`
+    agrupam as posições das linhas por chave, de modo que as linhas de uma
+    chave são `order[offsets[k]:offsets[k] + counts[k]]`. Chaves nulas são
+    tratadas como um valor (como no `pd.merge`).
+    """
+
+    def __init__(self, keys: pd.DataFrame):
+        started = time.perf_counter()
+        self.columns = list(keys.columns)
+        self.num_rows = len(keys)
+
+        if len(self.columns) == 1:
+            codes, uniques = pd.factorize(keys.iloc[:, 0], use_na_sentinel=False)
+            self.uniques = pd.Index(uniques)
+        else:
+            codes, self.uniques = pd.MultiIndex.from_frame(keys).factorize(use_na_sentinel=False)
+
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.counts = np.bincount(self.codes, minlength=len(self.uniques))
+        self._order: Optional[np.ndarray] = None
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)[:-1]]).astype(np.int64)
+        self._sorted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.build_time = time.perf_counter() - started
+
+    @property
+    def order(self) -> np.ndarray:
+        """Posições das linhas agrupadas por chave (ordenação feita só quando necessária)"""
+        if self._order is None:
+            self._order = np.argsort(self.codes, kind='stable')
+        return self._order
+
+    @property
+    def num_keys(self) -> int:
+        return len(self.uniques)
+
+    @property
+    def is_unique(self) -> bool:
+        return self.num_keys == self.num_rows
+
+    @property
+    def nbytes(self) -> int:
+        arrays = self.codes.nbytes + self.counts.nbytes + self.offsets.nbytes
+        if self._order is not None:
+            arrays += self._order.nbytes
+        return arrays + int(self.uniques.memory_usage(deep=True))
+
+    def sorted_keys(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Chaves distintas não nulas em ordem crescente e suas posições em `uniques` (chave única)"""
+        if self._sorted is None:
+            valid = np.flatnonzero(pd.notna(self.uniques))
+            values = np.asarray(self.uniques[valid])
+            order = np.argsort(values, kind='stable')
+            self._sorted = (values[order], valid[order])
+        return self._sorted
+
+    def match(self, other: "KeyIndex") -> np.ndarray:
+        """Para cada chave distinta de `other`, a chave correspondente neste índice (-1 se não houver)"""
+        if not self.num_keys or not other.num_keys:
+            return np.full(other.num_keys, -1, dtype=np.int64)
+        return np.asarray(self.uniques.get_indexer(other.uniques), dtype=np.int64)
+
+    def rows(self, keys: np.ndarray) -> np.ndarray:
+        """Posições (em ordem crescente) de todas as linhas das chaves informadas"""
+        lengths = self.counts[keys]
+        total = int(lengths.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        # Para cada chave, offsets[k] + 0..counts[k]-1, sem laço em Python
+        starts = np.repeat(self.offsets[keys] - np.cumsum(lengths) + lengths, lengths)
+        return np.sort(self.order[starts + np.arange(total)])
+
+
+class KeyIndexCache:
+    """
+    Cache LRU de índices por (versão do dataset, colunas-chave)
+
+    O handle muda a cada edição, então um índice nunca é reutilizado para
+    dados diferentes; versões antigas saem pela LRU.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._indexes: "OrderedDict[Tuple[str, Tuple[str, ...]], KeyIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, handle: DatasetHandle, columns: Sequence[str],
+            load: Callable[[List[str]], pd.DataFrame]) -> Tuple[KeyIndex, bool]:
+        """Retorna o índice (construindo-o com `load(colunas)` em caso de miss) e se veio do cache"""
+        key = (handle.key, tuple(columns))
+        with self._lock:
+            if key in self._indexes:
+                self.hits += 1
+                self._indexes.move_to_end(key)
+                return self._indexes[key], True
+            self.misses += 1
+
+        # Construído fora do lock: usado também pelas tarefas em paralelo do serviço (api/)
+        index = KeyIndex(key_frame(load(list(columns)), columns))
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index, False
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(index.nbytes for index in self._indexes.values())
+
+
+@dataclass
+class JoinEstimate:
+    """Cardinalidade do JOIN calculada a partir dos índices, antes de executá-lo"""
+    how: str
+    left_rows: int
+    right_rows: int
+    matched_keys: int
+    inner_rows: int
+    left_unmatched: int
+    right_unmatched: int
+    max_fanout: int
+    many_to_many: bool
+
+    @property
+    def rows(self) -> int:
+        if self.how == 'inner':
+            return self.inner_rows
+        if self.how == 'left':
+            return self.inner_rows + self.left_unmatched
+        if self.how == 'right':
+            return self.inner_rows + self.right_unmatched
+        return self.inner_rows + self.left_unmatched + self.right_unmatched
+
+
+@dataclass
+class JoinStats:
+    """Tempos e contagens de uma execução"""
+    estimate: JoinEstimate
+    result_rows: int = 0
+    partitions: int = 0
+    index_time: float = 0.0
+    indexes_cached: int = 0
+    elapsed: float = 0.0
+
+
+def estimate_join(left: KeyIndex, right: KeyIndex, how: str = 'left') -> JoinEstimate:
+    """Estima (exatamente) o número de linhas do resultado"""
+    if how not in JOIN_TYPES:
+        raise ValueError(f"Tipo de JOIN inválido: {how}")
+
+    right_keys = right.match(left)
+    matched = right_keys >= 0
+    fanout = _right_counts(right, right_keys)
+
+    right_matched = np.zeros(right.num_keys, dtype=bool)
+    right_matched[right_keys[matched]] = True
+
+    return JoinEstimate(
+        how=how,
+        left_rows=left.num_rows,
+        right_rows=right.num_rows,
+        matched_keys=int(matched.sum()),
+        inner_rows=int((left.counts * fanout).sum()),
+        left_unmatched=int(left.counts[~matched].sum()),
+        right_unmatched=int(right.counts[~right_matched].sum()),
+        max_fanout=int(fanout.max()) if len(fanout) else 0,
+        many_to_many=bool(((left.counts > 1) & (fanout > 1)).any())
+    )
+
+
+def iter_join(left_df: pd.DataFrame, right_df: pd.DataFrame, left_on: Sequence[str], right_on: Sequence[str],
+              left_index: KeyIndex, right_index: KeyIndex, how: str = 'left',
+              partition_rows: int = 500_000, suffixes: Tuple[str, str] = ('_x', '_y')) -> Iterator[pd.DataFrame]:
+    """
+    Executa o JOIN em partições da tabela esquerda com no máximo ~`partition_rows`
+    linhas de saída cada; cada partição só enxerga as linhas da direita com
+    chaves presentes nela. As linhas da direita sem correspondência (right/outer)
+    vêm na última partição.
+    """
+    estimate = estimate_join(left_index, right_index, how)
+    right_keys = right_index.match(left_index)
+    fanout = _right_counts(right_index, right_keys)
+
+    # Colunas que recebem nulos em alguma partição são convertidas em todas,
+    # para que as partições tenham os mesmos tipos
+    nullable_left = how in ('right', 'outer') and estimate.right_unmatched > 0
+    nullable_right = how in ('left', 'outer') and estimate.left_unmatched > 0
+    merge_how = 'left' if how in ('left', 'outer') else 'inner'
+    merge_kwargs = {'left_on': list(left_on), 'right_on': list(right_on), 'suffixes': suffixes}
+    # Chaves com o mesmo nome dos dois lados viram uma só coluna, sempre preenchida
+    shared_keys = [left for left, right in zip(left_on, right_on) if left == right]
+
+    # Linhas de saída por linha da esquerda (mínimo 1 quando a esquerda é preservada)
+    output_rows = fanout[left_index.codes]
+    if merge_how == 'left':
+        output_rows = np.maximum(output_rows, 1)
+    cumulative = np.cumsum(output_rows)
+
+    produced = False
+    start = 0
+    while start < left_index.num_rows:
+        before = cumulative[start - 1] if start else 0
+        stop = max(int(np.searchsorted(cumulative, before + partition_rows, side='right')), start + 1)
+
+        if right_index.num_rows <= partition_rows:
+            # Direita pequena: filtrá-la custaria mais que o próprio merge
+            right_part = right_df
+        else:
+            keys = right_keys[np.unique(left_index.codes[start:stop])]
+            right_part = right_df.iloc[right_index.rows(keys[keys >= 0])]
+        left_part = left_df.iloc[start:stop]
+        chunk = pd.merge(
+            _as_nullable(left_part, shared_keys) if nullable_left else left_part,
+            _as_nullable(right_part, shared_keys) if nullable_right else right_part,
+            how=merge_how, **merge_kwargs
+        )
+        if len(chunk) or not produced:
+            produced = True
+            yield chunk
+        start = stop
+
+    if how in ('right', 'outer') and estimate.right_unmatched:
+        right_matched = np.zeros(right_index.num_keys, dtype=bool)
+        right_matched[right_keys[right_keys >= 0]] = True
+        unmatched = right_df.iloc[np.flatnonzero(~right_matched[right_index.codes])]
+        produced = True
+        yield pd.merge(
+            _as_nullable(left_df.iloc[0:0], shared_keys),
+            _as_nullable(unmatched, shared_keys) if nullable_right else unmatched,
+            how='right', **merge_kwargs
+        )
+
+    if not produced:
+        yield pd.merge(left_df.iloc[0:0], right_df.iloc[0:0], how=merge_how, **merge_kwargs)
+
+
+def hash_join(left_df: pd.DataFrame, right_df: pd.DataFrame, left_on: Sequence[str], right_on: Sequence[str],
+              how: str = 'left', left_index: Optional[KeyIndex] = None, right_index: Optional[KeyIndex] = None,
+              max_rows: Optional[int] = None, partition_rows: int = 500_000,
+              sink: Optional[Callable[[Iterator[pd.DataFrame]], Any]] = None) -> Tuple[Any, JoinStats]:
+    """
+    JOIN por hash com estimativa prévia e execução em partições
+
+    `sink` consome as partições (ex.: `DatasetStore.put_chunks`, que grava em
+    disco sem juntar tudo em memória); sem ele, as partições são concatenadas.
+    Levanta JoinTooLarge se a estimativa passar de `max_rows`.
+    """
+    started = time.perf_counter()
+    left_on, right_on = list(left_on), list(right_on)
+    if len(left_on) != len(right_on) or not left_on:
+        raise ValueError("Informe o mesmo número (não nulo) de colunas-chave dos dois lados")
+
+    stats = JoinStats(estimate=None)
+    if left_index is None:
+        left_index = KeyIndex(key_frame(left_df, left_on))
+        stats.index_time += left_index.build_time
+    else:
+        stats.indexes_cached += 1
+    if right_index is None:
+        right_index = KeyIndex(key_frame(right_df, right_on))
+        stats.index_time += right_index.build_time
+    else:
+        stats.indexes_cached += 1
+
+    stats.estimate = estimate_join(left_index, right_index, how)
+    if max_rows is not None and stats.estimate.rows > max_rows:
+        raise JoinTooLarge(
+            f"O JOIN geraria {stats.estimate.rows:,} linhas, acima do limite de {max_rows:,}. "
+            f"Verifique se as chaves estão corretas ou filtre as tabelas antes."
+        )
+
+    def counted(chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        for chunk in chunks:
+            stats.partitions += 1
+            stats.result_rows += len(chunk)
+            yield chunk
+
+    chunks = counted(iter_join(left_df, right_df, left_on, right_on, left_index, right_index, how, partition_rows))
+    result = sink(chunks) if sink else pd.concat(list(chunks), ignore_index=True)
+    stats.elapsed = time.perf_counter() - started
+    return result, stats
+
+
+def _right_counts(right: KeyIndex, right_keys: np.ndarray) -> np.ndarray:
+    # Quantidade de linhas da direita para cada chave da esquerda (0 sem correspondência)
+    if not right.num_keys:
+        return np.zeros(len(right_keys), dtype=np.int64)
+    return np.where(right_keys >= 0, right.counts[np.maximum(right_keys, 0)], 0)
+
+
+def _as_nullable(df: pd.DataFrame, keep: Sequence[str] = ()) -> pd.DataFrame:
+    # Os mesmos tipos que o pd.merge produz quando a coluna recebe nulos
+    conversions = {}
+    for column, dtype in df.dtypes.items():
+        if column in keep:
+            continue
+        if dtype == np.bool_:
+            conversions[column] = object
+        elif pd.api.types.is_integer_dtype(dtype) and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            conversions[column] = 'float64'
+    return df.astype(conversions) if conversions else df
@@ -0,0 +1,222 @@
+# Journal de edições
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+
+import pandas as pd
+
+from .storage import DatasetStore, DatasetHandle, cow_copy
+
+
+def _next_labels(index: pd.Index, count: int) -> pd.Index:
+    """Rótulos inteiros livres para `count` linhas novas no fim da tabela"""
+    start = int(index.max()) + 1 if len(index) and pd.api.types.is_integer_dtype(index) else len(index)
+    return pd.RangeIndex(start, start + count)
+
+
+@dataclass
+class EditOperation:
+    """Operação registrada no journal"""
+    kind: str
+    description: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+class EditJournal:
+    """
+    Log append-only de operações aplicadas sobre uma base imutável.
+
+    A base nunca é alterada: o estado atual é a base mais as operações até
+    `position`. Valores volumosos (colunas calculadas, linhas adicionadas)
+    vão para o DatasetStore e o journal guarda apenas seus handles.
+
+    Operações sobre colunas (incluindo edição de células) geram a nova versão
+    com `DatasetStore.put_columns`: só as colunas afetadas são gravadas e a
+    tabela não é materializada; inserir ou excluir linhas regrava a versão.
+    """
+
+    def __init__(self, store: DatasetStore, base: DatasetHandle):
+        self.store = store
+        self.base = base
+        self.operations: List[EditOperation] = []
+        self.position = 0
+        self._head = base
+        self._last_change: Optional[Tuple[str, EditOperation]] = None
+
+    @property
+    def handle(self) -> DatasetHandle:
+        """Handle da versão atual"""
+        return self._head
+
+    @property
+    def can_undo(self) -> bool:
+        return self.position > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self.position < len(self.operations)
+
+    @property
+    def is_modified(self) -> bool:
+        return self.position > 0
+
+    def load(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Materializa a versão atual (somente leitura)"""
+        return self.store.load(self._head, columns=columns)
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Memória (em uso quando materializada) da versão atual, da base e dos payloads"""
+        payloads = sum(
+            value.memory_bytes for op in self.operations
+            for value in op.payload.values() if isinstance(value, DatasetHandle)
+        )
+        return {
+            'current': self._head.memory_bytes,
+            'base': self.base.memory_bytes if self._head.key != self.base.key else 0,
+            'journal': payloads
+        }
+
+    def disk_bytes(self) -> int:
+        """Tamanho no armazenamento de todas as versões e payloads"""
+        handles = {self.base.key: self.base, self._head.key: self._head}
+        for op in self.operations:
+            handles.update({value.key: value for value in op.payload.values() if isinstance(value, DatasetHandle)})
+        return sum(handle.nbytes for handle in handles.values())
+
+    def last_change(self) -> Optional[Tuple[str, EditOperation]]:
+        """
+        Chave da versão anterior e operação que gerou a atual, quando a versão
+        atual veio de uma única operação nova (não de desfazer/refazer)
+        """
+        return self._last_change
+
+    def history(self) -> List[Tuple[str, bool]]:
+        """Descrição das operações e se cada uma está aplicada"""
+        return [(op.description, i < self.position) for i, op in enumerate(self.operations)]
+
+    # Operações -------------------------------------------------------------
+
+    def set_columns(self, values: pd.DataFrame, description: str) -> None:
+        """Cria ou substitui colunas (PROCV, DE/PARA, operações matemáticas...)"""
+        self._append(EditOperation('set_columns', description, {'values': self.store.put(values)}))
+
+    def add_column(self, column: str, value: Any, description: str) -> None:
+        """Cria uma coluna preenchida com um valor constante"""
+        self._append(EditOperation('add_column', description, {'column': column, 'value': value}))
+
+    def drop_column(self, column: str, description: str) -> None:
+        self._append(EditOperation('drop_column', description, {'column': column}))
+
+    def edit_cells(self, changes: List[Tuple[Any, str, Any]], description: str) -> None:
+        """Altera células individuais: lista de (rótulo da linha, coluna, valor)"""
+        self._append(EditOperation('cells', description, {'changes': changes}))
+
+    def delete_rows(self, labels: List[Any], description: str) -> None:
+        self._append(EditOperation('delete_rows', description, {'labels': labels}))
+
+    def append_rows(self, rows: pd.DataFrame, description: str) -> None:
+        self._append(EditOperation('append_rows', description, {'rows': self.store.put(rows)}))
+
+    # Navegação -------------------------------------------------------------
+
+    def undo(self) -> None:
+        if self.can_undo:
+            self._checkout(self.position - 1)
+
+    def redo(self) -> None:
+        if self.can_redo:
+            self._checkout(self.position + 1)
+
+    def restore(self) -> None:
+        """Volta à base sem copiar dados (as operações continuam disponíveis para refazer)"""
+        self._drop_head()
+        self._head = self.base
+        self.position = 0
+        self._last_change = None
+
+    def release(self) -> None:
+        """Apaga do armazenamento a base, a versão atual e os payloads"""
+        self._drop_head()
+        for op in self.operations:
+            self._drop_payload(op)
+        self.store.delete(self.base)
+        self.operations = []
+        self.position = 0
+        self._head = self.base
+
+    # Internos --------------------------------------------------------------
+
+    def _append(self, op: EditOperation) -> None:
+        # Uma nova operação descarta o que havia para refazer
+        for discarded in self.operations[self.position:]:
+            self._drop_payload(discarded)
+        del self.operations[self.position:]
+
+        parent = self._head.key
+        head = self._apply(self._head, op)
+        self.operations.append(op)
+        self.position += 1
+        self._set_head(head)
+        self._last_change = (parent, op)
+
+    def _checkout(self, position: int) -> None:
+        if position == 0:
+            self.restore()
+            return
+
+        # Refaz a partir da base: mais barato que guardar uma cópia por passo
+        head = self.base
+        for op in self.operations[:position]:
+            derived = self._apply(head, op)
+            if head.key != self.base.key:
+                self.store.delete(head)
+            head = derived
+        self.position = position
+        self._set_head(head)
+
+    def _set_head(self, head: DatasetHandle) -> None:
+        self._drop_head()
+        self._head = head
+        self._last_change = None
+
+    def _drop_head(self) -> None:
+        if self._head.key != self.base.key:
+            self.store.delete(self._head)
+
+    def _drop_payload(self, op: EditOperation) -> None:
+        for value in op.payload.values():
+            if isinstance(value, DatasetHandle):
+                self.store.delete(value)
+
+    def _apply(self, handle: DatasetHandle, op: EditOperation) -> DatasetHandle:
+        """Grava a versão resultante de aplicar `op` sobre `handle`"""
+        payload = op.payload
+
+        if op.kind == 'set_columns':
+            return self.store.put_columns(handle, self.store.load(payload['values']))
+
+        if op.kind == 'add_column':
+            values = pd.DataFrame({payload['column']: payload['value']}, index=pd.RangeIndex(handle.num_rows))
+            return self.store.put_columns(handle, values)
+
+        if op.kind == 'drop_column':
+            return self.store.put_columns(handle, drop=[payload['column']])
+
+        if op.kind == 'cells':
+            # Só as colunas editadas são lidas e regravadas
+            columns = list(dict.fromkeys(column for _, column, _ in payload['changes']))
+            values = cow_copy(self.store.load(handle, columns=columns))
+            for label, column, value in payload['changes']:
+                values.at[label, column] = value
+            return self.store.put_columns(handle, values)
+
+        df = self.store.load(handle)
+        if op.kind == 'delete_rows':
+            return self.store.put(df.drop(index=payload['labels']))
+
+        if op.kind == 'append_rows':
+            # Rótulos novos a partir do maior da tabela inteira: os que o editor
+            # atribui numa página podem já existir nas páginas seguintes
+            rows = self.store.load(payload['rows'])
+            return self.store.put(pd.concat([df, rows.set_axis(_next_labels(df.index, len(rows)))]))
+
+        raise ValueError(f"Operação desconhecida: {op.kind}")
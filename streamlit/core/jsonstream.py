@@ -0,0 +1,295 @@
+# Leitura incremental de documentos JSON grandes
+import re
+import json
+import time
+import codecs
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple, Iterator, Sequence, Union, BinaryIO, TextIO
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+from .memory import MB
+
+# Tamanho de cada leitura do arquivo no modo incremental
+READ_CHUNK_BYTES = 1 * MB
+
+# Documentos até este tamanho são decodificados de uma vez (mais rápido que
+# em fluxo); acima, as listas pedidas são lidas item a item
+STREAM_MIN_BYTES = 8 * MB
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Resto do buffer que ainda pode ser parte de um número ("1." + "5e3")
+_NUMBER_TAIL = re.compile(r'[0-9.eE+\-]*\Z')
+_DECODER = json.JSONDecoder()
+
+
+def decode_json(data: Union[str, bytes]) -> Any:
+    """
+    Decodifica um documento inteiro (com orjson, se instalado)
+    Erros de sintaxe levantam json.JSONDecodeError nos dois casos
+    """
+    if isinstance(data, bytes) and data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_json(data: Any, compact: bool = False) -> bytes:
+    """
+    Serializa em UTF-8 (com orjson, se instalado); indentado com 2 espaços
+    ou, se `compact`, sem espaços. Tipos desconhecidos viram texto
+    """
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        return orjson.dumps(data, default=str, option=options if compact else options | orjson.OPT_INDENT_2)
+    if compact:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+
+
+class ColumnBuilder:
+    """
+    Monta um DataFrame registro a registro guardando uma lista por coluna,
+    em vez de um dicionário por linha; colunas que faltam num registro ficam nulas
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, List[Any]] = {}
+        self.rows = 0
+
+    def append(self, record: Any) -> None:
+        if not isinstance(record, dict):
+            raise ValueError(f"Esperado um objeto JSON por item, encontrado {type(record).__name__}")
+        for key, value in record.items():
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [None] * self.rows
+            column.append(value)
+        self.rows += 1
+        if len(record) < len(self.columns):
+            for column in self.columns.values():
+                if len(column) < self.rows:
+                    column.append(None)
+
+    def extend(self, records: Sequence[Any]) -> None:
+        for record in records:
+            self.append(record)
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame com as colunas montadas (as listas são liberadas)"""
+        columns, self.columns = self.columns, {}
+        return pd.DataFrame(columns) if self.rows else pd.DataFrame()
+
+
+@dataclass
+class JsonReadStats:
+    """Tamanho, itens lidos em fluxo, tempo e forma de leitura de um documento"""
+    bytes: int = 0
+    records: int = 0
+    elapsed: float = 0.0
+    mode: str = ''
+
+    @property
+    def throughput(self) -> float:
+        """MB lidos por segundo"""
+        return self.bytes / MB / self.elapsed if self.elapsed else 0.0
+
+
+def read_json_document(source: Union[str, bytes, BinaryIO, TextIO], columnar: Sequence[str] = (),
+                       stream_min_bytes: int = STREAM_MIN_BYTES,
+                       chunk_size: int = READ_CHUNK_BYTES) -> Tuple[Any, Dict[str, ColumnBuilder], JsonReadStats]:
+    """
+    Lê um documento JSON; as listas de objetos em `columnar` (chaves do
+    objeto raiz) vão para ColumnBuilders e saem do documento retornado
+
+    Documentos grandes são lidos em blocos de `chunk_size` e cada item das
+    listas é decodificado e entregue ao builder assim que lido: nem o texto
+    inteiro nem a lista de dicionários ficam em memória. Retorna o documento
+    (sem as listas), os builders e as estatísticas.
+    """
+    started = time.perf_counter()
+    size = _size(source)
+    stats = JsonReadStats(bytes=size or 0)
+
+    if size is not None and size <= stream_min_bytes:
+        data = source if isinstance(source, (str, bytes)) else source.read()
+        document = decode_json(data)
+        builders = {}
+        if isinstance(document, dict):
+            for key in columnar:
+                if isinstance(document.get(key), list):
+                    builders[key] = ColumnBuilder()
+                    builders[key].extend(document.pop(key))
+                    stats.records += builders[key].rows
+        stats.mode = 'orjson' if orjson is not None else 'json'
+    else:
+        reader = _StreamReader(_text_chunks(source, chunk_size))
+        document, builders = reader.read_object(set(columnar))
+        stats.records = sum(builder.rows for builder in builders.values())
+        stats.bytes = stats.bytes or reader.consumed
+        stats.mode = 'incremental'
+
+    stats.elapsed = time.perf_counter() - started
+    return document, builders, stats
+
+
+def _size(source: Any) -> Optional[int]:
+    # Tamanho em bytes (ou caracteres) sem ler o conteúdo; None se desconhecido
+    if isinstance(source, (str, bytes)):
+        return len(source)
+    try:
+        position = source.tell()
+        size = source.seek(0, 2) - position
+        source.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _text_chunks(source: Any, chunk_size: int) -> Iterator[str]:
+    """Texto do documento em blocos, decodificando UTF-8 incrementalmente"""
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+        return
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    if isinstance(source, bytes):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield decoder.decode(view[start:start + chunk_size])
+    else:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+class _StreamReader:
+    """
+    Percorre o objeto raiz com o decodificador do json (raw_decode) sobre um
+    buffer de texto que é completado bloco a bloco
+    """
+
+    def __init__(self, chunks: Iterator[str]):
+        self.chunks = chunks
+        self.text = ''
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    @property
+    def consumed(self) -> int:
+        return self.offset + self.pos
+
+    def read_object(self, columnar: set) -> Tuple[Dict[str, Any], Dict[str, ColumnBuilder]]:
+        document: Dict[str, Any] = {}
+        builders: Dict[str, ColumnBuilder] = {}
+        self._expect('{', "O documento precisa ser um objeto JSON")
+        if self._peek() == '}':
+            self.pos += 1
+        else:
+            while True:
+                key = self._value()
+                if not isinstance(key, str):
+                    self._fail("Esperado o nome de um campo")
+                self._expect(':')
+                if key in columnar and self._peek() == '[':
+                    builders[key] = self._read_array()
+                else:
+                    document[key] = self._value()
+                if self._next_separator('}'):
+                    break
+        if self._peek():
+            self._fail("Conteúdo após o fim do documento")
+        return document, builders
+
+    def _read_array(self) -> ColumnBuilder:
+        builder = ColumnBuilder()
+        self.pos += 1
+        if self._peek() == ']':
+            self.pos += 1
+            return builder
+        decode, skip, append = _DECODER.raw_decode, _WHITESPACE.match, builder.append
+        while True:
+            # Caminho rápido: item e separador inteiros no buffer
+            text = self.text
+            try:
+                value, end = decode(text, skip(text, self.pos).end())
+                end = skip(text, end).end()
+                separator = text[end] if end < len(text) - 1 else ''
+            except json.JSONDecodeError:
+                separator = ''
+            if separator == ',':
+                append(value)
+                self.pos = skip(text, end + 1).end()
+                continue
+            append(self._value())
+            if self._next_separator(']'):
+                return builder
+
+    def _next_separator(self, closing: str) -> bool:
+        # Após um valor: ',' continua, `closing` termina
+        char = self._peek()
+        self.pos += 1
+        if char == closing:
+            return True
+        if char != ',':
+            self.pos -= 1
+            self._fail(f"Esperado ',' ou '{closing}'")
+        return False
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError as e:
+                # Valor incompleto no fim do buffer: lê mais um bloco e tenta de novo
+                if self._fill():
+                    continue
+                self._fail(e.msg, self.offset + e.pos)
+            # Um número no fim do buffer pode continuar no próximo bloco: raw_decode
+            # devolve só o prefixo válido (1 de "1.") e o resto viria como lixo
+            if isinstance(value, (int, float)) and _NUMBER_TAIL.match(self.text, end) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char: str, message: Optional[str] = None) -> None:
+        if self._peek() != char:
+            self._fail(message or f"Esperado '{char}'")
+        self.pos += 1
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _fail(self, message: str, position: Optional[int] = None) -> None:
+        position = self.consumed if position is None else position
+        raise ValueError(f"JSON inválido (caractere {position:,}): {message}")
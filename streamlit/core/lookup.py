@@ -0,0 +1,104 @@
+# Motor de PROCV (lookup) sobre índices de chave
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from .joins import KeyIndex
+
+LOOKUP_MODES = ('exact', 'approximate')
+DUPLICATE_POLICIES = ('first', 'last', 'error')
+
+
+class DuplicateKeys(Exception):
+    """A referência tem chaves repetidas e a política pede erro"""
+    pass
+
+
+@dataclass
+class LookupStats:
+    """Contagens e tempo de um PROCV"""
+    rows: int = 0
+    matched: int = 0
+    duplicate_keys: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def unmatched(self) -> int:
+        return self.rows - self.matched
+
+
+def lookup(source: KeyIndex, reference: KeyIndex, values: pd.DataFrame,
+           mode: str = 'exact', duplicates: str = 'first') -> Tuple[pd.DataFrame, LookupStats]:
+    """
+    Busca, para cada linha da origem, os `values` da linha correspondente da referência
+
+    `values` são as colunas a retornar, na ordem das linhas da referência.
+    Em `approximate` (como o PROCV com VERDADEIRO), a correspondência é a maior
+    chave menor ou igual ao valor buscado. Sem correspondência, o resultado é nulo.
+    """
+    if mode not in LOOKUP_MODES:
+        raise ValueError(f"Modo de busca inválido: {mode}")
+    if duplicates not in DUPLICATE_POLICIES:
+        raise ValueError(f"Política de duplicatas inválida: {duplicates}")
+
+    started = time.perf_counter()
+    if mode == 'approximate':
+        keys = _approximate_keys(source, reference)
+    else:
+        keys = reference.match(source)
+
+    # Estatísticas e validação calculadas por chave distinta, não por linha
+    found = keys >= 0
+    repeated = found & (reference.counts[np.maximum(keys, 0)] > 1) if reference.num_keys else found
+    stats = LookupStats(
+        rows=source.num_rows,
+        matched=int(source.counts[found].sum()),
+        duplicate_keys=int(repeated.sum())
+    )
+    if duplicates == 'error' and stats.duplicate_keys:
+        examples = ', '.join(str(key) for key in source.uniques[repeated][:5])
+        raise DuplicateKeys(
+            f"{stats.duplicate_keys:,} chave(s) buscada(s) aparecem mais de uma vez na referência (ex.: {examples})"
+        )
+
+    # Linha escolhida da referência para cada chave distinta da origem
+    if reference.num_keys:
+        safe_keys = np.maximum(keys, 0)
+        offsets = reference.offsets[safe_keys]
+        if duplicates == 'last':
+            offsets = offsets + reference.counts[safe_keys] - 1
+        rows = np.where(found, reference.order[offsets], -1)
+    else:
+        rows = np.full(len(keys), -1, dtype=np.int64)
+
+    row_per_source = rows[source.codes]
+    result = values.iloc[np.maximum(row_per_source, 0)].reset_index(drop=True) if len(values) else \
+        pd.DataFrame(index=range(source.num_rows), columns=values.columns)
+    missing = row_per_source < 0
+    if missing.any():
+        result = result.mask(pd.Series(missing), axis=0)
+
+    stats.elapsed = time.perf_counter() - started
+    return result, stats
+
+
+def _approximate_keys(source: KeyIndex, reference: KeyIndex) -> np.ndarray:
+    # Para cada chave da origem, a maior chave da referência <= valor buscado
+    if len(source.columns) != 1 or len(reference.columns) != 1:
+        raise ValueError("A busca aproximada exige uma única coluna chave")
+
+    sorted_keys, sorted_positions = reference.sorted_keys()
+    keys = np.full(source.num_keys, -1, dtype=np.int64)
+    valid = pd.notna(source.uniques)
+    if not len(sorted_keys) or not valid.any():
+        return keys
+
+    try:
+        slots = np.searchsorted(sorted_keys, np.asarray(source.uniques[valid]), side='right') - 1
+    except TypeError:
+        raise ValueError("As chaves da origem e da referência não são comparáveis (ex.: texto e número)")
+    keys[np.flatnonzero(valid)] = np.where(slots >= 0, sorted_positions[np.maximum(slots, 0)], -1)
+    return keys
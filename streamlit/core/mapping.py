@@ -0,0 +1,207 @@
+# Motor de DE/PARA (substituição de valores)
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class NormalizeOptions:
+    """Normalizações aplicadas aos textos antes de comparar com a coluna DE"""
+    case: bool = False
+    whitespace: bool = False
+    accents: bool = False
+
+    @property
+    def active(self) -> bool:
+        return self.case or self.whitespace or self.accents
+
+
+@dataclass
+class ReplacementStats:
+    """Substituições feitas em cada coluna"""
+    changes: Dict[str, int] = field(default_factory=dict)
+    distinct_values: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return sum(self.changes.values())
+
+
+def normalize_values(values: pd.Series, options: NormalizeOptions) -> pd.Series:
+    """Normaliza os textos de uma série (valores não textuais ficam como estão)"""
+    if not options.active:
+        return values
+
+    is_text = values.map(lambda value: isinstance(value, str), na_action='ignore').fillna(False).astype(bool)
+    if not is_text.any():
+        return values
+
+    text = values[is_text].astype(str)
+    if options.whitespace:
+        text = text.str.strip().str.replace(r'\s+', ' ', regex=True)
+    if options.accents:
+        text = text.str.normalize('NFKD').str.replace('[\u0300-\u036f]', '', regex=True)
+    if options.case:
+        text = text.str.casefold()
+
+    values = values.astype(object)
+    values[is_text] = text.astype(object)
+    return values
+
+
+class ReplacementMap:
+    """
+    Tabela DE/PARA compilada.
+
+    Os valores DE (normalizados) viram um índice hash consultado uma única vez
+    por valor distinto da coluna; as linhas só são tocadas para montar o
+    resultado. Com `regex`, cada DE é uma expressão regular aplicada em ordem.
+    """
+
+    def __init__(self, de: List[Any], para: List[Any], options: Optional[NormalizeOptions] = None,
+                 regex: bool = False):
+        self.options = options or NormalizeOptions()
+        self.regex = regex
+        self.size = len(de)
+
+        if regex:
+            flags = re.IGNORECASE if self.options.case else 0
+            self.rules: List[Tuple[re.Pattern, str]] = [
+                (re.compile(str(pattern), flags), str(replacement)) for pattern, replacement in zip(de, para)
+            ]
+            return
+
+        # Chaves repetidas: vale a última, como no dict(zip(...)) original
+        keys = normalize_values(pd.Series(list(de), dtype=object), self.options)
+        keep = ~keys.duplicated(keep='last').to_numpy()
+        self._keys = pd.Index(keys.to_numpy()[keep], dtype=object)
+        self._values = np.asarray(list(para), dtype=object)[keep]
+
+    def translate(self, values: pd.Series) -> pd.Series:
+        """Aplica o mapeamento a valores distintos (resultado alinhado a `values`)"""
+        values = values.astype(object)
+        if self.regex:
+            result = values.copy()
+            is_text = values.map(lambda value: isinstance(value, str), na_action='ignore').fillna(False).astype(bool)
+            text = normalize_values(values[is_text], NormalizeOptions(
+                whitespace=self.options.whitespace, accents=self.options.accents
+            ))
+            for pattern, replacement in self.rules:
+                text = text.map(lambda value: pattern.sub(replacement, value))
+            result[is_text] = text
+            return result
+
+        positions = self._keys.get_indexer(normalize_values(values, self.options))
+        found = positions >= 0
+        result = values.copy()
+        result[found] = self._values[positions[found]]
+        return result
+
+    def apply(self, df: pd.DataFrame, columns: List[str]) -> Tuple[pd.DataFrame, ReplacementStats]:
+        """
+        Aplica o mapeamento às colunas em uma passada: os valores distintos de
+        todas as colunas são traduzidos juntos e a contagem de alterações sai das
+        frequências de cada valor, sem comparar as colunas linha a linha
+        """
+        started = time.perf_counter()
+        stats = ReplacementStats()
+
+        factorized = {}
+        for column in columns:
+            series = df[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes, uniques = series.cat.codes.to_numpy(), pd.Series(series.cat.categories, dtype=object)
+            else:
+                codes, uniques = pd.factorize(series)
+                uniques = pd.Series(uniques, dtype=object)
+            factorized[column] = (codes, uniques)
+
+        # Tradução única sobre a união dos valores distintos
+        distinct = pd.Series(pd.unique(pd.concat([uniques for _, uniques in factorized.values()], ignore_index=True)),
+                             dtype=object)
+        translated = pd.Series(self.translate(distinct).to_numpy(), index=pd.Index(distinct, dtype=object))
+        stats.distinct_values = len(distinct)
+
+        result = {}
+        for column, (codes, uniques) in factorized.items():
+            new_uniques = translated.reindex(pd.Index(uniques, dtype=object)).to_numpy()
+            changed = ~((new_uniques == uniques.to_numpy()) | (pd.isna(new_uniques) & pd.isna(uniques.to_numpy())))
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            stats.changes[column] = int(counts[changed].sum())
+            if not stats.changes[column]:
+                continue
+
+            series = df[column]
+            values = np.append(new_uniques, np.nan)[np.where(codes >= 0, codes, len(new_uniques))]
+            new_series = pd.Series(values, index=series.index, name=column)
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                new_series = new_series.astype('category')
+            else:
+                new_series = new_series.infer_objects()
+            result[column] = new_series
+
+        stats.elapsed = time.perf_counter() - started
+        return pd.DataFrame(result, index=df.index), stats
+
+
+class ReplacementMapCache:
+    """
+    Mapeamentos compilados, indexados pelo conteúdo da tabela DE/PARA e pelas
+    opções; compartilhado por todas as sessões do servidor
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._maps: "OrderedDict[str, ReplacementMap]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, de: List[Any], para: List[Any], options: Optional[NormalizeOptions] = None,
+            regex: bool = False) -> ReplacementMap:
+        options = options or NormalizeOptions()
+        key = mapping_key(de, para, options, regex)
+        with self._lock:
+            if key in self._maps:
+                self.hits += 1
+                self._maps.move_to_end(key)
+                return self._maps[key]
+
+        compiled = ReplacementMap(de, para, options, regex)
+        with self._lock:
+            self.misses += 1
+            self._maps[key] = compiled
+            while len(self._maps) > self.max_entries:
+                self._maps.popitem(last=False)
+        return compiled
+
+
+def mapping_key(de: List[Any], para: List[Any], options: NormalizeOptions, regex: bool) -> str:
+    """Hash do conteúdo de uma tabela DE/PARA e das opções de comparação"""
+    pairs = pd.DataFrame({'de': pd.Series(list(de), dtype=object), 'para': pd.Series(list(para), dtype=object)})
+    # O tipo entra no hash: 1 e '1' são chaves diferentes
+    typed = pairs.map(lambda value: f"{type(value).__name__}:{value}")
+    digest = hashlib.sha256(pd.util.hash_pandas_object(typed, index=False).to_numpy().tobytes())
+    digest.update(repr((options, regex)).encode())
+    return digest.hexdigest()
+
+
+_cache: Optional[ReplacementMapCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_replacement_cache() -> ReplacementMapCache:
+    """Cache de mapeamentos do processo (único para todas as sessões)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReplacementMapCache()
+        return _cache
@@ -0,0 +1,88 @@
+# Orçamento de memória
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+MB = 1024 * 1024
+
+
+@dataclass
+class MemoryBudgetConfig:
+    """Limites de memória por sessão e para o processo inteiro"""
+    session_bytes: int = field(default_factory=lambda: int(os.environ.get('EXCEL_SESSION_MEMORY_MB', 1024)) * MB)
+    global_bytes: int = field(default_factory=lambda: int(os.environ.get('EXCEL_GLOBAL_MEMORY_MB', 4096)) * MB)
+
+
+class MemoryBudgetExceeded(Exception):
+    """Carga recusada por ultrapassar o orçamento de memória"""
+    pass
+
+
+class MemoryBudget:
+    """
+    Registro da memória residente de cada sessão, compartilhado por todas as
+    sessões do servidor. Cada sessão informa seu uso atual e consulta o
+    orçamento antes de carregar novos dados.
+    """
+
+    def __init__(self, config: Optional[MemoryBudgetConfig] = None):
+        self.config = config or MemoryBudgetConfig()
+        self._usage: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def report(self, session_id: str, nbytes: int) -> None:
+        """Atualiza a memória residente de uma sessão"""
+        with self._lock:
+            self._usage[session_id] = nbytes
+
+    def release(self, session_id: str) -> None:
+        with self._lock:
+            self._usage.pop(session_id, None)
+
+    def session_usage(self, session_id: str) -> int:
+        with self._lock:
+            return self._usage.get(session_id, 0)
+
+    def total_usage(self) -> int:
+        with self._lock:
+            return sum(self._usage.values())
+
+    def available(self, session_id: str) -> int:
+        """Quanto a sessão ainda pode alocar sem estourar nenhum dos limites"""
+        with self._lock:
+            session = self._usage.get(session_id, 0)
+            total = sum(self._usage.values())
+        return max(0, min(self.config.session_bytes - session, self.config.global_bytes - total))
+
+    def check(self, session_id: str, additional: int, description: str = "dados") -> None:
+        """Levanta MemoryBudgetExceeded se `additional` bytes não couberem no orçamento"""
+        with self._lock:
+            session = self._usage.get(session_id, 0)
+            total = sum(self._usage.values())
+
+        if session + additional > self.config.session_bytes:
+            raise MemoryBudgetExceeded(
+                f"Carregar {description} exigiria ~{additional / MB:.1f} MB, mas esta sessão já usa "
+                f"{session / MB:.1f} MB de um limite de {self.config.session_bytes / MB:.0f} MB. "
+                f"Remova tabelas que não estão em uso e tente novamente."
+            )
+        if total + additional > self.config.global_bytes:
+            raise MemoryBudgetExceeded(
+                f"Carregar {description} exigiria ~{additional / MB:.1f} MB, mas o servidor já usa "
+                f"{total / MB:.0f} MB de um limite global de {self.config.global_bytes / MB:.0f} MB. "
+                f"Tente novamente mais tarde ou com um arquivo menor."
+            )
+
+
+_budget: Optional[MemoryBudget] = None
+_budget_lock = threading.Lock()
+
+
+def get_memory_budget() -> MemoryBudget:
+    """Orçamento de memória do processo (único para todas as sessões)"""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = MemoryBudget()
+        return _budget
@@ -0,0 +1,709 @@
+# Pipelines de operações: plano lazy, otimização e execução em blocos
+import json
+import time
+import operator
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Any, Optional, Tuple, Callable, Iterator, Iterable, Set, ClassVar
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import GroupAggregator
+from .expressions import ExpressionError, parse_formulas, evaluate_formulas
+from .joins import JOIN_TYPES, KeyIndex, key_frame, hash_join, _as_nullable
+from .lookup import lookup
+
+# Condições de filtro: operador -> rótulo (como na tela)
+FILTER_OPS = {
+    '==': 'igual a',
+    '!=': 'diferente de',
+    '>': 'maior que',
+    '>=': 'maior ou igual a',
+    '<': 'menor que',
+    '<=': 'menor ou igual a',
+    'contains': 'contém',
+    'in': 'está em',
+    'isnull': 'está vazio',
+    'notnull': 'não está vazio',
+}
+
+_COMPARE = {
+    '==': operator.eq, '!=': operator.ne, '>': operator.gt,
+    '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+}
+
+# Linhas lidas por bloco na execução de um pipeline
+PIPELINE_BATCH_ROWS = 200_000
+
+
+# Etapas ---------------------------------------------------------------------
+
+@dataclass
+class FilterStep:
+    """Mantém as linhas em que `column <op> value`"""
+    column: str
+    op: str = '=='
+    value: Any = None
+    kind: ClassVar[str] = 'filter'
+
+    def describe(self) -> str:
+        if self.op in ('isnull', 'notnull'):
+            return f"Filtro: {self.column} {FILTER_OPS[self.op]}"
+        return f"Filtro: {self.column} {FILTER_OPS.get(self.op, self.op)} {self.value!r}"
+
+
+@dataclass
+class JoinStep:
+    """JOIN da tabela corrente (esquerda) com `table`"""
+    table: str
+    left_on: List[str]
+    right_on: List[str]
+    how: str = 'left'
+    kind: ClassVar[str] = 'join'
+
+    def describe(self) -> str:
+        return f"JOIN {self.how.upper()} com '{self.table}' ({', '.join(self.left_on)} = {', '.join(self.right_on)})"
+
+
+@dataclass
+class LookupStep:
+    """PROCV: traz `value_columns` de `table`; com várias colunas, cada uma vira '<new_column>_<coluna>'"""
+    table: str
+    lookup_columns: List[str]
+    reference_columns: List[str]
+    value_columns: List[str]
+    new_column: str
+    mode: str = 'exact'
+    duplicates: str = 'first'
+    kind: ClassVar[str] = 'lookup'
+
+    def outputs(self) -> List[Tuple[str, str]]:
+        """Pares (coluna da referência, coluna criada), como no PROCV do editor"""
+        if len(self.value_columns) == 1:
+            return [(self.value_columns[0], self.new_column)]
+        return [(column, f"{self.new_column}_{column}") for column in self.value_columns]
+
+    def describe(self) -> str:
+        return f"PROCV em '{self.table}' ({', '.join(self.lookup_columns)}) → {', '.join(o for _, o in self.outputs())}"
+
+
+@dataclass
+class FormulaStep:
+    """Lote de fórmulas `Nova_Coluna = expressão`"""
+    text: str
+    kind: ClassVar[str] = 'formula'
+
+    def formulas(self) -> List[Tuple[str, Any]]:
+        return parse_formulas(self.text)
+
+    def describe(self) -> str:
+        return f"Fórmulas: {', '.join(name for name, _ in self.formulas())}"
+
+
+@dataclass
+class SelectStep:
+    """Mantém apenas (e nesta ordem) as colunas escolhidas"""
+    columns: List[str]
+    kind: ClassVar[str] = 'select'
+
+    def describe(self) -> str:
+        return f"Selecionar: {', '.join(self.columns)}"
+
+
+@dataclass
+class GroupStep:
+    """Agrupamento / tabela dinâmica (sempre a última etapa)"""
+    keys: List[str]
+    aggregations: List[Tuple[str, str]]
+    pivot: Optional[str] = None
+    kind: ClassVar[str] = 'group'
+
+    def __post_init__(self):
+        # Do JSON as agregações chegam como listas
+        self.aggregations = [tuple(item) for item in self.aggregations]
+
+    def describe(self) -> str:
+        aggregations = ', '.join(f"{func}({column})" for column, func in self.aggregations)
+        return f"Agrupar por {', '.join(self.keys)}" + (f" × {self.pivot}" if self.pivot else "") + f": {aggregations}"
+
+
+STEP_TYPES = {step.kind: step for step in (FilterStep, JoinStep, LookupStep, FormulaStep, SelectStep, GroupStep)}
+
+
+def step_to_dict(step: Any) -> Dict[str, Any]:
+    return {'kind': step.kind, **asdict(step)}
+
+
+def step_from_dict(data: Dict[str, Any]) -> Any:
+    data = dict(data)
+    kind = data.pop('kind', None)
+    if kind not in STEP_TYPES:
+        raise ValueError(f"Tipo de etapa desconhecido: {kind}")
+    try:
+        return STEP_TYPES[kind](**data)
+    except TypeError as e:
+        raise ValueError(f"Etapa '{kind}' inválida: {e}")
+
+
+@dataclass
+class Pipeline:
+    """
+    Sequência de etapas sobre a tabela `source`, guardada sem executar
+
+    Salvo como JSON (`to_json`), pode ser executado de novo sobre outros
+    arquivos com as mesmas colunas: `bind` troca as tabelas usadas.
+    """
+    source: str
+    steps: List[Any] = field(default_factory=list)
+
+    def tables(self) -> List[str]:
+        """Tabelas usadas: a de origem e as de JOIN/PROCV"""
+        names = [self.source] + [step.table for step in self.steps if isinstance(step, (JoinStep, LookupStep))]
+        return list(dict.fromkeys(names))
+
+    def bind(self, tables: Dict[str, str]) -> "Pipeline":
+        """Cópia do pipeline com as tabelas trocadas (nome antigo -> novo)"""
+        steps = []
+        for step in self.steps:
+            data = step_to_dict(step)
+            if 'table' in data:
+                data['table'] = tables.get(data['table'], data['table'])
+            steps.append(step_from_dict(data))
+        return Pipeline(tables.get(self.source, self.source), steps)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'source': self.source, 'steps': [step_to_dict(step) for step in self.steps]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Pipeline":
+        if not isinstance(data, dict) or 'source' not in data:
+            raise ValueError("Pipeline inválido: informe a tabela de origem")
+        return cls(data['source'], [step_from_dict(step) for step in data.get('steps', [])])
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2, default=str)
+
+    @classmethod
+    def from_json(cls, text: str) -> "Pipeline":
+        try:
+            return cls.from_dict(json.loads(text))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Arquivo de pipeline inválido: {e}")
+
+
+# Esquema (colunas) após cada etapa -----------------------------------------
+
+def join_columns(left: List[str], right: List[str], left_on: List[str],
+                 right_on: List[str]) -> Tuple[List[str], Dict[str, Tuple[str, str]]]:
+    """
+    Colunas do resultado de um JOIN (mesmos nomes do pd.merge) e a origem de
+    cada uma: coluna -> ('left' | 'right', nome na tabela de origem)
+    """
+    shared = {l for l, r in zip(left_on, right_on) if l == r}
+    overlap = (set(left) & set(right)) - shared
+    origin: Dict[str, Tuple[str, str]] = {}
+    for column in left:
+        origin[f"{column}_x" if column in overlap else column] = ('left', column)
+    for column in right:
+        if column not in shared:
+            origin[f"{column}_y" if column in overlap else column] = ('right', column)
+    return list(origin), origin
+
+
+def step_columns(columns: List[str], step: Any, schemas: Dict[str, List[str]]) -> List[str]:
+    """Colunas depois da etapa; levanta ValueError se ela usa uma coluna inexistente"""
+    available = set(columns)
+
+    def require(names: Iterable[str], among: Iterable[str]) -> None:
+        missing = [name for name in names if name not in set(among)]
+        if missing:
+            raise ValueError(f"{step.describe()}: coluna(s) inexistente(s): {', '.join(map(str, missing))}")
+
+    if isinstance(step, FilterStep):
+        if step.op not in FILTER_OPS:
+            raise ValueError(f"Condição de filtro inválida: {step.op}")
+        require([step.column], available)
+        return columns
+    if isinstance(step, SelectStep):
+        if not step.columns:
+            raise ValueError("Selecione ao menos uma coluna")
+        require(step.columns, available)
+        return list(dict.fromkeys(step.columns))
+    if isinstance(step, FormulaStep):
+        formulas = step.formulas()
+        if not formulas:
+            raise ExpressionError("Nenhuma fórmula informada")
+        created = list(columns)
+        for name, expression in formulas:
+            missing = [column for column in expression.columns if column not in created]
+            if missing:
+                raise ValueError(f"Fórmula '{name}': coluna(s) inexistente(s): {', '.join(missing)}")
+            if name not in created:
+                created.append(name)
+        return created
+
+    if isinstance(step, GroupStep):
+        if not step.keys or not step.aggregations:
+            raise ValueError("Selecione as colunas de agrupamento, os valores e as agregações.")
+        require(step.keys + ([step.pivot] if step.pivot else []) + [c for c, _ in step.aggregations], available)
+        return []
+
+    if step.table not in schemas:
+        raise ValueError(f"Tabela '{step.table}' não encontrada")
+    if isinstance(step, JoinStep):
+        if step.how not in JOIN_TYPES:
+            raise ValueError(f"Tipo de JOIN inválido: {step.how}")
+        if not step.left_on or len(step.left_on) != len(step.right_on):
+            raise ValueError("Selecione o mesmo número de colunas chave dos dois lados.")
+        require(step.left_on, available)
+        require(step.right_on, schemas[step.table])
+        return join_columns(columns, schemas[step.table], step.left_on, step.right_on)[0]
+    if isinstance(step, LookupStep):
+        if not (step.lookup_columns and step.value_columns and step.new_column):
+            raise ValueError("Informe as colunas de busca, as chaves da referência, os valores e o nome da nova coluna")
+        if len(step.lookup_columns) != len(step.reference_columns):
+            raise ValueError("Selecione o mesmo número de colunas chave na origem e na referência")
+        require(step.lookup_columns, available)
+        require(step.reference_columns + step.value_columns, schemas[step.table])
+        return columns + [name for _, name in step.outputs() if name not in available]
+    raise ValueError(f"Etapa desconhecida: {step!r}")
+
+
+def validate(pipeline: Pipeline, schemas: Dict[str, List[str]]) -> List[List[str]]:
+    """Confere as colunas de cada etapa; retorna as colunas antes de cada etapa e a final"""
+    if pipeline.source not in schemas:
+        raise ValueError(f"Tabela '{pipeline.source}' não encontrada")
+    columns = list(schemas[pipeline.source])
+    history = [columns]
+    for number, step in enumerate(pipeline.steps, start=1):
+        if isinstance(step, GroupStep) and number != len(pipeline.steps):
+            raise ValueError("O agrupamento precisa ser a última etapa do pipeline")
+        columns = step_columns(columns, step, schemas)
+        history.append(columns)
+    return history
+
+
+# Plano físico ----------------------------------------------------------------
+
+@dataclass
+class Scan:
+    """Leitura de uma tabela: só as colunas necessárias, com os filtros aplicados a cada bloco"""
+    table: str
+    columns: Optional[List[str]] = None
+    filters: List[FilterStep] = field(default_factory=list)
+
+    def read_columns(self) -> Optional[List[str]]:
+        if self.columns is None:
+            return None
+        return list(dict.fromkeys(self.columns + [f.column for f in self.filters]))
+
+    def describe(self) -> str:
+        text = f"Ler '{self.table}'"
+        text += f" ({len(self.columns)} coluna(s))" if self.columns is not None else " (todas as colunas)"
+        if self.filters:
+            text += " com " + "; ".join(f.describe().replace("Filtro: ", "") for f in self.filters)
+        return text
+
+
+@dataclass
+class FusedLookup:
+    """Um ou mais PROCVs na mesma referência e chaves, feitos com um único índice"""
+    table: str
+    lookup_columns: List[str]
+    reference_columns: List[str]
+    mode: str
+    duplicates: str
+    outputs: List[Tuple[str, str]]
+
+    def describe(self) -> str:
+        return f"PROCV em '{self.table}' ({', '.join(self.lookup_columns)}) → {', '.join(o for _, o in self.outputs)}"
+
+
+@dataclass
+class PlanNode:
+    """Etapa do plano físico; `scan` é a leitura do lado direito (JOIN/PROCV)"""
+    step: Any
+    scan: Optional[Scan] = None
+    # Colunas mantidas antes da etapa (poda antes de JOINs)
+    keep: Optional[List[str]] = None
+    # Colunas que chegam à etapa (antes da poda)
+    columns: Optional[List[str]] = None
+
+    def describe(self) -> str:
+        text = self.step.describe()
+        if self.scan is not None and (self.scan.filters or self.scan.columns is not None):
+            text += f" — {self.scan.describe()}"
+        return text
+
+
+@dataclass
+class QueryPlan:
+    """Plano otimizado: leitura da origem, etapas e as otimizações aplicadas"""
+    source: Scan
+    nodes: List[PlanNode]
+    notes: List[str] = field(default_factory=list)
+
+    def explain(self) -> List[str]:
+        return [self.source.describe()] + [node.describe() for node in self.nodes]
+
+
+def optimize(pipeline: Pipeline, schemas: Dict[str, List[str]]) -> QueryPlan:
+    """
+    Monta o plano físico do pipeline:
+
+    - filtros descem até a leitura das tabelas (antes de JOINs, PROCVs e
+      fórmulas que não criam a coluna filtrada); filtros sobre colunas da
+      direita de um JOIN INNER/RIGHT vão para a leitura da tabela da direita
+    - PROCVs seguidos na mesma referência e chaves viram uma só busca
+    - cada tabela é lida apenas com as colunas usadas até o fim do pipeline
+    """
+    validate(pipeline, schemas)
+    notes: List[str] = []
+    steps = list(pipeline.steps)
+    source = Scan(pipeline.source)
+    right_scans: Dict[int, Scan] = {
+        id(step): Scan(step.table) for step in steps if isinstance(step, (JoinStep, LookupStep))
+    }
+
+    # 1. Filtros o mais cedo possível
+    for original in [step for step in steps if isinstance(step, FilterStep)]:
+        position = next(i for i, step in enumerate(steps) if step is original)
+        current = original
+        while True:
+            if position == 0:
+                steps.pop(0)
+                source.filters.append(current)
+                notes.append(f"{current.describe()} aplicado na leitura de '{pipeline.source}'")
+                break
+            previous = steps[position - 1]
+            if isinstance(previous, (FilterStep, SelectStep)):
+                movable = True
+            elif isinstance(previous, (FormulaStep, LookupStep)):
+                movable = current.column in validate(Pipeline(pipeline.source, steps[:position - 1]), schemas)[-1]
+                movable = movable and current.column not in (
+                    [name for name, _ in previous.formulas()] if isinstance(previous, FormulaStep)
+                    else [name for _, name in previous.outputs()]
+                )
+            elif isinstance(previous, JoinStep):
+                left = validate(Pipeline(pipeline.source, steps[:position - 1]), schemas)[-1]
+                side, name = join_columns(left, schemas[previous.table], previous.left_on, previous.right_on)[1][current.column]
+                if side == 'right' and previous.how in ('inner', 'right'):
+                    steps.pop(position)
+                    right_scans[id(previous)].filters.append(FilterStep(name, current.op, current.value))
+                    notes.append(f"{current.describe()} aplicado na leitura de '{previous.table}', antes do JOIN")
+                    break
+                movable = side == 'left' and previous.how in ('inner', 'left')
+                if movable and name != current.column:
+                    current = FilterStep(name, current.op, current.value)
+            else:
+                movable = False
+
+            if not movable:
+                if current is not original:
+                    steps[position] = current
+                break
+            steps[position] = previous
+            steps[position - 1] = current
+            position -= 1
+
+    # 2. PROCVs fundidos
+    nodes: List[PlanNode] = []
+    for step in steps:
+        if isinstance(step, LookupStep):
+            last = nodes[-1].step if nodes else None
+            if (isinstance(last, FusedLookup) and last.table == step.table
+                    and last.lookup_columns == step.lookup_columns
+                    and last.reference_columns == step.reference_columns
+                    and (last.mode, last.duplicates) == (step.mode, step.duplicates)
+                    and not set(step.lookup_columns) & {name for _, name in last.outputs}):
+                last.outputs.extend(step.outputs())
+                notes.append(f"PROCVs em '{step.table}' ({', '.join(step.lookup_columns)}) feitos com um único índice")
+                continue
+            fused = FusedLookup(step.table, list(step.lookup_columns), list(step.reference_columns),
+                                step.mode, step.duplicates, step.outputs())
+            nodes.append(PlanNode(fused, right_scans[id(step)]))
+        elif isinstance(step, JoinStep):
+            nodes.append(PlanNode(step, right_scans[id(step)]))
+        else:
+            nodes.append(PlanNode(step))
+
+    # 3. Poda de colunas (de trás para frente)
+    inputs = [list(schemas[pipeline.source])]
+    for node in nodes:
+        node.columns = inputs[-1]
+        inputs.append(_node_columns(inputs[-1], node, schemas))
+
+    required: Optional[Set[str]] = None
+    for index in range(len(nodes) - 1, -1, -1):
+        node, columns = nodes[index], inputs[index]
+        step = node.step
+        if isinstance(step, GroupStep):
+            required = set(step.keys + ([step.pivot] if step.pivot else []) + [c for c, _ in step.aggregations])
+        elif isinstance(step, SelectStep):
+            required = set(step.columns)
+        elif isinstance(step, FilterStep):
+            if required is not None:
+                required = required | {step.column}
+        elif isinstance(step, FormulaStep):
+            if required is not None:
+                formulas = step.formulas()
+                created = {name for name, _ in formulas}
+                used = {column for _, expression in formulas for column in expression.columns}
+                required = (required - created) | (used & set(columns))
+        elif isinstance(step, FusedLookup):
+            if required is not None:
+                kept = [(value, name) for value, name in step.outputs if name in required]
+                if len(kept) < len(step.outputs):
+                    dropped = [name for _, name in step.outputs if name not in required]
+                    notes.append(f"PROCV de {', '.join(dropped)} descartado (coluna não usada no resultado)")
+                    step.outputs = kept
+                required = (required - {name for _, name in step.outputs}) | set(step.lookup_columns)
+            node.scan.columns = list(dict.fromkeys(step.reference_columns + [value for value, _ in step.outputs]))
+        elif isinstance(step, JoinStep):
+            right = schemas[step.table]
+            _, origin = join_columns(columns, right, step.left_on, step.right_on)
+            if required is None:
+                continue
+            needed = {'left': set(step.left_on), 'right': set(step.right_on)}
+            for column in required:
+                side, name = origin[column]
+                needed[side].add(name)
+            # Colunas com o mesmo nome dos dois lados são mantidas juntas (os sufixos _x/_y dependem disso)
+            shared = {l for l, r in zip(step.left_on, step.right_on) if l == r}
+            for column in (set(columns) & set(right)) - shared:
+                if column in needed['left'] or column in needed['right']:
+                    needed['left'].add(column)
+                    needed['right'].add(column)
+            node.keep = [column for column in columns if column in needed['left']]
+            node.scan.columns = [column for column in right if column in needed['right']]
+            required = needed['left']
+
+    nodes = [node for node in nodes if not (isinstance(node.step, FusedLookup) and not node.step.outputs)]
+    if required is not None:
+        source.columns = [column for column in schemas[pipeline.source] if column in required]
+    for scan in [source] + [node.scan for node in nodes if node.scan is not None]:
+        total = len(schemas[scan.table])
+        if scan.columns is not None and len(scan.columns) < total:
+            notes.append(f"'{scan.table}': lidas {len(scan.columns)} de {total} colunas")
+    return QueryPlan(source, nodes, notes)
+
+
+def _node_columns(columns: List[str], node: PlanNode, schemas: Dict[str, List[str]]) -> List[str]:
+    if isinstance(node.step, FusedLookup):
+        return columns + [name for _, name in node.step.outputs if name not in columns]
+    return step_columns(columns, node.step, schemas)
+
+
+# Execução --------------------------------------------------------------------
+
+@dataclass
+class StepTiming:
+    """Tempo e linhas produzidas por uma etapa do plano"""
+    description: str
+    rows: int = 0
+    elapsed: float = 0.0
+
+
+@dataclass
+class PlanStats:
+    """Tempos por etapa de uma execução do pipeline"""
+    steps: List[StepTiming] = field(default_factory=list)
+    rows: int = 0
+    elapsed: float = 0.0
+
+
+def filter_frame(df: pd.DataFrame, filters: List[FilterStep]) -> pd.DataFrame:
+    """Aplica os filtros (E) e renumera as linhas"""
+    if not filters:
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    for step in filters:
+        mask &= _filter_mask(df[step.column], step)
+    return df[mask].reset_index(drop=True)
+
+
+def _filter_mask(series: pd.Series, step: FilterStep) -> np.ndarray:
+    if step.op == 'isnull':
+        return series.isna().to_numpy()
+    if step.op == 'notnull':
+        return series.notna().to_numpy()
+    if step.op == 'contains':
+        return series.astype(str).str.contains(str(step.value), case=False, regex=False, na=False).to_numpy(bool)
+    if step.op == 'in':
+        values = step.value if isinstance(step.value, (list, tuple)) else str(step.value).split(',')
+        return series.isin([_coerce(series, value) for value in values]).to_numpy()
+    result = _COMPARE[step.op](series, _coerce(series, step.value))
+    return result.fillna(False).to_numpy(bool) if hasattr(result, 'fillna') else np.asarray(result, dtype=bool)
+
+
+def _coerce(series: pd.Series, value: Any) -> Any:
+    # Valores digitados (texto) comparados no tipo da coluna
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            if pd.api.types.is_bool_dtype(series.dtype):
+                return value.lower() in ('true', 'verdadeiro', 'sim', '1')
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                return float(value.replace(',', '.'))
+            if pd.api.types.is_datetime64_any_dtype(series.dtype):
+                return pd.Timestamp(value)
+        except ValueError:
+            raise ValueError(f"Valor '{value}' não é compatível com a coluna '{series.name}' ({series.dtype})")
+    return value
+
+
+def execute(plan: QueryPlan, read: Callable[[str, Optional[List[str]]], Iterator[pd.DataFrame]],
+            sink: Callable[[Iterator[pd.DataFrame]], Any],
+            progress: Optional[Callable[[int], None]] = None) -> Tuple[Any, PlanStats]:
+    """
+    Executa o plano lendo a origem em blocos: filtros, PROCVs, fórmulas e
+    JOINs INNER/LEFT são aplicados bloco a bloco, sem tabelas intermediárias.
+    JOINs RIGHT/OUTER juntam os blocos antes de executar.
+
+    `read(tabela, colunas)` percorre a tabela em blocos; `sink` recebe os
+    blocos do resultado (ex.: DatasetStore.put_chunks) ou, com agrupamento no
+    fim, um iterador com a tabela agrupada. `progress` recebe as linhas lidas
+    da origem.
+    """
+    started = time.perf_counter()
+    stats = PlanStats()
+    scan_timing = StepTiming(plan.source.describe())
+    stats.steps.append(scan_timing)
+
+    def scanned() -> Iterator[pd.DataFrame]:
+        rows = 0
+        batches = iter(read(plan.source.table, plan.source.read_columns()))
+        while True:
+            step_started = time.perf_counter()
+            batch = next(batches, None)
+            if batch is None:
+                break
+            rows += len(batch)
+            batch = filter_frame(batch.reset_index(drop=True), plan.source.filters)
+            if plan.source.columns is not None:
+                batch = batch[plan.source.columns]
+            scan_timing.elapsed += time.perf_counter() - step_started
+            scan_timing.rows += len(batch)
+            if progress:
+                progress(rows)
+            yield batch
+
+    stream: Iterator[pd.DataFrame] = scanned()
+    group = None
+    for node in plan.nodes:
+        timing = StepTiming(node.describe())
+        stats.steps.append(timing)
+        if isinstance(node.step, GroupStep):
+            group = (node.step, timing)
+            break
+        stream = _apply(node, stream, read, timing)
+
+    if group is not None:
+        step, timing = group
+        aggregator = GroupAggregator(step.keys, step.aggregations, step.pivot)
+        for batch in stream:
+            step_started = time.perf_counter()
+            aggregator.update(batch)
+            timing.elapsed += time.perf_counter() - step_started
+        step_started = time.perf_counter()
+        grouped = aggregator.result()
+        timing.elapsed += time.perf_counter() - step_started
+        timing.rows = len(grouped)
+        stream = iter([grouped])
+
+    def counted(batches: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        produced = False
+        for batch in batches:
+            # Blocos vazios só são úteis para manter as colunas de um resultado vazio
+            if len(batch) or not produced:
+                produced = True
+                stats.rows += len(batch)
+                yield batch
+
+    result = sink(counted(stream))
+    stats.elapsed = time.perf_counter() - started
+    return result, stats
+
+
+def _read_all(read: Callable, scan: Scan) -> pd.DataFrame:
+    batches = [filter_frame(batch.reset_index(drop=True), scan.filters)
+               for batch in read(scan.table, scan.read_columns())]
+    df = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame(columns=scan.read_columns())
+    return df[scan.columns] if scan.columns is not None else df
+
+
+def _apply(node: PlanNode, stream: Iterator[pd.DataFrame], read: Callable, timing: StepTiming) -> Iterator[pd.DataFrame]:
+    """Aplica a etapa a cada bloco, contando apenas o tempo da própria etapa"""
+    step = node.step
+
+    if isinstance(step, JoinStep) and step.how in ('right', 'outer'):
+        # Linhas da direita sem correspondência só são conhecidas no fim: junta a esquerda
+        def joined() -> Iterator[pd.DataFrame]:
+            batches = list(stream)
+            # Origem sem linhas não produz blocos: a esquerda é vazia, com as colunas da etapa
+            left = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame(columns=node.columns)
+            step_started = time.perf_counter()
+            if node.keep is not None:
+                left = left[node.keep]
+            result, _ = hash_join(left, _read_all(read, node.scan), step.left_on, step.right_on, how=step.how)
+            timing.elapsed += time.perf_counter() - step_started
+            timing.rows += len(result)
+            yield result
+        return joined()
+
+    state: Dict[str, Any] = {}
+
+    def prepare() -> None:
+        # Lado direito lido (e indexado) uma vez, no primeiro bloco
+        if isinstance(step, JoinStep):
+            right = _read_all(read, node.scan)
+            shared = [l for l, r in zip(step.left_on, step.right_on) if l == r]
+            # Na esquerda, blocos com e sem correspondência precisam dos mesmos tipos
+            state['right'] = _as_nullable(right, shared) if step.how == 'left' else right
+            state['index'] = KeyIndex(key_frame(right, step.right_on))
+        elif isinstance(step, FusedLookup):
+            reference = _read_all(read, node.scan)
+            state['index'] = KeyIndex(key_frame(reference, step.reference_columns))
+            state['values'] = reference[[value for value, _ in step.outputs]]
+        elif isinstance(step, FormulaStep):
+            state['formulas'] = step.formulas()
+
+    def transform(batch: pd.DataFrame) -> pd.DataFrame:
+        if isinstance(step, FilterStep):
+            return filter_frame(batch, [step])
+        if isinstance(step, SelectStep):
+            return batch[list(dict.fromkeys(step.columns))]
+        if isinstance(step, FormulaStep):
+            results, _ = evaluate_formulas(batch, state['formulas'])
+            batch = batch.copy(deep=False)
+            for column in results.columns:
+                batch[column] = results[column]
+            return batch
+        if isinstance(step, FusedLookup):
+            found, _ = lookup(KeyIndex(key_frame(batch, step.lookup_columns)), state['index'],
+                              state['values'], mode=step.mode, duplicates=step.duplicates)
+            batch = batch.copy(deep=False)
+            for position, (_, name) in enumerate(step.outputs):
+                batch[name] = found.iloc[:, position].to_numpy()
+            return batch
+        if isinstance(step, JoinStep):
+            if node.keep is not None:
+                batch = batch[node.keep]
+            right, index = state['right'], state['index']
+            # Apenas as linhas da direita com chaves presentes no bloco entram no merge
+            keys = index.match(KeyIndex(key_frame(batch, step.left_on)))
+            part = right.iloc[index.rows(keys[keys >= 0])]
+            return pd.merge(batch, part, how=step.how, left_on=step.left_on, right_on=step.right_on,
+                            suffixes=('_x', '_y'))
+        raise ValueError(f"Etapa desconhecida: {step!r}")
+
+    def applied() -> Iterator[pd.DataFrame]:
+        for batch in stream:
+            step_started = time.perf_counter()
+            if not state:
+                prepare()
+            batch = transform(batch)
+            timing.elapsed += time.perf_counter() - step_started
+            timing.rows += len(batch)
+            yield batch
+    return applied()
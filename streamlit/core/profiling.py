@@ -0,0 +1,334 @@
+# Perfil de colunas (estatísticas por versão do dataset)
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Callable
+
+import numpy as np
+import pandas as pd
+
+_HLL_BITS = 12
+_HLL_REGISTERS = 1 << _HLL_BITS
+
+
+class HyperLogLog:
+    """Contagem aproximada de valores distintos (~1,6% de erro), mesclável"""
+
+    def __init__(self):
+        self.registers = np.zeros(_HLL_REGISTERS, dtype=np.uint8)
+
+    def update(self, values: Any) -> None:
+        if not len(values):
+            return
+        hashes = pd.util.hash_array(np.asarray(values))
+        buckets = (hashes >> np.uint64(64 - _HLL_BITS)).astype(np.int64)
+        rest = (hashes << np.uint64(_HLL_BITS)) >> np.uint64(_HLL_BITS)
+        # Posição do primeiro bit 1 nos bits restantes
+        bit_length = np.zeros(len(rest), dtype=np.int64)
+        nonzero = rest > 0
+        bit_length[nonzero] = np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.int64) + 1
+        ranks = (64 - _HLL_BITS - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = float(_HLL_REGISTERS)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Correção para cardinalidades pequenas (linear counting)
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+
+class TopK:
+    """
+    Valores mais frequentes por contadores limitados (Space-Saving simplificado)
+    Enquanto nenhum contador for descartado, as contagens são exatas
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='int64')
+        self.error = 0
+
+    @property
+    def exact(self) -> bool:
+        return self.error == 0
+
+    def update(self, counts: pd.Series) -> None:
+        if counts.empty:
+            return
+        # Cada lado é podado antes de somar: a junção nunca passa de 2 × capacidade
+        counts = self._trim(counts)
+        if self.counts.empty:
+            merged = counts.astype('int64')
+        else:
+            merged = pd.concat([self.counts, counts]).groupby(level=0, sort=False).sum().astype('int64')
+        self.counts = self._trim(merged)
+
+    def _trim(self, counts: pd.Series) -> pd.Series:
+        if len(counts) <= self.capacity:
+            return counts
+        counts = counts.sort_values(ascending=False, kind='stable')
+        # Limite de erro: contagem máxima que um valor descartado pode ter perdido
+        self.error += int(counts.iloc[self.capacity])
+        return counts.iloc[:self.capacity]
+
+    def merge(self, other: "TopK") -> None:
+        self.update(other.counts)
+        self.error = max(self.error, other.error)
+
+    def top(self, k: int = 10) -> pd.Series:
+        return self.counts.sort_values(ascending=False, kind='stable').head(k)
+
+
+@dataclass
+class ColumnProfile:
+    """Resumo de uma coluna, calculado em blocos e mesclável"""
+    name: str
+    dtype: str
+    kind: str
+    rows: int = 0
+    nulls: int = 0
+    minimum: Any = None
+    maximum: Any = None
+    mean: float = 0.0
+    m2: float = 0.0
+    sample: np.ndarray = field(default_factory=lambda: np.empty(0))
+    sample_size: int = 50_000
+    distinct_sketch: HyperLogLog = field(default_factory=HyperLogLog)
+    top_values: TopK = field(default_factory=TopK)
+
+    @property
+    def count(self) -> int:
+        return self.rows - self.nulls
+
+    @property
+    def distinct(self) -> int:
+        # Contadores exatos valem mais que a estimativa enquanto nada foi descartado
+        if self.top_values.exact:
+            return len(self.top_values.counts)
+        return self.distinct_sketch.estimate()
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else float('nan')
+
+    @property
+    def quantiles_exact(self) -> bool:
+        return len(self.sample) >= self.count
+
+    def quantiles(self, points: List[float] = (0.25, 0.5, 0.75)) -> Dict[float, float]:
+        """Quantis (exatos até `sample_size` valores; acima disso, de uma amostra uniforme)"""
+        if self.kind != 'numeric' or not len(self.sample):
+            return {}
+        values = np.quantile(self.sample, points)
+        return dict(zip(points, values.tolist()))
+
+    def describe(self) -> pd.Series:
+        """Equivalente ao Series.describe() a partir do perfil"""
+        if self.kind != 'numeric':
+            top = self.top_values.top(1)
+            return pd.Series({
+                'count': self.count, 'unique': self.distinct,
+                'top': top.index[0] if len(top) else None, 'freq': int(top.iloc[0]) if len(top) else None
+            }, name=self.name)
+        quantiles = self.quantiles()
+        return pd.Series({
+            'count': float(self.count), 'mean': self.mean if self.count else float('nan'), 'std': self.std,
+            'min': self.minimum, '25%': quantiles.get(0.25), '50%': quantiles.get(0.5),
+            '75%': quantiles.get(0.75), 'max': self.maximum
+        }, name=self.name)
+
+    def update(self, series: pd.Series) -> None:
+        """Incorpora um bloco de valores"""
+        self.rows += len(series)
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+
+        # Valores repetidos não mudam o sketch: basta passar os distintos do bloco
+        counts = values.value_counts(sort=False)
+        counts = counts[counts > 0]  # categorias sem ocorrência
+        self.distinct_sketch.update(counts.index)
+        self.top_values.update(counts)
+
+        if self.kind == 'numeric':
+            numbers = values.to_numpy(dtype=np.float64)
+            self._merge_moments(len(numbers), float(numbers.mean()), float(((numbers - numbers.mean()) ** 2).sum()))
+            self._merge_sample(numbers, len(numbers))
+
+        self._merge_bounds(*self._bounds(values))
+
+    def merge(self, other: "ColumnProfile") -> None:
+        """Mescla o perfil de outras linhas da mesma coluna (ex.: linhas adicionadas)"""
+        count = other.count
+        self.rows += other.rows
+        self.nulls += other.nulls
+        if not count:
+            return
+        self.distinct_sketch.merge(other.distinct_sketch)
+        self.top_values.merge(other.top_values)
+        if self.kind == 'numeric':
+            self._merge_moments(count, other.mean, other.m2)
+            self._merge_sample(other.sample, count)
+        self._merge_bounds(other.minimum, other.maximum)
+
+    # Internos --------------------------------------------------------------
+
+    def _merge_moments(self, count: int, mean: float, m2: float) -> None:
+        # Combinação de médias e variâncias em paralelo (Chan et al.)
+        previous = self.count - count
+        total = previous + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * previous * count / total
+
+    def _merge_sample(self, values: np.ndarray, population: int) -> None:
+        # Amostra uniforme: cada lado contribui proporcionalmente à sua população
+        previous = self.count - population
+        combined = np.concatenate([self.sample, values])
+        if len(combined) <= self.sample_size:
+            self.sample = combined
+            return
+        rng = np.random.default_rng(self.count)
+        take_old = int(round(self.sample_size * previous / self.count))
+        old = rng.choice(self.sample, min(take_old, len(self.sample)), replace=False)
+        new = rng.choice(values, min(self.sample_size - len(old), len(values)), replace=False)
+        self.sample = np.concatenate([old, new])
+
+    @staticmethod
+    def _bounds(values: pd.Series) -> tuple:
+        try:
+            return values.min(), values.max()
+        except TypeError:
+            return None, None
+
+    def _merge_bounds(self, minimum: Any, maximum: Any) -> None:
+        try:
+            if minimum is not None and (self.minimum is None or minimum < self.minimum):
+                self.minimum = minimum
+            if maximum is not None and (self.maximum is None or maximum > self.maximum):
+                self.maximum = maximum
+        except TypeError:
+            pass
+
+
+@dataclass
+class DatasetProfile:
+    """Perfil de todas as colunas de uma versão do dataset"""
+    rows: int
+    columns: Dict[str, ColumnProfile]
+    preview: bool = False
+    elapsed: float = 0.0
+
+    @property
+    def nulls(self) -> int:
+        return sum(profile.nulls for profile in self.columns.values())
+
+    @property
+    def filled(self) -> int:
+        return sum(profile.count for profile in self.columns.values())
+
+    def columns_of_kind(self, kind: str) -> List[str]:
+        return [name for name, profile in self.columns.items() if profile.kind == kind]
+
+
+def column_kind(dtype: Any) -> str:
+    """Classifica a coluna em numérica, texto ou outra (datas, booleanos...)"""
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'other'
+    if pd.api.types.is_numeric_dtype(dtype):
+        return 'numeric'
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        return 'text'
+    return 'other'
+
+
+def profile_frame(df: pd.DataFrame, chunk_rows: int = 200_000,
+                  progress: Optional[Callable[[float], None]] = None, preview: bool = False) -> DatasetProfile:
+    """Calcula o perfil das colunas em blocos de linhas (memória temporária limitada)"""
+    started = time.perf_counter()
+    columns = {
+        column: ColumnProfile(name=column, dtype=str(dtype), kind=column_kind(dtype))
+        for column, dtype in df.dtypes.items()
+    }
+    total = len(df) * max(len(columns), 1)
+    done = 0
+    for column, profile in columns.items():
+        series = df[column]
+        for start in range(0, len(series), chunk_rows):
+            chunk = series.iloc[start:start + chunk_rows]
+            profile.update(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done / total)
+
+    return DatasetProfile(rows=len(df), columns=columns, preview=preview, elapsed=time.perf_counter() - started)
+
+
+def update_profile(previous: DatasetProfile, columns: List[str], changed: Optional[pd.DataFrame] = None,
+                   appended: Optional[pd.DataFrame] = None,
+                   progress: Optional[Callable[[float], None]] = None) -> DatasetProfile:
+    """
+    Perfil de uma nova versão a partir do perfil da versão anterior
+
+    `columns` são as colunas da nova versão; as que não estão em `changed`
+    (colunas criadas ou alteradas, com todas as linhas) são reaproveitadas.
+    Linhas em `appended` são mescladas sem reler as linhas existentes.
+    """
+    started = time.perf_counter()
+    recomputed = profile_frame(changed, progress=progress).columns if changed is not None else {}
+    added = profile_frame(appended).columns if appended is not None else {}
+
+    profiles = {}
+    for name in columns:
+        if name in recomputed:
+            profiles[name] = recomputed[name]
+        elif name in added:
+            profiles[name] = _copy_profile(previous.columns[name])
+            profiles[name].merge(added[name])
+        else:
+            profiles[name] = previous.columns[name]
+
+    rows = previous.rows + (len(appended) if appended is not None else 0)
+    return DatasetProfile(rows=rows, columns=profiles, elapsed=time.perf_counter() - started)
+
+
+def _copy_profile(profile: ColumnProfile) -> ColumnProfile:
+    # Os perfis em cache são compartilhados entre versões: mesclar numa cópia
+    copy = ColumnProfile(**{**profile.__dict__})
+    copy.distinct_sketch = HyperLogLog()
+    copy.distinct_sketch.registers = profile.distinct_sketch.registers.copy()
+    copy.top_values = TopK(profile.top_values.capacity)
+    copy.top_values.counts = profile.top_values.counts.copy()
+    copy.top_values.error = profile.top_values.error
+    return copy
+
+
+class ProfileCache:
+    """Perfis por versão (chave do handle) de dataset, em LRU"""
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[str, DatasetProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[DatasetProfile]:
+        with self._lock:
+            if key in self._profiles:
+                self._profiles.move_to_end(key)
+                return self._profiles[key]
+        return None
+
+    def put(self, key: str, profile: DatasetProfile) -> None:
+        with self._lock:
+            self._profiles[key] = profile
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
@@ -0,0 +1,228 @@
+# Cache de datasets compartilhado entre sessões
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Any, Optional, Tuple, Callable
+
+import pandas as pd
+
+from .memory import MB, get_memory_budget
+from .storage import DatasetStore, DatasetHandle, create_dataset_store
+
+# Sessão fictícia que representa o cache no orçamento global de memória
+SHARED_BUDGET_ID = 'shared-dataset-cache'
+
+
+@dataclass
+class SharedEntry:
+    """Dataset compartilhado e as sessões que o utilizam"""
+    handle: DatasetHandle
+    meta: Dict[str, Any] = field(default_factory=dict)
+    holders: Set[str] = field(default_factory=set)
+    hits: int = 0
+    created: float = field(default_factory=time.time)
+
+
+class SharedDatasetCache:
+    """
+    Datasets já lidos, indexados pelo conteúdo do arquivo (SHA-256) e pela
+    forma de leitura (planilha, opções de CSV...), compartilhados por todas
+    as sessões do servidor.
+
+    Cada entrada é gravada uma vez no armazenamento do cache; as sessões a
+    adotam sem copiar (hard link em Parquet, mesma referência em memória) e,
+    como o journal nunca altera a base, as edições de uma sessão geram
+    versões próprias sem afetar as demais. Entradas sem sessões são
+    despejadas por LRU quando o cache passa de `max_bytes`.
+
+    Uploads idênticos em andamento também são compartilhados: a segunda
+    sessão acompanha a tarefa da primeira em vez de ler o arquivo de novo.
+    """
+
+    def __init__(self, store: DatasetStore, max_bytes: int = 2048 * MB):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple, SharedEntry]" = OrderedDict()
+        self._aliases: Dict[Tuple, Tuple] = {}
+        self._pending: Dict[Tuple, Tuple[Any, Set[str]]] = {}
+        self._lock = threading.RLock()
+
+    # Entradas --------------------------------------------------------------
+
+    def checkout(self, key: Tuple, holder: str,
+                 session_store: DatasetStore) -> Optional[Tuple[DatasetHandle, Dict[str, Any]]]:
+        """
+        Adota a entrada no armazenamento da sessão e registra `holder` como usuário
+        Retorna (handle na sessão, metadados) ou None se a chave não estiver no cache
+        """
+        with self._lock:
+            key = self._aliases.get(key, key)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.hits += 1
+            entry.holders.add(holder)
+            self._entries.move_to_end(key)
+            handle = entry.handle
+        return session_store.adopt(self.store, handle), entry.meta
+
+    def put(self, key: Tuple, df: pd.DataFrame, meta: Optional[Dict[str, Any]] = None,
+            aliases: Tuple[Tuple, ...] = (), holder: Optional[str] = None) -> None:
+        """
+        Guarda um dataset lido (se outra sessão já o guardou, mantém o existente)
+        `aliases` são outras chaves para o mesmo dataset (ex.: "primeira planilha");
+        com `holder`, a entrada nasce em uso e não é despejada antes do checkout
+        """
+        with self._lock:
+            for alias in aliases:
+                self._pending.pop(alias, None)
+                self._aliases[alias] = key
+            self._pending.pop(key, None)
+            if key in self._entries:
+                if holder:
+                    self._entries[key].holders.add(holder)
+                return
+        handle = self.store.put(df)
+        with self._lock:
+            if key in self._entries:
+                self.store.delete(handle)
+            else:
+                self._entries[key] = SharedEntry(handle, dict(meta or {}))
+            if holder:
+                self._entries[key].holders.add(holder)
+            self._evict()
+        self._report_memory()
+
+    def get_or_put(self, key: Tuple, holder: str, session_store: DatasetStore,
+                   build: Callable[[], pd.DataFrame]) -> Tuple[DatasetHandle, Dict[str, Any]]:
+        """Adota a entrada, lendo o dataset com `build` apenas se ele ainda não estiver no cache"""
+        hit = self.checkout(key, holder, session_store)
+        if hit is None:
+            self.put(key, build(), holder=holder)
+            hit = self.checkout(key, holder, session_store)
+        return hit
+
+    def release(self, key: Tuple, holder: str) -> None:
+        """A sessão deixou de usar a entrada (ela pode ser despejada se ninguém mais a usar)"""
+        with self._lock:
+            entry = self._entries.get(self._aliases.get(key, key))
+            if entry is not None:
+                entry.holders.discard(holder)
+            self._evict()
+        self._report_memory()
+
+    def release_holder(self, holder: str) -> None:
+        """Libera todas as entradas e uploads pendentes de uma sessão encerrada"""
+        with self._lock:
+            for entry in self._entries.values():
+                entry.holders.discard(holder)
+            for key in list(self._pending):
+                self.leave_pending(key, holder)
+            self._evict()
+        self._report_memory()
+
+    # Uploads em andamento --------------------------------------------------
+
+    def join_pending(self, key: Tuple, holder: str) -> Optional[Any]:
+        """Tarefa de leitura já em andamento para a mesma chave (e passa a acompanhá-la)"""
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None or pending[0].done:
+                return None
+            pending[1].add(holder)
+            return pending[0]
+
+    def add_pending(self, key: Tuple, holder: str, job: Any) -> None:
+        with self._lock:
+            self._pending[key] = (job, {holder})
+
+    def leave_pending(self, key: Tuple, holder: str) -> bool:
+        """
+        A sessão desistiu da tarefa; retorna True se ninguém mais a acompanha
+        (só então ela pode ser cancelada)
+        """
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                return True
+            pending[1].discard(holder)
+            if pending[1]:
+                return False
+            del self._pending[key]
+            return True
+
+    # Estatísticas ----------------------------------------------------------
+
+    @property
+    def nbytes(self) -> int:
+        """Tamanho das entradas no armazenamento do cache (disco em Parquet, memória no modo memória)"""
+        with self._lock:
+            return sum(self._entry_bytes(entry) for entry in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'shared': sum(1 for entry in self._entries.values() if len(entry.holders) > 1),
+                'holders': sum(len(entry.holders) for entry in self._entries.values()),
+                'pending': len(self._pending),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def entries(self) -> List[Tuple[Tuple, SharedEntry]]:
+        with self._lock:
+            return list(self._entries.items())
+
+    # Internos --------------------------------------------------------------
+
+    def _entry_bytes(self, entry: SharedEntry) -> int:
+        return entry.handle.nbytes if entry.handle.format != 'memory' else entry.handle.memory_bytes
+
+    def _evict(self) -> None:
+        # Só entradas sem sessões: as demais continuam referenciadas de qualquer forma
+        total = sum(self._entry_bytes(entry) for entry in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.holders:
+                continue
+            del self._entries[key]
+            for alias in [alias for alias, target in self._aliases.items() if target == key]:
+                del self._aliases[alias]
+            self.store.delete(entry.handle)
+            total -= self._entry_bytes(entry)
+            self.evictions += 1
+
+    def _report_memory(self) -> None:
+        # Em memória, o cache conta uma única vez no orçamento global
+        get_memory_budget().report(SHARED_BUDGET_ID, self.store.resident_bytes)
+
+
+_shared_cache: Optional[SharedDatasetCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache() -> SharedDatasetCache:
+    """Cache de datasets do processo (único para todas as sessões)"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = SharedDatasetCache(
+                create_dataset_store(),
+                max_bytes=int(os.environ.get('EXCEL_SHARED_CACHE_MB', 2048)) * MB
+            )
+        return _shared_cache
@@ -0,0 +1,709 @@
+# Armazenamento de datasets
+import os
+import json
+import uuid
+import shutil
+import weakref
+import tempfile
+from collections import OrderedDict
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Any, Optional, Iterable, Iterator, Sequence, Tuple
+
+import pandas as pd
+
+from .cache import frame_nbytes
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow é opcional
+    pa = None
+    pq = None
+
+# Com Copy-on-Write (padrão no pandas >= 3) uma cópia rasa compartilha as
+# colunas não alteradas com o DataFrame de origem
+_COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3 or bool(pd.get_option('mode.copy_on_write'))
+
+# Versões montadas por colunas com mais peças que isso são regravadas num
+# arquivo só (cada peça é um arquivo a abrir em toda leitura)
+MAX_VIEW_PIECES = 16
+
+_VIEW_LAYOUT = 'layout.json'
+
+
+def cow_copy(df: pd.DataFrame) -> pd.DataFrame:
+    """Cópia que só duplica as colunas efetivamente alteradas (quando há CoW)"""
+    return df.copy(deep=not _COPY_ON_WRITE)
+
+
+@dataclass
+class StoreConfig:
+    """Configuração do armazenamento de datasets"""
+    backend: str = field(default_factory=lambda: os.environ.get('EXCEL_DATASET_STORE', 'parquet'))
+    base_dir: str = field(default_factory=lambda: os.environ.get(
+        'EXCEL_DATASET_DIR', os.path.join(tempfile.gettempdir(), 'streamlit_datasets')
+    ))
+    row_group_size: int = 50_000
+
+
+@dataclass(frozen=True)
+class DatasetHandle:
+    """Referência leve para um dataset armazenado (é o que fica na sessão)"""
+    key: str
+    num_rows: int
+    columns: List[str]
+    nbytes: int
+    format: str = 'memory'
+    memory_bytes: int = 0
+
+
+class DatasetStore(ABC):
+    """
+    Interface de armazenamento de datasets.
+
+    Os DataFrames retornados por `load` e `read_rows` devem ser tratados como
+    somente leitura: alterações são gravadas com `put`, que gera um novo handle.
+    """
+
+    @abstractmethod
+    def put(self, df: pd.DataFrame) -> DatasetHandle:
+        """Armazena um DataFrame e retorna seu handle"""
+        pass
+
+    @abstractmethod
+    def load(self, handle: DatasetHandle, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Materializa o dataset (ou apenas algumas colunas)"""
+        pass
+
+    @abstractmethod
+    def read_rows(self, handle: DatasetHandle, start: int, stop: int) -> pd.DataFrame:
+        """Materializa apenas as linhas [start, stop)"""
+        pass
+
+    @abstractmethod
+    def delete(self, handle: DatasetHandle) -> None:
+        """Remove o dataset do armazenamento"""
+        pass
+
+    @abstractmethod
+    def put_bytes(self, key: str, data: bytes) -> Any:
+        """Armazena bytes brutos (ex.: arquivo original) e retorna uma fonte legível pelo pandas"""
+        pass
+
+    def put_chunks(self, chunks: Iterable[pd.DataFrame]) -> DatasetHandle:
+        """
+        Armazena um dataset produzido em partições (ex.: resultado de JOIN)
+        O índice resultante é um RangeIndex
+        """
+        return self.put(pd.concat(list(chunks), ignore_index=True))
+
+    def put_columns(self, parent: DatasetHandle, values: Optional[pd.DataFrame] = None,
+                    drop: Sequence[str] = ()) -> DatasetHandle:
+        """
+        Nova versão de `parent` com as colunas de `values` criadas ou
+        substituídas (mesmas linhas, na mesma ordem) e as de `drop` removidas
+        O padrão materializa a tabela e a grava com `put`
+        """
+        df = cow_copy(self.load(parent))
+        if drop:
+            df = df.drop(columns=list(drop))
+        if values is not None:
+            for column in values.columns:
+                df[column] = values[column].set_axis(df.index)
+        return self.put(df)
+
+    def iter_batches(self, handle: DatasetHandle, columns: Optional[List[str]] = None,
+                     batch_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+        """Percorre o dataset em blocos de linhas (apenas as colunas pedidas)"""
+        df = self.load(handle, columns=columns)
+        for start in range(0, len(df), batch_rows):
+            yield df.iloc[start:start + batch_rows]
+
+    def save(self, handle: DatasetHandle, path: str) -> str:
+        """
+        Grava uma cópia persistente do dataset em `path` (sem extensão)
+        Retorna o formato gravado ('parquet' ou 'pickle'); o arquivo é `path.formato`
+        """
+        df = self.load(handle)
+        if pq is not None:
+            try:
+                if not all(isinstance(col, str) for col in df.columns):
+                    raise TypeError("Parquet exige nomes de coluna textuais")
+                pq.write_table(pa.Table.from_pandas(df, preserve_index=True), f"{path}.parquet")
+                return 'parquet'
+            except (pa.ArrowException, TypeError, ValueError):
+                pass
+        df.to_pickle(f"{path}.pickle")
+        return 'pickle'
+
+    def attach(self, path: str, file_format: str, num_rows: int, columns: List[str],
+               memory_bytes: int = 0) -> DatasetHandle:
+        """Registra um arquivo gravado por `save` (o padrão é ler o arquivo inteiro)"""
+        source = f"{path}.{file_format}"
+        if file_format == 'view':
+            return self.put(read_view(source))
+        df = pd.read_parquet(source) if file_format == 'parquet' else pd.read_pickle(source)
+        return self.put(df)
+
+    def adopt(self, source: "DatasetStore", handle: DatasetHandle) -> DatasetHandle:
+        """Registra um dataset de outro armazenamento (ex.: o cache compartilhado entre sessões)"""
+        return self.put(source.load(handle))
+
+    def file_path(self, handle: DatasetHandle) -> Optional[str]:
+        """Arquivo Parquet do dataset, legível por outros processos (None se não houver)"""
+        return None
+
+    def spool_path(self) -> str:
+        """
+        Caminho (sem extensão) onde outro processo grava um dataset com
+        `write_chunks` para depois registrá-lo com `attach`
+        """
+        return os.path.join(tempfile.gettempdir(), f"spool_{uuid.uuid4().hex}")
+
+    @property
+    def resident_bytes(self) -> int:
+        """Memória mantida pelo armazenamento entre execuções do script"""
+        return 0
+
+    def spill(self, nbytes: int) -> int:
+        """Tenta liberar `nbytes` de memória residente; retorna quanto foi liberado"""
+        return 0
+
+
+class MemoryDatasetStore(DatasetStore):
+    """
+    Armazenamento em memória (comportamento original da sessão).
+
+    Com `max_resident_bytes` e `spill_store`, os datasets menos usados são
+    despejados para o armazenamento secundário (ex.: Parquet em disco) e
+    voltam para a memória quando acessados.
+    """
+
+    def __init__(self, max_resident_bytes: Optional[int] = None, spill_store: Optional[DatasetStore] = None):
+        self.max_resident_bytes = max_resident_bytes
+        self.spill_store = spill_store
+        self._frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._spilled: Dict[str, DatasetHandle] = {}
+        self._shared: Set[str] = set()
+        self._blobs: Dict[str, bytes] = {}
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._sizes[key] for key in self._frames) + sum(len(blob) for blob in self._blobs.values())
+
+    def put(self, df: pd.DataFrame) -> DatasetHandle:
+        key = uuid.uuid4().hex
+        size = frame_nbytes(df)
+        self._admit(key, df, size)
+        return DatasetHandle(
+            key=key,
+            num_rows=len(df),
+            columns=list(df.columns),
+            nbytes=size,
+            memory_bytes=size
+        )
+
+    def load(self, handle: DatasetHandle, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        df = self._frame(handle.key)
+        return df[columns] if columns is not None else df
+
+    def read_rows(self, handle: DatasetHandle, start: int, stop: int) -> pd.DataFrame:
+        if handle.key in self._spilled:
+            return self.spill_store.read_rows(self._spilled[handle.key], start, stop)
+        return self._frame(handle.key).iloc[start:stop]
+
+    def iter_batches(self, handle: DatasetHandle, columns: Optional[List[str]] = None,
+                     batch_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+        if handle.key in self._spilled:
+            # Dataset despejado é percorrido no disco, sem voltar para a memória
+            return self.spill_store.iter_batches(self._spilled[handle.key], columns, batch_rows)
+        return super().iter_batches(handle, columns, batch_rows)
+
+    def delete(self, handle: DatasetHandle) -> None:
+        self._frames.pop(handle.key, None)
+        self._sizes.pop(handle.key, None)
+        self._shared.discard(handle.key)
+        if handle.key in self._spilled:
+            self.spill_store.delete(self._spilled.pop(handle.key))
+
+    def save(self, handle: DatasetHandle, path: str) -> str:
+        if handle.key in self._spilled:
+            return self.spill_store.save(self._spilled[handle.key], path)
+        return super().save(handle, path)
+
+    def file_path(self, handle: DatasetHandle) -> Optional[str]:
+        if handle.key in self._spilled:
+            return self.spill_store.file_path(self._spilled[handle.key])
+        return None
+
+    def spool_path(self) -> str:
+        if self.spill_store is not None:
+            return self.spill_store.spool_path()
+        return super().spool_path()
+
+    def attach(self, path: str, file_format: str, num_rows: int, columns: List[str],
+               memory_bytes: int = 0) -> DatasetHandle:
+        """Com armazenamento secundário o dataset entra como despejado: só é lido quando acessado"""
+        if self.spill_store is None:
+            return super().attach(path, file_format, num_rows, columns, memory_bytes)
+
+        spilled = self.spill_store.attach(path, file_format, num_rows, columns, memory_bytes)
+        key = uuid.uuid4().hex
+        self._spilled[key] = spilled
+        self._sizes[key] = memory_bytes
+        return DatasetHandle(
+            key=key,
+            num_rows=num_rows,
+            columns=list(columns),
+            nbytes=spilled.nbytes,
+            memory_bytes=memory_bytes
+        )
+
+    def adopt(self, source: DatasetStore, handle: DatasetHandle) -> DatasetHandle:
+        """
+        De outro armazenamento em memória, guarda a mesma referência (somente
+        leitura): a memória é de quem a compartilha e não entra na conta da sessão
+        """
+        if not isinstance(source, MemoryDatasetStore):
+            return super().adopt(source, handle)
+
+        key = uuid.uuid4().hex
+        self._frames[key] = source.load(handle)
+        self._sizes[key] = 0
+        self._shared.add(key)
+        return DatasetHandle(
+            key=key,
+            num_rows=handle.num_rows,
+            columns=list(handle.columns),
+            nbytes=handle.nbytes,
+            memory_bytes=handle.memory_bytes
+        )
+
+    def put_bytes(self, key: str, data: bytes) -> Any:
+        if self.spill_store is not None:
+            return self.spill_store.put_bytes(key, data)
+        self._blobs[key] = data
+        return data
+
+    def spill(self, nbytes: int) -> int:
+        """Despeja os datasets menos usados até liberar `nbytes`"""
+        if self.spill_store is None:
+            return 0
+
+        freed = 0
+        for key in list(self._frames):
+            if freed >= nbytes:
+                break
+            if key in self._shared:
+                # Despejar um dataset compartilhado não liberaria memória
+                continue
+            self._spilled[key] = self.spill_store.put(self._frames.pop(key))
+            freed += self._sizes[key]
+        return freed
+
+    def _frame(self, key: str) -> pd.DataFrame:
+        if key in self._spilled:
+            # Dataset despejado: volta para a memória como o mais recente
+            handle = self._spilled.pop(key)
+            df = self.spill_store.load(handle)
+            self.spill_store.delete(handle)
+            self._admit(key, df, self._sizes[key])
+            return df
+
+        self._frames.move_to_end(key)
+        return self._frames[key]
+
+    def _admit(self, key: str, df: pd.DataFrame, size: int) -> None:
+        self._frames[key] = df
+        self._sizes[key] = size
+        if self.max_resident_bytes is not None:
+            excess = self.resident_bytes - self.max_resident_bytes
+            if excess > 0:
+                # O dataset recém-admitido é o último da LRU: nunca é despejado aqui
+                self.spill(min(excess, self.resident_bytes - size))
+
+
+class ParquetDatasetStore(DatasetStore):
+    """
+    Armazenamento em disco: cada versão de dataset é um arquivo Parquet lido
+    com memory-map. A sessão guarda apenas handles e as linhas são lidas por
+    row group sob demanda.
+
+    Versões que só criam, alteram ou removem colunas (`put_columns`) são
+    montadas por colunas ('view'): um diretório com hard links para os
+    arquivos da versão anterior e um arquivo só com as colunas novas.
+    """
+
+    def __init__(self, base_dir: str, row_group_size: int = 50_000):
+        if pq is None:
+            raise ImportError("pyarrow é necessário para o armazenamento em Parquet")
+
+        self.base_dir = os.path.join(base_dir, uuid.uuid4().hex)
+        self.row_group_size = row_group_size
+        os.makedirs(self.base_dir, exist_ok=True)
+
+        # Remove os arquivos da sessão quando o store for descartado
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.base_dir, True)
+
+    def put(self, df: pd.DataFrame) -> DatasetHandle:
+        key = uuid.uuid4().hex
+        file_format = write_frame(os.path.join(self.base_dir, key), df, self.row_group_size)
+        return DatasetHandle(
+            key=key,
+            num_rows=len(df),
+            columns=list(df.columns),
+            nbytes=os.path.getsize(self._path(key, file_format)),
+            format=file_format,
+            memory_bytes=frame_nbytes(df)
+        )
+
+    def put_chunks(self, chunks: Iterable[pd.DataFrame]) -> DatasetHandle:
+        """Grava cada partição como row groups, sem juntar o resultado em memória"""
+        key = uuid.uuid4().hex
+        file_format, num_rows, columns, memory_bytes = write_chunks(os.path.join(self.base_dir, key), chunks, self.row_group_size)
+        return DatasetHandle(
+            key=key,
+            num_rows=num_rows,
+            columns=columns,
+            nbytes=os.path.getsize(self._path(key, file_format)),
+            format=file_format,
+            memory_bytes=memory_bytes
+        )
+
+    def put_columns(self, parent: DatasetHandle, values: Optional[pd.DataFrame] = None,
+                    drop: Sequence[str] = ()) -> DatasetHandle:
+        """Grava só as colunas de `values`; as demais são hard links para os arquivos de `parent`"""
+        if parent.format == 'pickle':
+            return super().put_columns(parent, values, drop)
+
+        new_columns = list(values.columns) if values is not None else []
+        removed = set(drop) | set(new_columns)
+        pieces = []
+        for position, (source, piece_columns) in enumerate(self._pieces(parent)):
+            kept = [column for column in piece_columns if column not in removed]
+            # A primeira peça fica mesmo sem colunas: é dela que vem o índice
+            if kept or not position:
+                pieces.append((source, kept))
+        if len(pieces) + bool(new_columns) > MAX_VIEW_PIECES:
+            return super().put_columns(parent, values, drop)
+
+        key = uuid.uuid4().hex
+        directory = self._path(key, 'view')
+        os.makedirs(directory)
+        layout = []
+        try:
+            for source, piece_columns in pieces:
+                file = f"{len(layout)}.parquet"
+                _link(source, os.path.join(directory, file))
+                layout.append([file, piece_columns])
+            if new_columns:
+                if not all(isinstance(col, str) for col in new_columns):
+                    raise TypeError("Parquet exige nomes de coluna textuais")
+                file = f"{len(layout)}.parquet"
+                table = pa.Table.from_pandas(values, preserve_index=False)
+                pq.write_table(table, os.path.join(directory, file), row_group_size=self.row_group_size)
+                layout.append([file, new_columns])
+        except (pa.ArrowException, TypeError, ValueError):
+            # Tipos que não cabem em Parquet: a versão é materializada (pickle)
+            shutil.rmtree(directory, ignore_errors=True)
+            return super().put_columns(parent, values, drop)
+
+        # Colunas substituídas continuam na mesma posição; as novas vão para o fim
+        columns = [column for column in parent.columns if column not in set(drop)]
+        columns += [column for column in new_columns if column not in columns]
+        with open(os.path.join(directory, _VIEW_LAYOUT), 'w', encoding='utf-8') as f:
+            json.dump({'columns': columns, 'pieces': layout}, f)
+
+        # Memória estimada: a da versão anterior proporcional às colunas mantidas
+        kept_columns = sum(len(piece_columns) for _, piece_columns in pieces)
+        memory_bytes = parent.memory_bytes * kept_columns // max(len(parent.columns), 1)
+        if values is not None:
+            memory_bytes += frame_nbytes(values)
+        return DatasetHandle(
+            key=key,
+            num_rows=parent.num_rows,
+            columns=columns,
+            nbytes=dataset_file_size(directory),
+            format='view',
+            memory_bytes=memory_bytes
+        )
+
+    def load(self, handle: DatasetHandle, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        if handle.format == 'pickle':
+            df = pd.read_pickle(self._path(handle.key, 'pickle'))
+            return df[columns] if columns is not None else df
+        if handle.format == 'view':
+            return read_view(self._path(handle.key, 'view'), columns)
+        return _read_parquet(self._path(handle.key, 'parquet'), columns)
+
+    def read_rows(self, handle: DatasetHandle, start: int, stop: int) -> pd.DataFrame:
+        if handle.format == 'pickle':
+            return self.load(handle).iloc[start:stop]
+        if handle.format == 'view':
+            return read_view(self._path(handle.key, 'view'), start=start, stop=stop)
+        return _read_parquet(self._path(handle.key, 'parquet'), start=start, stop=stop)
+
+    def iter_batches(self, handle: DatasetHandle, columns: Optional[List[str]] = None,
+                     batch_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+        """Lê o arquivo em lotes: a memória usada é a de um lote, não a do dataset"""
+        if handle.format == 'pickle':
+            yield from super().iter_batches(handle, columns, batch_rows)
+            return
+        if handle.format == 'view':
+            # Peças podem ter row groups diferentes: os lotes são lidos por intervalo
+            for start in range(0, handle.num_rows, batch_rows):
+                yield read_view(self._path(handle.key, 'view'), columns, start, start + batch_rows)
+            return
+
+        parquet_file = pq.ParquetFile(self._path(handle.key, 'parquet'), memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+
+    def delete(self, handle: DatasetHandle) -> None:
+        for file_format in ('parquet', 'pickle', 'view'):
+            remove_dataset_file(self._path(handle.key, file_format))
+
+    def save(self, handle: DatasetHandle, path: str) -> str:
+        """Os arquivos são imutáveis: a cópia persistente é um hard link (cópia se não for possível)"""
+        _link(self._path(handle.key, handle.format), f"{path}.{handle.format}")
+        return handle.format
+
+    def file_path(self, handle: DatasetHandle) -> Optional[str]:
+        return self._path(handle.key, 'parquet') if handle.format == 'parquet' else None
+
+    def attach(self, path: str, file_format: str, num_rows: int, columns: List[str],
+               memory_bytes: int = 0) -> DatasetHandle:
+        """Adota o arquivo sem lê-lo: apenas o link para o diretório da sessão"""
+        key = uuid.uuid4().hex
+        target = self._path(key, file_format)
+        _link(f"{path}.{file_format}", target)
+        return DatasetHandle(
+            key=key,
+            num_rows=num_rows,
+            columns=list(columns),
+            nbytes=dataset_file_size(target),
+            format=file_format,
+            memory_bytes=memory_bytes
+        )
+
+    def adopt(self, source: DatasetStore, handle: DatasetHandle) -> DatasetHandle:
+        """De outro armazenamento em Parquet, apenas um hard link para o mesmo arquivo"""
+        if not isinstance(source, ParquetDatasetStore):
+            return super().adopt(source, handle)
+        return self.attach(
+            os.path.join(source.base_dir, handle.key), handle.format,
+            handle.num_rows, handle.columns, handle.memory_bytes
+        )
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        path = self._path(key, 'bin')
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+        return path
+
+    def _pieces(self, handle: DatasetHandle) -> List[Tuple[str, List[str]]]:
+        # Arquivos da versão e as colunas que cada um fornece (o primeiro tem o índice)
+        if handle.format != 'view':
+            return [(self._path(handle.key, handle.format), list(handle.columns))]
+        directory = self._path(handle.key, 'view')
+        return [(os.path.join(directory, file), columns) for file, columns in _view_layout(directory)['pieces']]
+
+    def spool_path(self) -> str:
+        """No diretório da sessão: o `attach` do arquivo gravado é só um hard link"""
+        return os.path.join(self.base_dir, uuid.uuid4().hex)
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.base_dir, f"{key}.{extension}")
+
+
+def _link(source: str, target: str) -> None:
+    if os.path.isdir(source):
+        # Versão montada por colunas: um link para cada peça
+        os.makedirs(target)
+        for file in os.listdir(source):
+            _link(os.path.join(source, file), os.path.join(target, file))
+        return
+    try:
+        os.link(source, target)
+    except OSError:
+        # Sistemas de arquivos diferentes (ou sem suporte a hard link)
+        shutil.copyfile(source, target)
+
+
+def dataset_file_size(path: str) -> int:
+    """Tamanho em disco de um dataset gravado (arquivo ou diretório de peças)"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, file)) for file in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def remove_dataset_file(path: str) -> None:
+    """Apaga um dataset gravado (arquivo ou diretório de peças), se existir"""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def read_view(path: str, columns: Optional[List[str]] = None,
+              start: Optional[int] = None, stop: Optional[int] = None) -> pd.DataFrame:
+    """
+    Lê uma versão montada por colunas (diretório com as peças e o layout)
+    Só as peças com colunas pedidas são abertas; `start`/`stop` limitam as linhas
+    """
+    layout = _view_layout(path)
+    wanted = layout['columns'] if columns is None else list(columns)
+    selected = set(wanted)
+    frames = []
+    for file, piece_columns in layout['pieces']:
+        piece_columns = [column for column in piece_columns if column in selected]
+        if piece_columns:
+            frames.append(_read_parquet(os.path.join(path, file), piece_columns, start, stop))
+
+    index = _read_index(os.path.join(path, layout['pieces'][0][0]), start, stop)
+    if not frames:
+        return pd.DataFrame(index=index)
+    return pd.concat([frame.set_axis(index) for frame in frames], axis=1)[wanted]
+
+
+def _view_layout(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, _VIEW_LAYOUT), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _read_parquet(path: str, columns: Optional[List[str]] = None,
+                  start: Optional[int] = None, stop: Optional[int] = None) -> pd.DataFrame:
+    # O índice gravado pelo pandas é lido mesmo quando só algumas colunas são pedidas
+    if start is None:
+        return pq.read_table(path, columns=columns, memory_map=True, use_pandas_metadata=True).to_pandas()
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    metadata = parquet_file.metadata
+
+    # Ler apenas os row groups que cobrem o intervalo pedido
+    row_groups = []
+    first_row = offset = 0
+    for i in range(metadata.num_row_groups):
+        group_rows = metadata.row_group(i).num_rows
+        if offset + group_rows > start and offset < stop:
+            if not row_groups:
+                first_row = offset
+            row_groups.append(i)
+        offset += group_rows
+
+    df = parquet_file.read_row_groups(row_groups, columns=columns, use_pandas_metadata=True).to_pandas()
+    return df.iloc[start - first_row:stop - first_row]
+
+
+def _read_index(path: str, start: Optional[int] = None, stop: Optional[int] = None) -> pd.Index:
+    # Um RangeIndex fica só nos metadados do pandas: nada é lido do arquivo
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    index_columns = (parquet_file.schema_arrow.pandas_metadata or {}).get('index_columns', [])
+    if not index_columns:
+        return pd.RangeIndex(parquet_file.metadata.num_rows)[start:stop]
+    if isinstance(index_columns[0], dict):
+        spec = index_columns[0]
+        return pd.RangeIndex(spec['start'], spec['stop'], spec['step'])[start:stop]
+    return _read_parquet(path, [], start, stop).index
+
+
+
+def write_frame(path: str, df: pd.DataFrame, row_group_size: int = 50_000) -> str:
+    """
+    Grava o DataFrame em `path`.parquet (ou `path`.pickle, se os tipos não
+    couberem em Parquet) e retorna o formato gravado
+    """
+    if pq is not None:
+        try:
+            if not all(isinstance(col, str) for col in df.columns):
+                raise TypeError("Parquet exige nomes de coluna textuais")
+            table = pa.Table.from_pandas(df, preserve_index=True)
+            pq.write_table(table, f"{path}.parquet", row_group_size=row_group_size)
+            return 'parquet'
+        except (pa.ArrowException, TypeError, ValueError):
+            # Colunas com tipos mistos (comum em planilhas) não cabem em Parquet
+            pass
+    df.to_pickle(f"{path}.pickle")
+    return 'pickle'
+
+
+def write_chunks(path: str, chunks: Iterable[pd.DataFrame],
+                 row_group_size: int = 50_000) -> Tuple[str, int, List[Any], int]:
+    """
+    Grava as partições em `path`.parquet como row groups, sem juntar o
+    resultado em memória; não depende de um store e roda nos processos de
+    trabalho. Retorna formato, linhas, colunas e memória estimada
+    """
+    if pq is None:
+        chunks = list(chunks)
+        df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+        return write_frame(path, df), len(df), list(df.columns), frame_nbytes(df)
+
+    target = f"{path}.parquet"
+    chunks = iter(chunks)
+    writer = None
+    columns: List[Any] = []
+    num_rows = memory_bytes = 0
+
+    try:
+        for chunk in chunks:
+            # Só a conversão e a gravação do bloco ficam no try: erros de quem
+            # produz os blocos (ex.: filtro inválido num pipeline) sobem como vieram
+            try:
+                if not all(isinstance(col, str) for col in chunk.columns):
+                    raise TypeError("Parquet exige nomes de coluna textuais")
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is not None:
+                    table = table.cast(writer.schema)
+                else:
+                    writer = pq.ParquetWriter(target, table.schema)
+                    columns = list(chunk.columns)
+                writer.write_table(table, row_group_size=row_group_size)
+            except (pa.ArrowException, TypeError, ValueError):
+                # Partições com tipos incompatíveis: junta o que já foi gravado com o restante
+                if writer is not None:
+                    writer.close()
+                    writer = None
+                    written = pq.read_table(target).to_pandas()
+                    os.remove(target)
+                else:
+                    written = chunk.iloc[0:0]
+                df = pd.concat([written, chunk, *chunks], ignore_index=True)
+                return write_frame(path, df, row_group_size), len(df), list(df.columns), frame_nbytes(df)
+            num_rows += len(chunk)
+            memory_bytes += frame_nbytes(chunk)
+    except Exception:
+        # O arquivo incompleto não fica no diretório
+        if writer is not None:
+            writer.close()
+            writer = None
+        if os.path.exists(target):
+            os.remove(target)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if not columns:
+        return write_frame(path, pd.DataFrame(), row_group_size), 0, [], 0
+    return 'parquet', num_rows, columns, memory_bytes
+
+
+def create_dataset_store(config: Optional[StoreConfig] = None,
+                         max_resident_bytes: Optional[int] = None) -> DatasetStore:
+    """
+    Cria o armazenamento configurado (cai para memória sem pyarrow)
+    No modo memória, `max_resident_bytes` ativa o despejo para disco
+    """
+    config = config or StoreConfig()
+    if pq is None:
+        return MemoryDatasetStore()
+    if config.backend == 'parquet':
+        return ParquetDatasetStore(config.base_dir, config.row_group_size)
+    return MemoryDatasetStore(
+        max_resident_bytes=max_resident_bytes,
+        spill_store=ParquetDatasetStore(config.base_dir, config.row_group_size)
+    )
@@ -0,0 +1,207 @@
+# Validação declarativa de tabelas (regras vetorizadas por coluna)
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Callable, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Colunas da tabela de problemas: rótulo da linha, coluna e mensagem
+ISSUE_COLUMNS = ['Linha', 'Coluna', 'Erro']
+
+# Pesos do módulo 11 (primeiro e segundo dígito verificador)
+_CPF_WEIGHTS = (np.arange(10, 1, -1), np.arange(11, 1, -1))
+_CNPJ_WEIGHTS = (np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]), np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+
+# Pontuação aceita nos documentos (removida antes da conferência)
+_PUNCTUATION = r'[.\-/\s]'
+
+
+def normalize_document(values: pd.Series) -> pd.Series:
+    """CPF/CNPJ sem pontuação e em maiúsculas (o CNPJ alfanumérico tem letras)"""
+    return values.astype('string').str.upper().str.replace(_PUNCTUATION, '', regex=True)
+
+
+def _mod11_valid(values: pd.Series, pattern: str, weights: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    # Cada valor no formato vira uma linha de uma matriz de dígitos (ASCII - 48,
+    # que também é o valor das letras no CNPJ alfanumérico) e os dois dígitos
+    # verificadores são conferidos para todas as linhas de uma vez
+    normalized = normalize_document(values)
+    valid = np.zeros(len(values), dtype=bool)
+    shaped = normalized.str.fullmatch(pattern).fillna(False).to_numpy(dtype=bool)
+    if not shaped.any():
+        return valid
+    width = len(weights[1]) + 1
+    raw = ''.join(normalized[shaped].tolist()).encode('ascii')
+    digits = np.frombuffer(raw, dtype=np.uint8).reshape(-1, width).astype(np.int64) - 48
+
+    ok = ~(digits == digits[:, :1]).all(axis=1)  # 000..., 111... passam no módulo 11
+    for position, weight in enumerate(weights, start=len(weights[0])):
+        remainder = digits[:, :position] @ weight % 11
+        ok &= np.where(remainder < 2, 0, 11 - remainder) == digits[:, position]
+    valid[shaped] = ok
+    return valid
+
+
+def valid_cpf(values: pd.Series) -> np.ndarray:
+    """Máscara dos CPFs válidos (11 dígitos, com ou sem pontuação)"""
+    return _mod11_valid(values, r'\d{11}', _CPF_WEIGHTS)
+
+
+def valid_cnpj(values: pd.Series) -> np.ndarray:
+    """Máscara dos CNPJs válidos, numéricos ou alfanuméricos (12 caracteres + 2 dígitos)"""
+    return _mod11_valid(values, r'[0-9A-Z]{12}\d{2}', _CNPJ_WEIGHTS)
+
+
+def valid_cpf_cnpj(values: pd.Series) -> np.ndarray:
+    """Máscara dos valores que são um CPF ou um CNPJ válido"""
+    return valid_cpf(values) | valid_cnpj(values)
+
+
+def matches(pattern: str) -> Callable[[pd.Series], np.ndarray]:
+    """Verificação por expressão regular (o valor inteiro precisa casar)"""
+    def check(values: pd.Series) -> np.ndarray:
+        return values.astype('string').str.strip().str.fullmatch(pattern).fillna(False).to_numpy(dtype=bool)
+    return check
+
+
+valid_cep = matches(r'\d{5}-?\d{3}')
+
+
+def non_negative_number(values: pd.Series) -> np.ndarray:
+    """Máscara dos números maiores ou iguais a zero"""
+    numbers = pd.to_numeric(values, errors='coerce')
+    return (numbers >= 0).fillna(False).to_numpy(dtype=bool)
+
+
+@dataclass
+class Rule:
+    """
+    Regra de uma coluna: `check` recebe a coluna e devolve a máscara dos
+    valores válidos. Valores vazios só são erro se a coluna for obrigatória
+    """
+    column: str
+    check: Optional[Callable[[pd.Series], np.ndarray]] = None
+    message: str = 'Valor inválido'
+    required: bool = False
+
+
+@dataclass
+class FrameRule:
+    """
+    Regra sobre a tabela inteira (duplicidades, totais): `check` recebe a
+    tabela e devolve (linha, coluna, mensagem) para cada problema
+    """
+    name: str
+    check: Callable[[pd.DataFrame], Iterable[Tuple[Any, str, str]]]
+
+
+@dataclass
+class Schema:
+    """Regras de linha (conferidas só nas linhas alteradas) e de tabela"""
+    rules: List[Rule] = field(default_factory=list)
+    frame_rules: List[FrameRule] = field(default_factory=list)
+
+    def validate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Problemas da tabela inteira, um por célula"""
+        return _issues_frame(self.check_rows(df) + self.check_frame(df))
+
+    def check_rows(self, df: pd.DataFrame) -> List[Tuple[Any, str, str]]:
+        issues = []
+        for rule in self.rules:
+            if rule.column not in df.columns:
+                continue
+            values = df[rule.column]
+            empty = (values.isna() | (values.astype('string').str.strip() == '')).to_numpy(dtype=bool)
+            if rule.required:
+                issues.extend((row, rule.column, 'Campo obrigatório') for row in df.index[empty])
+            if rule.check is not None and not empty.all():
+                filled = ~empty
+                invalid = ~rule.check(values[filled])
+                issues.extend((row, rule.column, rule.message) for row in df.index[filled][invalid])
+        return issues
+
+    def check_frame(self, df: pd.DataFrame) -> List[Tuple[Any, str, str]]:
+        return [issue for rule in self.frame_rules for issue in rule.check(df)]
+
+
+def unique(column: str, message: str = 'Valor duplicado', normalize: Optional[Callable[[pd.Series], pd.Series]] = None,
+           by: Optional[str] = None) -> FrameRule:
+    """Regra de valores únicos na coluna (dentro de cada grupo de `by`, se informado); vazios são ignorados"""
+    def check(df: pd.DataFrame) -> List[Tuple[Any, str, str]]:
+        if column not in df.columns or not len(df):
+            return []
+        values = df[column] if normalize is None else normalize(df[column])
+        values = values.astype('string').str.strip()
+        keys = [values] if by is None or by not in df.columns else [df[by], values]
+        filled = (values.notna() & (values != '')).to_numpy(dtype=bool)
+        duplicated = pd.DataFrame(dict(enumerate(keys))).duplicated(keep=False).to_numpy(dtype=bool) & filled
+        return [(row, column, message) for row in df.index[duplicated]]
+    return FrameRule(name=f'unique:{column}', check=check)
+
+
+def _issues_frame(issues: List[Tuple[Any, str, str]]) -> pd.DataFrame:
+    # Linha fica como objeto: problemas da tabela inteira não têm linha (None)
+    return pd.DataFrame(issues, columns=ISSUE_COLUMNS).astype({'Linha': object})
+
+
+@dataclass
+class ValidationStats:
+    """Linhas da tabela, linhas conferidas nesta rodada e problemas encontrados"""
+    rows: int = 0
+    checked: int = 0
+    issues: int = 0
+    elapsed: float = 0.0
+
+
+class IncrementalValidator:
+    """
+    Valida uma tabela a cada edição conferindo as regras de linha só nas
+    linhas novas ou alteradas desde a última chamada; os problemas das
+    demais linhas são reaproveitados. As regras de tabela rodam sempre
+    """
+
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        self.stats = ValidationStats()
+        self._frame: Optional[pd.DataFrame] = None
+        self._row_issues = _issues_frame([])
+
+    def validate(self, df: pd.DataFrame) -> pd.DataFrame:
+        started = time.perf_counter()
+        changed = self._changed_rows(df)
+        if changed is None:
+            row_issues = _issues_frame(self.schema.check_rows(df))
+            checked = len(df)
+        else:
+            kept = self._row_issues[self._row_issues['Linha'].isin(df.index) & ~self._row_issues['Linha'].isin(changed)]
+            fresh = _issues_frame(self.schema.check_rows(df.loc[changed]))
+            row_issues = pd.concat([kept, fresh], ignore_index=True) if len(fresh) else kept
+            checked = len(changed)
+
+        self._frame = df.copy()
+        self._row_issues = row_issues
+        issues = pd.concat([row_issues, _issues_frame(self.schema.check_frame(df))], ignore_index=True)
+        self.stats = ValidationStats(rows=len(df), checked=checked, issues=len(issues),
+                                     elapsed=time.perf_counter() - started)
+        return issues
+
+    def reset(self) -> None:
+        self.stats = ValidationStats()
+        self._frame = None
+        self._row_issues = _issues_frame([])
+
+    def _changed_rows(self, df: pd.DataFrame) -> Optional[pd.Index]:
+        # None: não há como comparar e a tabela inteira é conferida
+        previous = self._frame
+        if previous is None or not previous.columns.equals(df.columns) \
+                or not df.index.is_unique or not previous.index.is_unique:
+            return None
+        common = df.index.intersection(previous.index, sort=False)
+        before, after = previous.loc[common], df.loc[common]
+        changed = np.zeros(len(common), dtype=bool)
+        for column in df.columns:
+            a, b = after[column], before[column]
+            same = (a == b).fillna(False).to_numpy(dtype=bool) | (a.isna() & b.isna()).to_numpy(dtype=bool)
+            changed |= ~same
+        return common[changed].append(df.index.difference(previous.index, sort=False))
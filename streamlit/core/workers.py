@@ -0,0 +1,365 @@
+# Pool de processos para operações pesadas sobre DataFrames
+import os
+import glob
+import time
+import uuid
+import tempfile
+import threading
+import multiprocessing
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple, Callable, Iterator
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow é opcional
+    pa = None
+    pq = None
+
+from .jobs import Job, JobCancelled
+from .memory import MB
+
+# Os frames trocados com os processos ficam em memória compartilhada (tmpfs)
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+_FRAME_PREFIX = 'excel_frame_'
+
+# Intervalo de verificação de tempo, memória e cancelamento das tarefas
+_POLL_SECONDS = 0.1
+
+
+class WorkerError(Exception):
+    """Falha de uma tarefa no processo de trabalho"""
+    pass
+
+
+class WorkerTimeout(WorkerError):
+    """A tarefa passou do tempo máximo e o processo foi encerrado"""
+    pass
+
+
+class WorkerMemoryExceeded(WorkerError):
+    """O processo passou do limite de memória e foi encerrado"""
+    pass
+
+
+@dataclass(frozen=True)
+class FrameRef:
+    """
+    DataFrame entregue a outro processo por arquivo, sem pickle
+
+    `arrow`: Arrow IPC em memória compartilhada, lido com memory-map e apagado
+    por quem o criou. `parquet`: arquivo do DatasetStore, lido diretamente pelo
+    processo (apenas as colunas pedidas); chega às tarefas como FrameRef, para
+    que elas decidam entre `as_frame` e a leitura em blocos de `iter_frame`.
+    """
+    path: str
+    format: str = 'arrow'
+    columns: Optional[Tuple[str, ...]] = None
+
+
+def share_frame(df: pd.DataFrame) -> Any:
+    """
+    Grava o DataFrame em Arrow IPC na memória compartilhada e retorna a referência
+    Sem pyarrow, ou com tipos que o Arrow não representa, o próprio DataFrame segue por pickle
+    """
+    if pa is None:
+        return df
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+    except (pa.ArrowException, TypeError, ValueError):
+        return df
+
+    path = os.path.join(SHARED_DIR, f"{_FRAME_PREFIX}{os.getpid()}_{uuid.uuid4().hex}.arrow")
+    try:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    except BaseException:
+        release_frame(FrameRef(path))
+        raise
+    return FrameRef(path)
+
+
+def open_frame(ref: FrameRef) -> pd.DataFrame:
+    """Lê um DataFrame referenciado (Arrow IPC com memory-map: as páginas são as do arquivo)"""
+    columns = list(ref.columns) if ref.columns is not None else None
+    if ref.format == 'parquet':
+        return pq.read_table(ref.path, columns=columns, memory_map=True).to_pandas()
+    table = pa.ipc.open_file(pa.memory_map(ref.path)).read_all()
+    df = table.to_pandas()
+    return df[columns] if columns is not None else df
+
+
+def as_frame(source: Any) -> pd.DataFrame:
+    """DataFrame de uma referência (ou o próprio DataFrame)"""
+    return open_frame(source) if isinstance(source, FrameRef) else source
+
+
+def iter_frame(source: Any, columns: Optional[List[str]] = None,
+               batch_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+    """Percorre um DataFrame (ou referência) em blocos; em Parquet, lê um bloco por vez do disco"""
+    if isinstance(source, FrameRef) and source.format == 'parquet':
+        parquet_file = pq.ParquetFile(source.path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    df = as_frame(source)
+    if columns is not None:
+        df = df[columns]
+    for start in range(0, len(df), batch_rows):
+        yield df.iloc[start:start + batch_rows]
+
+
+def release_frame(ref: FrameRef) -> None:
+    """Apaga o arquivo de um frame compartilhado (arquivos do DatasetStore não são tocados)"""
+    if ref.format == 'arrow':
+        try:
+            os.remove(ref.path)
+        except OSError:
+            pass
+
+
+def _pack(value: Any) -> Any:
+    # DataFrames (inclusive dentro de tuplas, listas e dicionários) viram referências
+    if isinstance(value, pd.DataFrame):
+        return share_frame(value)
+    if isinstance(value, (tuple, list)):
+        return type(value)(_pack(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _pack(item) for key, item in value.items()}
+    return value
+
+
+def _unpack(value: Any, release: bool = False) -> Any:
+    # Em tarefas de blocos (iter_frame), a referência Parquet segue como está
+    if isinstance(value, FrameRef):
+        if value.format == 'parquet':
+            return value
+        df = open_frame(value)
+        if release:
+            release_frame(value)
+        return df
+    if isinstance(value, (tuple, list)):
+        return type(value)(_unpack(item, release) for item in value)
+    if isinstance(value, dict):
+        return {key: _unpack(item, release) for key, item in value.items()}
+    return value
+
+
+def _frames(value: Any) -> List[FrameRef]:
+    if isinstance(value, FrameRef):
+        return [value]
+    if isinstance(value, (tuple, list)):
+        return [ref for item in value for ref in _frames(item)]
+    if isinstance(value, dict):
+        return [ref for item in value.values() for ref in _frames(item)]
+    return []
+
+
+def _worker_main(conn: Any) -> None:
+    """Laço do processo de trabalho: recebe (função, argumentos) e devolve o resultado"""
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+
+        fn, args, kwargs = task
+        try:
+            result = ('ok', _pack(fn(*_unpack(args), **_unpack(kwargs))))
+        except Exception as e:
+            result = ('error', e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # Exceções que não podem ser serializadas chegam como WorkerError
+            conn.send(('error', WorkerError(f"{type(result[1]).__name__}: {result[1]}" if result[0] == 'error'
+                                            else f"Resultado não serializável: {e}")))
+
+
+class _Worker:
+    """Processo de trabalho e a ponta do pipe do lado do servidor"""
+
+    def __init__(self, context: Any):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True,
+                                       name='excel-worker')
+        self.process.start()
+        child_conn.close()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def rss(self) -> int:
+        """Memória residente do processo (0 onde /proc não existe)"""
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            return 0
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+        # Frames de resultado que o processo não chegou a entregar
+        for path in glob.glob(os.path.join(SHARED_DIR, f"{_FRAME_PREFIX}{self.process.pid}_*")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+
+
+class WorkerPool:
+    """
+    Processos de trabalho para operações que prendem o GIL (merge, replace,
+    describe, agrupamentos): enquanto uma sessão espera o resultado, as demais
+    continuam sendo atendidas.
+
+    Os DataFrames vão e voltam como Arrow IPC em memória compartilhada (ou
+    direto do arquivo Parquet do DatasetStore), sem pickle. Cada tarefa tem
+    tempo máximo e limite de memória: ao passar de um deles, ou se a tarefa
+    for cancelada, o processo é encerrado e substituído na próxima tarefa.
+    """
+
+    def __init__(self, max_workers: int = 2, timeout: Optional[float] = None,
+                 memory_bytes: Optional[int] = None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.memory_bytes = memory_bytes
+        self.completed = 0
+        self.failed = 0
+        self.killed = 0
+        self.peak_bytes = 0
+        self._idle: List[_Worker] = []
+        self._busy = 0
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        # spawn: fork de um servidor com várias threads não é seguro
+        self._context = multiprocessing.get_context('spawn')
+
+    def run(self, fn: Callable[..., Any], *args, job: Optional[Job] = None, timeout: Optional[float] = None,
+            memory_bytes: Optional[int] = None, **kwargs) -> Any:
+        """
+        Executa `fn(*args, **kwargs)` num processo e espera o resultado
+        `fn` precisa ser uma função de módulo; com `job`, o cancelamento encerra o processo
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        memory_bytes = memory_bytes if memory_bytes is not None else self.memory_bytes
+        packed_args, packed_kwargs = _pack(args), _pack(kwargs)
+        try:
+            self._acquire(job)
+            try:
+                status, payload = self._execute(fn, packed_args, packed_kwargs, job, timeout, memory_bytes)
+            finally:
+                self._slots.release()
+        finally:
+            for ref in _frames((packed_args, packed_kwargs)):
+                release_frame(ref)
+
+        if status == 'error':
+            self.failed += 1
+            raise payload
+        self.completed += 1
+        return _unpack(payload, release=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': len(self._idle) + self._busy,
+                'busy': self._busy,
+                'max_workers': self.max_workers,
+                'completed': self.completed,
+                'failed': self.failed,
+                'killed': self.killed,
+                'peak_bytes': self.peak_bytes
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+    # Internos --------------------------------------------------------------
+
+    def _acquire(self, job: Optional[Job]) -> None:
+        # Na fila por um processo livre, sem deixar de atender o cancelamento
+        while not self._slots.acquire(timeout=_POLL_SECONDS):
+            if job is not None and job.cancel_requested:
+                raise JobCancelled()
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            self._busy += 1
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive:
+                    return worker
+        return _Worker(self._context)
+
+    def _checkin(self, worker: Optional[_Worker]) -> None:
+        with self._lock:
+            self._busy -= 1
+            if worker is not None:
+                self._idle.append(worker)
+
+    def _execute(self, fn: Callable[..., Any], args: Any, kwargs: Any, job: Optional[Job],
+                 timeout: Optional[float], memory_bytes: Optional[int]) -> Tuple[str, Any]:
+        worker = self._checkout()
+        started = time.monotonic()
+        try:
+            worker.conn.send((fn, args, kwargs))
+            while not worker.conn.poll(_POLL_SECONDS):
+                if not worker.alive:
+                    raise WorkerError("O processo de trabalho terminou inesperadamente")
+                if job is not None and job.cancel_requested:
+                    raise JobCancelled()
+                if timeout is not None and time.monotonic() - started > timeout:
+                    raise WorkerTimeout(f"A operação passou do tempo máximo de {timeout:.0f}s")
+                rss = worker.rss()
+                self.peak_bytes = max(self.peak_bytes, rss)
+                if memory_bytes is not None and rss > memory_bytes:
+                    raise WorkerMemoryExceeded(
+                        f"A operação passou do limite de memória de {memory_bytes / MB:.0f} MB"
+                    )
+            result = worker.conn.recv()
+        except BaseException:
+            self.killed += 1
+            worker.kill()
+            self._checkin(None)
+            raise
+        self._checkin(worker)
+        return result
+
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> WorkerPool:
+    """Pool de processos de trabalho do servidor (único para todas as sessões)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            memory_mb = os.environ.get('EXCEL_WORKER_MEMORY_MB')
+            _pool = WorkerPool(
+                max_workers=int(os.environ.get('EXCEL_WORKERS', 2)),
+                timeout=float(os.environ.get('EXCEL_WORKER_TIMEOUT', 600)),
+                memory_bytes=int(memory_mb) * MB if memory_mb else None
+            )
+        return _pool
@@ -0,0 +1,265 @@
+# Workspace persistente: datasets em Parquet e metadados em SQLite
+import os
+import re
+import json
+import uuid
+import threading
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional
+
+from sqlalchemy import (
+    JSON, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, UniqueConstraint,
+    create_engine, delete, insert, select, update
+)
+
+from .storage import DatasetStore, DatasetHandle, dataset_file_size, remove_dataset_file
+
+_metadata = MetaData()
+
+workspaces_table = Table(
+    'workspaces', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user', String(200), nullable=False),
+    Column('name', String(200), nullable=False),
+    Column('created_at', DateTime, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+    UniqueConstraint('user', 'name')
+)
+
+datasets_table = Table(
+    'datasets', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('workspace_id', Integer, ForeignKey('workspaces.id', ondelete='CASCADE'), nullable=False),
+    Column('name', String(500), nullable=False),
+    Column('position', Integer, nullable=False, default=0),
+    Column('file', String(100), nullable=False),
+    Column('format', String(20), nullable=False),
+    Column('num_rows', Integer, nullable=False),
+    Column('columns', JSON, nullable=False),
+    Column('nbytes', Integer, nullable=False),
+    Column('memory_bytes', Integer, nullable=False),
+    Column('info', JSON, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+    UniqueConstraint('workspace_id', 'name')
+)
+
+settings_table = Table(
+    'settings', _metadata,
+    Column('workspace_id', Integer, ForeignKey('workspaces.id', ondelete='CASCADE'), primary_key=True),
+    Column('key', String(100), primary_key=True),
+    Column('value', JSON, nullable=False)
+)
+
+
+@dataclass
+class WorkspaceConfig:
+    """Onde ficam os workspaces persistentes e se a persistência está ativa"""
+    enabled: bool = field(default_factory=lambda: os.environ.get('EXCEL_WORKSPACE', 'on').lower() not in
+                          ('0', 'off', 'false', 'no'))
+    base_dir: str = field(default_factory=lambda: os.environ.get(
+        'EXCEL_WORKSPACE_DIR', os.path.join(os.path.expanduser('~'), '.excel_workspaces')
+    ))
+
+
+@dataclass
+class WorkspaceDataset:
+    """Dataset salvo no workspace (metadados; os dados ficam no arquivo)"""
+    name: str
+    file: str
+    format: str
+    num_rows: int
+    columns: List[str]
+    nbytes: int
+    memory_bytes: int
+    info: Dict[str, Any]
+    updated_at: datetime
+
+
+class WorkspaceStore:
+    """
+    Workspaces persistentes por usuário: cada dataset é um arquivo imutável
+    (Parquet, ou pickle quando os tipos não cabem em Parquet; versões montadas
+    por colunas são um diretório com as peças) e o catálogo,
+    com as configurações da sessão, fica em um SQLite.
+
+    Restaurar um workspace não lê os dados: `restore` apenas registra os
+    arquivos no DatasetStore da sessão, que os lê sob demanda.
+    """
+
+    def __init__(self, config: Optional[WorkspaceConfig] = None):
+        self.config = config or WorkspaceConfig()
+        os.makedirs(self.config.base_dir, exist_ok=True)
+        self.engine = create_engine(
+            f"sqlite:///{os.path.join(self.config.base_dir, 'workspaces.db')}",
+            json_serializer=lambda value: json.dumps(value, default=_json_default)
+        )
+        _metadata.create_all(self.engine)
+        self._lock = threading.Lock()
+
+    # Workspaces ------------------------------------------------------------
+
+    def workspace_id(self, user: str, name: str) -> int:
+        """Identificador do workspace (criado na primeira vez)"""
+        with self.engine.begin() as conn:
+            row = conn.execute(select(workspaces_table.c.id).where(
+                workspaces_table.c.user == user, workspaces_table.c.name == name
+            )).first()
+            if row is not None:
+                return row.id
+            now = datetime.now()
+            return conn.execute(insert(workspaces_table).values(
+                user=user, name=name, created_at=now, updated_at=now
+            )).inserted_primary_key[0]
+
+    def list_workspaces(self, user: str) -> List[str]:
+        with self.engine.connect() as conn:
+            return list(conn.execute(
+                select(workspaces_table.c.name).where(workspaces_table.c.user == user)
+                .order_by(workspaces_table.c.name)
+            ).scalars())
+
+    def delete_workspace(self, user: str, name: str) -> None:
+        """Apaga o workspace, seus datasets e configurações"""
+        workspace_id = self.workspace_id(user, name)
+        for dataset in self.datasets(workspace_id):
+            self._remove_file(workspace_id, dataset.file, dataset.format)
+        with self.engine.begin() as conn:
+            conn.execute(delete(datasets_table).where(datasets_table.c.workspace_id == workspace_id))
+            conn.execute(delete(settings_table).where(settings_table.c.workspace_id == workspace_id))
+            conn.execute(delete(workspaces_table).where(workspaces_table.c.id == workspace_id))
+
+    # Datasets --------------------------------------------------------------
+
+    def datasets(self, workspace_id: int) -> List[WorkspaceDataset]:
+        """Datasets do workspace na ordem em que foram criados"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(datasets_table).where(datasets_table.c.workspace_id == workspace_id)
+                .order_by(datasets_table.c.position, datasets_table.c.id)
+            ).mappings().all()
+        return [WorkspaceDataset(
+            name=row['name'], file=row['file'], format=row['format'], num_rows=row['num_rows'],
+            columns=row['columns'], nbytes=row['nbytes'], memory_bytes=row['memory_bytes'],
+            info=row['info'], updated_at=row['updated_at']
+        ) for row in rows]
+
+    def save_dataset(self, workspace_id: int, name: str, store: DatasetStore, handle: DatasetHandle,
+                     info: Dict[str, Any], position: int = 0) -> WorkspaceDataset:
+        """
+        Grava a versão `handle` do dataset como um novo arquivo e troca a
+        entrada do catálogo; o arquivo anterior é apagado depois da troca
+        """
+        file = uuid.uuid4().hex
+        file_format = store.save(handle, self._file_path(workspace_id, file))
+        values = dict(
+            file=file, format=file_format, num_rows=handle.num_rows, columns=list(handle.columns),
+            nbytes=dataset_file_size(f"{self._file_path(workspace_id, file)}.{file_format}"),
+            memory_bytes=handle.memory_bytes, info=info, position=position, updated_at=datetime.now()
+        )
+
+        with self._lock, self.engine.begin() as conn:
+            previous = conn.execute(select(datasets_table.c.file, datasets_table.c.format).where(
+                datasets_table.c.workspace_id == workspace_id, datasets_table.c.name == name
+            )).first()
+            if previous is None:
+                conn.execute(insert(datasets_table).values(workspace_id=workspace_id, name=name, **values))
+            else:
+                conn.execute(update(datasets_table).where(
+                    datasets_table.c.workspace_id == workspace_id, datasets_table.c.name == name
+                ).values(**values))
+            self._touch(conn, workspace_id)
+
+        if previous is not None:
+            self._remove_file(workspace_id, previous.file, previous.format)
+        return WorkspaceDataset(name=name, **{k: v for k, v in values.items() if k != 'position'})
+
+    def update_info(self, workspace_id: int, name: str, info: Dict[str, Any]) -> None:
+        """Atualiza só os metadados do dataset (os dados não mudaram)"""
+        with self.engine.begin() as conn:
+            conn.execute(update(datasets_table).where(
+                datasets_table.c.workspace_id == workspace_id, datasets_table.c.name == name
+            ).values(info=info))
+
+    def delete_dataset(self, workspace_id: int, name: str) -> None:
+        with self._lock, self.engine.begin() as conn:
+            previous = conn.execute(select(datasets_table.c.file, datasets_table.c.format).where(
+                datasets_table.c.workspace_id == workspace_id, datasets_table.c.name == name
+            )).first()
+            conn.execute(delete(datasets_table).where(
+                datasets_table.c.workspace_id == workspace_id, datasets_table.c.name == name
+            ))
+            self._touch(conn, workspace_id)
+        if previous is not None:
+            self._remove_file(workspace_id, previous.file, previous.format)
+
+    def restore(self, workspace_id: int, dataset: WorkspaceDataset, store: DatasetStore) -> DatasetHandle:
+        """Registra o arquivo do dataset no armazenamento da sessão, sem ler os dados"""
+        return store.attach(
+            self._file_path(workspace_id, dataset.file), dataset.format,
+            dataset.num_rows, dataset.columns, dataset.memory_bytes
+        )
+
+    def disk_bytes(self, workspace_id: int) -> int:
+        return sum(dataset.nbytes for dataset in self.datasets(workspace_id))
+
+    # Configurações ---------------------------------------------------------
+
+    def settings(self, workspace_id: int) -> Dict[str, Any]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(settings_table.c.key, settings_table.c.value).where(
+                settings_table.c.workspace_id == workspace_id
+            )).all()
+        return {row.key: row.value for row in rows}
+
+    def save_setting(self, workspace_id: int, key: str, value: Any) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(delete(settings_table).where(
+                settings_table.c.workspace_id == workspace_id, settings_table.c.key == key
+            ))
+            conn.execute(insert(settings_table).values(workspace_id=workspace_id, key=key, value=value))
+
+    # Internos --------------------------------------------------------------
+
+    def _touch(self, conn: Any, workspace_id: int) -> None:
+        conn.execute(update(workspaces_table).where(workspaces_table.c.id == workspace_id)
+                     .values(updated_at=datetime.now()))
+
+    def _file_path(self, workspace_id: int, file: str) -> str:
+        directory = os.path.join(self.config.base_dir, str(workspace_id))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, file)
+
+    def _remove_file(self, workspace_id: int, file: str, file_format: str) -> None:
+        remove_dataset_file(f"{self._file_path(workspace_id, file)}.{file_format}")
+
+
+def workspace_name(value: Optional[str], default: str = 'default') -> str:
+    """Nome de workspace seguro para exibir e guardar (letras, números, - e _)"""
+    name = re.sub(r'[^\w\-]+', '-', (value or '').strip()).strip('-')[:100]
+    return name or default
+
+
+def _json_default(value: Any) -> Any:
+    # Escalares do numpy/pandas e datas vindos de DataFrames
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+_workspace_store: Optional[WorkspaceStore] = None
+_workspace_lock = threading.Lock()
+
+
+def get_workspace_store() -> Optional[WorkspaceStore]:
+    """Catálogo de workspaces do processo (None quando a persistência está desativada)"""
+    global _workspace_store
+    with _workspace_lock:
+        if _workspace_store is None:
+            config = WorkspaceConfig()
+            if not config.enabled:
+                return None
+            _workspace_store = WorkspaceStore(config)
+        return _workspace_store
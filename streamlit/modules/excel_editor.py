@@ -6,8 +6,66 @@ Editor completo para planilhas Excel com funcionalidades avançadas
 import streamlit as st
 import pandas as pd
 import io
-from typing import Dict, List, Any, Optional
+import os
+import copy
+import time
+import uuid
+import weakref
+import dataclasses
+from typing import Dict, List, Any, Optional, Tuple, Iterator, Callable
+from sqlalchemy.exc import SQLAlchemyError
 from core.base import BaseModule, UIComponents
+from core.cache import WorkbookCache, content_hash, frame_nbytes
+from core.storage import DatasetStore, DatasetHandle, create_dataset_store
+from core.journal import EditJournal
+from core.ingest import (
+    FILE_FORMATS, FORMAT_LABELS, IngestOptions, file_format, read_columnar, read_csv_chunked, read_excel_sheet
+)
+from core.memory import MB, get_memory_budget
+from core.joins import JOIN_TYPES, KeyIndex, KeyIndexCache
+from core.mapping import NormalizeOptions
+from core.expressions import ExpressionError
+from core.aggregate import AGGREGATIONS
+from core.engine import ARITHMETIC, OperationEngine
+from core.pipeline import (
+    FILTER_OPS, FilterStep, FormulaStep, GroupStep, JoinStep, LookupStep, Pipeline, SelectStep, step_columns, validate
+)
+from core.export import EXPORT_FORMATS, PARQUET_COMPRESSIONS, ExportCache, ExportOptions, csv_date_formats, export_file
+from core.jobs import Job, CANCELLED, DONE, FAILED, STATUS_LABELS, get_job_runner
+from core.shared import get_shared_cache
+from core.workers import get_worker_pool
+from core.profiling import ColumnProfile, DatasetProfile, ProfileCache, profile_frame, update_profile
+from core.workspace import get_workspace_store, workspace_name
+
+# Datasets até este tamanho são perfilados na hora; acima, em segundo plano
+# com uma prévia calculada sobre as primeiras linhas
+PROFILE_SYNC_ROWS = 100_000
+PROFILE_PREVIEW_ROWS = 20_000
+
+# Estado da sessão que é salvo no workspace junto com os datasets
+WORKSPACE_SETTINGS = ('excel_config', 'manual_replacements', 'depara_maps', 'pipelines')
+
+
+def _read_csv_job(job: Job, data: bytes, options: IngestOptions) -> tuple:
+    """Tarefa de leitura de CSV (roda no pool de threads)"""
+    return read_csv_chunked(io.BytesIO(data), options, progress=job.report, total_bytes=len(data))
+
+
+def _read_columnar_job(job: Job, data: bytes, upload_format: str, options: IngestOptions) -> tuple:
+    """Tarefa de leitura de Parquet, Feather ou JSON Lines (roda no pool de threads)"""
+    return read_columnar(data, upload_format, options, progress=job.report)
+
+
+def _profile_job(job: Job, df: pd.DataFrame) -> DatasetProfile:
+    """Tarefa de perfil completo de um dataset (roda no pool de threads)"""
+    return profile_frame(df, progress=job.report)
+
+
+def _update_profile_job(job: Job, previous: DatasetProfile, columns: List[str],
+                        changed: Optional[pd.DataFrame], appended: Optional[pd.DataFrame]) -> DatasetProfile:
+    """Tarefa de atualização incremental do perfil após uma edição"""
+    return update_profile(previous, columns, changed, appended, progress=job.report)
+
 
 class ExcelModule(BaseModule):
     """Módulo completo para edição e manipulação de arquivos Excel"""
@@ -22,6 +80,9 @@ class ExcelModule(BaseModule):
     def render(self) -> None:
         """Renderiza o módulo completo de edição de Excel"""
         self.show_header()
+        self._restore_workspace()
+        self._report_memory()
+        self._collect_jobs()
         
         # Configuração de abas principais
         tab_configs = [
@@ -33,26 +94,30 @@ class ExcelModule(BaseModule):
         ]
         
         tabs = UIComponents.tabs(tab_configs)
-        
-        # Aba 1: Upload de arquivo Excel
-        with tabs['upload']['tab']:
-            self._render_upload_tab()
-        
-        # Aba 2: Editor avançado
-        with tabs['editor']['tab']:
-            self._render_editor_tab()
-        
-        # Aba 3: Operações de dados (NOVO!)
-        with tabs['operations']['tab']:
-            self._render_operations_tab()
-        
-        # Aba 4: Análise de dados
-        with tabs['analysis']['tab']:
-            self._render_analysis_tab()
-        
-        # Aba 5: Configurações
-        with tabs['config']['tab']:
-            self._render_config_tab()
+
+        try:
+            # Aba 1: Upload de arquivo Excel
+            with tabs['upload']['tab']:
+                self._render_upload_tab()
+            
+            # Aba 2: Editor avançado
+            with tabs['editor']['tab']:
+                self._render_editor_tab()
+            
+            # Aba 3: Operações de dados (NOVO!)
+            with tabs['operations']['tab']:
+                self._render_operations_tab()
+            
+            # Aba 4: Análise de dados
+            with tabs['analysis']['tab']:
+                self._render_analysis_tab()
+            
+            # Aba 5: Configurações
+            with tabs['config']['tab']:
+                self._render_config_tab()
+        finally:
+            # Alterações desta execução vão para o workspace (também quando há st.rerun)
+            self._sync_workspace()
     
     def _render_upload_tab(self) -> None:
         """Renderiza aba de upload de múltiplos arquivos Excel"""
@@ -72,59 +137,35 @@ class ExcelModule(BaseModule):
             # Upload de múltiplos arquivos
             arquivos_excel = st.file_uploader(
                 "Selecione um ou mais arquivos:",
-                ['xlsx', 'xls', 'csv'],
+                [extension.lstrip('.') for extension in FILE_FORMATS],
                 accept_multiple_files=True,
-                help="Formatos suportados: .xlsx, .xls, .csv. Você pode selecionar múltiplos arquivos."
+                help="Formatos suportados: .xlsx, .xls, .csv, .parquet, .feather/.arrow e .jsonl/.ndjson. "
+                     "Você pode selecionar múltiplos arquivos."
             )
             
+            csv_options = self._render_csv_options()
+            
             if arquivos_excel:
+                dataset_names = {}
                 for arquivo in arquivos_excel:
-                    try:
-                        # Processar cada arquivo
-                        dataset_name = st.text_input(
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        dataset_names[arquivo.name] = st.text_input(
                             f"Nome para a tabela '{arquivo.name}':",
                             value=arquivo.name.split('.')[0],
                             key=f"name_{arquivo.name}"
                         )
-                        
-                        if st.button(f"📤 Processar {arquivo.name}", key=f"process_{arquivo.name}"):
-                            # Determinar tipo de arquivo e ler
-                            if arquivo.name.endswith('.csv'):
-                                df = pd.read_csv(arquivo)
-                                sheet_info = {'sheets': ['CSV']}
-                            else:
-                                # Ler arquivo Excel e obter nomes das abas
-                                excel_file = pd.ExcelFile(arquivo)
-                                sheet_names = excel_file.sheet_names
-                                
-                                if len(sheet_names) > 1:
-                                    # Para múltiplas sheets, vamos carregar a primeira por padrão
-                                    df = pd.read_excel(arquivo, sheet_name=sheet_names[0])
-                                    sheet_info = {'sheets': sheet_names, 'selected': sheet_names[0]}
-                                else:
-                                    df = pd.read_excel(arquivo, sheet_name=sheet_names[0])
-                                    sheet_info = {'sheets': sheet_names, 'selected': sheet_names[0]}
-                            
-                            # Salvar dataset no session state
-                            st.session_state['datasets'][dataset_name] = {
-                                'data': df,
-                                'original': df.copy(),
-                                'filename': arquivo.name,
-                                'sheet_info': sheet_info,
-                                'size': arquivo.size
-                            }
-                            
-                            # Armazenar arquivo original para permitir troca de planilhas (apenas para Excel)
-                            if not arquivo.name.endswith('.csv'):
-                                arquivo.seek(0)  # Voltar ao início do arquivo
-                                st.session_state[f"original_file_{dataset_name}"] = arquivo.read()
-                                arquivo.seek(0)  # Voltar ao início novamente
-                            
-                            self.show_success(f"Dataset '{dataset_name}' adicionado com sucesso!")
-                            st.rerun()
-                            
-                    except Exception as e:
-                        self.show_error(f"Erro ao processar '{arquivo.name}': {str(e)}")
+                    with col2:
+                        st.write("")
+                        if st.button(f"📤 Processar", key=f"process_{arquivo.name}"):
+                            self._submit_uploads([arquivo], dataset_names, csv_options)
+                
+                if len(arquivos_excel) > 1 and st.button(
+                    f"📤 Processar todos ({len(arquivos_excel)} arquivos)", type="primary", width="stretch"
+                ):
+                    self._submit_uploads(arquivos_excel, dataset_names, csv_options)
+            
+            self._render_jobs_panel()
         
         # Visualizar tabelas carregadas
         with upload_tabs[1]:
@@ -133,23 +174,74 @@ class ExcelModule(BaseModule):
             if not st.session_state['datasets']:
                 st.info("Nenhuma tabela carregada ainda. Faça upload de arquivos na aba anterior.")
             else:
+                budget = get_memory_budget()
+                session_usage = budget.session_usage(self._session_id())
+                st.progress(
+                    min(session_usage / budget.config.session_bytes, 1.0),
+                    text=f"🧠 Memória da sessão: {session_usage / MB:.1f} MB de {budget.config.session_bytes / MB:.0f} MB "
+                         f"(servidor: {budget.total_usage() / MB:.0f} MB de {budget.config.global_bytes / MB:.0f} MB)"
+                )
+                cache_stats = self._get_workbook_cache().stats()
+                st.caption(
+                    f"🗂️ Cache de planilhas: {cache_stats['sheets']} planilha(s) em memória "
+                    f"({cache_stats['bytes'] / 1024 / 1024:.1f} MB) · "
+                    f"{cache_stats['hits']} acertos / {cache_stats['misses']} leituras"
+                )
+                shared_stats = get_shared_cache().stats()
+                st.caption(
+                    f"🤝 Cache compartilhado entre sessões: {shared_stats['entries']} arquivo(s) lido(s) "
+                    f"({shared_stats['bytes'] / MB:.1f} MB), {shared_stats['shared']} em uso por mais de uma sessão · "
+                    f"{shared_stats['hits']} reaproveitamentos"
+                )
+                worker_stats = get_worker_pool().stats()
+                st.caption(
+                    f"⚙️ Processos de trabalho: {worker_stats['busy']} ocupado(s) de {worker_stats['max_workers']} · "
+                    f"{worker_stats['completed']} operação(ões) concluída(s), {worker_stats['killed']} interrompida(s) · "
+                    f"pico de {worker_stats['peak_bytes'] / MB:.0f} MB"
+                )
+
                 # Mostrar informações de cada dataset
                 for name, dataset_info in st.session_state['datasets'].items():
                     with st.expander(f"📊 {name} ({dataset_info['filename']})"):
-                        df = dataset_info['data']
+                        handle = dataset_info['journal'].handle
                         
                         # Métricas
                         col1, col2, col3, col4 = st.columns(4)
                         with col1:
-                            st.metric("📄 Linhas", len(df))
+                            st.metric("📄 Linhas", handle.num_rows)
                         with col2:
-                            st.metric("📊 Colunas", len(df.columns))
+                            st.metric("📊 Colunas", len(handle.columns))
                         with col3:
                             sheet_info = dataset_info.get('sheet_info', {'sheets': ['Dados']})
                             sheet_count = len(sheet_info['sheets'])
                             st.metric("📋 Planilhas", sheet_count)
                         with col4:
-                            st.metric("💾 Tamanho", f"{dataset_info['size'] / 1024:.1f} KB")
+                            memory = self._dataset_memory(dataset_info)
+                            st.metric(
+                                "💾 Memória",
+                                f"{memory['total'] / MB:.1f} MB",
+                                help="Memória real (memory_usage deep) da versão atual, da base, das edições e do cache de planilhas"
+                            )
+                        
+                        st.caption(
+                            f"Atual: {memory['current'] / MB:.1f} MB · Base: {memory['base'] / MB:.1f} MB · "
+                            f"Edições: {memory['journal'] / MB:.1f} MB · Cache de planilhas: {memory['cache'] / MB:.1f} MB · "
+                            f"Em disco: {memory['disk'] / MB:.1f} MB · Arquivo: {dataset_info['size'] / MB:.1f} MB"
+                        )
+                        
+                        # Resultado da otimização de tipos na ingestão
+                        ingest_report = dataset_info.get('ingest_report')
+                        if ingest_report and ingest_report.memory_before:
+                            st.caption(
+                                f"⚡ Ingestão ({ingest_report.engine}, {ingest_report.elapsed:.1f}s): "
+                                f"{ingest_report.memory_before / 1024 / 1024:.1f} MB → "
+                                f"{ingest_report.memory_after / 1024 / 1024:.1f} MB "
+                                f"({ingest_report.saved_ratio:.0%} economizados)"
+                            )
+                            if ingest_report.conversions:
+                                st.caption("Tipos otimizados: " + ", ".join(
+                                    f"{column} → {dtype}" for column, dtype in ingest_report.conversions.items()
+                                ))
                         
                         # Mostrar planilhas disponíveis se houver mais de uma
                         sheet_info = dataset_info.get('sheet_info', {'sheets': ['Dados']})
@@ -158,14 +250,14 @@ class ExcelModule(BaseModule):
                             current_sheet = sheet_info.get('selected', sheet_info['sheets'][0])
                             st.write(f"**📌 Planilha atual:** {current_sheet}")
                         
-                        # Preview
-                        st.dataframe(df.head(5))
+                        # Preview (lê apenas as primeiras linhas)
+                        st.dataframe(self._get_store().read_rows(handle, 0, 5))
                         
                         # Botões de ação
                         col1, col2 = st.columns(2)
                         with col1:
                             if st.button(f"🗑️ Remover {name}", key=f"remove_{name}"):
-                                del st.session_state['datasets'][name]
+                                self._remove_dataset(name)
                                 st.rerun()
                         with col2:
                             if st.button(f"✏️ Editar {name}", key=f"edit_{name}"):
@@ -211,13 +303,12 @@ class ExcelModule(BaseModule):
                     )
                     
                     # Adicionar ao datasets
-                    st.session_state['datasets'][new_table_name] = {
-                        'data': df,
-                        'original': df.copy(),
-                        'filename': f"{new_table_name}.xlsx",
-                        'sheet_info': {'sheets': ['Dados'], 'selected': 'Dados'},
-                        'size': 0
-                    }
+                    self._add_dataset(
+                        new_table_name, df,
+                        filename=f"{new_table_name}.xlsx",
+                        sheet_info={'sheets': ['Dados'], 'selected': 'Dados'},
+                        size=0
+                    )
                     
                     self.show_success(f"Tabela '{new_table_name}' criada com sucesso!")
                     st.rerun()
@@ -229,6 +320,214 @@ class ExcelModule(BaseModule):
                 self.show_success("Nova planilha criada!")
                 st.rerun()
     
+    def _submit_uploads(self, arquivos: List[Any], dataset_names: Dict[str, str],
+                        csv_options: IngestOptions) -> None:
+        """Envia os arquivos para processamento em segundo plano (em paralelo)"""
+        try:
+            # Recusar de imediato arquivos que não cabem no orçamento de memória
+            self._ensure_memory(sum(arquivo.size for arquivo in arquivos), f"{len(arquivos)} arquivo(s)")
+        except Exception as e:
+            self.show_error(str(e))
+            return
+        
+        runner = get_job_runner()
+        shared = get_shared_cache()
+        jobs = st.session_state.setdefault('upload_jobs', [])
+        for arquivo in arquivos:
+            data = arquivo.getvalue()
+            upload_format = file_format(arquivo.name)
+            record = {
+                'dataset_name': dataset_names[arquivo.name],
+                'filename': arquivo.name,
+                'size': arquivo.size,
+                'file_hash': None,
+                'shared_key': self._shared_key(content_hash(data), upload_format, csv_options),
+                'collected': False,
+                'message': None
+            }
+            if upload_format != 'excel':
+                record['sheet'] = FORMAT_LABELS[upload_format]
+            else:
+                # O workbook fica registrado no cache da sessão para as trocas de planilha
+                record['file_hash'] = self._get_workbook_cache().register(data, spill=self._get_store().put_bytes)
+
+            # Arquivo idêntico já lido (ou sendo lido) por outra sessão: nada a processar
+            if self._collect_shared(record):
+                jobs.append(record)
+                continue
+            job = shared.join_pending(record['shared_key'], self._session_id())
+            if job is not None:
+                record['job'] = job
+                jobs.append(record)
+                continue
+
+            if upload_format == 'csv':
+                # Leitura em blocos numa thread, com progresso e cancelamento entre blocos
+                record['job'] = runner.submit(arquivo.name, _read_csv_job, data, csv_options)
+            elif upload_format != 'excel':
+                # Formatos colunares: o pyarrow libera o GIL, a thread basta
+                record['job'] = runner.submit(arquivo.name, _read_columnar_job, data, upload_format, csv_options)
+            else:
+                # openpyxl prende o GIL: o parse roda num processo separado
+                record['job'] = runner.submit(arquivo.name, read_excel_sheet, data, kind='process')
+            shared.add_pending(record['shared_key'], self._session_id(), record['job'])
+            jobs.append(record)
+    
+    def _collect_jobs(self) -> None:
+        """Registra como datasets os resultados das tarefas concluídas"""
+        for record in st.session_state.get('upload_jobs', []):
+            job = record['job']
+            if record['collected'] or not job.done:
+                continue
+            record['collected'] = True
+            if job.status != DONE or record.get('abandoned'):
+                continue
+            
+            try:
+                # Outra sessão que acompanhava a mesma tarefa pode já ter guardado o resultado
+                if job.result is not None and not self._collect_shared(record):
+                    if record['file_hash']:
+                        sheet_names, df = job.result
+                        self._get_workbook_cache().prime(record['file_hash'], sheet_names, sheet_names[0], df)
+                        # Para múltiplas sheets, a primeira é carregada por padrão
+                        meta = {'sheets': sheet_names}
+                        key, aliases = self._shared_key(record['file_hash'], 'excel', sheet=sheet_names[0]), \
+                            (record['shared_key'],)
+                    else:
+                        df, ingest_report = job.result
+                        meta = {'ingest_report': ingest_report}
+                        key, aliases = record['shared_key'], ()
+
+                    # O dataset lido vai para o cache compartilhado e a sessão o adota
+                    self._ensure_memory(frame_nbytes(df), f"'{record['dataset_name']}'")
+                    get_shared_cache().put(key, df, meta, aliases, holder=self._session_id())
+                    del df
+                    job.result = None
+                if not record['message'] and not self._collect_shared(record):
+                    raise RuntimeError("Resultado indisponível: envie o arquivo novamente")
+            except Exception as e:
+                job.status, job.error = FAILED, str(e)
+            finally:
+                # O resultado já está no armazenamento; não manter uma segunda cópia
+                job.result = None
+
+    def _shared_key(self, digest: str, upload_format: str, options: Optional[IngestOptions] = None,
+                    sheet: Optional[str] = None) -> tuple:
+        """
+        Chave no cache compartilhado: conteúdo do arquivo e forma de leitura
+        Para Excel sem `sheet`, a chave representa a primeira planilha
+        """
+        if upload_format == 'excel':
+            return (digest, 'excel', sheet)
+        return (digest, upload_format, dataclasses.astuple(options or IngestOptions()))
+
+    def _collect_shared(self, record: Dict[str, Any]) -> bool:
+        """Registra o dataset do upload a partir do cache compartilhado, se ele já estiver lá"""
+        hit = get_shared_cache().checkout(record['shared_key'], self._session_id(), self._get_store())
+        if hit is None:
+            return False
+
+        handle, meta = hit
+        if 'sheets' in meta:
+            sheet_info = {'sheets': list(meta['sheets']), 'selected': meta['sheets'][0]}
+        else:
+            label = record.get('sheet', 'CSV')
+            sheet_info = {'sheets': [label], 'selected': label}
+
+        self._register_dataset(
+            record['dataset_name'], handle,
+            filename=record['filename'],
+            sheet_info=sheet_info,
+            size=record['size'],
+            file_hash=record['file_hash']
+        )
+        dataset_info = st.session_state['datasets'][record['dataset_name']]
+        dataset_info['ingest_report'] = meta.get('ingest_report')
+        dataset_info['shared_key'] = record['shared_key']
+        record['collected'] = True
+        if 'job' in record:
+            record['message'] = f"Dataset '{record['dataset_name']}' adicionado com sucesso!"
+        else:
+            # Sem tarefa: o painel mostra um registro já concluído
+            record['job'] = Job(name=record['filename'], status=DONE, progress=1.0,
+                                started=time.time(), finished=time.time())
+            record['message'] = f"Dataset '{record['dataset_name']}' reaproveitado do cache compartilhado (sem nova leitura)"
+        return True
+    
+    def _render_jobs_panel(self) -> None:
+        """Painel de status das tarefas de upload (atualizado enquanto houver tarefas ativas)"""
+        jobs = st.session_state.get('upload_jobs', [])
+        if not jobs:
+            return
+        
+        def panel() -> None:
+            st.markdown("**⚙️ Processamento**")
+            for record in jobs:
+                job = record['job']
+                status = CANCELLED if record.get('abandoned') else job.status
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.progress(
+                        job.progress,
+                        text=f"{STATUS_LABELS[status]} · {record['filename']} → "
+                             f"'{record['dataset_name']}' ({job.elapsed:.1f}s)"
+                    )
+                    if job.status == FAILED:
+                        self.show_error(f"Erro ao processar '{record['filename']}': {job.error}")
+                    elif record['message']:
+                        st.caption(f"✅ {record['message']}")
+                with col2:
+                    if not job.done and not record.get('abandoned') and st.button(
+                            "🚫 Cancelar", key=f"cancel_{record['dataset_name']}_{job.id}"):
+                        # A tarefa pode estar sendo acompanhada por outras sessões (mesmo arquivo)
+                        record['abandoned'] = True
+                        if get_shared_cache().leave_pending(record['shared_key'], self._session_id()):
+                            job.cancel()
+            
+            # Resultados prontos são registrados na próxima execução completa do script
+            if any(record['job'].done and not record['collected'] for record in jobs):
+                st.rerun()
+            
+            if all(record['job'].done or record.get('abandoned') for record in jobs) and st.button("🧹 Limpar lista", key="clear_upload_jobs"):
+                st.session_state['upload_jobs'] = []
+                st.rerun()
+        
+        active = any(not record['job'].done and not record.get('abandoned') for record in jobs)
+        st.fragment(panel, run_every=1.0 if active else None)()
+    
+    def _render_csv_options(self) -> IngestOptions:
+        """Opções de leitura de CSV (blocos, engine e otimização de tipos)"""
+        with st.expander("⚙️ Opções de leitura de CSV"):
+            col1, col2 = st.columns(2)
+            with col1:
+                engine = st.selectbox(
+                    "Engine:",
+                    ["pandas", "pyarrow"],
+                    help="pyarrow lê o arquivo em blocos decodificados em paralelo",
+                    key="csv_engine"
+                )
+                chunksize = st.number_input(
+                    "Linhas por bloco:", min_value=10_000, max_value=1_000_000,
+                    value=100_000, step=10_000, key="csv_chunksize"
+                )
+            with col2:
+                use_categories = st.checkbox(
+                    "🏷️ Texto repetitivo como categoria", value=True, key="csv_categories"
+                )
+                downcast_floats = st.checkbox(
+                    "🔢 Reduzir decimais para float32",
+                    value=False,
+                    help="Economiza memória, mas reduz a precisão para ~7 dígitos",
+                    key="csv_downcast_floats"
+                )
+        
+        return IngestOptions(
+            chunksize=int(chunksize),
+            engine=engine,
+            use_categories=use_categories,
+            downcast_floats=downcast_floats
+        )
+    
     def _render_editor_tab(self) -> None:
         """Renderiza aba de edição dos dados"""
         if not st.session_state['datasets']:
@@ -263,20 +562,8 @@ class ExcelModule(BaseModule):
                 # Se mudou de planilha, recarregar os dados
                 if selected_sheet != sheet_info['selected']:
                     try:
-                        # Recarregar dados da planilha selecionada
-                        filename = dataset_info['filename']
-                        # Precisamos do arquivo original para recarregar uma planilha diferente
-                        # Vamos armazenar o arquivo original no session_state quando fazer upload
-                        if f"original_file_{selected_dataset}" in st.session_state:
-                            file_bytes = st.session_state[f"original_file_{selected_dataset}"]
-                            file_buffer = io.BytesIO(file_bytes)
-                            new_df = pd.read_excel(file_buffer, sheet_name=selected_sheet)
-                            
-                            # Atualizar dados
-                            st.session_state['datasets'][selected_dataset]['data'] = new_df
-                            st.session_state['datasets'][selected_dataset]['original'] = new_df.copy()
-                            st.session_state['datasets'][selected_dataset]['sheet_info']['selected'] = selected_sheet
-                            
+                        # Recarregar dados da planilha selecionada (a partir do cache do workbook)
+                        if self._switch_sheet(selected_dataset, selected_sheet):
                             self.show_success(f"Planilha '{selected_sheet}' carregada!")
                             st.rerun()
                         else:
@@ -285,12 +572,14 @@ class ExcelModule(BaseModule):
                     except Exception as e:
                         self.show_error(f"Erro ao carregar planilha '{selected_sheet}': {str(e)}")
             
-            df = dataset_info['data']
+            journal = self._get_journal(selected_dataset)
+            handle = journal.handle
+            columns = list(handle.columns)
             current_sheet = sheet_info['selected']
             
             # Informações da tabela
             sheet_display = f" (Planilha: {current_sheet})" if len(sheet_info['sheets']) > 1 else ""
-            st.info(f"📄 Editando: **{selected_dataset}**{sheet_display} ({len(df)} linhas, {len(df.columns)} colunas)")
+            st.info(f"📄 Editando: **{selected_dataset}**{sheet_display} ({handle.num_rows} linhas, {len(columns)} colunas)")
             
             # Operações rápidas de colunas
             col1, col2, col3 = st.columns(3)
@@ -299,44 +588,67 @@ class ExcelModule(BaseModule):
                 st.write("**Adicionar Coluna:**")
                 new_col_name = st.text_input("Nome da nova coluna:", key=f"new_col_{selected_dataset}")
                 if st.button("➕ Adicionar", key=f"add_col_{selected_dataset}"):
-                    if new_col_name and new_col_name not in df.columns:
-                        df[new_col_name] = ""
-                        st.session_state['datasets'][selected_dataset]['data'] = df
+                    if new_col_name and new_col_name not in columns:
+                        journal.add_column(
+                            new_col_name, "", f"Adicionar coluna '{new_col_name}'"
+                        )
                         self.show_success(f"Coluna '{new_col_name}' adicionada!")
                         st.rerun()
-                    elif new_col_name in df.columns:
+                    elif new_col_name in columns:
                         self.show_warning("Coluna já existe!")
             
             with col2:
                 st.write("**Remover Coluna:**")
-                if len(df.columns) > 0:
+                if len(columns) > 0:
                     col_to_remove = st.selectbox(
                         "Selecione coluna:",
-                        df.columns,
+                        columns,
                         key=f"remove_col_selector_{selected_dataset}"
                     )
                     if st.button("🗑️ Remover", key=f"remove_col_{selected_dataset}"):
-                        if col_to_remove in df.columns:
-                            df = df.drop(columns=[col_to_remove])
-                            st.session_state['datasets'][selected_dataset]['data'] = df
+                        if col_to_remove in columns:
+                            journal.drop_column(
+                                col_to_remove, f"Remover coluna '{col_to_remove}'"
+                            )
                             self.show_success(f"Coluna '{col_to_remove}' removida!")
                             st.rerun()
             
             with col3:
                 st.write("**Operações:**")
+                undo_col, redo_col = st.columns(2)
+                with undo_col:
+                    if st.button("↩️ Desfazer", key=f"undo_{selected_dataset}", disabled=not journal.can_undo):
+                        journal.undo()
+                        st.rerun()
+                with redo_col:
+                    if st.button("↪️ Refazer", key=f"redo_{selected_dataset}", disabled=not journal.can_redo):
+                        journal.redo()
+                        st.rerun()
                 if st.button("🔄 Restaurar Original", key=f"restore_{selected_dataset}"):
-                    st.session_state['datasets'][selected_dataset]['data'] = dataset_info['original'].copy()
+                    journal.restore()
                     self.show_success("Dados restaurados ao original!")
                     st.rerun()
             
-            # Editor de dados principal
-            edited_df = UIComponents.data_editor(
-                df,
-                key=f"excel_editor_{selected_dataset}"
+            # Histórico de edições
+            if journal.operations:
+                with st.expander(f"🕘 Histórico de edições ({journal.position}/{len(journal.operations)})"):
+                    for i, (description, applied) in enumerate(journal.history(), start=1):
+                        st.write(f"{'✅' if applied else '⏸️'} {i}. {description}")
+            
+            # Editor de dados principal: apenas a página visível é lida do
+            # armazenamento e enviada ao navegador
+            page_size = st.session_state.get('excel_config', {}).get('max_rows_display', 100)
+            start, stop = UIComponents.pagination(handle.num_rows, page_size, f"excel_editor_{selected_dataset}")
+            page_df = self._get_store().read_rows(handle, start, stop)
+            
+            editor_key = f"excel_editor_{selected_dataset}_{start}"
+            edited_page = UIComponents.data_editor(
+                page_df,
+                key=editor_key
             )
             
-            # Atualizar dados no session state
-            st.session_state['datasets'][selected_dataset]['data'] = edited_df
+            # Registrar no journal apenas o que foi editado (linhas novas vão para o fim da tabela)
+            self._journal_editor_changes(selected_dataset, page_df, edited_page, st.session_state.get(editor_key))
             
             # Botões de ação
             st.markdown("---")
@@ -352,26 +664,49 @@ class ExcelModule(BaseModule):
                 self.show_success("✅ Alterações salvas na sessão!")
             
             if button_states[f'download_excel_{selected_dataset}']:
-                filename = dataset_info['filename']
-                self._download_excel(edited_df, filename)
+                self._download_excel([selected_dataset], dataset_info['filename'])
             
             if button_states[f'download_csv_{selected_dataset}']:
-                filename = dataset_info['filename']
-                csv_data = edited_df.to_csv(index=False)
-                st.download_button(
-                    "📄 Baixar CSV",
-                    csv_data,
-                    filename.replace('.xlsx', '.csv').replace('.xls', '.csv'),
-                    "text/csv",
-                    key=f"csv_download_{selected_dataset}"
+                self._download_dataset(selected_dataset, dataset_info['filename'], 'csv')
+            
+            # Formatos colunares / JSON Lines (o padrão vem das configurações)
+            columnar_formats = ['parquet', 'feather', 'ndjson']
+            default_format = self._export_options_format()
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                other_format = st.selectbox(
+                    "Outros formatos:", columnar_formats,
+                    index=columnar_formats.index(default_format) if default_format in columnar_formats else 0,
+                    format_func=lambda export_format: EXPORT_FORMATS[export_format][0],
+                    key=f"export_format_{selected_dataset}",
+                    help="Parquet e Feather preservam os tipos das colunas e são muito mais rápidos que o Excel"
                 )
+            with col2:
+                st.write("")
+                generate = st.button("📦 Gerar arquivo", key=f"export_file_{selected_dataset}")
+            if generate:
+                self._download_dataset(selected_dataset, dataset_info['filename'], other_format)
+            
+            # Várias tabelas (e planilhas) em um único arquivo
+            with st.expander("📚 Exportar várias tabelas em um arquivo Excel"):
+                all_names = list(st.session_state['datasets'].keys())
+                export_names = st.multiselect("Tabelas:", all_names, default=all_names, key="export_workbook_datasets")
+                all_sheets = st.checkbox(
+                    "Incluir as demais planilhas dos arquivos originais", value=False, key="export_all_sheets",
+                    help="Planilhas não carregadas entram como estão no arquivo original"
+                )
+                if st.button("📚 Gerar arquivo", key="export_workbook") and export_names:
+                    self._download_excel(export_names, "tabelas.xlsx", all_sheets=all_sheets)
     
-    def _get_dataset_with_sheet_selection(self, key_prefix: str, label: str = "Selecione a tabela:") -> tuple:
+    def _get_dataset_with_sheet_selection(self, key_prefix: str, label: str = "Selecione a tabela:",
+                                          load_data: bool = True) -> tuple:
         """
         Helper para seleção de dataset e planilha
         Retorna: (dataset_name, dataframe, sheet_name) ou (None, None, None)
+        Com `load_data=False` o dataframe não é materializado (retorna None)
         """
         dataset_names = list(st.session_state['datasets'].keys())
+        load = self._get_data if load_data else (lambda name: None)
         
         if not dataset_names:
             return None, None, None
@@ -401,27 +736,452 @@ class ExcelModule(BaseModule):
             # Se mudou de planilha, recarregar dados
             if selected_sheet != sheet_info['selected']:
                 try:
-                    if f"original_file_{selected_dataset}" in st.session_state:
-                        file_bytes = st.session_state[f"original_file_{selected_dataset}"]
-                        file_buffer = io.BytesIO(file_bytes)
-                        new_df = pd.read_excel(file_buffer, sheet_name=selected_sheet)
-                        
-                        # Atualizar dados
-                        st.session_state['datasets'][selected_dataset]['data'] = new_df
-                        st.session_state['datasets'][selected_dataset]['sheet_info']['selected'] = selected_sheet
+                    if self._switch_sheet(selected_dataset, selected_sheet):
                         st.rerun()
                     else:
                         st.warning(f"Arquivo original não encontrado para '{selected_dataset}'.")
-                        return selected_dataset, dataset_info['data'], sheet_info['selected']
+                        return selected_dataset, load(selected_dataset), sheet_info['selected']
                 
                 except Exception as e:
                     st.error(f"Erro ao trocar planilha: {str(e)}")
-                    return selected_dataset, dataset_info['data'], sheet_info['selected']
+                    return selected_dataset, load(selected_dataset), sheet_info['selected']
         else:
             selected_sheet = sheet_info['selected']
         
-        return selected_dataset, dataset_info['data'], selected_sheet
-    
+        return selected_dataset, load(selected_dataset), selected_sheet
+
+    def _get_store(self) -> DatasetStore:
+        """Armazenamento de datasets da sessão (Parquet em disco por padrão)"""
+        if 'dataset_store' not in st.session_state:
+            budget = get_memory_budget()
+            store = create_dataset_store(max_resident_bytes=budget.config.session_bytes)
+            # Quando a sessão é descartada, sua memória sai do orçamento global
+            # e os datasets compartilhados que ela usava podem ser despejados
+            weakref.finalize(store, budget.release, self._session_id())
+            weakref.finalize(store, get_shared_cache().release_holder, self._session_id())
+            st.session_state['dataset_store'] = store
+        return st.session_state['dataset_store']
+
+    def _session_id(self) -> str:
+        """Identificador da sessão no orçamento de memória"""
+        if 'session_id' not in st.session_state:
+            st.session_state['session_id'] = uuid.uuid4().hex
+        return st.session_state['session_id']
+
+    def _report_memory(self) -> None:
+        """Informa ao orçamento global a memória residente desta sessão"""
+        usage = self._get_store().resident_bytes + self._get_workbook_cache().stats()['bytes']
+        if 'key_index_cache' in st.session_state:
+            usage += st.session_state['key_index_cache'].nbytes
+        if 'export_cache' in st.session_state:
+            usage += st.session_state['export_cache'].nbytes
+        get_memory_budget().report(self._session_id(), usage)
+
+    def _ensure_memory(self, nbytes: int, description: str) -> None:
+        """
+        Garante espaço para `nbytes` no orçamento: despeja datasets e planilhas
+        em cache menos usados e, se ainda assim não couber, recusa a carga
+        """
+        budget = get_memory_budget()
+        self._report_memory()
+        shortfall = nbytes - budget.available(self._session_id())
+
+        if shortfall > 0:
+            freed = self._get_store().spill(shortfall)
+            if freed < shortfall:
+                cache = self._get_workbook_cache()
+                cache.trim(max(0, cache.stats()['bytes'] - (shortfall - freed)))
+            self._report_memory()
+
+        budget.check(self._session_id(), nbytes, description)
+
+    def _dataset_memory(self, dataset_info: Dict[str, Any]) -> Dict[str, int]:
+        """Memória do dataset: versão atual, base, edições e planilhas em cache"""
+        journal = dataset_info['journal']
+        memory = journal.memory_bytes()
+        file_hash = dataset_info.get('file_hash')
+        memory['cache'] = self._get_workbook_cache().workbook_bytes(file_hash) if file_hash else 0
+        memory['total'] = sum(memory.values())
+        memory['disk'] = journal.disk_bytes()
+        return memory
+
+    def _add_dataset(self, name: str, df: pd.DataFrame, filename: str, sheet_info: Dict[str, Any],
+                     size: int, file_hash: Optional[str] = None) -> None:
+        """Grava um novo dataset no armazenamento e registra apenas o journal na sessão"""
+        self._ensure_memory(frame_nbytes(df), f"'{name}'")
+        self._register_dataset(name, self._get_store().put(df), filename, sheet_info, size, file_hash)
+
+    def _register_dataset(self, name: str, handle: DatasetHandle, filename: str, sheet_info: Dict[str, Any],
+                          size: int, file_hash: Optional[str] = None) -> None:
+        """Registra na sessão um dataset já gravado no armazenamento"""
+        st.session_state['datasets'][name] = {
+            'journal': EditJournal(self._get_store(), handle),
+            'filename': filename,
+            'sheet_info': sheet_info,
+            'size': size,
+            'file_hash': file_hash
+        }
+
+    def _get_journal(self, name: str) -> EditJournal:
+        """Journal de edições de um dataset"""
+        return st.session_state['datasets'][name]['journal']
+
+    def _get_data(self, name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Materializa os dados atuais de um dataset (somente leitura)"""
+        return self._get_journal(name).load(columns=columns)
+
+    def _journal_editor_changes(self, name: str, df: pd.DataFrame, edited_df: pd.DataFrame,
+                                editor_state: Optional[Dict[str, Any]]) -> None:
+        """Converte o estado do st.data_editor em operações do journal"""
+        if not editor_state:
+            return
+
+        journal = self._get_journal(name)
+        edited_rows = editor_state.get('edited_rows') or {}
+        deleted_rows = editor_state.get('deleted_rows') or []
+        added_rows = editor_state.get('added_rows') or []
+
+        # Valores lidos do resultado do editor, já convertidos para o tipo da coluna.
+        # Alterações que não mudam o valor são ignoradas: o estado do widget só é
+        # reiniciado quando os dados de entrada mudam
+        changes = []
+        for position, row_changes in edited_rows.items():
+            label = df.index[int(position)]
+            if int(position) in deleted_rows:
+                continue
+            for column in row_changes:
+                old_value, new_value = df.at[label, column], edited_df.at[label, column]
+                if not (old_value == new_value or (pd.isna(old_value) and pd.isna(new_value))):
+                    changes.append((label, column, new_value))
+        if changes:
+            journal.edit_cells(changes, f"Editar {len(changes)} célula(s)")
+        if deleted_rows:
+            journal.delete_rows(list(df.index[deleted_rows]), f"Remover {len(deleted_rows)} linha(s)")
+        if added_rows:
+            # Os rótulos dados pelo editor valem só na página: o journal atribui os definitivos
+            journal.append_rows(edited_df.iloc[-len(added_rows):], f"Adicionar {len(added_rows)} linha(s)")
+
+    def _get_engine(self, background: bool = False) -> OperationEngine:
+        """
+        Motor de operações sobre o armazenamento e o cache de índices da sessão
+        Operações pesadas em tabelas grandes rodam no pool de processos. Com
+        `background`, o motor pode ser usado em tarefas (fora do script): a
+        verificação de memória só consulta o orçamento, sem despejar dados
+        """
+        if 'key_index_cache' not in st.session_state:
+            st.session_state['key_index_cache'] = KeyIndexCache()
+        memory_check = self._ensure_memory
+        if background:
+            session_id = self._session_id()
+            memory_check = lambda nbytes, description: get_memory_budget().check(session_id, nbytes, description)
+        return OperationEngine(
+            self._get_store(), st.session_state['key_index_cache'], memory_check, workers=get_worker_pool()
+        )
+
+    def _start_operation(self, key: str, name: str, fn: Callable[[Job], Any]) -> None:
+        """Executa a operação em segundo plano; a tela acompanha por `_operation_result`"""
+        st.session_state.setdefault('operation_jobs', {})[key] = get_job_runner().submit(name, fn)
+
+    def _operation_running(self, key: str) -> bool:
+        return key in st.session_state.get('operation_jobs', {})
+
+    def _operation_result(self, key: str) -> Optional[Job]:
+        """
+        Acompanha a operação em andamento (com opção de cancelar); quando ela
+        termina, retorna o Job uma única vez para a tela registrar o resultado
+        """
+        jobs = st.session_state.setdefault('operation_jobs', {})
+        job = jobs.get(key)
+        if job is None:
+            return None
+        if job.done:
+            del jobs[key]
+            return job
+
+        def progress() -> None:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.progress(job.progress, text=f"⚙️ {job.name}... ({job.elapsed:.1f}s)")
+            with col2:
+                if st.button("🚫 Cancelar", key=f"cancel_operation_{key}"):
+                    job.cancel()
+            if job.done:
+                st.rerun()
+
+        st.fragment(progress, run_every=1.0)()
+        return None
+
+    def _get_key_index(self, name: str, columns: List[str]) -> Tuple[KeyIndex, bool]:
+        """Índice de chaves da versão atual do dataset (reconstruído só após edições)"""
+        return self._get_engine().key_index(self._get_journal(name), columns)
+
+    def _get_profile(self, name: str) -> Tuple[Optional[DatasetProfile], Optional[Job]]:
+        """
+        Perfil da versão atual do dataset: do cache, calculado na hora (datasets
+        pequenos) ou em segundo plano; enquanto a tarefa não termina, retorna a tarefa
+        """
+        if 'profile_cache' not in st.session_state:
+            st.session_state['profile_cache'] = ProfileCache()
+            st.session_state['profile_jobs'] = {}
+        cache, jobs = st.session_state['profile_cache'], st.session_state['profile_jobs']
+        
+        journal = self._get_journal(name)
+        key = journal.handle.key
+        profile = cache.get(key)
+        if profile is not None:
+            return profile, None
+        
+        job = jobs.get(key)
+        if job is not None:
+            # Tarefas com erro ficam registradas para o erro ser exibido
+            if job.status != DONE:
+                return None, job
+            del jobs[key]
+            cache.put(key, job.result)
+            return job.result, None
+        
+        # Após uma edição, o perfil da versão anterior é atualizado em vez de refeito
+        last_change = journal.last_change()
+        previous = cache.get(last_change[0]) if last_change else None
+        changes = self._profile_changes(journal, previous, last_change[1]) if previous else None
+        
+        if journal.handle.num_rows <= PROFILE_SYNC_ROWS:
+            profile = update_profile(previous, *changes) if changes else profile_frame(journal.load())
+            cache.put(key, profile)
+            return profile, None
+        
+        runner = get_job_runner()
+        if changes:
+            jobs[key] = runner.submit(f"Perfil de '{name}'", _update_profile_job, previous, *changes)
+        else:
+            jobs[key] = runner.submit(f"Perfil de '{name}'", _profile_job, journal.load())
+        return None, jobs[key]
+
+    def _get_profile_preview(self, name: str) -> DatasetProfile:
+        """Perfil das primeiras linhas, exibido enquanto o perfil completo é calculado"""
+        handle = self._get_journal(name).handle
+        cache = st.session_state['profile_cache']
+        key = f"preview:{handle.key}"
+        preview = cache.get(key)
+        if preview is None:
+            rows = self._get_store().read_rows(handle, 0, PROFILE_PREVIEW_ROWS)
+            preview = profile_frame(rows, preview=True)
+            cache.put(key, preview)
+        return preview
+
+    def _profile_changes(self, journal: EditJournal, previous: DatasetProfile, op: Any) -> Optional[tuple]:
+        """
+        Argumentos de update_profile para a última operação do journal, ou None
+        quando o perfil precisa ser refeito (ex.: remoção de linhas)
+        """
+        columns = journal.handle.columns
+        payload = op.payload
+        
+        if op.kind in ('set_columns', 'add_column', 'cells'):
+            if op.kind == 'set_columns':
+                changed = list(payload['values'].columns)
+            elif op.kind == 'add_column':
+                changed = [payload['column']]
+            else:
+                changed = list(dict.fromkeys(column for _, column, _ in payload['changes']))
+            # Só as colunas alteradas são lidas do armazenamento
+            return columns, journal.load(columns=changed), None
+        
+        if op.kind == 'drop_column':
+            return columns, None, None
+        
+        if op.kind == 'append_rows':
+            rows = self._get_store().load(payload['rows'])
+            same_types = set(rows.columns) == set(previous.columns) and all(
+                str(dtype) == previous.columns[column].dtype for column, dtype in rows.dtypes.items()
+            )
+            return (columns, None, rows) if same_types else None
+        
+        return None
+
+    def _apply_depara(self, table: str, columns: List[str], de: List[Any], para: List[Any],
+                      normalize: NormalizeOptions, regex: bool, description: str) -> None:
+        """Aplica um DE/PARA (compilado uma vez e reaproveitado) às colunas escolhidas"""
+        try:
+            stats = self._get_engine().depara(self._get_journal(table), columns, de, para, normalize, regex, description)
+            st.session_state['last_depara_stats'] = stats
+            st.rerun()
+        
+        except Exception as e:
+            self.show_error(f"❌ Erro ao aplicar DE/PARA: {str(e)}")
+
+    def _render_save_depara(self, de: List[Any], para: List[Any], default_name: str) -> None:
+        """Guarda o mapeamento na sessão para reutilizar em outras tabelas"""
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            map_name = st.text_input("Salvar mapeamento como:", value=default_name, key=f"depara_save_name_{default_name}")
+        with col2:
+            st.write("")
+            if st.button("💾 Salvar", key=f"depara_save_{default_name}") and map_name:
+                st.session_state['depara_maps'][map_name] = {'de': list(de), 'para': list(para)}
+                st.toast(f"💾 Mapeamento '{map_name}' salvo!")
+                st.rerun()
+
+    def _get_workbook_cache(self) -> WorkbookCache:
+        """Cache de planilhas da sessão (um parse por planilha por sessão)"""
+        if 'workbook_cache' not in st.session_state:
+            st.session_state['workbook_cache'] = WorkbookCache()
+        return st.session_state['workbook_cache']
+
+    def _switch_sheet(self, dataset_name: str, sheet_name: str) -> bool:
+        """
+        Troca a planilha ativa de um dataset usando o cache do workbook
+        Retorna False se o arquivo original não estiver disponível
+        """
+        dataset_info = st.session_state['datasets'][dataset_name]
+        file_hash = dataset_info.get('file_hash')
+        cache = self._get_workbook_cache()
+
+        if not file_hash or not cache.has_workbook(file_hash):
+            return False
+
+        # A nova planilha passa a ser a base do dataset (com um journal novo),
+        # lida uma única vez para todas as sessões que abrirem o mesmo arquivo
+        store = self._get_store()
+        shared = get_shared_cache()
+        key = self._shared_key(file_hash, 'excel', sheet=sheet_name)
+        handle, _ = shared.get_or_put(key, self._session_id(), store,
+                                      lambda: cache.get_sheet(file_hash, sheet_name))
+        dataset_info['journal'].release()
+        if dataset_info.get('shared_key'):
+            shared.release(dataset_info['shared_key'], self._session_id())
+        dataset_info['journal'] = EditJournal(store, handle)
+        dataset_info['shared_key'] = key
+        dataset_info['sheet_info']['selected'] = sheet_name
+        return True
+
+    def _remove_dataset(self, dataset_name: str) -> None:
+        """Remove um dataset e libera o workbook do cache se não houver outras referências"""
+        dataset_info = st.session_state['datasets'].pop(dataset_name)
+        dataset_info['journal'].release()
+        if dataset_info.get('shared_key'):
+            get_shared_cache().release(dataset_info['shared_key'], self._session_id())
+        file_hash = dataset_info.get('file_hash')
+
+        if file_hash and not any(
+            info.get('file_hash') == file_hash for info in st.session_state['datasets'].values()
+        ):
+            self._get_workbook_cache().release(file_hash)
+
+    def _workspace_user(self) -> str:
+        """Usuário dono do workspace (login do Streamlit, se configurado)"""
+        try:
+            if st.user.is_logged_in:
+                return str(st.user.get('email') or st.user.get('name'))
+        except (AttributeError, KeyError):
+            pass
+        return os.environ.get('EXCEL_WORKSPACE_USER', 'local')
+
+    def _restore_workspace(self) -> None:
+        """Na primeira execução da sessão, reabre o workspace indicado na URL (?workspace=nome)"""
+        if 'workspace' not in st.session_state:
+            self._open_workspace(workspace_name(st.query_params.get('workspace')))
+
+    def _open_workspace(self, name: str) -> None:
+        """
+        Registra na sessão os datasets e configurações salvos no workspace
+        Os arquivos são apenas vinculados ao armazenamento: nada é lido aqui
+        """
+        if 'datasets' not in st.session_state:
+            st.session_state['datasets'] = {}
+        workspaces = get_workspace_store()
+        if workspaces is None:
+            st.session_state['workspace'] = None
+            return
+
+        user = self._workspace_user()
+        workspace_id = workspaces.workspace_id(user, name)
+        state = {'user': user, 'name': name, 'id': workspace_id, 'versions': {}, 'settings': {}}
+        store = self._get_store()
+
+        for dataset in workspaces.datasets(workspace_id):
+            if dataset.name in st.session_state['datasets']:
+                continue
+            try:
+                handle = workspaces.restore(workspace_id, dataset, store)
+            except OSError:
+                # Arquivo apagado fora da aplicação: a entrada é descartada na próxima gravação
+                continue
+            info = dataset.info
+            self._register_dataset(
+                dataset.name, handle, info.get('filename', dataset.name),
+                info.get('sheet_info') or {'sheets': [dataset.name], 'selected': dataset.name},
+                info.get('size', 0), info.get('file_hash')
+            )
+            state['versions'][dataset.name] = (handle.key, info)
+
+        for key, pairs in workspaces.settings(workspace_id).items():
+            if key in WORKSPACE_SETTINGS:
+                # Dicionários são gravados como pares para manter chaves não textuais
+                st.session_state[key] = {
+                    tuple(k) if isinstance(k, list) else k: v for k, v in pairs
+                }
+                state['settings'][key] = copy.deepcopy(pairs)
+
+        st.session_state['workspace'] = state
+
+    def _workspace_info(self, dataset_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Metadados do dataset guardados no catálogo do workspace"""
+        return copy.deepcopy({
+            'filename': dataset_info['filename'],
+            'sheet_info': dataset_info['sheet_info'],
+            'size': dataset_info['size'],
+            'file_hash': dataset_info.get('file_hash')
+        })
+
+    def _sync_workspace(self) -> None:
+        """
+        Grava no workspace as versões de dataset e as configurações que mudaram
+        desde a última gravação; comparar handles torna a chamada barata
+        """
+        state = st.session_state.get('workspace')
+        if not state:
+            return
+
+        workspaces = get_workspace_store()
+        store = self._get_store()
+        datasets = st.session_state.get('datasets', {})
+        try:
+            for position, (name, dataset_info) in enumerate(datasets.items()):
+                handle = dataset_info['journal'].handle
+                info = self._workspace_info(dataset_info)
+                saved = state['versions'].get(name)
+                if saved is None or saved[0] != handle.key:
+                    workspaces.save_dataset(state['id'], name, store, handle, info, position)
+                elif saved[1] != info:
+                    workspaces.update_info(state['id'], name, info)
+                state['versions'][name] = (handle.key, info)
+
+            for name in [name for name in state['versions'] if name not in datasets]:
+                workspaces.delete_dataset(state['id'], name)
+                del state['versions'][name]
+
+            for key in WORKSPACE_SETTINGS:
+                if key not in st.session_state:
+                    continue
+                pairs = [[k, v] for k, v in st.session_state[key].items()]
+                if state['settings'].get(key) != pairs:
+                    workspaces.save_setting(state['id'], key, pairs)
+                    state['settings'][key] = copy.deepcopy(pairs)
+        except (OSError, SQLAlchemyError) as e:
+            self.show_warning(f"Não foi possível salvar o workspace: {str(e)}")
+
+    def _switch_workspace(self, name: str) -> None:
+        """Fecha as tabelas da sessão (continuam salvas) e abre outro workspace"""
+        self._sync_workspace()
+        st.session_state['workspace'] = None
+        for dataset_name in list(st.session_state.get('datasets', {})):
+            self._remove_dataset(dataset_name)
+        for key in WORKSPACE_SETTINGS:
+            st.session_state.pop(key, None)
+        st.query_params['workspace'] = name
+        self._open_workspace(name)
+
     def _render_operations_tab(self) -> None:
         """Renderiza aba de operações de dados (joins, merges, etc.)"""
         if not st.session_state['datasets']:
@@ -435,9 +1195,17 @@ class ExcelModule(BaseModule):
             "🔗 Joins/Merge",
             "🔍 PROCV/Lookup", 
             "📋 DE/PARA",
-            "🧮 Operações Matemáticas"
+            "🧮 Operações Matemáticas",
+            "📊 Agrupar/Pivô",
+            "🧩 Pipeline"
         ])
         
+        # Renderizadas primeiro: as abas abaixo encerram a função quando faltam tabelas
+        with operations_tabs[4]:
+            self._render_group_operation()
+        with operations_tabs[5]:
+            self._render_pipeline_operation()
+        
         # Tab 1: Joins/Merge
         with operations_tabs[0]:
             st.subheader("🔗 Juntar Tabelas (JOIN/MERGE)")
@@ -448,19 +1216,21 @@ class ExcelModule(BaseModule):
                 st.warning("Você precisa ter pelo menos 2 tabelas para realizar um join.")
                 return
             
+            left_key, right_key = [], []
             col1, col2 = st.columns(2)
             
             with col1:
                 st.write("**Tabela Principal (Esquerda)**")
-                left_table, left_df, left_sheet = self._get_dataset_with_sheet_selection(
-                    "left_join", "Selecione a tabela principal:"
+                left_table, _, left_sheet = self._get_dataset_with_sheet_selection(
+                    "left_join", "Selecione a tabela principal:", load_data=False
                 )
                 
-                if left_table and left_df is not None:
-                    left_columns = list(left_df.columns)
-                    left_key = st.selectbox(
-                        "Coluna chave (esquerda):",
+                if left_table:
+                    left_columns = list(self._get_journal(left_table).handle.columns)
+                    left_key = st.multiselect(
+                        "Coluna(s) chave (esquerda):",
                         left_columns,
+                        default=left_columns[:1],
                         key="left_key_join"
                     )
             
@@ -491,22 +1261,16 @@ class ExcelModule(BaseModule):
                             # Recarregar se necessário
                             if right_sheet != sheet_info['selected']:
                                 try:
-                                    if f"original_file_{right_table}" in st.session_state:
-                                        file_bytes = st.session_state[f"original_file_{right_table}"]
-                                        file_buffer = io.BytesIO(file_bytes)
-                                        new_df = pd.read_excel(file_buffer, sheet_name=right_sheet)
-                                        
-                                        st.session_state['datasets'][right_table]['data'] = new_df
-                                        st.session_state['datasets'][right_table]['sheet_info']['selected'] = right_sheet
+                                    if self._switch_sheet(right_table, right_sheet):
                                         st.rerun()
                                 except Exception as e:
                                     st.error(f"Erro ao trocar planilha: {str(e)}")
                         
-                        right_df = dataset_info['data']
-                        right_columns = list(right_df.columns)
-                        right_key = st.selectbox(
-                            "Coluna chave (direita):",
+                        right_columns = list(dataset_info['journal'].handle.columns)
+                        right_key = st.multiselect(
+                            "Coluna(s) chave (direita):",
                             right_columns,
+                            default=[column for column in left_key if column in right_columns] or right_columns[:1],
                             key="right_key_join"
                         )
                 else:
@@ -529,39 +1293,96 @@ class ExcelModule(BaseModule):
                 key="join_result_name"
             )
             
-            if st.button("🔗 Executar JOIN", key="execute_join"):
+            # Estimativa a partir dos índices de chave (em cache por versão do dataset)
+            max_join_rows = st.session_state.get('excel_config', {}).get('max_join_rows', 5_000_000)
+            estimate = None
+            if left_table and right_table and left_key and right_key:
+                if len(left_key) != len(right_key):
+                    self.show_warning("Selecione o mesmo número de colunas chave dos dois lados.")
+                else:
+                    try:
+                        estimate = self._get_engine().estimate_join(
+                            self._get_journal(left_table), self._get_journal(right_table), left_key, right_key, join_type
+                        )
+                        
+                        col1, col2, col3, col4 = st.columns(4)
+                        with col1:
+                            st.metric("📐 Linhas estimadas", f"{estimate.rows:,}")
+                        with col2:
+                            st.metric("🔑 Chaves em comum", f"{estimate.matched_keys:,}")
+                        with col3:
+                            st.metric("↔️ Sem correspondência", f"{estimate.left_unmatched:,} / {estimate.right_unmatched:,}",
+                                      help="Linhas da esquerda / da direita sem chave correspondente")
+                        with col4:
+                            st.metric("🔁 Máx. por chave", f"{estimate.max_fanout:,}",
+                                      help="Maior número de linhas da direita para uma mesma chave da esquerda")
+                        
+                        if estimate.many_to_many:
+                            self.show_warning(
+                                "Há chaves repetidas nas duas tabelas (muitos-para-muitos): cada combinação gera uma linha."
+                            )
+                        if estimate.rows > max_join_rows:
+                            self.show_error(
+                                f"O resultado teria {estimate.rows:,} linhas, acima do limite de {max_join_rows:,} "
+                                f"(ajustável em ⚙️ Configurações)."
+                            )
+                    except Exception as e:
+                        self.show_error(f"Erro ao indexar as chaves: {str(e)}")
+            
+            if st.button(
+                "🔗 Executar JOIN", key="execute_join",
+                disabled=(estimate is not None and estimate.rows > max_join_rows) or self._operation_running('join')
+            ):
                 if left_table and right_table and left_key and right_key and new_table_name:
                     try:
-                        left_df = st.session_state['datasets'][left_table]['data']
-                        right_df = st.session_state['datasets'][right_table]['data']
+                        if new_table_name in st.session_state['datasets']:
+                            raise ValueError(f"Já existe uma tabela com o nome '{new_table_name}'")
                         
-                        # Executar merge
-                        result_df = pd.merge(
-                            left_df, 
-                            right_df, 
-                            left_on=left_key, 
-                            right_on=right_key, 
-                            how=join_type,
-                            suffixes=('_x', '_y')
+                        # Em segundo plano (num processo de trabalho para tabelas grandes);
+                        # a tela acompanha e pode cancelar
+                        engine = self._get_engine(background=True)
+                        left_journal, right_journal = self._get_journal(left_table), self._get_journal(right_table)
+                        self._start_operation(
+                            'join', f"JOIN {left_table} × {right_table}",
+                            lambda job: (new_table_name, *engine.join(
+                                left_journal, right_journal, left_key, right_key,
+                                how=join_type, max_rows=max_join_rows, job=job
+                            ))
                         )
-                        
-                        # Salvar resultado
-                        if new_table_name not in st.session_state['datasets']:
-                            st.session_state['datasets'][new_table_name] = {
-                                'data': result_df,
-                                'original': result_df.copy(),
-                                'filename': f"{new_table_name}.xlsx",
-                                'sheet_info': {'sheets': ['Dados'], 'selected': 'Dados'},
-                                'size': len(result_df)
-                            }
-                            
-                            self.show_success(f"✅ JOIN executado com sucesso! Tabela '{new_table_name}' criada com {len(result_df)} linhas.")
-                            st.rerun()
-                        else:
-                            self.show_error(f"❌ Já existe uma tabela com o nome '{new_table_name}'")
+                        st.rerun()
                     
                     except Exception as e:
                         self.show_error(f"❌ Erro ao executar JOIN: {str(e)}")
+            
+            job = self._operation_result('join')
+            if job is not None and job.status == DONE:
+                name, handle, stats = job.result
+                if name in st.session_state['datasets']:
+                    self._get_store().delete(handle)
+                    self.show_error(f"❌ Já existe uma tabela com o nome '{name}'")
+                else:
+                    self._register_dataset(
+                        name, handle,
+                        filename=f"{name}.xlsx",
+                        sheet_info={'sheets': ['Dados'], 'selected': 'Dados'},
+                        size=handle.nbytes
+                    )
+                    st.session_state['last_join_stats'] = (name, stats)
+                    st.rerun()
+            elif job is not None and job.status == FAILED:
+                self.show_error(f"❌ Erro ao executar JOIN: {job.error}")
+            elif job is not None:
+                self.show_warning("JOIN cancelado.")
+            
+            last_join = st.session_state.pop('last_join_stats', None)
+            if last_join:
+                name, stats = last_join
+                self.show_success(f"JOIN executado com sucesso! Tabela '{name}' criada com {stats.result_rows:,} linhas.")
+                st.caption(
+                    f"⏱️ {stats.elapsed:.2f}s em {stats.partitions} partição(ões) · "
+                    f"{stats.estimate.left_rows:,} × {stats.estimate.right_rows:,} linhas de entrada · "
+                    f"índices: {stats.indexes_cached} em cache"
+                )
         
         # Tab 2: PROCV/Lookup
         with operations_tabs[1]:
@@ -571,19 +1392,22 @@ class ExcelModule(BaseModule):
                 st.warning("Você precisa ter pelo menos 2 tabelas para realizar um PROCV.")
                 return
             
+            ref_table = None
+            lookup_columns, ref_key_columns, value_columns = [], [], []
             col1, col2 = st.columns(2)
             
             with col1:
                 st.write("**Tabela de Origem**")
-                source_table, source_df, source_sheet = self._get_dataset_with_sheet_selection(
-                    "source_lookup", "Tabela onde buscar valores:"
+                source_table, _, source_sheet = self._get_dataset_with_sheet_selection(
+                    "source_lookup", "Tabela onde buscar valores:", load_data=False
                 )
                 
-                if source_table and source_df is not None:
-                    source_columns = list(source_df.columns)
-                    lookup_column = st.selectbox(
-                        "Coluna para buscar:",
+                if source_table:
+                    source_columns = list(self._get_journal(source_table).handle.columns)
+                    lookup_columns = st.multiselect(
+                        "Coluna(s) para buscar:",
                         source_columns,
+                        default=source_columns[:1],
                         key="lookup_column"
                     )
             
@@ -613,61 +1437,74 @@ class ExcelModule(BaseModule):
                             
                             if ref_sheet != sheet_info['selected']:
                                 try:
-                                    if f"original_file_{ref_table}" in st.session_state:
-                                        file_bytes = st.session_state[f"original_file_{ref_table}"]
-                                        file_buffer = io.BytesIO(file_bytes)
-                                        new_df = pd.read_excel(file_buffer, sheet_name=ref_sheet)
-                                        
-                                        st.session_state['datasets'][ref_table]['data'] = new_df
-                                        st.session_state['datasets'][ref_table]['sheet_info']['selected'] = ref_sheet
+                                    if self._switch_sheet(ref_table, ref_sheet):
                                         st.rerun()
                                 except Exception as e:
                                     st.error(f"Erro ao trocar planilha: {str(e)}")
-                        
-                        ref_df = dataset_info['data']
                 
                 if ref_table:
-                    ref_df = st.session_state['datasets'][ref_table]['data']
-                    ref_columns = list(ref_df.columns)
+                    ref_columns = list(st.session_state['datasets'][ref_table]['journal'].handle.columns)
                     
-                    ref_key_column = st.selectbox(
-                        "Coluna chave (referência):",
+                    ref_key_columns = st.multiselect(
+                        "Coluna(s) chave (referência):",
                         ref_columns,
+                        default=[column for column in lookup_columns if column in ref_columns] or ref_columns[:1],
                         key="ref_key_column"
                     )
                     
-                    value_column = st.selectbox(
-                        "Coluna de valores a retornar:",
+                    value_columns = st.multiselect(
+                        "Coluna(s) de valores a retornar:",
                         ref_columns,
+                        default=[column for column in ref_columns if column not in ref_key_columns][:1],
                         key="value_column"
                     )
             
-            new_column_name = st.text_input(
-                "Nome da nova coluna:",
-                value="PROCV_Result",
-                key="procv_column_name"
-            )
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                new_column_name = st.text_input(
+                    "Nome da nova coluna:",
+                    value="PROCV_Result",
+                    help="Com várias colunas de valores, cada uma vira '<nome>_<coluna>'",
+                    key="procv_column_name"
+                )
+            with col2:
+                match_mode = st.selectbox(
+                    "Correspondência:",
+                    ["exact", "approximate"],
+                    format_func=lambda mode: {"exact": "Exata", "approximate": "Aproximada (PROCV VERDADEIRO)"}[mode],
+                    help="Aproximada: usa a maior chave menor ou igual ao valor buscado (uma coluna chave)",
+                    key="procv_match_mode"
+                )
+            with col3:
+                duplicate_policy = st.selectbox(
+                    "Chaves repetidas na referência:",
+                    ["first", "last", "error"],
+                    format_func=lambda policy: {"first": "Primeira ocorrência", "last": "Última ocorrência", "error": "Erro"}[policy],
+                    key="procv_duplicates"
+                )
             
             if st.button("🔍 Executar PROCV", key="execute_lookup"):
-                if all([source_table, ref_table, lookup_column, ref_key_column, value_column, new_column_name]):
+                if all([source_table, ref_table, lookup_columns, ref_key_columns, value_columns, new_column_name]):
                     try:
-                        source_df = st.session_state['datasets'][source_table]['data'].copy()
-                        ref_df = st.session_state['datasets'][ref_table]['data']
-                        
-                        # Criar dicionário de lookup
-                        lookup_dict = dict(zip(ref_df[ref_key_column], ref_df[value_column]))
-                        
-                        # Aplicar lookup
-                        source_df[new_column_name] = source_df[lookup_column].map(lookup_dict)
-                        
-                        # Atualizar dados
-                        st.session_state['datasets'][source_table]['data'] = source_df
-                        
-                        self.show_success(f"✅ PROCV executado! Coluna '{new_column_name}' adicionada à tabela '{source_table}'.")
+                        columns, stats = self._get_engine().procv(
+                            self._get_journal(source_table), self._get_journal(ref_table),
+                            lookup_columns, ref_key_columns, value_columns, new_column_name,
+                            mode=match_mode, duplicates=duplicate_policy, reference_name=ref_table
+                        )
+                        st.session_state['last_lookup_stats'] = (source_table, columns, stats)
                         st.rerun()
                     
                     except Exception as e:
                         self.show_error(f"❌ Erro ao executar PROCV: {str(e)}")
+            
+            last_lookup = st.session_state.pop('last_lookup_stats', None)
+            if last_lookup:
+                table, columns, stats = last_lookup
+                self.show_success(f"PROCV executado! Coluna(s) {', '.join(columns)} adicionada(s) à tabela '{table}'.")
+                st.caption(
+                    f"⏱️ {stats.elapsed:.2f}s · {stats.matched:,} de {stats.rows:,} linhas encontradas · "
+                    f"{stats.duplicate_keys:,} chave(s) repetida(s) na referência"
+                )
         
         # Tab 3: DE/PARA
         with operations_tabs[2]:
@@ -678,31 +1515,54 @@ class ExcelModule(BaseModule):
                 return
             
             # Seleção da tabela e planilha
-            selected_table, df, selected_sheet = self._get_dataset_with_sheet_selection(
-                "depara", "Selecione a tabela:"
+            selected_table, _, selected_sheet = self._get_dataset_with_sheet_selection(
+                "depara", "Selecione a tabela:", load_data=False
             )
             
-            if selected_table and df is not None:
-                columns = list(df.columns)
+            if selected_table:
+                columns = list(self._get_journal(selected_table).handle.columns)
                 
-                target_column = st.selectbox(
-                    "Coluna para aplicar DE/PARA:",
+                target_columns = st.multiselect(
+                    "Coluna(s) para aplicar DE/PARA:",
                     columns,
+                    default=columns[:1],
                     key="depara_column"
                 )
                 
                 # Mostrar valores únicos
-                if target_column:
-                    unique_values = df[target_column].unique()
-                    st.write(f"**Valores únicos encontrados:** {len(unique_values)}")
+                if target_columns:
+                    unique_counts = self._get_data(selected_table, columns=target_columns).nunique()
+                    st.write("**Valores únicos encontrados:** " + ", ".join(
+                        f"{column}: {count}" for column, count in unique_counts.items()
+                    ))
+                    
+                    with st.expander("⚙️ Opções de comparação"):
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            ignore_case = st.checkbox("🔠 Ignorar maiúsculas/minúsculas", key="depara_case")
+                            ignore_spaces = st.checkbox("␣ Ignorar espaços extras", key="depara_whitespace")
+                        with col2:
+                            ignore_accents = st.checkbox("🅰️ Ignorar acentos", key="depara_accents")
+                            use_regex = st.checkbox(
+                                "🧩 DE como expressão regular",
+                                help="Cada valor DE é uma regex aplicada em ordem; PARA pode usar grupos (\\1)",
+                                key="depara_regex"
+                            )
+                    normalize = NormalizeOptions(case=ignore_case, whitespace=ignore_spaces, accents=ignore_accents)
                     
                     # Interface para DE/PARA
                     st.write("**Definir substituições:**")
                     
-                    # Upload de arquivo DE/PARA ou criação manual
+                    if 'depara_maps' not in st.session_state:
+                        st.session_state['depara_maps'] = {}
+                    
+                    # Upload de arquivo DE/PARA, criação manual ou mapeamento já salvo
+                    methods = ["Upload arquivo DE/PARA", "Criar manualmente"]
+                    if st.session_state['depara_maps']:
+                        methods.append("Mapeamento salvo")
                     depara_method = st.radio(
                         "Método:",
-                        ["Upload arquivo DE/PARA", "Criar manualmente"],
+                        methods,
                         key="depara_method"
                     )
                     
@@ -738,30 +1598,41 @@ class ExcelModule(BaseModule):
                                             key="para_column"
                                         )
                                     
+                                    de_values, para_values = list(depara_df[de_column]), list(depara_df[para_column])
                                     if st.button("🔄 Aplicar DE/PARA", key="apply_depara_file"):
-                                        try:
-                                            # Criar dicionário de substituição
-                                            replacement_dict = dict(zip(depara_df[de_column], depara_df[para_column]))
-                                            
-                                            # Aplicar substituições
-                                            df_updated = df.copy()
-                                            df_updated[target_column] = df_updated[target_column].replace(replacement_dict)
-                                            
-                                            # Atualizar dados
-                                            st.session_state['datasets'][selected_table]['data'] = df_updated
-                                            
-                                            replaced_count = (df[target_column] != df_updated[target_column]).sum()
-                                            self.show_success(f"✅ DE/PARA aplicado! {replaced_count} valores substituídos.")
-                                            st.rerun()
-                                        
-                                        except Exception as e:
-                                            self.show_error(f"❌ Erro ao aplicar DE/PARA: {str(e)}")
+                                        self._apply_depara(
+                                            selected_table, target_columns, de_values, para_values,
+                                            normalize, use_regex, f"DE/PARA ({depara_file.name})"
+                                        )
+                                    self._render_save_depara(de_values, para_values, depara_file.name.rsplit('.', 1)[0])
                                 else:
                                     st.error("Arquivo deve ter pelo menos 2 colunas")
                             
                             except Exception as e:
                                 self.show_error(f"❌ Erro ao ler arquivo: {str(e)}")
                     
+                    elif depara_method == "Mapeamento salvo":
+                        map_name = st.selectbox(
+                            "Mapeamento:",
+                            list(st.session_state['depara_maps'].keys()),
+                            key="depara_saved_map"
+                        )
+                        saved_map = st.session_state['depara_maps'][map_name]
+                        st.caption(f"{len(saved_map['de'])} substituição(ões)")
+                        st.dataframe(pd.DataFrame({'DE': saved_map['de'], 'PARA': saved_map['para']}).head(20))
+                        
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            if st.button("🔄 Aplicar DE/PARA", key="apply_saved_depara"):
+                                self._apply_depara(
+                                    selected_table, target_columns, saved_map['de'], saved_map['para'],
+                                    normalize, use_regex, f"DE/PARA ({map_name})"
+                                )
+                        with col2:
+                            if st.button("🗑️ Excluir mapeamento", key="delete_saved_depara"):
+                                del st.session_state['depara_maps'][map_name]
+                                st.rerun()
+                    
                     else:  # Criar manualmente
                         st.write("**Criar substituições manualmente:**")
                         
@@ -795,26 +1666,31 @@ class ExcelModule(BaseModule):
                             col1, col2 = st.columns(2)
                             with col1:
                                 if st.button("🔄 Aplicar Todas", key="apply_manual_depara"):
-                                    try:
-                                        df_updated = df.copy()
-                                        df_updated[target_column] = df_updated[target_column].replace(
-                                            st.session_state['manual_replacements']
-                                        )
-                                        
-                                        # Atualizar dados
-                                        st.session_state['datasets'][selected_table]['data'] = df_updated
-                                        
-                                        replaced_count = (df[target_column] != df_updated[target_column]).sum()
-                                        self.show_success(f"✅ DE/PARA aplicado! {replaced_count} valores substituídos.")
-                                        st.rerun()
-                                    
-                                    except Exception as e:
-                                        self.show_error(f"❌ Erro ao aplicar DE/PARA: {str(e)}")
+                                    self._apply_depara(
+                                        selected_table, target_columns,
+                                        list(st.session_state['manual_replacements'].keys()),
+                                        list(st.session_state['manual_replacements'].values()),
+                                        normalize, use_regex, "DE/PARA manual"
+                                    )
                             
                             with col2:
                                 if st.button("🗑️ Limpar Substituições", key="clear_replacements"):
                                     st.session_state['manual_replacements'] = {}
                                     st.rerun()
+                            
+                            self._render_save_depara(
+                                list(st.session_state['manual_replacements'].keys()),
+                                list(st.session_state['manual_replacements'].values()),
+                                "Manual"
+                            )
+            
+            last_depara = st.session_state.pop('last_depara_stats', None)
+            if last_depara:
+                self.show_success(f"DE/PARA aplicado! {last_depara.total:,} valores substituídos.")
+                st.caption(
+                    f"⏱️ {last_depara.elapsed:.2f}s · {last_depara.distinct_values:,} valores distintos traduzidos · " +
+                    ", ".join(f"{column}: {count:,}" for column, count in last_depara.changes.items())
+                )
         
         # Tab 4: Operações Matemáticas
         with operations_tabs[3]:
@@ -825,12 +1701,14 @@ class ExcelModule(BaseModule):
                 return
             
             # Seleção da tabela e planilha
-            selected_table, df, selected_sheet = self._get_dataset_with_sheet_selection(
-                "math", "Selecione a tabela:"
+            selected_table, _, selected_sheet = self._get_dataset_with_sheet_selection(
+                "math", "Selecione a tabela:", load_data=False
             )
             
-            if selected_table and df is not None:
-                numeric_columns = df.select_dtypes(include=['number']).columns.tolist()
+            if selected_table:
+                # Só os tipos: lê zero linhas do armazenamento
+                schema = self._get_store().read_rows(self._get_journal(selected_table).handle, 0, 0)
+                numeric_columns = schema.select_dtypes(include=['number']).columns.tolist()
                 
                 if not numeric_columns:
                     st.warning("Não foram encontradas colunas numéricas nesta tabela.")
@@ -839,11 +1717,43 @@ class ExcelModule(BaseModule):
                 # Tipo de operação
                 operation_type = st.selectbox(
                     "Tipo de operação:",
-                    ["Soma de colunas", "Subtração", "Multiplicação", "Divisão", "Estatísticas"],
+                    ["Fórmulas", "Soma de colunas", "Subtração", "Multiplicação", "Divisão", "Estatísticas"],
                     key="math_operation"
                 )
                 
-                if operation_type in ["Soma de colunas", "Subtração", "Multiplicação", "Divisão"]:
+                if operation_type == "Fórmulas":
+                    formulas_text = st.text_area(
+                        "Fórmulas (uma por linha, no formato Nova_Coluna = expressão):",
+                        value=f"Nova_Coluna = {numeric_columns[0]} * 1.1" if numeric_columns[0].isidentifier()
+                        else f"Nova_Coluna = [{numeric_columns[0]}] * 1.1",
+                        height=150,
+                        help="Operadores: + - * / ^ = <> > < >= <=. Funções: SE/IF, ARRED/ROUND, SOMA/SUM, MÉDIA/AVERAGE, "
+                             "MÍNIMO/MIN, MÁXIMO/MAX, ABS, RAIZ/SQRT, LN/LOG, EXP, E/AND, OU/OR, NÃO/NOT, ÉVAZIO/ISBLANK. "
+                             "Colunas com espaços vão entre colchetes: [Valor Total]. "
+                             "Cada fórmula pode usar as colunas criadas nas linhas anteriores.",
+                        key="math_formulas"
+                    )
+                    
+                    if st.button("🧮 Calcular Fórmulas", key="execute_formulas"):
+                        try:
+                            # Todas as colunas do lote entram no journal como uma única operação
+                            stats = self._get_engine().formulas(self._get_journal(selected_table), formulas_text)
+                            st.session_state['last_formula_stats'] = stats
+                            st.rerun()
+                        
+                        except ExpressionError as e:
+                            self.show_error(f"❌ Fórmula inválida: {str(e)}")
+                        except Exception as e:
+                            self.show_error(f"❌ Erro ao calcular: {str(e)}")
+                    
+                    last_formulas = st.session_state.pop('last_formula_stats', None)
+                    if last_formulas:
+                        self.show_success(f"{len(last_formulas.timings)} coluna(s) calculada(s) em {last_formulas.rows:,} linhas!")
+                        st.caption(f"⏱️ {last_formulas.elapsed:.3f}s · " + ", ".join(
+                            f"{name}: {elapsed * 1000:.0f} ms" for name, elapsed in last_formulas.timings.items()
+                        ))
+                
+                elif operation_type in ["Soma de colunas", "Subtração", "Multiplicação", "Divisão"]:
                     col1, col2 = st.columns(2)
                     
                     with col1:
@@ -869,19 +1779,11 @@ class ExcelModule(BaseModule):
                     if st.button(f"🧮 Executar {operation_type}", key="execute_math"):
                         if column1 and column2 and new_column_name:
                             try:
-                                df_updated = df.copy()
-                                
-                                if operation_type == "Soma de colunas":
-                                    df_updated[new_column_name] = df_updated[column1] + df_updated[column2]
-                                elif operation_type == "Subtração":
-                                    df_updated[new_column_name] = df_updated[column1] - df_updated[column2]
-                                elif operation_type == "Multiplicação":
-                                    df_updated[new_column_name] = df_updated[column1] * df_updated[column2]
-                                elif operation_type == "Divisão":
-                                    df_updated[new_column_name] = df_updated[column1] / df_updated[column2]
-                                
-                                # Atualizar dados
-                                st.session_state['datasets'][selected_table]['data'] = df_updated
+                                # Atualizar dados (apenas a nova coluna vai para o journal)
+                                operation = next(key for key, (label, _) in ARITHMETIC.items() if label == operation_type)
+                                self._get_engine().arithmetic(
+                                    self._get_journal(selected_table), operation, column1, column2, new_column_name
+                                )
                                 
                                 self.show_success(f"✅ {operation_type} executada! Coluna '{new_column_name}' criada.")
                                 st.rerun()
@@ -897,7 +1799,7 @@ class ExcelModule(BaseModule):
                     )
                     
                     if selected_columns:
-                        stats_df = df[selected_columns].describe()
+                        stats_df = self._get_engine().describe(self._get_journal(selected_table), selected_columns)
                         st.write("**Estatísticas Descritivas:**")
                         st.dataframe(stats_df)
                         
@@ -906,19 +1808,351 @@ class ExcelModule(BaseModule):
                             stats_table_name = f"{selected_table}_estatisticas"
                             
                             if stats_table_name not in st.session_state['datasets']:
-                                st.session_state['datasets'][stats_table_name] = {
-                                    'data': stats_df.reset_index(),
-                                    'original': stats_df.reset_index().copy(),
-                                    'filename': f"{stats_table_name}.xlsx",
-                                    'sheet_info': {'sheets': ['Estatísticas'], 'selected': 'Estatísticas'},
-                                    'size': len(stats_df)
-                                }
+                                self._add_dataset(
+                                    stats_table_name, stats_df.reset_index(),
+                                    filename=f"{stats_table_name}.xlsx",
+                                    sheet_info={'sheets': ['Estatísticas'], 'selected': 'Estatísticas'},
+                                    size=len(stats_df)
+                                )
                                 
                                 self.show_success(f"✅ Tabela de estatísticas '{stats_table_name}' criada!")
                                 st.rerun()
                             else:
                                 self.show_error("❌ Tabela de estatísticas já existe!")
     
+    def _render_group_operation(self) -> None:
+        """Agrupamento / tabela dinâmica, lido do armazenamento em blocos"""
+        st.subheader("📊 Agrupar e Resumir (Tabela Dinâmica)")
+        
+        selected_table, _, selected_sheet = self._get_dataset_with_sheet_selection(
+            "group", "Selecione a tabela:", load_data=False
+        )
+        if not selected_table:
+            return
+        
+        columns = list(self._get_journal(selected_table).handle.columns)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            group_keys = st.multiselect("Agrupar por (linhas):", columns, default=columns[:1], key="group_keys")
+            pivot_options = ["(nenhuma)"] + [column for column in columns if column not in group_keys]
+            pivot = st.selectbox("Colunas da tabela dinâmica (opcional):", pivot_options, key="group_pivot",
+                                 help="Cada valor desta coluna vira uma coluna do resultado")
+        with col2:
+            value_columns = st.multiselect(
+                "Valores:", [column for column in columns if column not in group_keys and column != pivot],
+                key="group_values"
+            )
+            functions = st.multiselect(
+                "Agregações:", list(AGGREGATIONS), default=['sum'],
+                format_func=lambda func: AGGREGATIONS[func], key="group_functions"
+            )
+        
+        new_table_name = st.text_input(
+            "Nome da tabela resultante:",
+            value=f"{selected_table}_resumo",
+            key="group_result_name"
+        )
+        
+        if st.button("📊 Agrupar", key="execute_group", disabled=self._operation_running('group')):
+            if group_keys and value_columns and functions and new_table_name:
+                try:
+                    if new_table_name in st.session_state['datasets']:
+                        raise ValueError(f"Já existe uma tabela com o nome '{new_table_name}'")
+                    
+                    pivot_column = None if pivot == "(nenhuma)" else pivot
+                    journal = self._get_journal(selected_table)
+                    aggregations = [(column, func) for column in value_columns for func in functions]
+                    total_rows = max(journal.handle.num_rows, 1)
+                    
+                    # Apenas as colunas usadas são lidas, um bloco de linhas por vez, em segundo plano
+                    engine = self._get_engine(background=True)
+                    self._start_operation(
+                        'group', f"Agrupando {selected_table}",
+                        lambda job: (new_table_name, *engine.group(
+                            journal, group_keys, aggregations, pivot=pivot_column,
+                            progress=lambda rows: job.report(rows / total_rows), job=job
+                        ))
+                    )
+                    st.rerun()
+                
+                except Exception as e:
+                    self.show_error(f"❌ Erro ao agrupar: {str(e)}")
+            else:
+                self.show_warning("Selecione as colunas de agrupamento, os valores e as agregações.")
+        
+        job = self._operation_result('group')
+        if job is not None and job.status == DONE:
+            name, handle, stats = job.result
+            if name in st.session_state['datasets']:
+                self._get_store().delete(handle)
+                self.show_error(f"❌ Já existe uma tabela com o nome '{name}'")
+            else:
+                self._register_dataset(
+                    name, handle,
+                    filename=f"{name}.xlsx",
+                    sheet_info={'sheets': ['Dados'], 'selected': 'Dados'},
+                    size=handle.memory_bytes
+                )
+                st.session_state['last_group_stats'] = (name, stats)
+                st.rerun()
+        elif job is not None and job.status == FAILED:
+            self.show_error(f"❌ Erro ao agrupar: {job.error}")
+        elif job is not None:
+            self.show_warning("Agrupamento cancelado.")
+        
+        last_group = st.session_state.pop('last_group_stats', None)
+        if last_group:
+            name, stats = last_group
+            self.show_success(f"Tabela '{name}' criada com {stats.groups:,} grupo(s)!")
+            st.caption(f"⏱️ {stats.elapsed:.2f}s · {stats.rows_scanned:,} linhas lidas em {stats.batches} bloco(s)")
+    
+    def _render_pipeline_operation(self) -> None:
+        """
+        Pipeline de operações: as etapas são montadas sem executar, o plano é
+        otimizado e executado de uma vez, sem tabelas intermediárias
+        """
+        st.subheader("🧩 Pipeline de Operações")
+        st.caption("Monte filtro → JOIN → PROCV → agrupamento e execute tudo de uma vez; "
+                   "apenas a tabela final é criada.")
+        
+        dataset_names = list(st.session_state['datasets'].keys())
+        if not dataset_names:
+            return
+        saved = st.session_state.setdefault('pipelines', {})
+        
+        # Pipelines salvos (ou exportados em JSON) são reabertos sobre as tabelas atuais
+        col1, col2 = st.columns(2)
+        with col1:
+            saved_name = st.selectbox("Pipelines salvos:", ["(novo)"] + list(saved), key="pipeline_saved")
+            if st.button("📂 Abrir", key="pipeline_open", disabled=saved_name == "(novo)"):
+                st.session_state['pipeline_draft'] = copy.deepcopy(saved[saved_name])
+                st.rerun()
+        with col2:
+            uploaded = st.file_uploader("Importar pipeline (.json):", type=['json'], key="pipeline_upload")
+            if uploaded is not None and st.button("📥 Importar", key="pipeline_import"):
+                try:
+                    st.session_state['pipeline_draft'] = Pipeline.from_json(uploaded.getvalue().decode('utf-8')).to_dict()
+                    st.rerun()
+                except ValueError as e:
+                    self.show_error(f"❌ {str(e)}")
+        
+        try:
+            pipeline = Pipeline.from_dict(st.session_state.get('pipeline_draft') or {'source': dataset_names[0]})
+        except ValueError as e:
+            self.show_error(f"❌ {str(e)}")
+            pipeline = Pipeline(dataset_names[0])
+        
+        # Cada tabela usada pode ser trocada (ex.: os arquivos do mês seguinte)
+        st.markdown("**Tabelas do pipeline**")
+        tables = pipeline.tables()
+        binding = {}
+        for column, table in zip(st.columns(len(tables)), tables):
+            with column:
+                binding[table] = st.selectbox(
+                    "Origem:" if table == pipeline.source else f"'{table}':", dataset_names,
+                    index=dataset_names.index(table) if table in dataset_names else 0,
+                    key=f"pipeline_table_{table}"
+                )
+        if any(binding[table] != table for table in tables):
+            pipeline = pipeline.bind(binding)
+            st.session_state['pipeline_draft'] = pipeline.to_dict()
+            st.rerun()
+        
+        schemas = {name: list(self._get_journal(name).handle.columns) for name in dataset_names}
+        try:
+            columns = validate(pipeline, schemas)[-1]
+            valid = True
+        except (ValueError, ExpressionError) as e:
+            self.show_error(f"❌ {str(e)}")
+            columns, valid = [], False
+        
+        # Etapas
+        st.markdown("**Etapas**")
+        if not pipeline.steps:
+            st.info("Nenhuma etapa adicionada.")
+        for position, step in enumerate(pipeline.steps):
+            col1, col2 = st.columns([10, 1])
+            with col1:
+                st.write(f"{position + 1}. {step.describe()}")
+            with col2:
+                if st.button("🗑️", key=f"pipeline_remove_{position}"):
+                    pipeline.steps.pop(position)
+                    st.session_state['pipeline_draft'] = pipeline.to_dict()
+                    st.rerun()
+        
+        if valid and not (pipeline.steps and isinstance(pipeline.steps[-1], GroupStep)):
+            with st.expander("➕ Adicionar etapa", expanded=not pipeline.steps):
+                step = self._pipeline_step_form(columns, dataset_names, schemas)
+                if step is not None:
+                    try:
+                        step_columns(columns, step, schemas)
+                        pipeline.steps.append(step)
+                        st.session_state['pipeline_draft'] = pipeline.to_dict()
+                        st.rerun()
+                    except (ValueError, ExpressionError) as e:
+                        self.show_error(f"❌ {str(e)}")
+        
+        if not (valid and pipeline.steps):
+            return
+        
+        engine = self._get_engine(background=True)
+        journals = {name: self._get_journal(name) for name in pipeline.tables()}
+        try:
+            plan = engine.plan(pipeline, journals)
+        except (ValueError, ExpressionError) as e:
+            self.show_error(f"❌ {str(e)}")
+            return
+        
+        with st.expander("🧠 Plano otimizado"):
+            for number, line in enumerate(plan.explain(), start=1):
+                st.write(f"{number}. {line}")
+            if plan.notes:
+                st.markdown("**Otimizações aplicadas:**")
+                for note in plan.notes:
+                    st.write(f"- {note}")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            new_table_name = st.text_input(
+                "Nome da tabela resultante:", value=f"{pipeline.source}_pipeline", key="pipeline_result_name"
+            )
+            if st.button("▶️ Executar pipeline", key="execute_pipeline", disabled=self._operation_running('pipeline')):
+                if new_table_name in st.session_state['datasets']:
+                    self.show_error(f"❌ Já existe uma tabela com o nome '{new_table_name}'")
+                elif new_table_name:
+                    self._start_operation(
+                        'pipeline', f"Pipeline sobre {pipeline.source}",
+                        lambda job: (new_table_name, *engine.run_pipeline(pipeline, journals, job=job))
+                    )
+                    st.rerun()
+        with col2:
+            pipeline_name = st.text_input("Nome do pipeline:", value=saved_name if saved_name != "(novo)" else "",
+                                          key="pipeline_name")
+            col_save, col_download = st.columns(2)
+            with col_save:
+                if st.button("💾 Salvar", key="pipeline_save", disabled=not pipeline_name):
+                    saved[pipeline_name] = pipeline.to_dict()
+                    self.show_success(f"Pipeline '{pipeline_name}' salvo!")
+            with col_download:
+                st.download_button(
+                    "⬇️ JSON", pipeline.to_json(), file_name=f"{pipeline_name or 'pipeline'}.json",
+                    mime="application/json", key="pipeline_download"
+                )
+        
+        job = self._operation_result('pipeline')
+        if job is not None and job.status == DONE:
+            name, handle, stats = job.result
+            if name in st.session_state['datasets']:
+                self._get_store().delete(handle)
+                self.show_error(f"❌ Já existe uma tabela com o nome '{name}'")
+            else:
+                self._register_dataset(
+                    name, handle,
+                    filename=f"{name}.xlsx",
+                    sheet_info={'sheets': ['Dados'], 'selected': 'Dados'},
+                    size=handle.memory_bytes
+                )
+                st.session_state['last_pipeline_stats'] = (name, stats)
+                st.rerun()
+        elif job is not None and job.status == FAILED:
+            self.show_error(f"❌ Erro ao executar o pipeline: {job.error}")
+        elif job is not None:
+            self.show_warning("Pipeline cancelado.")
+        
+        last_pipeline = st.session_state.pop('last_pipeline_stats', None)
+        if last_pipeline:
+            name, stats = last_pipeline
+            self.show_success(f"Tabela '{name}' criada com {stats.rows:,} linha(s)!")
+            st.dataframe(pd.DataFrame([
+                {'Etapa': timing.description, 'Linhas': timing.rows, 'Tempo (s)': round(timing.elapsed, 3)}
+                for timing in stats.steps
+            ]), hide_index=True)
+            st.caption(f"⏱️ {stats.elapsed:.2f}s no total")
+    
+    def _pipeline_step_form(self, columns: List[str], dataset_names: List[str],
+                            schemas: Dict[str, List[str]]) -> Optional[Any]:
+        """Campos da nova etapa; retorna a etapa quando o botão é clicado"""
+        kinds = {
+            'filter': "🔎 Filtro", 'join': "🔗 JOIN", 'lookup': "🔍 PROCV",
+            'formula': "🧮 Fórmulas", 'select': "📑 Selecionar colunas", 'group': "📊 Agrupar"
+        }
+        kind = st.selectbox("Tipo de etapa:", list(kinds), format_func=kinds.get, key="pipeline_step_kind")
+        
+        if kind == 'filter':
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                column = st.selectbox("Coluna:", columns, key="pipeline_filter_column")
+            with col2:
+                op = st.selectbox("Condição:", list(FILTER_OPS), format_func=FILTER_OPS.get, key="pipeline_filter_op")
+            with col3:
+                value = st.text_input("Valor:", key="pipeline_filter_value",
+                                      help="Em 'está em', separe os valores por vírgula",
+                                      disabled=op in ('isnull', 'notnull'))
+            if op == 'in':
+                value = [item.strip() for item in value.split(',')]
+            build = lambda: FilterStep(column, op, None if op in ('isnull', 'notnull') else value)
+        
+        elif kind == 'join':
+            table = st.selectbox("Tabela da direita:", dataset_names, key="pipeline_join_table")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                left_on = st.multiselect("Chave(s) da tabela atual:", columns, key="pipeline_join_left")
+            with col2:
+                right_on = st.multiselect("Chave(s) da direita:", schemas[table], key="pipeline_join_right")
+            with col3:
+                how = st.selectbox("Tipo de JOIN:", list(JOIN_TYPES), index=1, key="pipeline_join_how")
+            build = lambda: JoinStep(table, left_on, right_on, how)
+        
+        elif kind == 'lookup':
+            table = st.selectbox("Tabela de referência:", dataset_names, key="pipeline_lookup_table")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                lookup_columns = st.multiselect("Coluna(s) de busca:", columns, key="pipeline_lookup_columns")
+            with col2:
+                reference_columns = st.multiselect("Chave(s) da referência:", schemas[table],
+                                                   key="pipeline_lookup_keys")
+            with col3:
+                value_columns = st.multiselect("Valores a retornar:", schemas[table], key="pipeline_lookup_values")
+            col1, col2 = st.columns(2)
+            with col1:
+                new_column = st.text_input("Nome da nova coluna:", value="PROCV_Result", key="pipeline_lookup_name",
+                                           help="Com várias colunas de valores, cada uma vira '<nome>_<coluna>'")
+            with col2:
+                mode = st.selectbox(
+                    "Correspondência:", ["exact", "approximate"],
+                    format_func=lambda mode: {"exact": "Exata", "approximate": "Aproximada (PROCV VERDADEIRO)"}[mode],
+                    key="pipeline_lookup_mode"
+                )
+            build = lambda: LookupStep(table, lookup_columns, reference_columns, value_columns, new_column, mode)
+        
+        elif kind == 'formula':
+            text = st.text_area("Fórmulas (uma por linha):", placeholder="Total = Preco * Quantidade",
+                                key="pipeline_formula_text")
+            build = lambda: FormulaStep(text)
+        
+        elif kind == 'select':
+            selected = st.multiselect("Colunas mantidas:", columns, default=columns, key="pipeline_select_columns")
+            build = lambda: SelectStep(selected)
+        
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                keys = st.multiselect("Agrupar por:", columns, default=columns[:1], key="pipeline_group_keys")
+                pivot_options = ["(nenhuma)"] + [column for column in columns if column not in keys]
+                pivot = st.selectbox("Colunas da tabela dinâmica (opcional):", pivot_options, key="pipeline_group_pivot")
+            with col2:
+                values = st.multiselect("Valores:", [column for column in columns if column not in keys],
+                                        key="pipeline_group_values")
+                functions = st.multiselect("Agregações:", list(AGGREGATIONS), default=['sum'],
+                                           format_func=lambda func: AGGREGATIONS[func], key="pipeline_group_functions")
+            build = lambda: GroupStep(keys, [(column, func) for column in values for func in functions],
+                                      None if pivot == "(nenhuma)" else pivot)
+        
+        if st.button("➕ Adicionar", key="pipeline_add_step"):
+            return build()
+        return None
+    
     def _render_analysis_tab(self) -> None:
         """Renderiza aba de análise dos dados"""
         if not st.session_state['datasets']:
@@ -927,95 +2161,158 @@ class ExcelModule(BaseModule):
         
         st.subheader("📊 Análise dos Dados")
         
-        # Seletor de tabela e planilha para análise
-        selected_dataset, df, selected_sheet = self._get_dataset_with_sheet_selection(
-            "analysis", "Selecione a tabela para analisar:"
+        # Seletor de tabela e planilha para análise (os dados vêm do perfil, não são carregados aqui)
+        selected_dataset, _, selected_sheet = self._get_dataset_with_sheet_selection(
+            "analysis", "Selecione a tabela para analisar:", load_data=False
         )
         
-        if selected_dataset and df is not None:
-            
-            # Estatísticas básicas
-            st.subheader("📈 Estatísticas Gerais")
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric("📄 Total de Linhas", len(df))
-            with col2:  
-                st.metric("📊 Total de Colunas", len(df.columns))
-            with col3:
-                st.metric("❌ Valores Nulos", df.isnull().sum().sum())
-            with col4:
-                st.metric("📝 Células Preenchidas", df.notna().sum().sum())
+        if not selected_dataset:
+            return
+        
+        try:
+            profile, job = self._get_profile(selected_dataset)
+        except Exception as e:
+            self.show_error(f"❌ Erro ao calcular o perfil: {str(e)}")
+            return
+        
+        if profile is None:
+            if job.status == FAILED:
+                self.show_error(f"❌ Erro ao calcular o perfil: {job.error}")
+                return
             
-            # Análise por colunas
-            st.subheader("🔍 Análise por Colunas")
+            def progress() -> None:
+                st.progress(job.progress, text=f"📊 Calculando perfil completo... ({job.elapsed:.1f}s)")
+                if job.done:
+                    st.rerun()
             
-            # Selecionar coluna para análise
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-            text_cols = df.select_dtypes(include=['object']).columns.tolist()
+            st.fragment(progress, run_every=1.0)()
+            profile = self._get_profile_preview(selected_dataset)
+            st.caption(f"👀 Prévia calculada sobre as primeiras {profile.rows:,} linhas")
+        
+        handle = self._get_journal(selected_dataset).handle
+        
+        # Estatísticas básicas
+        st.subheader("📈 Estatísticas Gerais")
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("📄 Total de Linhas", handle.num_rows)
+        with col2:  
+            st.metric("📊 Total de Colunas", len(handle.columns))
+        with col3:
+            st.metric("❌ Valores Nulos", profile.nulls)
+        with col4:
+            st.metric("📝 Células Preenchidas", profile.filled)
+        
+        if not profile.preview:
+            st.caption(f"⏱️ Perfil calculado em {profile.elapsed:.2f}s (reaproveitado até a próxima edição)")
+        
+        # Análise por colunas
+        st.subheader("🔍 Análise por Colunas")
+        
+        numeric_cols = profile.columns_of_kind('numeric')
+        text_cols = profile.columns_of_kind('text')
         
         if numeric_cols:
             st.subheader("📊 Colunas Numéricas")
-            selected_numeric = st.selectbox("Escolha uma coluna numérica:", numeric_cols)
+            selected_numeric = st.selectbox("Escolha uma coluna numérica:", numeric_cols, key="analysis_numeric")
             
             if selected_numeric:
+                column = profile.columns[selected_numeric]
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.write("**Estatísticas:**")
-                    stats = df[selected_numeric].describe()
-                    st.dataframe(stats)
+                    st.dataframe(column.describe())
+                    if not column.quantiles_exact:
+                        st.caption(f"Quantis estimados a partir de uma amostra de {len(column.sample):,} valores")
                 
                 with col2:
                     st.write("**Gráfico:**")
-                    st.bar_chart(df[selected_numeric].value_counts().head(10))
+                    st.bar_chart(column.top_values.top(10))
+                    self._render_distinct_caption(column)
         
         if text_cols:
             st.subheader("📝 Colunas de Texto")
-            selected_text = st.selectbox("Escolha uma coluna de texto:", text_cols)
+            selected_text = st.selectbox("Escolha uma coluna de texto:", text_cols, key="analysis_text")
             
             if selected_text:
+                column = profile.columns[selected_text]
+                value_counts = column.top_values.top(10)
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.write("**Valores mais frequentes:**")
-                    value_counts = df[selected_text].value_counts().head(10)
                     st.dataframe(value_counts)
+                    self._render_distinct_caption(column)
                 
                 with col2:
                     st.write("**Distribuição:**")
                     st.bar_chart(value_counts)
+
+    def _render_distinct_caption(self, column: ColumnProfile) -> None:
+        """Valores distintos e precisão das contagens de uma coluna do perfil"""
+        if column.top_values.exact:
+            st.caption(f"🔢 {column.distinct:,} valores distintos")
+        else:
+            st.caption(
+                f"🔢 ≈ {column.distinct:,} valores distintos (estimativa); "
+                f"contagens dos mais frequentes com erro de até {column.top_values.error:,}"
+            )
     
     def _render_config_tab(self) -> None:
         """Renderiza aba de configurações"""
         st.subheader("⚙️ Configurações do Excel Editor")
+        saved = st.session_state.get('excel_config', {})
+
+        def option_index(options: List[Any], key: str, default: int = 0) -> int:
+            return options.index(saved[key]) if saved.get(key) in options else default
         
         # Configurações de display
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("🔧 Configurações Gerais")
-            auto_save = st.checkbox("💾 Salvamento Automático", value=True)
-            show_stats = st.checkbox("📊 Mostrar Estatísticas", value=True)
-            max_rows_display = st.slider("📄 Máx. linhas exibidas:", 10, 1000, 100)
+            auto_save = st.checkbox("💾 Salvamento Automático", value=saved.get('auto_save', True))
+            show_stats = st.checkbox("📊 Mostrar Estatísticas", value=saved.get('show_stats', True))
+            max_rows_display = st.slider("📄 Máx. linhas exibidas:", 10, 1000, saved.get('max_rows_display', 100))
+            max_join_rows = st.number_input(
+                "🔗 Máx. linhas no resultado de JOIN:",
+                min_value=10_000, max_value=100_000_000, value=saved.get('max_join_rows', 5_000_000), step=100_000,
+                help="JOINs cujo resultado estimado passe deste limite são recusados antes de executar"
+            )
         
         with col2:
             st.subheader("🎨 Aparência")
-            column_width = st.selectbox("📏 Largura das colunas:", ["Pequena", "Média", "Grande"], index=1)
-            show_index = st.checkbox("🔢 Mostrar índice", value=True)
-            highlight_changes = st.checkbox("✨ Destacar alterações", value=True)
+            width_options = ["Pequena", "Média", "Grande"]
+            column_width = st.selectbox("📏 Largura das colunas:", width_options,
+                                        index=option_index(width_options, 'column_width', 1))
+            show_index = st.checkbox("🔢 Mostrar índice", value=saved.get('show_index', True))
+            highlight_changes = st.checkbox("✨ Destacar alterações", value=saved.get('highlight_changes', True))
         
         # Configurações de exportação
         st.subheader("📤 Configurações de Exportação")
         
         col3, col4 = st.columns(2)
         with col3:
-            export_format = st.selectbox("📋 Formato padrão:", ["Excel (.xlsx)", "CSV (.csv)", "JSON (.json)"])
-            include_index = st.checkbox("🔢 Incluir índices na exportação", value=False)
+            format_options = [label for label, _, _ in EXPORT_FORMATS.values()]
+            export_format = st.selectbox("📋 Formato padrão:", format_options,
+                                         index=option_index(format_options, 'export_format'))
+            include_index = st.checkbox("🔢 Incluir índices na exportação", value=saved.get('include_index', False))
+            parquet_compression = st.selectbox(
+                "🗜️ Compressão (Parquet/Feather):", PARQUET_COMPRESSIONS,
+                index=option_index(PARQUET_COMPRESSIONS, 'parquet_compression'),
+                help="snappy é o mais rápido; zstd gera arquivos menores. No Feather, snappy e gzip usam lz4"
+            )
         
         with col4:
-            date_format = st.selectbox("📅 Formato de data:", ["DD/MM/AAAA", "MM/DD/AAAA", "AAAA-MM-DD"])
-            decimal_separator = st.selectbox("🔢 Separador decimal:", [",", "."], index=1)
+            date_options = ["DD/MM/AAAA", "MM/DD/AAAA", "AAAA-MM-DD"]
+            date_format = st.selectbox("📅 Formato de data:", date_options,
+                                       index=option_index(date_options, 'date_format'))
+            decimal_separator = st.selectbox(
+                "🔢 Separador decimal:", [",", "."], index=option_index([",", "."], 'decimal_separator', 1),
+                help="Usado no CSV (com vírgula, os campos são separados por ponto e vírgula); no Excel os números são gravados como números"
+            )
         
         # Salvar configurações
         if st.button("💾 Salvar Configurações", width="stretch"):
@@ -1023,13 +2320,15 @@ class ExcelModule(BaseModule):
                 'auto_save': auto_save,
                 'show_stats': show_stats,
                 'max_rows_display': max_rows_display,
+                'max_join_rows': int(max_join_rows),
                 'column_width': column_width,
                 'show_index': show_index,
                 'highlight_changes': highlight_changes,
                 'export_format': export_format,
                 'include_index': include_index,
                 'date_format': date_format,
-                'decimal_separator': decimal_separator
+                'decimal_separator': decimal_separator,
+                'parquet_compression': parquet_compression
             }
             st.session_state['excel_config'] = config
             self.show_success("Configurações salvas!")
@@ -1037,27 +2336,137 @@ class ExcelModule(BaseModule):
             # Mostrar configurações salvas
             with st.expander("👀 Configurações Atuais"):
                 st.json(config)
+
+        self._render_workspace_settings()
+
+    def _render_workspace_settings(self) -> None:
+        """Workspace persistente: onde as tabelas e configurações ficam salvas"""
+        st.subheader("💾 Workspace")
+        state = st.session_state.get('workspace')
+        workspaces = get_workspace_store()
+        if not state or workspaces is None:
+            st.info("A persistência está desativada (EXCEL_WORKSPACE=off): as tabelas ficam apenas nesta sessão.")
+            return
+
+        st.caption(
+            f"👤 {state['user']} · 📂 {state['name']} · {len(state['versions'])} tabela(s) salvas · "
+            f"{workspaces.disk_bytes(state['id']) / MB:.1f} MB em disco. "
+            f"Tabelas e configurações são salvas automaticamente e reabertas ao recarregar a página."
+        )
+
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            names = workspaces.list_workspaces(state['user'])
+            target = st.selectbox(
+                "Abrir workspace:", names, index=names.index(state['name']) if state['name'] in names else None,
+                accept_new_options=True, key="workspace_target",
+                help="Digite um nome novo para criar um workspace vazio"
+            )
+        with col2:
+            st.write("")
+            if st.button("📂 Abrir", key="workspace_open") and target and workspace_name(target) != state['name']:
+                self._switch_workspace(workspace_name(target))
+                st.rerun()
     
-    def _download_excel(self, df: pd.DataFrame, filename: str) -> None:
-        """Gera download do arquivo Excel"""
-        try:
-            # Criar buffer em memória
-            buffer = io.BytesIO()
-            
-            # Escrever DataFrame no buffer como Excel
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df.to_excel(writer, sheet_name='Dados', index=False)
+    def _get_export_cache(self) -> ExportCache:
+        """Arquivos exportados da sessão, por versão dos datasets"""
+        if 'export_cache' not in st.session_state:
+            st.session_state['export_cache'] = ExportCache()
+        return st.session_state['export_cache']
+
+    def _export_options(self) -> ExportOptions:
+        return ExportOptions.from_config(st.session_state.get('excel_config', {}))
+
+    def _export_options_format(self) -> str:
+        """Formato padrão escolhido nas configurações"""
+        label = st.session_state.get('excel_config', {}).get('export_format')
+        return next((key for key, (format_label, _, _) in EXPORT_FORMATS.items() if format_label == label), 'xlsx')
+
+    def _export_sheets(self, names: List[str], all_sheets: bool = False) -> Tuple[tuple, List[Any], Optional[int]]:
+        """
+        Planilhas a exportar, lidas do armazenamento em blocos
+        Retorna (chave de cache, planilhas, total de linhas ou None se desconhecido)
+        """
+        store = self._get_store()
+        workbook_cache = self._get_workbook_cache()
+        key, sheets, total_rows = [], [], 0
+        
+        for name in names:
+            dataset_info = st.session_state['datasets'][name]
+            handle = dataset_info['journal'].handle
+            key.append((name, handle.key))
+            sheets.append((name, store.iter_batches(handle), handle.columns))
+            total_rows = total_rows + handle.num_rows if total_rows is not None else None
             
-            buffer.seek(0)
+            file_hash = dataset_info.get('file_hash')
+            if not (all_sheets and file_hash and workbook_cache.has_workbook(file_hash)):
+                continue
+            sheet_info = dataset_info['sheet_info']
+            for sheet in sheet_info['sheets']:
+                if sheet != sheet_info['selected']:
+                    key.append((name, file_hash, sheet))
+                    sheets.append((f"{name} - {sheet}", self._lazy_sheet(file_hash, sheet)))
+                    total_rows = None  # linhas da planilha só são conhecidas após a leitura
+        
+        return tuple(key), sheets, total_rows
+
+    def _lazy_sheet(self, file_hash: str, sheet: str) -> Iterator[pd.DataFrame]:
+        # A planilha só é lida quando o arquivo for de fato gerado
+        yield self._get_workbook_cache().get_sheet(file_hash, sheet)
+
+    def _download_excel(self, names: List[str], filename: str, all_sheets: bool = False) -> None:
+        """Gera (ou reaproveita do cache) o arquivo Excel com uma planilha por tabela"""
+        try:
+            options = self._export_options()
+            key, sheets, total_rows = self._export_sheets(names, all_sheets)
+            started = time.perf_counter()
+            data, cached = self._get_export_cache().get(
+                ('xlsx', options, key),
+                lambda: export_file('xlsx', sheets, options, total_rows=total_rows)
+            )
             
             # Botão de download
             st.download_button(
                 label="📥 Baixar Excel",
-                data=buffer.getvalue(),
+                data=data,
                 file_name=filename,
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 width="stretch"
             )
+            self._export_caption(cached, time.perf_counter() - started, len(data))
             
         except Exception as e:
-            self.show_error(f"Erro ao gerar arquivo Excel: {str(e)}")
\ No newline at end of file
+            self.show_error(f"Erro ao gerar arquivo Excel: {str(e)}")
+
+    def _download_dataset(self, name: str, filename: str, export_format: str) -> None:
+        """Gera (ou reaproveita do cache) o arquivo de uma tabela em CSV, JSON Lines, Parquet ou Feather"""
+        label, extension, mime = EXPORT_FORMATS[export_format]
+        try:
+            options = self._export_options()
+            handle = self._get_journal(name).handle
+            store = self._get_store()
+            started = time.perf_counter()
+            data, cached = self._get_export_cache().get(
+                (export_format, options, handle.key),
+                lambda: export_file(
+                    export_format, [(name, store.iter_batches(handle), handle.columns)], options,
+                    date_formats=csv_date_formats(store, handle, options) if export_format == 'csv' else None
+                )
+            )
+            st.download_button(
+                f"📥 Baixar {label}",
+                data,
+                f"{os.path.splitext(filename)[0]}.{extension}",
+                mime,
+                key=f"{export_format}_download_{name}"
+            )
+            self._export_caption(cached, time.perf_counter() - started, len(data))
+        
+        except Exception as e:
+            self.show_error(f"Erro ao gerar arquivo {label}: {str(e)}")
+
+    def _export_caption(self, cached: bool, elapsed: float, size: int) -> None:
+        if cached:
+            st.caption(f"⚡ Arquivo reaproveitado ({size / MB:.1f} MB): a tabela não mudou desde a última exportação")
+        else:
+            st.caption(f"⏱️ Arquivo gerado em {elapsed:.2f}s ({size / MB:.1f} MB)")
@@ -1,8 +1,59 @@
+import io
+import os
 import json
+import time
+import zipfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from dataclasses import dataclass, field
 import pandas as pd
 import streamlit as st
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Iterator, BinaryIO, Callable, Union
 from core.base import BaseModule, DataProcessor, UIComponents
+from core.cache import content_hash
+from core.jobs import Job, DONE, FAILED, get_job_runner
+from core.jsonstream import JsonReadStats, decode_json, encode_json, read_json_document
+from core.memory import MB
+from core.validation import (
+    ISSUE_COLUMNS, FrameRule, IncrementalValidator, Rule, Schema, ValidationStats, matches, non_negative_number,
+    normalize_document, unique, valid_cep, valid_cnpj, valid_cpf_cnpj
+)
+from core.workers import WorkerPool, get_worker_pool
+
+# Campos da empresa: chave no JSON -> rótulo na tela
+COMPANY_FIELDS = {
+    'company_name': 'Nome da Empresa',
+    'cnpj': 'CNPJ',
+    'nire': 'NIRE',
+    'address': 'Endereço',
+    'zip_code': 'CEP'
+}
+
+# Colunas principais dos sócios, nesta ordem (as demais vêm depois)
+PARTNER_COLUMNS = ['partner_name', 'cpf_cnpj', 'represented_by', 'address', 'participation_value', 'qualification']
+
+# Listas do documento editadas em tabelas próprias
+LIST_FIELDS = ('partners', 'new_partners', 'leaving_partners')
+
+# Processamento em lote: arquivos aceitos e tamanho dos blocos enviados aos processos
+BATCH_EXTENSIONS = ('.json', '.ndjson', '.jsonl')
+BATCH_CHUNK_DOCUMENTS = 200
+BATCH_CHUNK_BYTES = 16 * MB
+# Abaixo deste número de documentos, entregar os blocos aos processos custa mais que processá-los
+BATCH_WORKER_MIN_DOCUMENTS = 2000
+
+# Coluna que identifica o documento de origem nas tabelas do lote
+DOCUMENT_COLUMN = 'Documento'
+
+# Campo opcional do documento com o capital social, conferido contra a soma das participações
+CAPITAL_FIELD = 'share_capital'
+
+# Documentos processados mantidos por sessão (os mais antigos saem primeiro)
+DOCUMENT_CACHE_SIZE = 8
+
+# Tamanho máximo da prévia do JSON modificado (o download traz o documento inteiro)
+PREVIEW_BYTES = 20_000
 
 class SocietaryModule(BaseModule):
     """Módulo para edição de atos societários"""
@@ -22,6 +73,7 @@ class SocietaryModule(BaseModule):
         tab_configs = [
             {'name': '📁 Upload JSON', 'key': 'upload'},
             {'name': '✏️ Colar JSON', 'key': 'paste'},
+            {'name': '📦 Lote', 'key': 'batch'},
             {'name': '📄 Exemplo', 'key': 'example'}
         ]
         
@@ -30,7 +82,22 @@ class SocietaryModule(BaseModule):
         # Processar cada aba
         self._render_upload_tab(tabs['upload']['tab'])
         self._render_paste_tab(tabs['paste']['tab'])
+        self._render_batch_tab(tabs['batch']['tab'])
         self._render_example_tab(tabs['example']['tab'])
+        
+        # Documento carregado por qualquer uma das abas: editado aqui a cada rerun
+        self._render_active_document()
+    
+    @staticmethod
+    def _document_cache() -> "SocietaryDocumentCache":
+        return st.session_state.setdefault('documentos_societarios', SocietaryDocumentCache())
+    
+    def _load_document(self, data: Union[bytes, str], name: str) -> None:
+        """Processa o documento (só se o conteúdo for novo) e o torna o documento em edição"""
+        document = self._document_cache().get_or_process(data, name, SocietaryDataProcessor().process_document)
+        if st.session_state.get('documento_societario') != document.digest:
+            st.session_state['documento_societario'] = document.digest
+            st.session_state.pop('json_modificado', None)
     
     def _render_upload_tab(self, tab) -> None:
         """Renderiza aba de upload"""
@@ -43,11 +110,13 @@ class SocietaryModule(BaseModule):
                 "Selecione um arquivo JSON com dados societários"
             )
             
-            if arquivo_json is not None:
+            # Cada upload é processado uma vez; os reruns seguintes usam o cache
+            uploads = st.session_state.setdefault('uploads_societarios', {})
+            if arquivo_json is not None and arquivo_json.file_id not in uploads:
                 try:
-                    dados_json = json.loads(arquivo_json.read().decode('utf-8'))
+                    self._load_document(arquivo_json.getvalue(), arquivo_json.name)
+                    uploads[arquivo_json.file_id] = st.session_state['documento_societario']
                     self.show_success("Arquivo carregado com sucesso!")
-                    self._process_societary_data(dados_json)
                 except Exception as e:
                     self.show_error(f"Erro ao carregar arquivo: {str(e)}")
     
@@ -65,14 +134,121 @@ class SocietaryModule(BaseModule):
             if st.button("📝 Processar JSON Colado", width="stretch"):
                 if json_text.strip():
                     try:
-                        dados_json = json.loads(json_text)
+                        self._load_document(json_text, "JSON colado")
                         self.show_success("JSON processado com sucesso!")
-                        self._process_societary_data(dados_json)
-                    except json.JSONDecodeError as e:
+                    except ValueError as e:
                         self.show_error(f"JSON inválido: {str(e)}")
                 else:
                     self.show_warning("Por favor, cole um JSON válido na área de texto")
     
+    def _render_batch_tab(self, tab) -> None:
+        """Renderiza aba de processamento em lote (milhares de documentos)"""
+        with tab:
+            st.subheader("Processamento em lote")
+            
+            origem = st.radio("Enviar:", ["Arquivos ou .zip", "Pasta"], horizontal=True, key="lote_origem")
+            arquivos = st.file_uploader(
+                "Arquivos JSON, NDJSON ou .zip:",
+                type=['json', 'ndjson', 'jsonl', 'zip'],
+                accept_multiple_files=True if origem == "Arquivos ou .zip" else "directory",
+                help="Cada arquivo .json é um documento (ou uma lista de documentos); no NDJSON, um por linha",
+                key="lote_arquivos"
+            )
+            
+            job = st.session_state.get('lote_job')
+            if st.button("⚙️ Processar lote", width="stretch", disabled=not arquivos or job is not None):
+                files = [(arquivo.name, arquivo.getvalue()) for arquivo in arquivos]
+                processor = SocietaryBatchProcessor(get_worker_pool())
+                st.session_state['lote_job'] = get_job_runner().submit(
+                    f"Lote de {len(files)} arquivo(s)", lambda job: processor.process(files, job=job)
+                )
+                st.session_state.pop('lote', None)
+                st.session_state.pop('lote_validacao', None)
+                st.rerun()
+            
+            if job is not None:
+                if not job.done:
+                    def progress() -> None:
+                        col1, col2 = st.columns([4, 1])
+                        with col1:
+                            st.progress(job.progress, text=f"⚙️ {job.name}... ({job.elapsed:.1f}s)")
+                        with col2:
+                            if st.button("🚫 Cancelar", key="lote_cancelar"):
+                                job.cancel()
+                        if job.done:
+                            st.rerun()
+                    
+                    st.fragment(progress, run_every=1.0)()
+                    return
+                
+                del st.session_state['lote_job']
+                if job.status == DONE:
+                    st.session_state['lote'] = job.result
+                elif job.status == FAILED:
+                    self.show_error(f"Erro ao processar o lote: {job.error}")
+                else:
+                    self.show_warning("Processamento do lote cancelado.")
+            
+            lote = st.session_state.get('lote')
+            if lote is not None:
+                self._render_batch_result(lote)
+    
+    def _render_batch_result(self, lote: Dict[str, Any]) -> None:
+        """Tabelas combinadas do lote para edição em massa e exportação em .zip"""
+        stats = lote['stats']
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("📄 Documentos", f"{stats.documents:,}")
+        with col2:
+            st.metric("👥 Sócios", f"{stats.partners:,}")
+        with col3:
+            st.metric("❌ Com erro", f"{stats.errors:,}")
+        with col4:
+            st.metric("⚡ Documentos/s", f"{stats.throughput:,.0f}")
+        st.caption(
+            f"⏱️ {stats.elapsed:.2f}s · {stats.bytes / MB:,.1f} MB em {stats.chunks} bloco(s)"
+            + (f" · {stats.workers} processo(s)" if stats.workers else " · na própria sessão")
+        )
+        
+        if len(lote['erros']):
+            with st.expander(f"❌ Documentos com erro ({len(lote['erros']):,})"):
+                st.dataframe(lote['erros'], hide_index=True, width="stretch")
+        
+        editados = {}
+        for key, title in (('empresa', "🏢 Empresas"), ('socios', "👥 Sócios"),
+                           ('novos', "➕ Novos Sócios"), ('saindo', "➖ Sócios que Saem")):
+            if len(lote[key]):
+                st.subheader(title)
+                editados[key] = UIComponents.data_editor(lote[key], key=f"lote_{key}_editor")
+            else:
+                editados[key] = lote[key]
+        
+        validator = st.session_state.setdefault('lote_validacao', SocietaryValidator())
+        issues = validator.validate(editados, capital={
+            document: SocietaryValidator.capital_of(dados) for document, dados in lote['originais'].items()
+        })
+        self._render_validation(issues, validator.stats)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            exporter = SocietaryDataExporter()
+            frames = {**editados, 'originais': lote['originais'], 'colunas_socios': lote['colunas_socios']}
+            # O .zip é gerado só no clique, um documento por vez
+            st.download_button(
+                label="📦 Download ZIP",
+                data=lambda: exporter.export_batch(frames),
+                file_name="atos_societarios.zip",
+                mime="application/zip",
+                width="stretch"
+            )
+        with col2:
+            if st.button("🗑️ Descartar lote", width="stretch"):
+                st.session_state.pop('lote', None)
+                st.session_state.pop('lote_validacao', None)
+                for key in [key for key in st.session_state.keys() if key.startswith('lote_') and key.endswith('_editor')]:
+                    del st.session_state[key]
+                st.rerun()
+    
     def _render_example_tab(self, tab) -> None:
         """Renderiza aba de exemplo"""
         with tab:
@@ -83,131 +259,165 @@ class SocietaryModule(BaseModule):
             st.code(json.dumps(exemplo, indent=2, ensure_ascii=False), language='json')
             
             if st.button("📋 Usar Este Exemplo", width="stretch"):
-                self.show_success("Exemplo carregado!")
-                self._process_societary_data(exemplo)
-    
-    def _process_societary_data(self, dados_json: Dict) -> None:
-        """Processa dados societários e exibe interface de edição"""
-        try:
-            processor = SocietaryDataProcessor()
-            data_frames = processor.process_json(dados_json)
-            
-            self._render_editing_interface(data_frames)
-            
-        except Exception as e:
-            self.show_error(f"Erro ao processar dados: {str(e)}")
+                try:
+                    self._load_document(json.dumps(exemplo, ensure_ascii=False), "Exemplo")
+                    self.show_success("Exemplo carregado!")
+                except Exception as e:
+                    self.show_error(f"Erro ao processar dados: {str(e)}")
     
-    def _render_editing_interface(self, data_frames: Dict) -> None:
+    def _render_active_document(self) -> None:
+        """Interface de edição do documento em edição, vindo do cache"""
+        digest = st.session_state.get('documento_societario')
+        document = self._document_cache().get(digest) if digest else None
+        if document is None:
+            return
+        
+        st.divider()
+        st.subheader(f"📄 {document.name}")
+        self._show_parse_stats(document.frames['parse_stats'])
+        self._render_editing_interface(document)
+    
+    @staticmethod
+    def _clear_editing_state() -> None:
+        for key in list(st.session_state.keys()):
+            if key.startswith(('empresa_', 'socios_', 'novos_', 'saindo_', 'json_', 'validacao')):
+                del st.session_state[key]
+    
+    @staticmethod
+    def _render_validation(issues: Dict[str, pd.DataFrame], stats: ValidationStats) -> None:
+        """Problemas encontrados por tabela, um por célula"""
+        titulos = {'empresa': "Empresa", 'socios': "Sócios", 'novos': "Novos Sócios", 'saindo': "Sócios que Saem"}
+        tabela = pd.concat(
+            [df.assign(Tabela=titulos[key]) for key, df in issues.items() if len(df)] or [pd.DataFrame()],
+            ignore_index=True
+        )
+        detalhe = f"{stats.checked:,} de {stats.rows:,} linhas conferidas em {stats.elapsed * 1000:,.0f} ms"
+        if tabela.empty:
+            st.caption(f"✅ Nenhum problema encontrado · {detalhe}")
+            return
+        st.warning(f"⚠️ {len(tabela):,} problema(s) de validação")
+        with st.expander("🔎 Problemas de validação"):
+            tabela['Linha'] = tabela['Linha'].astype('string').fillna('—')
+            st.dataframe(tabela[['Tabela', *ISSUE_COLUMNS]], hide_index=True, width="stretch")
+            st.caption(detalhe)
+    
+    @staticmethod
+    def _show_parse_stats(stats: JsonReadStats) -> None:
+        """Tamanho, sócios e velocidade da leitura do documento"""
+        st.caption(f"⚡ {stats.bytes / MB:,.1f} MB lidos em {stats.elapsed:.2f}s "
+                   f"({stats.throughput:,.1f} MB/s, {stats.mode}) · {stats.records:,} sócios")
+    
+    def _render_editing_interface(self, document: "SocietaryDocument") -> None:
         """Renderiza interface de edição dos dados"""
-        df_empresa = data_frames['empresa']
-        df_socios = data_frames['socios'] 
-        df_novos = data_frames['novos']
-        df_saindo = data_frames['saindo']
-        dados_originais = data_frames['originais']
+        df_empresa = document.frames['empresa']
+        dados_originais = document.frames['originais']
+        
+        def editor(table: str) -> pd.DataFrame:
+            # Chave por documento: as edições de um não passam para outro
+            key = f"{table}_editor_{document.digest[:12]}"
+            return UIComponents.data_editor(document.editor_base(table, key in st.session_state), key=key)
         
         if df_empresa is not None and not df_empresa.empty:
             # Informações da Empresa
             st.subheader("🏢 Informações da Empresa")
-            df_empresa_editado = UIComponents.data_editor(
-                df_empresa,
-                key="empresa_editor"
-            )
+            df_empresa_editado = editor('empresa')
             
             # Sócios da Empresa  
-            if not df_socios.empty:
+            if not document.frames['socios'].empty:
                 st.subheader("👥 Sócios da Empresa")
-                df_socios_editado = UIComponents.data_editor(
-                    df_socios,
-                    key="socios_editor"
-                )
+                df_socios_editado = editor('socios')
             else:
                 df_socios_editado = pd.DataFrame()
             
             # Novos Sócios
-            if not df_novos.empty:
+            if not document.frames['novos'].empty:
                 st.subheader("➕ Novos Sócios")
-                df_novos_editado = UIComponents.data_editor(
-                    df_novos,
-                    key="novos_editor"
-                )
+                df_novos_editado = editor('novos')
             else:
                 df_novos_editado = pd.DataFrame()
             
             # Sócios que Saem
-            if not df_saindo.empty:
+            if not document.frames['saindo'].empty:
                 st.subheader("➖ Sócios que Saem")
-                df_saindo_editado = UIComponents.data_editor(
-                    df_saindo,
-                    key="saindo_editor"
-                )
+                df_saindo_editado = editor('saindo')
             else:
                 df_saindo_editado = pd.DataFrame()
             
+            # Estado editado fica no cache: sobrevive a reruns em que os editores não aparecem
+            document.edited = {'empresa': df_empresa_editado, 'socios': df_socios_editado,
+                               'novos': df_novos_editado, 'saindo': df_saindo_editado}
+            
+            # Validação das tabelas editadas
+            validator = st.session_state.setdefault('validacao', SocietaryValidator())
+            issues = validator.validate(document.edited, capital=SocietaryValidator.capital_of(dados_originais))
+            self._render_validation(issues, validator.stats)
+            
             # Botões de ação
-            self._render_action_buttons(
-                df_empresa_editado,
-                df_socios_editado,
-                df_novos_editado, 
-                df_saindo_editado,
-                dados_originais
-            )
+            self._render_action_buttons(document)
     
-    def _render_action_buttons(self, df_empresa, df_socios, df_novos, df_saindo, dados_originais) -> None:
+    def _render_action_buttons(self, document: "SocietaryDocument") -> None:
         """Renderiza botões de ação"""
-        buttons_config = [
-            {'label': '💾 Salvar Alterações', 'key': 'save'},
-            {'label': '📥 Download JSON', 'key': 'download'},
-            {'label': '🔄 Resetar', 'key': 'reset'}
-        ]
+        df_empresa, df_socios, df_novos, df_saindo = (document.edited[key] for key in ('empresa', 'socios', 'novos', 'saindo'))
+        dados_originais = document.frames['originais']
+        exporter = SocietaryDataExporter()
+        compacto = st.toggle("⚡ JSON compacto", key="json_compacto",
+                             help="Sem indentação: arquivo menor e gerado mais rápido")
         
-        button_states = UIComponents.action_buttons(buttons_config)
-        
-        if button_states['save']:
-            try:
-                exporter = SocietaryDataExporter()
-                json_modificado = exporter.export_modified_data(
-                    df_empresa, df_socios, df_novos, df_saindo, dados_originais
-                )
-                
-                if json_modificado:
-                    st.session_state['json_modificado'] = json_modificado
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            if st.button("💾 Salvar Alterações", width="stretch"):
+                try:
+                    st.session_state['json_modificado'] = exporter.export_modified_data(
+                        df_empresa, df_socios, df_novos, df_saindo, dados_originais, compact=compacto
+                    )
                     self.show_success("Alterações salvas!")
-            except Exception as e:
-                self.show_error(f"Erro ao salvar: {str(e)}")
-        
-        if button_states['download'] and 'json_modificado' in st.session_state:
+                except Exception as e:
+                    self.show_error(f"Erro ao salvar: {str(e)}")
+        with col2:
+            # Gerado só no clique, a partir das tabelas editadas
             st.download_button(
-                label="📥 Download Executar",
-                data=st.session_state['json_modificado'],
+                label="📥 Download JSON",
+                data=lambda: exporter.export_modified_data(
+                    df_empresa, df_socios, df_novos, df_saindo, dados_originais, compact=compacto
+                ),
                 file_name="ato_societario_modificado.json",
                 mime="application/json",
                 width="stretch"
             )
+        with col3:
+            if st.button("🔄 Resetar", width="stretch"):
+                # Descartar as edições (o documento processado continua no cache) e recarregar
+                self._document_cache().discard_edits(document.digest)
+                self._clear_editing_state()
+                st.rerun()
+        with col4:
+            if st.button("🗑️ Fechar", width="stretch", help="Remove o documento do cache da sessão"):
+                self._document_cache().invalidate(document.digest)
+                st.session_state.pop('documento_societario', None)
+                self._clear_editing_state()
+                st.rerun()
         
-        if button_states['reset']:
-            # Limpar session state e recarregar
-            for key in list(st.session_state.keys()):
-                if key.startswith(('empresa_', 'socios_', 'novos_', 'saindo_', 'json_')):
-                    del st.session_state[key]
-            st.rerun()
-        
-        # Prévia do JSON modificado
+        # Prévia do JSON modificado (só o começo: documentos grandes pesariam em cada rerun)
         if 'json_modificado' in st.session_state:
+            json_modificado = st.session_state['json_modificado']
             with st.expander("👀 Prévia do JSON Modificado"):
-                st.code(st.session_state['json_modificado'], language='json')
+                st.code(json_modificado[:PREVIEW_BYTES].decode('utf-8', errors='ignore'), language='json')
+                if len(json_modificado) > PREVIEW_BYTES:
+                    st.caption(f"Exibindo {PREVIEW_BYTES / 1000:,.0f} KB de {len(json_modificado) / MB:,.1f} MB; "
+                               "use o download para o documento completo")
     
     def _get_sample_data(self) -> Dict:
         """Retorna dados de exemplo"""
         return {
             "company_name": "EXEMPLO SOCIEDADE LTDA",
-            "cnpj": "12.345.678/0001-90",
+            "cnpj": "12.345.678/0001-95",
             "nire": "12345678901",
             "address": "Rua Exemplo, 123, Centro, São Paulo/SP",
             "zip_code": "01234-567",
             "partners": [
                 {
                     "partner_name": "João Silva",
-                    "cpf_cnpj": "123.456.789-10",
+                    "cpf_cnpj": "123.456.789-09",
                     "represented_by": "",
                     "address": "Rua A, 100, São Paulo/SP",
                     "participation_value": 10000.0,
@@ -226,34 +436,127 @@ class SocietaryModule(BaseModule):
             "leaving_partners": ["Pedro Costa"]
         }
 
+@dataclass
+class SocietaryDocument:
+    """
+    Documento processado: tabelas de process_document, últimas tabelas
+    editadas e a tabela usada como base de cada editor enquanto ele existir
+    """
+    digest: str
+    name: str
+    frames: Dict[str, Any]
+    edited: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    bases: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    
+    def editor_base(self, table: str, active: bool) -> pd.DataFrame:
+        """
+        Tabela de entrada do editor: a mesma enquanto o editor estiver ativo
+        (as edições dele são um delta sobre ela); um editor novo parte das
+        últimas edições guardadas
+        """
+        if not active or table not in self.bases:
+            self.bases[table] = self.edited.get(table, self.frames[table])
+        return self.bases[table]
+
+
+class SocietaryDocumentCache:
+    """
+    Documentos processados da sessão, indexados pelo hash do conteúdo do JSON
+    Um documento já visto não é lido de novo e guarda as edições feitas nele
+    """
+    
+    def __init__(self, max_documents: int = DOCUMENT_CACHE_SIZE):
+        self.max_documents = max_documents
+        self.hits = 0
+        self.misses = 0
+        self._documents: "OrderedDict[str, SocietaryDocument]" = OrderedDict()
+    
+    def get_or_process(self, data: Union[bytes, str], name: str,
+                       process: Callable[[Union[bytes, str]], Dict[str, Any]]) -> SocietaryDocument:
+        """Documento do cache ou, se o conteúdo for novo, o resultado de `process(data)`"""
+        digest = content_hash(data.encode('utf-8') if isinstance(data, str) else data)
+        if digest in self._documents:
+            self.hits += 1
+            self._documents.move_to_end(digest)
+            return self._documents[digest]
+        
+        self.misses += 1
+        document = SocietaryDocument(digest=digest, name=name, frames=process(data))
+        self._documents[digest] = document
+        while len(self._documents) > self.max_documents:
+            self._documents.popitem(last=False)
+        return document
+    
+    def get(self, digest: str) -> Optional[SocietaryDocument]:
+        """Documento pelo hash, se ainda estiver no cache"""
+        document = self._documents.get(digest)
+        if document is not None:
+            self._documents.move_to_end(digest)
+        return document
+    
+    def discard_edits(self, digest: str) -> None:
+        """Volta o documento às tabelas originais"""
+        document = self._documents.get(digest)
+        if document is not None:
+            document.edited.clear()
+            document.bases.clear()
+    
+    def invalidate(self, digest: Optional[str] = None) -> None:
+        """Remove o documento (ou, sem `digest`, todos) do cache"""
+        if digest is None:
+            self._documents.clear()
+        else:
+            self._documents.pop(digest, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso do cache"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'documents': len(self._documents),
+            'max_documents': self.max_documents
+        }
+
+
 class SocietaryDataProcessor(DataProcessor):
     """Processador específico para dados societários"""
     
     def process_json(self, dados_json: Any) -> Dict[str, Any]:
         """Processa JSON societário e retorna DataFrames"""
         dados = self.safe_json_load(dados_json)
+        socios = dados.get('partners', [])
+        return self._build_frames(dados, pd.DataFrame(socios) if socios else pd.DataFrame())
+    
+    def process_document(self, source: Any) -> Dict[str, Any]:
+        """
+        Lê o documento (arquivo, bytes ou texto) e retorna os DataFrames;
+        'partners' é lido em fluxo direto para colunas. Erros levantam ValueError
+        e as estatísticas da leitura ficam em 'parse_stats'
+        """
+        dados, builders, stats = read_json_document(source, columnar=('partners',))
+        if not isinstance(dados, dict):
+            raise ValueError("O documento não é um objeto JSON")
+        if 'partners' in builders:
+            # A lista é refeita a partir da tabela na exportação
+            dados['partners'] = []
+            df_socios = builders['partners'].to_frame()
+        else:
+            df_socios = pd.DataFrame()
         
+        data_frames = self._build_frames(dados, df_socios)
+        data_frames['parse_stats'] = stats
+        return data_frames
+    
+    def _build_frames(self, dados: Dict[str, Any], df_socios: pd.DataFrame) -> Dict[str, Any]:
         # DataFrame principal da empresa
-        info_empresa = {
-            'Nome da Empresa': dados.get('company_name', ''),
-            'CNPJ': dados.get('cnpj', ''),
-            'NIRE': dados.get('nire', ''),
-            'Endereço': dados.get('address', ''),
-            'CEP': dados.get('zip_code', '')
-        }
+        info_empresa = {label: dados.get(key, '') for key, label in COMPANY_FIELDS.items()}
         df_empresa = self.create_editable_dataframe(info_empresa)
         
         # DataFrame dos sócios
-        socios = dados.get('partners', [])
-        if socios:
-            df_socios = pd.DataFrame(socios)
-            # Reorganizar colunas principais
-            colunas_principais = ['partner_name', 'cpf_cnpj', 'represented_by', 'address', 'participation_value', 'qualification']
-            colunas_existentes = [col for col in colunas_principais if col in df_socios.columns]
-            outras_colunas = [col for col in df_socios.columns if col not in colunas_principais]
-            df_socios = df_socios[colunas_existentes + outras_colunas]
-        else:
-            df_socios = pd.DataFrame()
+        if not df_socios.empty:
+            df_socios = self.order_partner_columns(df_socios)
         
         # DataFrame dos novos sócios
         novos_socios = dados.get('new_partners', [])
@@ -270,40 +573,405 @@ class SocietaryDataProcessor(DataProcessor):
             'saindo': df_saindo,
             'originais': dados
         }
+    
+    @staticmethod
+    def order_partner_columns(df_socios: pd.DataFrame) -> pd.DataFrame:
+        """Reorganiza as colunas principais dos sócios (a coluna do documento, se houver, vem primeiro)"""
+        primeiras = [DOCUMENT_COLUMN] + PARTNER_COLUMNS
+        colunas_existentes = [col for col in primeiras if col in df_socios.columns]
+        outras_colunas = [col for col in df_socios.columns if col not in primeiras]
+        return df_socios[colunas_existentes + outras_colunas]
+    
+    @staticmethod
+    def validate_document(dados: Any) -> None:
+        """Estrutura mínima de um ato societário; levanta ValueError"""
+        if not isinstance(dados, dict):
+            raise ValueError("O documento não é um objeto JSON")
+        if not any(dados.get(key) for key in COMPANY_FIELDS):
+            raise ValueError(f"Nenhum dado da empresa ({', '.join(COMPANY_FIELDS)})")
+        partners = dados.get('partners') or []
+        if not isinstance(partners, list) or not all(isinstance(partner, dict) for partner in partners):
+            raise ValueError("'partners' precisa ser uma lista de objetos")
+        for key in ('new_partners', 'leaving_partners'):
+            if not isinstance(dados.get(key) or [], list):
+                raise ValueError(f"'{key}' precisa ser uma lista")
+    
+    def flatten_documents(self, documents: Iterable[Tuple[str, Any]]) -> Dict[str, Any]:
+        """
+        Valida vários documentos e os achata em tabelas únicas, com a coluna
+        'Documento'; os inválidos ficam de fora e são listados em 'erros'.
+        Em 'originais' ficam os demais campos de cada documento (para a exportação)
+        """
+        empresas, socios, novos, saindo, erros = [], [], [], [], []
+        originais, colunas_socios = {}, {}
+        
+        for name, content in documents:
+            try:
+                dados = decode_json(content) if isinstance(content, (str, bytes)) else content
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                erros.append({DOCUMENT_COLUMN: name, 'Erro': f"JSON inválido: {str(e)}"})
+                continue
+            
+            # Um arquivo com uma lista vira um documento por item
+            items = [(f"{name}#{i}", item) for i, item in enumerate(dados, start=1)] \
+                if isinstance(dados, list) else [(name, dados)]
+            for document, dados in items:
+                try:
+                    self.validate_document(dados)
+                except ValueError as e:
+                    erros.append({DOCUMENT_COLUMN: document, 'Erro': str(e)})
+                    continue
+                
+                partners = dados.get('partners') or []
+                empresas.append({DOCUMENT_COLUMN: document,
+                                 **{label: dados.get(key, '') for key, label in COMPANY_FIELDS.items()}})
+                socios.extend({DOCUMENT_COLUMN: document, **partner} for partner in partners)
+                novos.extend({DOCUMENT_COLUMN: document, 'Nome': nome} for nome in dados.get('new_partners') or [])
+                saindo.extend({DOCUMENT_COLUMN: document, 'Nome': nome} for nome in dados.get('leaving_partners') or [])
+                
+                # As listas presentes no original são refeitas a partir das tabelas
+                originais[document] = {key: [] if key in LIST_FIELDS else value for key, value in dados.items()}
+                colunas_socios[document] = list(dict.fromkeys(key for partner in partners for key in partner))
+        
+        return {
+            'empresa': pd.DataFrame(empresas, columns=[DOCUMENT_COLUMN, *COMPANY_FIELDS.values()]),
+            'socios': self.order_partner_columns(pd.DataFrame(socios)) if socios else pd.DataFrame(columns=[DOCUMENT_COLUMN]),
+            'novos': pd.DataFrame(novos, columns=[DOCUMENT_COLUMN, 'Nome']),
+            'saindo': pd.DataFrame(saindo, columns=[DOCUMENT_COLUMN, 'Nome']),
+            'erros': pd.DataFrame(erros, columns=[DOCUMENT_COLUMN, 'Erro']),
+            'originais': originais,
+            'colunas_socios': colunas_socios
+        }
+
+
+def capital_rule(capital: Dict[Any, Optional[float]]) -> FrameRule:
+    """
+    Soma de participation_value por documento (sem a coluna 'Documento',
+    a chave é None): precisa ser positiva e, se o capital social for
+    conhecido, igual a ele
+    """
+    def check(df: pd.DataFrame) -> List[Tuple[Any, str, str]]:
+        if 'participation_value' not in df.columns or not len(df):
+            return []
+        valores = pd.to_numeric(df['participation_value'], errors='coerce')
+        if DOCUMENT_COLUMN in df.columns:
+            totais = valores.groupby(df[DOCUMENT_COLUMN], sort=False).sum()
+        else:
+            totais = pd.Series([valores.sum()], index=[None])
+        problemas = []
+        for document, total in totais.items():
+            prefixo = f"{document}: " if document is not None else ""
+            esperado = capital.get(document)
+            if total <= 0:
+                problemas.append((None, 'participation_value', f"{prefixo}Soma das participações é zero"))
+            elif esperado is not None and abs(total - esperado) > 0.005:
+                problemas.append((None, 'participation_value',
+                                  f"{prefixo}Soma das participações ({total:,.2f}) difere do capital social ({esperado:,.2f})"))
+        return problemas
+    return FrameRule(name='capital', check=check)
+
+
+class SocietaryValidator:
+    """
+    Validação das quatro tabelas de um ato (ou de um lote, com a coluna
+    'Documento'): CNPJ/CPF pelos dígitos verificadores, CEP, NIRE, sócios
+    duplicados e soma das participações. Cada tabela tem seu
+    IncrementalValidator, então a cada edição só as linhas alteradas são
+    conferidas de novo
+    """
+    
+    COMPANY_SCHEMA = Schema(rules=[
+        Rule(COMPANY_FIELDS['company_name'], required=True),
+        Rule(COMPANY_FIELDS['cnpj'], valid_cnpj, "CNPJ inválido (dígitos verificadores)", required=True),
+        Rule(COMPANY_FIELDS['nire'], matches(r'\d{11}'), "NIRE deve ter 11 dígitos"),
+        Rule(COMPANY_FIELDS['zip_code'], valid_cep, "CEP inválido (formato 00000-000)")
+    ])
+    NAME_SCHEMA = Schema(
+        rules=[Rule('Nome', required=True)],
+        frame_rules=[unique('Nome', "Nome repetido", by=DOCUMENT_COLUMN)]
+    )
+    
+    def __init__(self):
+        self.validators = {
+            'empresa': IncrementalValidator(self.COMPANY_SCHEMA),
+            'socios': IncrementalValidator(self.partner_schema({})),
+            'novos': IncrementalValidator(self.NAME_SCHEMA),
+            'saindo': IncrementalValidator(self.NAME_SCHEMA)
+        }
+        self.stats = ValidationStats()
+    
+    @staticmethod
+    def partner_schema(capital: Dict[Any, Optional[float]]) -> Schema:
+        return Schema(
+            rules=[
+                Rule('partner_name', required=True),
+                Rule('cpf_cnpj', valid_cpf_cnpj, "CPF/CNPJ inválido (dígitos verificadores)", required=True),
+                Rule('participation_value', non_negative_number, "Participação deve ser um número maior ou igual a zero")
+            ],
+            frame_rules=[
+                unique('cpf_cnpj', "Sócio duplicado (mesmo CPF/CNPJ)", normalize=normalize_document, by=DOCUMENT_COLUMN),
+                capital_rule(capital)
+            ]
+        )
+    
+    @staticmethod
+    def capital_of(dados: Dict[str, Any]) -> Optional[float]:
+        """Capital social informado no documento, se houver"""
+        valor = pd.to_numeric(pd.Series([dados.get(CAPITAL_FIELD)]), errors='coerce').iloc[0]
+        return None if pd.isna(valor) else float(valor)
+    
+    def validate(self, frames: Dict[str, pd.DataFrame], capital: Any = None) -> Dict[str, pd.DataFrame]:
+        """
+        Problemas por tabela (Linha, Coluna, Erro). `capital` é o capital
+        social do documento ou, no lote, um dicionário documento -> capital
+        """
+        capital = capital if isinstance(capital, dict) else {None: capital}
+        # Só as regras de tabela dependem do capital: as linhas já conferidas continuam valendo
+        self.validators['socios'].schema = self.partner_schema(capital)
+        
+        issues = {}
+        for key, validator in self.validators.items():
+            df = frames.get(key)
+            if df is None or df.empty:
+                issues[key] = pd.DataFrame(columns=ISSUE_COLUMNS)
+                validator.reset()
+            elif key == 'empresa' and 'Campo' in df.columns:
+                issues[key] = self._validate_fields(validator, df)
+            else:
+                issues[key] = validator.validate(df)
+        
+        stats = [validator.stats for validator in self.validators.values()]
+        self.stats = ValidationStats(
+            rows=sum(item.rows for item in stats), checked=sum(item.checked for item in stats),
+            issues=sum(len(df) for df in issues.values()), elapsed=sum(item.elapsed for item in stats)
+        )
+        return issues
+    
+    @staticmethod
+    def _validate_fields(validator: IncrementalValidator, df_empresa: pd.DataFrame) -> pd.DataFrame:
+        # Tabela Campo/Valor de um documento: validada como uma linha com uma
+        # coluna por campo e os problemas voltam para a linha do campo
+        linhas = pd.Series(df_empresa.index, index=df_empresa['Campo'])
+        issues = validator.validate(pd.DataFrame([dict(zip(df_empresa['Campo'], df_empresa['Valor']))]))
+        return issues.assign(Linha=issues['Coluna'].map(linhas), Coluna='Valor')
+
+
+def iter_filing_sources(files: Iterable[Tuple[str, bytes]]) -> Iterator[Tuple[str, bytes]]:
+    """
+    Documentos (nome, conteúdo) dos arquivos enviados: cada .json, cada linha
+    de um .ndjson/.jsonl e os arquivos desses tipos dentro de um .zip
+    """
+    for name, data in files:
+        lower = name.lower()
+        if lower.endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for info in archive.infolist():
+                    member = info.filename
+                    if info.is_dir() or member.startswith('__MACOSX/') or os.path.basename(member).startswith('.'):
+                        continue
+                    if member.lower().endswith(BATCH_EXTENSIONS):
+                        yield from iter_filing_sources([(f"{name}/{member}", archive.read(info))])
+        elif lower.endswith(('.ndjson', '.jsonl')):
+            for number, line in enumerate(data.splitlines(), start=1):
+                if line.strip():
+                    yield f"{name}#{number}", line
+        elif lower.endswith('.json'):
+            yield name, data
+
+
+def _flatten_filings_task(documents: List[Tuple[str, bytes]]) -> Dict[str, Any]:
+    """Tarefa do processo de trabalho: valida e achata um bloco de documentos"""
+    return SocietaryDataProcessor().flatten_documents(documents)
+
+
+@dataclass
+class BatchStats:
+    """Contagens e tempo de um processamento em lote"""
+    documents: int = 0
+    partners: int = 0
+    errors: int = 0
+    bytes: int = 0
+    chunks: int = 0
+    workers: int = 0
+    elapsed: float = 0.0
+    
+    @property
+    def throughput(self) -> float:
+        """Documentos processados por segundo"""
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+
+class SocietaryBatchProcessor:
+    """
+    Processamento em lote de atos societários
+
+    Os documentos são divididos em blocos, validados e achatados em paralelo
+    no pool de processos (lotes pequenos, na própria thread) e os blocos são
+    unidos nas tabelas empresa/socios/novos/saindo, com a coluna 'Documento'.
+    """
+    
+    def __init__(self, workers: Optional[WorkerPool] = None, chunk_documents: int = BATCH_CHUNK_DOCUMENTS,
+                 chunk_bytes: int = BATCH_CHUNK_BYTES, worker_documents: int = BATCH_WORKER_MIN_DOCUMENTS):
+        self.workers = workers
+        self.chunk_documents = chunk_documents
+        self.chunk_bytes = chunk_bytes
+        self.worker_documents = worker_documents
+    
+    def process(self, files: Iterable[Tuple[str, bytes]], job: Optional[Job] = None) -> Dict[str, Any]:
+        """Processa os arquivos (JSON, NDJSON ou .zip); `job` recebe o progresso e permite cancelar"""
+        started = time.perf_counter()
+        chunks = self._chunks(iter_filing_sources(files))
+        total = max(sum(len(chunk) for chunk in chunks), 1)
+        stats = BatchStats(bytes=sum(len(content) for chunk in chunks for _, content in chunk), chunks=len(chunks))
+        results: List[Optional[Dict[str, Any]]] = [None] * len(chunks)
+        processed = 0
+        
+        if self.workers is not None and total >= self.worker_documents:
+            stats.workers = min(self.workers.max_workers, len(chunks))
+            # Uma thread por processo: cada uma espera o resultado do seu bloco
+            with ThreadPoolExecutor(max_workers=stats.workers, thread_name_prefix='lote') as executor:
+                futures = {
+                    executor.submit(self.workers.run, _flatten_filings_task, chunk, job=job): position
+                    for position, chunk in enumerate(chunks)
+                }
+                for future in as_completed(futures):
+                    position = futures[future]
+                    results[position] = future.result()
+                    processed += len(chunks[position])
+                    if job is not None:
+                        job.report(processed / total)
+        else:
+            for position, chunk in enumerate(chunks):
+                results[position] = _flatten_filings_task(chunk)
+                processed += len(chunk)
+                if job is not None:
+                    job.report(processed / total)
+        
+        lote = self._combine([result for result in results if result is not None])
+        stats.documents = len(lote['empresa'])
+        stats.partners = len(lote['socios'])
+        stats.errors = len(lote['erros'])
+        stats.elapsed = time.perf_counter() - started
+        lote['stats'] = stats
+        return lote
+    
+    def _chunks(self, documents: Iterator[Tuple[str, bytes]]) -> List[List[Tuple[str, bytes]]]:
+        chunks, current, size = [], [], 0
+        for name, content in documents:
+            if current and (len(current) >= self.chunk_documents or size + len(content) > self.chunk_bytes):
+                chunks.append(current)
+                current, size = [], 0
+            current.append((name, content))
+            size += len(content)
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    @staticmethod
+    def _combine(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if not results:
+            results = [SocietaryDataProcessor().flatten_documents([])]
+        lote = {
+            key: pd.concat([result[key] for result in results], ignore_index=True)
+            for key in ('empresa', 'socios', 'novos', 'saindo', 'erros')
+        }
+        lote['socios'] = SocietaryDataProcessor.order_partner_columns(lote['socios'])
+        lote['originais'] = {document: dados for result in results for document, dados in result['originais'].items()}
+        lote['colunas_socios'] = {
+            document: colunas for result in results for document, colunas in result['colunas_socios'].items()
+        }
+        return lote
 
 class SocietaryDataExporter:
     """Exportador de dados societários"""
     
-    def export_modified_data(self, df_empresa, df_socios, df_novos, df_saindo, dados_originais) -> str:
-        """Exporta dados modificados para JSON"""
+    def export_modified_data(self, df_empresa, df_socios, df_novos, df_saindo, dados_originais,
+                             compact: bool = False) -> bytes:
+        """Exporta dados modificados para JSON (UTF-8)"""
         dados_modificados = dados_originais.copy()
         
-        # Atualizar dados da empresa
-        for _, row in df_empresa.iterrows():
-            campo = row['Campo']
-            valor = row['Valor']
-            
-            if campo == 'Nome da Empresa':
-                dados_modificados['company_name'] = valor
-            elif campo == 'CNPJ':
-                dados_modificados['cnpj'] = valor
-            elif campo == 'NIRE':
-                dados_modificados['nire'] = valor
-            elif campo == 'Endereço':
-                dados_modificados['address'] = valor
-            elif campo == 'CEP':
-                dados_modificados['zip_code'] = valor
+        # Atualizar dados da empresa pelos rótulos de COMPANY_FIELDS
+        campos = dict(zip(df_empresa['Campo'], self._column_values(df_empresa['Valor'])))
+        dados_modificados.update({key: campos[label] for key, label in COMPANY_FIELDS.items() if label in campos})
         
         # Atualizar lista de sócios
         if not df_socios.empty:
-            dados_modificados['partners'] = df_socios.to_dict('records')
+            dados_modificados['partners'] = self._records(df_socios)
         
         # Atualizar novos sócios
         if not df_novos.empty:
-            dados_modificados['new_partners'] = df_novos['Nome'].tolist()
+            dados_modificados['new_partners'] = self._column_values(df_novos['Nome'])
         
         # Atualizar sócios que saem
         if not df_saindo.empty:
-            dados_modificados['leaving_partners'] = df_saindo['Nome'].tolist()
+            dados_modificados['leaving_partners'] = self._column_values(df_saindo['Nome'])
+        
+        return encode_json(dados_modificados, compact=compact)
+    
+    def export_batch(self, lote: Dict[str, Any], target: Optional[BinaryIO] = None) -> BinaryIO:
+        """
+        Exporta as tabelas de um lote como .zip, um JSON por documento
+        Os documentos são gerados e gravados um de cada vez; retorna o arquivo
+        (temporário, se `target` não for informado) posicionado no início
+        """
+        target = target if target is not None else tempfile.TemporaryFile()
         
-        return json.dumps(dados_modificados, indent=2, ensure_ascii=False)
\ No newline at end of file
+        # Tabelas convertidas em registros uma única vez e separadas por documento
+        listas: Dict[str, Dict[str, List[Any]]] = {'socios': {}, 'novos': {}, 'saindo': {}}
+        for key, registros in listas.items():
+            for registro in self._records(lote[key]):
+                registros.setdefault(str(registro.pop(DOCUMENT_COLUMN, None)), []).append(registro)
+        
+        usados = set()
+        with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for empresa in self._records(lote['empresa']):
+                document = str(empresa[DOCUMENT_COLUMN])
+                # Colunas de sócios trazidas por outros documentos do lote ficam de fora
+                conhecidas = set(lote['colunas_socios'].get(document, []))
+                partners = [
+                    {key: value for key, value in socio.items() if key in conhecidas or value is not None}
+                    for socio in listas['socios'].get(document, [])
+                ]
+                
+                dados = dict(lote['originais'].get(document, {}))
+                dados.update({key: empresa[label] for key, label in COMPANY_FIELDS.items() if label in empresa})
+                if partners:
+                    dados['partners'] = partners
+                for key, tabela in (('new_partners', 'novos'), ('leaving_partners', 'saindo')):
+                    nomes = [registro.get('Nome') for registro in listas[tabela].get(document, [])]
+                    if nomes:
+                        dados[key] = nomes
+                archive.writestr(self._entry_name(document, usados), encode_json(dados))
+        
+        target.seek(0)
+        return target
+    
+    @classmethod
+    def _records(cls, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        # Convertido coluna a coluna e só então juntado em registros
+        if not len(df):
+            return []
+        columns = [cls._column_values(df.iloc[:, i]) for i in range(df.shape[1])]
+        return [dict(zip(df.columns, row)) for row in zip(*columns)]
+    
+    @staticmethod
+    def _column_values(series: pd.Series) -> List[Any]:
+        # Tipos do Python; valores ausentes viram null no JSON (NaN não é JSON válido)
+        values = series.tolist()
+        missing = series.isna().to_numpy()
+        if missing.any():
+            values = [None if ausente else value for value, ausente in zip(values, missing)]
+        return values
+    
+    @staticmethod
+    def _entry_name(document: str, usados: set) -> str:
+        # 'lote.zip/2024/a.json' -> '2024/a.json'; 'dados.ndjson#3' -> 'dados_3.json'
+        name, _, item = document.split('.zip/', 1)[-1].lstrip('/').partition('#')
+        stem = os.path.splitext(name)[0] if name.lower().endswith(BATCH_EXTENSIONS) else name
+        base = f"{stem}_{item}" if item else stem
+        entry, counter = f"{base}.json", 1
+        while entry in usados:
+            counter += 1
+            entry = f"{base}_{counter}.json"
+        usados.add(entry)
+        return entry
@@ -0,0 +1,76 @@
+# Leitura incremental comparada ao json.loads com blocos de vários tamanhos
+import io
+import json
+import random
+
+import pytest
+
+from core.jsonstream import read_json_document
+
+
+def _value(rng: random.Random, depth: int = 0):
+    kind = rng.choice(['int', 'float', 'exp', 'str', 'bool', 'null', 'list', 'dict'] if depth < 3 else
+                      ['int', 'float', 'exp', 'str', 'bool', 'null'])
+    if kind == 'int':
+        return rng.randint(-10 ** 12, 10 ** 12)
+    if kind == 'float':
+        return rng.uniform(-1e6, 1e6)
+    if kind == 'exp':
+        return rng.choice([1.5e300, -2.5e-300, 1e21, 6.02e23])
+    if kind == 'str':
+        return ''.join(rng.choice('abcçãé "\\/\n\t🏢0123') for _ in range(rng.randint(0, 12)))
+    if kind == 'bool':
+        return rng.random() < 0.5
+    if kind == 'null':
+        return None
+    if kind == 'list':
+        return [_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"k{i}": _value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+
+
+def _document(rng: random.Random) -> dict:
+    document = {f"campo{i}": _value(rng) for i in range(rng.randint(0, 6))}
+    document['share_capital'] = rng.uniform(0, 1e9)
+    document['partners'] = [
+        {'partner_name': _value(rng), 'participation_value': rng.choice([rng.uniform(0, 1e5), rng.randint(0, 10 ** 6)]),
+         **({'extra': _value(rng)} if rng.random() < 0.3 else {})}
+        for _ in range(rng.randint(0, 30))
+    ]
+    return document
+
+
+def _read(text: str, chunk_size: int, as_bytes: bool):
+    source = io.BytesIO(text.encode('utf-8')) if as_bytes else text
+    document, builders, _ = read_json_document(source, ('partners',), stream_min_bytes=0, chunk_size=chunk_size)
+    if 'partners' in builders:
+        columns = builders['partners'].columns
+        document['partners'] = [
+            {key: values[row] for key, values in columns.items() if values[row] is not None or key != 'extra'}
+            for row in range(builders['partners'].rows)
+        ]
+    return document
+
+
+def test_number_split_at_chunk_boundary():
+    document, _, _ = read_json_document(b'{"a": 1.5e3, "b": 2}', ('partners',), stream_min_bytes=0, chunk_size=4)
+    assert document == {'a': 1500.0, 'b': 2}
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_matches_json_loads(seed):
+    rng = random.Random(seed)
+    document = _document(rng)
+    # Itens sem 'extra' voltam com extra=None do builder; o original não tem a chave
+    for partner in document['partners']:
+        if partner.get('extra', 0) is None:
+            del partner['extra']
+    text = json.dumps(document, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 1]))
+    expected = json.loads(text)
+    for chunk_size in (1, 2, 3, 5, 7, 16, rng.randint(1, 64), len(text)):
+        for as_bytes in (False, True):
+            assert _read(text, chunk_size, as_bytes) == expected, (chunk_size, as_bytes)
+
+
+def test_invalid_json_raises_value_error():
+    with pytest.raises(ValueError):
+        read_json_document(b'{"a": 1.5e, "b": 2}', (), stream_min_bytes=0, chunk_size=3)